@@ -0,0 +1,28 @@
+# Generated by Django 6.0 on 2026-10-17 19:02
+
+from django.db import migrations
+
+
+# Incrementa versiones_tabla en cada escritura (función en stock 0010)
+TRIGGER = """
+CREATE TRIGGER clientes_cliente_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON clientes_cliente
+    FOR EACH STATEMENT EXECUTE FUNCTION versiones_tabla_incrementar();
+INSERT INTO versiones_tabla (tabla, version, modificado) VALUES ('clientes_cliente', 1, now());
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0001_initial'),
+        ('stock', '0010_versiones_tabla'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            TRIGGER,
+            "DROP TRIGGER IF EXISTS clientes_cliente_version ON clientes_cliente;"
+            "DELETE FROM versiones_tabla WHERE tabla = 'clientes_cliente';",
+        ),
+    ]
@@ -1,3 +1,23 @@
 from django.test import TestCase
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from .models import Cliente
+
+
+class ListadoClientesTests(TestCase):
+    """Respuesta condicional del listado de clientes"""
+
+    def test_304_hasta_que_cambia_un_cliente(self):
+        client = APIClient()
+        cliente = Cliente.objects.create(
+            nombre='Muebles Yecla', contacto='Ana', email='ana@example.com',
+            telefono='600000000', nif_cif='B00000001',
+        )
+        etag = client.get('/api/clientes/')['ETag']
+        self.assertEqual(client.get('/api/clientes/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        cliente.telefono = '600000002'
+        cliente.save()
+        response = client.get('/api/clientes/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
@@ -1,13 +1,15 @@
 from rest_framework.permissions import AllowAny
 from rest_framework import viewsets, filters
 from rest_framework.permissions import IsAuthenticated
+from comun.condicional import ListadoCondicionalMixin
 from .models import Cliente
 from .serializers import ClienteSerializer
 
-class ClienteViewSet(viewsets.ModelViewSet):
+class ClienteViewSet(ListadoCondicionalMixin, viewsets.ModelViewSet):
     queryset = Cliente.objects.all()
     serializer_class = ClienteSerializer
     permission_classes = [AllowAny]  # Cambia IsAuthenticated por AllowAny
+    modelos_version = [Cliente]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['nombre', 'nif_cif', 'email']
     ordering_fields = ['nombre', 'fecha_creacion']
@@ -0,0 +1,4 @@
+"""
+Infraestructura común de la API: exportación en streaming, paginación por
+cursor y respuestas condicionales. La usan stock, clientes y pedidos.
+"""
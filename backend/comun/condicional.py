@@ -0,0 +1,51 @@
+"""
+Respuestas condicionales (ETag / Last-Modified) para los listados.
+
+El validador de un listado se obtiene con una sola consulta a versiones_tabla
+(suma de los incrementos de las tablas de las que depende) y la URL completa. Si el
+cliente ya tiene esa versión se responde 304 sin ejecutar la consulta del
+listado ni el serializer.
+"""
+import hashlib
+
+from django.db.models import Max, Sum
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from .models import VersionTabla
+
+
+def version_listado(modelos):
+    """(suma de versiones, última modificación) de las tablas de los modelos"""
+    tablas = [model._meta.db_table for model in modelos]
+    datos = VersionTabla.objects.filter(tabla__in=tablas).aggregate(
+        version=Sum('version'), modificado=Max('modificado')
+    )
+    return datos['version'] or 0, datos['modificado']
+
+
+class ListadoCondicionalMixin:
+    """
+    Añade ETag y Last-Modified a list() y responde 304 a If-None-Match /
+    If-Modified-Since. `modelos_version` son los modelos cuyas tablas aparecen
+    en la respuesta (el propio y los de los nombres que resuelve el serializer).
+    """
+    modelos_version = []
+
+    def list(self, request, *args, **kwargs):
+        version, modificado = version_listado(self.modelos_version)
+        clave = f"{version}|{request.get_full_path()}|{request.META.get('HTTP_ACCEPT', '')}"
+        etag = '"%s"' % hashlib.md5(clave.encode('utf-8')).hexdigest()
+        ultima = int(modificado.timestamp()) if modificado else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=ultima)
+        if response is None:
+            response = super().list(request, *args, **kwargs)
+
+        response['ETag'] = etag
+        if ultima is not None:
+            response['Last-Modified'] = http_date(ultima)
+        # Que el navegador revalide siempre en lugar de reutilizar la copia a ciegas
+        patch_cache_control(response, no_cache=True)
+        patch_vary_headers(response, ['Accept'])
+        return response
@@ -0,0 +1,113 @@
+"""
+Exportación en streaming (CSV o NDJSON, opcionalmente gzip) de listados completos.
+
+Las filas se leen con un cursor de servidor (iterator con chunk_size) y se envían
+por bloques con StreamingHttpResponse: la memoria no crece con el tamaño de la
+tabla y la cabecera sale antes de que la consulta haya terminado.
+"""
+import csv
+import io
+import json
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+FORMATOS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+# Filas leídas por viaje al cursor de servidor y filas por bloque enviado
+CHUNK_SIZE = 2000
+FILAS_POR_BLOQUE = 500
+
+
+def _lineas_csv(columnas, filas):
+    """CSV separado por ';' (el que abre Excel en español), cabecera incluida"""
+    salida = io.StringIO()
+    writer = csv.writer(salida, delimiter=';', lineterminator='\n')
+    writer.writerow(columnas)
+
+    # La cabecera sale sola, antes de pedir la primera fila a la base de datos
+    yield salida.getvalue()
+    salida.seek(0)
+    salida.truncate()
+
+    for n, fila in enumerate(filas, start=1):
+        writer.writerow(fila)
+        if n % FILAS_POR_BLOQUE == 0:
+            yield salida.getvalue()
+            salida.seek(0)
+            salida.truncate()
+    if salida.tell():
+        yield salida.getvalue()
+
+
+def _lineas_ndjson(columnas, filas):
+    """Un objeto JSON por línea"""
+    bloque = []
+    for fila in filas:
+        bloque.append(json.dumps(dict(zip(columnas, fila)), cls=DjangoJSONEncoder, ensure_ascii=False))
+        if len(bloque) == FILAS_POR_BLOQUE:
+            yield '\n'.join(bloque) + '\n'
+            bloque = []
+    if bloque:
+        yield '\n'.join(bloque) + '\n'
+
+
+def _gzip(bloques):
+    """Comprime en streaming los bloques de texto"""
+    compresor = zlib.compressobj(wbits=31)  # 31 = cabecera gzip
+    for bloque in bloques:
+        datos = compresor.compress(bloque.encode('utf-8'))
+        if datos:
+            yield datos
+    yield compresor.flush()
+
+
+def respuesta_exportacion(request, queryset, columnas, nombre):
+    """
+    Devuelve un StreamingHttpResponse con las columnas indicadas del queryset.
+
+    columnas: lista de (nombre en el archivo, campo para values_list), p. ej.
+    ('familia', 'familia__nombre'). Parámetros: ?formato=csv|ndjson y ?gzip=true.
+    Devuelve None si el formato no es válido.
+    """
+    formato = request.query_params.get('formato', 'csv').lower()
+    if formato not in FORMATOS:
+        return None
+    comprimir = request.query_params.get('gzip', '').lower() == 'true'
+
+    nombres = [c[0] for c in columnas]
+    filas = queryset.values_list(*[c[1] for c in columnas]).iterator(chunk_size=CHUNK_SIZE)
+    bloques = (_lineas_csv if formato == 'csv' else _lineas_ndjson)(nombres, filas)
+
+    content_type, extension = FORMATOS[formato]
+    archivo = f"{nombre}_{timezone.localdate():%Y-%m-%d}.{extension}"
+    if comprimir:
+        bloques = _gzip(bloques)
+        content_type = 'application/gzip'
+        archivo += '.gz'
+
+    response = StreamingHttpResponse(bloques, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{archivo}"'
+    return response
+
+
+def exportar_listado(viewset, columnas, nombre):
+    """
+    Exporta el listado del viewset (con sus filtros, búsqueda y orden) en
+    streaming. Ver respuesta_exportacion.
+    """
+    queryset = viewset.filter_queryset(viewset.get_queryset())
+    response = respuesta_exportacion(viewset.request, queryset, columnas, nombre)
+    if response is None:
+        return Response(
+            {"error": "Formato no válido, use formato=csv o formato=ndjson"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return response
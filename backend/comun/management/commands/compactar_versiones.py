@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from comun.services import compactar_versiones
+
+
+class Command(BaseCommand):
+    help = (
+        "Agrupa los incrementos de versiones_tabla (una fila por escritura) en "
+        "una fila por tabla sin cambiar los ETag de los listados. "
+        "Pensado para ejecutarse periódicamente (p. ej. cada noche)."
+    )
+
+    def handle(self, *args, **options):
+        antes, despues = compactar_versiones()
+        self.stdout.write(self.style.SUCCESS(f"Versiones compactadas: {antes} filas -> {despues}."))
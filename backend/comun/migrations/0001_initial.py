@@ -0,0 +1,35 @@
+# Generated by Django 6.0 on 2026-10-18 09:25
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('stock', '0010_versiones_tabla'),
+    ]
+
+    # La tabla versiones_tabla la creó stock 0010: aquí solo pasa el modelo a comun
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='VersionTabla',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('tabla', models.CharField(max_length=63, unique=True)),
+                        ('version', models.BigIntegerField(default=0)),
+                        ('modificado', models.DateTimeField(default=django.utils.timezone.now)),
+                    ],
+                    options={
+                        'verbose_name': 'Versión de tabla',
+                        'verbose_name_plural': 'Versiones de tabla',
+                        'db_table': 'versiones_tabla',
+                    },
+                ),
+            ],
+        ),
+    ]
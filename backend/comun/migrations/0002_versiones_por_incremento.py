@@ -0,0 +1,54 @@
+# Generated by Django 6.0 on 2026-10-18 09:40
+
+from django.db import migrations, models
+
+
+# Cada sentencia inserta su incremento: sin UPDATE de una fila por tabla que
+# quede bloqueada hasta el commit (serializaba a todos los escritores de la
+# tabla y podía interbloquear transacciones que escriben en varias tablas)
+FUNCION = """
+CREATE OR REPLACE FUNCTION versiones_tabla_incrementar() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO versiones_tabla (tabla, version, modificado)
+    VALUES (TG_TABLE_NAME, 1, now());
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+# Vuelta atrás: una fila por tabla con la suma, y la función de stock 0010
+FUNCION_ANTERIOR = """
+WITH borradas AS (DELETE FROM versiones_tabla RETURNING tabla, version, modificado)
+INSERT INTO versiones_tabla (tabla, version, modificado)
+SELECT tabla, SUM(version), MAX(modificado) FROM borradas GROUP BY tabla;
+
+CREATE OR REPLACE FUNCTION versiones_tabla_incrementar() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO versiones_tabla (tabla, version, modificado)
+    VALUES (TG_TABLE_NAME, 1, now())
+    ON CONFLICT (tabla)
+    DO UPDATE SET version = versiones_tabla.version + 1, modificado = now();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comun', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='versiontabla',
+            name='tabla',
+            field=models.CharField(max_length=63),
+        ),
+        migrations.AddIndex(
+            model_name='versiontabla',
+            index=models.Index(fields=['tabla'], include=('version', 'modificado'), name='version_tabla_idx'),
+        ),
+        migrations.RunSQL(FUNCION, FUNCION_ANTERIOR),
+    ]
@@ -0,0 +1,32 @@
+from django.db import models
+from django.utils import timezone
+
+
+# ========================================
+# VERSIONES DE TABLA (RESPUESTAS CONDICIONALES)
+# ========================================
+
+class VersionTabla(models.Model):
+    """
+    Incremento de versión de una tabla para los ETag/Last-Modified de los listados.
+    Un trigger por sentencia inserta una fila (tabla, 1, now()) en cada INSERT,
+    UPDATE, DELETE o TRUNCATE de la tabla (ver migración 0002), así que cubre
+    también las escrituras masivas en SQL. La versión de la tabla es la suma de
+    sus filas: como solo se insertan, dos escrituras concurrentes no se esperan
+    entre sí, y cada fila solo la ven las transacciones que ven los datos.
+    compactar_versiones las agrupa en una fila por tabla.
+    """
+    tabla = models.CharField(max_length=63)
+    version = models.BigIntegerField(default=0)
+    modificado = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        db_table = 'versiones_tabla'
+        verbose_name = 'Versión de tabla'
+        verbose_name_plural = 'Versiones de tabla'
+        indexes = [
+            models.Index(fields=['tabla'], include=['version', 'modificado'], name='version_tabla_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.tabla} +{self.version}"
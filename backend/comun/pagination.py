@@ -0,0 +1,209 @@
+"""
+Paginación por cursor (keyset) para los listados grandes.
+
+En lugar de COUNT(*) + OFFSET n, cada página continúa a partir de los valores
+de ordenación de la última fila de la anterior:
+
+    WHERE (codigo > 'X')                                   -- ?ordering=codigo
+    WHERE (nombre > 'X' OR (nombre = 'X' AND id > 42))      -- ?ordering=nombre
+
+de modo que cualquier página cuesta lo mismo que la primera si existe un
+índice por (campo, id). El cursor es opaco (base64) y lo generan los enlaces
+next/previous de la respuesta.
+
+Parámetros:
+- ?cursor=...      Cursor devuelto en next/previous
+- ?page_size=N     Tamaño de página (máximo MAX_PAGE_SIZE)
+- ?contar=false    No calcula count (se omite el COUNT(*))
+- ?page=N          Paginación clásica por número de página (pantallas tipo admin)
+"""
+import base64
+import json
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+MAX_PAGE_SIZE = 1000
+
+
+def _campo(model, campo):
+    """Campo del modelo para '-campo', o None si es una anotación"""
+    try:
+        return model._meta.get_field(campo.lstrip('-'))
+    except FieldDoesNotExist:
+        return None
+
+
+class PaginacionPorPagina(PageNumberPagination):
+    """Paginación clásica (?page=N), con COUNT(*) y OFFSET"""
+    page_size_query_param = 'page_size'
+    max_page_size = MAX_PAGE_SIZE
+
+
+class PaginacionCursor(BasePagination):
+    """
+    Paginación keyset sobre la ordenación activa del viewset (?ordering= o
+    `ordering` por defecto). Si la ordenación no termina en un campo único se
+    añade id como desempate, en el mismo sentido que el último campo, para que
+    un único índice (campo, id) sirva tanto en orden ascendente como descendente.
+
+    Los campos de ordenación deben ser columnas no nulas del propio modelo o
+    anotaciones numéricas del queryset (p. ej. la relevancia de la búsqueda).
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = MAX_PAGE_SIZE
+    cursor_query_param = 'cursor'
+    contar_query_param = 'contar'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.por_pagina = None
+        if 'page' in request.query_params:
+            self.por_pagina = PaginacionPorPagina()
+            return self.por_pagina.paginate_queryset(queryset, request, view)
+
+        tamano = self._tamano_pagina(request)
+        self.orden = self._orden(queryset, request, view)
+        self.base_url = request.build_absolute_uri()
+        self.count = None
+        if request.query_params.get(self.contar_query_param, '').lower() != 'false':
+            self.count = queryset.count()
+
+        valores, hacia_atras = self._decodificar_cursor(queryset.model, request)
+        orden = self.orden
+        if hacia_atras:
+            orden = [self._invertir(campo) for campo in orden]
+
+        queryset = queryset.order_by(*orden)
+        if valores is not None:
+            queryset = queryset.filter(self._despues_de(orden, valores))
+
+        filas = list(queryset[:tamano + 1])
+        hay_mas = len(filas) > tamano
+        filas = filas[:tamano]
+        if hacia_atras:
+            filas.reverse()
+
+        # Hacia delante siempre hay página anterior si se llegó con un cursor,
+        # y hacia atrás siempre hay página siguiente (la de la que se vino)
+        self.siguiente = None
+        self.anterior = None
+        if filas:
+            if hay_mas or hacia_atras:
+                self.siguiente = self._cursor(filas[-1], False)
+            if (hay_mas and hacia_atras) or (valores is not None and not hacia_atras):
+                self.anterior = self._cursor(filas[0], True)
+        return filas
+
+    def get_paginated_response(self, data):
+        if self.por_pagina is not None:
+            return self.por_pagina.get_paginated_response(data)
+
+        respuesta = {}
+        if self.count is not None:
+            respuesta['count'] = self.count
+        respuesta['next'] = self._enlace(self.siguiente)
+        respuesta['previous'] = self._enlace(self.anterior)
+        respuesta['results'] = data
+        return Response(respuesta)
+
+    def get_paginated_response_schema(self, schema):
+        return PaginacionPorPagina().get_paginated_response_schema(schema)
+
+    # ---- Ordenación ----
+
+    def _orden(self, queryset, request, view):
+        """Ordenación activa, completada con id si hace falta para que sea total"""
+        orden = None
+        if view is not None:
+            for backend in getattr(view, 'filter_backends', []):
+                if issubclass(backend, OrderingFilter):
+                    orden = backend().get_ordering(request, queryset, view)
+                    break
+        orden = list(orden or queryset.query.order_by or queryset.model._meta.ordering or [])
+
+        for campo in orden:
+            field = _campo(queryset.model, campo)
+            if field is not None and (field.primary_key or field.unique):
+                return orden[:orden.index(campo) + 1]
+        descendente = bool(orden) and orden[-1].startswith('-')
+        return orden + ['-id' if descendente else 'id']
+
+    @staticmethod
+    def _invertir(campo):
+        return campo[1:] if campo.startswith('-') else '-' + campo
+
+    @staticmethod
+    def _despues_de(orden, valores):
+        """
+        Condición 'fila posterior a valores' en la ordenación dada:
+        (a > x) OR (a = x AND b > y) OR ...
+
+        Se añade además a >= x para que el primer campo acote el recorrido del índice.
+        """
+        condicion = Q()
+        iguales = {}
+        for campo, valor in zip(orden, valores):
+            nombre = campo.lstrip('-')
+            operador = 'lt' if campo.startswith('-') else 'gt'
+            condicion |= Q(**iguales, **{f'{nombre}__{operador}': valor})
+            iguales[nombre] = valor
+        primero = orden[0].lstrip('-')
+        cota = 'lte' if orden[0].startswith('-') else 'gte'
+        return Q(**{f'{primero}__{cota}': valores[0]}) & condicion
+
+    # ---- Cursores ----
+
+    def _tamano_pagina(self, request):
+        try:
+            tamano = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return min(max(tamano, 1), self.max_page_size)
+
+    def _cursor(self, fila, hacia_atras):
+        valores = []
+        for campo in self.orden:
+            if isinstance(fila, dict):
+                # Filas de values(): la clave es el nombre del campo o de la anotación
+                valores.append(fila[campo.lstrip('-')])
+                continue
+            field = _campo(type(fila), campo)
+            valores.append(getattr(fila, field.attname if field else campo.lstrip('-')))
+        return self._codificar(valores, hacia_atras)
+
+    @staticmethod
+    def _codificar(valores, hacia_atras):
+        datos = json.dumps({'v': valores, 'a': hacia_atras}, cls=DjangoJSONEncoder)
+        return base64.urlsafe_b64encode(datos.encode('utf-8')).decode('ascii')
+
+    def _decodificar_cursor(self, model, request):
+        """Devuelve (valores, hacia_atras) o (None, False) si no hay cursor"""
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            datos = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            valores = datos['v']
+            if not isinstance(valores, list) or len(valores) != len(self.orden):
+                raise ValueError
+            convertidos = []
+            for campo, valor in zip(self.orden, valores):
+                field = _campo(model, campo)
+                convertidos.append(field.to_python(valor) if field else float(valor))
+            return convertidos, bool(datos.get('a'))
+        except Exception:
+            raise NotFound("Cursor no válido")
+
+    def _enlace(self, cursor):
+        if cursor is None:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
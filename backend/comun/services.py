@@ -0,0 +1,31 @@
+"""
+Servicios comunes: mantenimiento de las tablas auxiliares de la API
+"""
+from django.db import connection
+
+from .models import VersionTabla
+
+
+def compactar_versiones():
+    """
+    Agrupa los incrementos de versiones_tabla en una fila por tabla con la
+    suma y la última modificación, de modo que el ETag no cambia. Las filas
+    que insertan mientras tanto otras transacciones no las ve el DELETE y
+    se quedan para la siguiente compactación.
+    Devuelve (filas_antes, filas_despues).
+    """
+    tabla = connection.ops.quote_name(VersionTabla._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            WITH borradas AS (
+                DELETE FROM {tabla} RETURNING tabla, version, modificado
+            ), agrupadas AS (
+                INSERT INTO {tabla} (tabla, version, modificado)
+                SELECT tabla, SUM(version), MAX(modificado) FROM borradas GROUP BY tabla
+                RETURNING 1
+            )
+            SELECT (SELECT COUNT(*) FROM borradas), (SELECT COUNT(*) FROM agrupadas)
+            """
+        )
+        return cursor.fetchone()
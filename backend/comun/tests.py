@@ -0,0 +1,64 @@
+import threading
+
+from django.db import connection, connections, transaction
+from django.test import TestCase, TransactionTestCase
+
+from stock.models import Familia, ModeloProducto
+from .condicional import version_listado
+from .models import VersionTabla
+from .services import compactar_versiones
+
+
+class VersionesTablaTests(TestCase):
+    """Incrementos de versión por sentencia y su compactación"""
+
+    def test_compactar_no_cambia_la_version(self):
+        for codigo in ('01', '02', '03'):
+            Familia.objects.create(codigo=codigo, nombre=f'Familia {codigo}')
+        Familia.objects.update(activo=False)
+        ModeloProducto.objects.create(codigo='MARTINA', nombre='Martina', tipo='MATERIA')
+        version = version_listado([Familia, ModeloProducto])
+
+        antes, despues = compactar_versiones()
+        self.assertGreater(antes, despues)
+        self.assertEqual(version_listado([Familia, ModeloProducto]), version)
+        self.assertEqual(VersionTabla.objects.filter(tabla='familias').count(), 1)
+
+        Familia.objects.create(codigo='04', nombre='Familia 04')
+        self.assertEqual(version_listado([Familia, ModeloProducto])[0], version[0] + 1)
+
+
+class VersionesTablaConcurrenciaTests(TransactionTestCase):
+    """Dos transacciones que escriben en la misma tabla"""
+
+    def test_escritores_no_se_esperan(self):
+        escrita = threading.Event()
+        terminar = threading.Event()
+        errores = []
+
+        def escritor():
+            try:
+                with transaction.atomic():
+                    Familia.objects.create(codigo='01', nombre='Madera')
+                    escrita.set()
+                    terminar.wait(10)
+            except Exception as e:
+                errores.append(e)
+            finally:
+                connections.close_all()
+
+        hilo = threading.Thread(target=escritor)
+        hilo.start()
+        try:
+            self.assertTrue(escrita.wait(10))
+            # Con la versión en una fila por tabla este INSERT esperaría al commit del otro
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL lock_timeout = '2s'")
+                Familia.objects.create(codigo='02', nombre='Metal')
+        finally:
+            terminar.set()
+            hilo.join()
+
+        self.assertEqual(errores, [])
+        self.assertEqual(Familia.objects.count(), 2)
@@ -38,6 +38,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     
     # Third party apps
     'rest_framework',
@@ -46,6 +47,7 @@ INSTALLED_APPS = [
     'django_filters',
 
     # Apps del proyecto
+    'comun',
     'clientes',
     'stock',
     'pedidos',
@@ -97,6 +99,21 @@ DATABASES = {
     }
 }
 
+# Caché
+# La versión de los datos de referencia (stock/referencias.py) debe ser visible
+# para todos los procesos: en local basta la caché en archivo; en producción,
+# Redis o Memcached.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'referencias': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '.cache' / 'referencias',
+    },
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -214,6 +231,40 @@ SIMPLE_JWT = {
     'JTI_CLAIM': 'jti',
 }
 
+# ========================================
+# NUMERACIÓN DE PEDIDOS
+# ========================================
+# PATRON: {anio} y {numero} (admite formato, p. ej. {numero:06d}). Cada valor
+#   distinto de lo que no es {numero} es una serie con su propio contador:
+#   '{anio}-{numero:06d}' -> 2026-000123, y vuelve a 1 cada año.
+# SIN_HUECOS: True reserva el número dentro de la transacción del alta (si se
+#   deshace, el número no se pierde, pero las altas simultáneas de la misma
+#   serie esperan unas a otras hasta el commit). False lo reserva antes, con
+#   un bloqueo de microsegundos: altas en paralelo, con algún hueco si fallan.
+PEDIDOS_NUMERACION = {
+    'PATRON': '{anio}-{numero:06d}',
+    'SIN_HUECOS': False,
+}
+
+# ========================================
+# DASHBOARD
+# ========================================
+# Segundos que se guardan en caché las estadísticas de /api/dashboard/stats/.
+# Cualquier escritura en clientes, pedidos o stock las invalida antes.
+DASHBOARD_CACHE_SEGUNDOS = 30
+
+# ========================================
+# TALLER
+# ========================================
+# HORAS_SEMANA: horas de fabricación de lunes a domingo. Los días con otra
+#   capacidad (festivos, horas extra) se dan de alta en /api/capacidad-taller/.
+# HORIZONTE_DIAS: días, a partir de la última entrega comprometida, en los
+#   que se busca hueco para un pedido nuevo.
+TALLER = {
+    'HORAS_SEMANA': [8, 8, 8, 8, 8, 0, 0],
+    'HORIZONTE_DIAS': 365,
+}
+
 # ========================================
 # LOGGING (para debugging)
 # ========================================
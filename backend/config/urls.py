@@ -13,4 +13,5 @@ urlpatterns = [
     path('api/', include('clientes.urls')),
     path('api/', include('stock.urls')),
     path('api/', include('pedidos.urls')),
+    path('api/', include('produccion.urls')),
 ]
\ No newline at end of file
@@ -1,12 +1,27 @@
 from django.contrib import admin
-from .models import Pedido, LineaPedido
+from django.db import transaction
+from .models import Pedido, LineaPedido, EventoPedido, CapacidadTaller
+from .signals import pedidos_cambiados
+
+def _reservado(pedido):
+    """Las líneas de un pedido con reservas solo se cambian por la API, que vuelve a reservar"""
+    return pedido is not None and pedido.pk is not None and pedido.reservas.exists()
 
 class LineaPedidoInline(admin.TabularInline):
-    """Permite editar las líneas de pedido dentro del pedido"""
+    """Permite editar las líneas de pedido dentro del pedido (si no tiene reservas)"""
     model = LineaPedido
     extra = 1
     fields = ('producto', 'cantidad', 'precio_unitario', 'subtotal')
     readonly_fields = ('subtotal',)
+    
+    def has_add_permission(self, request, obj=None):
+        return super().has_add_permission(request, obj) and not _reservado(obj)
+    
+    def has_change_permission(self, request, obj=None):
+        return super().has_change_permission(request, obj) and not _reservado(obj)
+    
+    def has_delete_permission(self, request, obj=None):
+        return super().has_delete_permission(request, obj) and not _reservado(obj)
 
 @admin.register(Pedido)
 class PedidoAdmin(admin.ModelAdmin):
@@ -26,9 +41,56 @@ class PedidoAdmin(admin.ModelAdmin):
             'fields': ('observaciones', 'total')
         }),
     )
+    
+    def save_related(self, request, form, formsets, change):
+        """Con el pedido y sus líneas ya guardados, en la transacción del formulario"""
+        super().save_related(request, form, formsets, change)
+        pedidos_cambiados.send(sender=Pedido, pedido_ids=[form.instance.pk])
 
 @admin.register(LineaPedido)
 class LineaPedidoAdmin(admin.ModelAdmin):
     list_display = ('pedido', 'producto', 'cantidad', 'precio_unitario', 'subtotal')
     list_filter = ('pedido__estado',)
-    search_fields = ('pedido__numero_pedido', 'producto__nombre')
\ No newline at end of file
+    search_fields = ('pedido__numero_pedido', 'producto__nombre')
+    
+    def has_change_permission(self, request, obj=None):
+        return super().has_change_permission(request, obj) and not (obj and _reservado(obj.pedido))
+    
+    def has_delete_permission(self, request, obj=None):
+        return super().has_delete_permission(request, obj) and not (obj and _reservado(obj.pedido))
+    
+    def save_model(self, request, obj, form, change):
+        anterior = form.initial.get('pedido')
+        super().save_model(request, obj, form, change)
+        pedidos_cambiados.send(sender=Pedido, pedido_ids=[obj.pedido_id] + ([anterior] if anterior else []))
+    
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        pedidos_cambiados.send(sender=Pedido, pedido_ids=[obj.pedido_id])
+    
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            pedido_ids = list(queryset.values_list('pedido_id', flat=True).distinct())
+            super().delete_queryset(request, queryset)
+            pedidos_cambiados.send(sender=Pedido, pedido_ids=pedido_ids)
+    
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'pedido':
+            kwargs['queryset'] = Pedido.objects.filter(reservas__isnull=True)
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+@admin.register(EventoPedido)
+class EventoPedidoAdmin(admin.ModelAdmin):
+    list_display = ('pedido', 'estado_anterior', 'estado', 'fecha')
+    list_filter = ('estado', 'fecha')
+    search_fields = ('pedido__numero_pedido',)
+    list_select_related = ('pedido',)
+    readonly_fields = ('pedido', 'estado_anterior', 'estado', 'fecha')
+
+
+
+@admin.register(CapacidadTaller)
+class CapacidadTallerAdmin(admin.ModelAdmin):
+    list_display = ('fecha', 'horas', 'motivo')
+    date_hierarchy = 'fecha'
+    ordering = ('fecha',)
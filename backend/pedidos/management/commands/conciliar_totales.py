@@ -0,0 +1,55 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from pedidos.services import conciliar_totales, tramos_pedidos
+
+
+class Command(BaseCommand):
+    help = (
+        "Comprueba que el total de cada pedido coincide con la suma de sus "
+        "líneas y corrige los descuadres. Recorre los pedidos por tramos de id, "
+        "cada tramo en su propia transacción, con varios hilos en paralelo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=5000,
+                            help='Pedidos por tramo (default: 5000)')
+        parser.add_argument('--procesos', type=int, default=4,
+                            help='Tramos que se concilian a la vez, cada uno con su conexión')
+        parser.add_argument('--comprobar', action='store_true',
+                            help='Solo informa de los descuadres, sin corregirlos')
+
+    def handle(self, *args, **options):
+        if options['lote'] < 1:
+            raise CommandError("--lote debe ser al menos 1")
+        tramos = tramos_pedidos(options['lote'])
+        reparar = not options['comprobar']
+
+        if options['procesos'] <= 1:
+            resultados = [conciliar_totales(desde, hasta, reparar) for desde, hasta in tramos]
+        else:
+            with ThreadPoolExecutor(max_workers=options['procesos']) as executor:
+                resultados = list(executor.map(
+                    lambda tramo: self._conciliar_en_hilo(*tramo, reparar), tramos
+                ))
+
+        descuadres = [fila for resultado in resultados for fila in resultado]
+        for pedido_id, total, calculado in descuadres[:50]:
+            self.stdout.write(f"  Pedido {pedido_id}: total {total}, suma de líneas {calculado}")
+        if len(descuadres) > 50:
+            self.stdout.write(f"  ... y {len(descuadres) - 50} más")
+
+        accion = 'corregidos' if reparar else 'encontrados'
+        estilo = self.style.SUCCESS if not descuadres else self.style.WARNING
+        self.stdout.write(estilo(
+            f"{len(tramos)} tramos revisados. Pedidos descuadrados {accion}: {len(descuadres)}."
+        ))
+
+    def _conciliar_en_hilo(self, desde, hasta, reparar):
+        """Cada hilo usa su propia conexión, que se cierra al terminar el tramo"""
+        try:
+            return conciliar_totales(desde, hasta, reparar)
+        finally:
+            connection.close()
@@ -0,0 +1,52 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from pedidos.services import recalcular_ventas, tramos_ventas
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye las ventas diarias (ventas_diarias) desde las líneas de "
+        "pedido. Recorre las fechas por tramos, cada tramo en su propia "
+        "transacción, con varios hilos en paralelo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=31,
+                            help='Días por tramo (default: 31)')
+        parser.add_argument('--procesos', type=int, default=4,
+                            help='Tramos que se recalculan a la vez, cada uno con su conexión')
+        parser.add_argument('--comprobar', action='store_true',
+                            help='Solo informa de los descuadres, sin corregirlos')
+
+    def handle(self, *args, **options):
+        if options['dias'] < 1:
+            raise CommandError("--dias debe ser al menos 1")
+        tramos = tramos_ventas(options['dias'])
+        reparar = not options['comprobar']
+
+        if options['procesos'] <= 1:
+            resultados = [recalcular_ventas(desde, hasta, reparar) for desde, hasta in tramos]
+        else:
+            with ThreadPoolExecutor(max_workers=options['procesos']) as executor:
+                resultados = list(executor.map(
+                    lambda tramo: self._recalcular_en_hilo(*tramo, reparar), tramos
+                ))
+
+        for (desde, hasta), descuadres in zip(tramos, resultados):
+            if descuadres:
+                self.stdout.write(f"  {desde} a {hasta}: {descuadres} grupos descuadrados")
+
+        accion = 'corregidos' if reparar else 'encontrados'
+        total = sum(resultados)
+        estilo = self.style.SUCCESS if not total else self.style.WARNING
+        self.stdout.write(estilo(f"{len(tramos)} tramos revisados. Grupos descuadrados {accion}: {total}."))
+
+    def _recalcular_en_hilo(self, desde, hasta, reparar):
+        """Cada hilo usa su propia conexión, que se cierra al terminar el tramo"""
+        try:
+            return recalcular_ventas(desde, hasta, reparar)
+        finally:
+            connection.close()
@@ -0,0 +1,28 @@
+# Generated by Django 6.0 on 2026-10-17 19:02
+
+from django.db import migrations
+
+
+# Incrementa versiones_tabla en cada escritura (función en stock 0010)
+TRIGGER = """
+CREATE TRIGGER pedidos_pedido_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON pedidos_pedido
+    FOR EACH STATEMENT EXECUTE FUNCTION versiones_tabla_incrementar();
+INSERT INTO versiones_tabla (tabla, version, modificado) VALUES ('pedidos_pedido', 1, now());
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0002_indices_paginacion'),
+        ('stock', '0010_versiones_tabla'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            TRIGGER,
+            "DROP TRIGGER IF EXISTS pedidos_pedido_version ON pedidos_pedido;"
+            "DELETE FROM versiones_tabla WHERE tabla = 'pedidos_pedido';",
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 6.0 on 2026-10-17 20:05
+
+from django.db import migrations
+
+
+# Triggers por sentencia con tablas de transición: cada sentencia sobre las
+# líneas suma al total de cada pedido afectado la diferencia entre los
+# subtotales nuevos y los viejos con un único UPDATE total = total + delta.
+# Cubre los bulk_create, los UPDATE/DELETE masivos y las líneas que cambian
+# de pedido.
+TRIGGER = """
+CREATE OR REPLACE FUNCTION pedidos_lineapedido_total() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE pedidos_pedido p SET total = p.total + d.delta
+        FROM (SELECT pedido_id, SUM(subtotal) AS delta FROM nuevas GROUP BY pedido_id) d
+        WHERE p.id = d.pedido_id AND d.delta <> 0;
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE pedidos_pedido p SET total = p.total - d.delta
+        FROM (SELECT pedido_id, SUM(subtotal) AS delta FROM viejas GROUP BY pedido_id) d
+        WHERE p.id = d.pedido_id AND d.delta <> 0;
+    ELSE
+        UPDATE pedidos_pedido p SET total = p.total + d.delta
+        FROM (
+            SELECT pedido_id, SUM(subtotal) AS delta
+            FROM (SELECT pedido_id, subtotal FROM nuevas
+                  UNION ALL
+                  SELECT pedido_id, -subtotal FROM viejas) cambios
+            GROUP BY pedido_id
+        ) d
+        WHERE p.id = d.pedido_id AND d.delta <> 0;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER pedidos_lineapedido_total_insert AFTER INSERT ON pedidos_lineapedido
+    REFERENCING NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION pedidos_lineapedido_total();
+CREATE TRIGGER pedidos_lineapedido_total_update AFTER UPDATE ON pedidos_lineapedido
+    REFERENCING OLD TABLE AS viejas NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION pedidos_lineapedido_total();
+CREATE TRIGGER pedidos_lineapedido_total_delete AFTER DELETE ON pedidos_lineapedido
+    REFERENCING OLD TABLE AS viejas
+    FOR EACH STATEMENT EXECUTE FUNCTION pedidos_lineapedido_total();
+
+-- Punto de partida: los totales que hubiera descuadrados (p. ej. por líneas borradas)
+UPDATE pedidos_pedido p SET total = c.calculado
+FROM (
+    SELECT p.id, COALESCE(SUM(l.subtotal), 0) AS calculado
+    FROM pedidos_pedido p
+    LEFT JOIN pedidos_lineapedido l ON l.pedido_id = p.id
+    GROUP BY p.id
+) c
+WHERE p.id = c.id AND p.total <> c.calculado;
+"""
+
+BORRAR = """
+DROP TRIGGER IF EXISTS pedidos_lineapedido_total_insert ON pedidos_lineapedido;
+DROP TRIGGER IF EXISTS pedidos_lineapedido_total_update ON pedidos_lineapedido;
+DROP TRIGGER IF EXISTS pedidos_lineapedido_total_delete ON pedidos_lineapedido;
+DROP FUNCTION IF EXISTS pedidos_lineapedido_total();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0003_version_tabla'),
+    ]
+
+    operations = [
+        migrations.RunSQL(TRIGGER, BORRAR),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 6.0 on 2026-10-17 19:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0004_total_por_triggers'),
+        ('stock', '0013_propuestas_compra'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReservaProducto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Fecha de entrega')),
+                ('cantidad', models.IntegerField(default=0, verbose_name='Cantidad reservada')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas_fecha', to='stock.producto', verbose_name='Producto')),
+            ],
+            options={
+                'verbose_name': 'Reserva por producto y fecha',
+                'verbose_name_plural': 'Reservas por producto y fecha',
+                'db_table': 'reservas_producto',
+                'constraints': [models.UniqueConstraint(fields=('producto', 'fecha'), name='reserva_producto_fecha_unica')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ReservaStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Fecha de entrega')),
+                ('cantidad', models.IntegerField(verbose_name='Cantidad')),
+                ('pedido', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to='pedidos.pedido', verbose_name='Pedido')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='reservas_pedido', to='stock.producto', verbose_name='Producto')),
+            ],
+            options={
+                'verbose_name': 'Reserva de stock',
+                'verbose_name_plural': 'Reservas de stock',
+                'db_table': 'reservas_stock',
+                'constraints': [models.UniqueConstraint(fields=('pedido', 'producto'), name='reserva_pedido_producto_unica')],
+            },
+        ),
+    ]
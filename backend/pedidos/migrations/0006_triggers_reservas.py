@@ -0,0 +1,65 @@
+# Generated by Django 6.0 on 2026-10-17 20:40
+
+from django.db import migrations
+
+
+# Triggers por sentencia con tablas de transición: cada sentencia sobre
+# reservas_stock suma en reservas_producto la diferencia entre las filas nuevas
+# y las viejas por (producto, fecha) con un único INSERT ... ON CONFLICT, y
+# borra los grupos que han quedado a cero.
+ACUMULAR = """
+        INSERT INTO reservas_producto (producto_id, fecha, cantidad)
+        SELECT producto_id, fecha, SUM(cantidad)
+        FROM ({filas}) cambios
+        GROUP BY producto_id, fecha
+        HAVING SUM(cantidad) <> 0
+        ON CONFLICT (producto_id, fecha)
+        DO UPDATE SET cantidad = reservas_producto.cantidad + EXCLUDED.cantidad;"""
+
+NUEVAS = "SELECT producto_id, fecha, cantidad FROM nuevas"
+VIEJAS = "SELECT producto_id, fecha, -cantidad AS cantidad FROM viejas"
+
+LIMPIAR = """
+        DELETE FROM reservas_producto r
+        USING (SELECT DISTINCT producto_id, fecha FROM viejas) v
+        WHERE r.producto_id = v.producto_id AND r.fecha = v.fecha AND r.cantidad = 0;"""
+
+TRIGGER = f"""
+CREATE OR REPLACE FUNCTION reservas_stock_resumir() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN{ACUMULAR.format(filas=NUEVAS)}
+    ELSIF TG_OP = 'DELETE' THEN{ACUMULAR.format(filas=VIEJAS)}{LIMPIAR}
+    ELSE{ACUMULAR.format(filas=NUEVAS + ' UNION ALL ' + VIEJAS)}{LIMPIAR}
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER reservas_stock_resumen_insert AFTER INSERT ON reservas_stock
+    REFERENCING NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION reservas_stock_resumir();
+CREATE TRIGGER reservas_stock_resumen_update AFTER UPDATE ON reservas_stock
+    REFERENCING OLD TABLE AS viejas NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION reservas_stock_resumir();
+CREATE TRIGGER reservas_stock_resumen_delete AFTER DELETE ON reservas_stock
+    REFERENCING OLD TABLE AS viejas
+    FOR EACH STATEMENT EXECUTE FUNCTION reservas_stock_resumir();
+"""
+
+BORRAR = """
+DROP TRIGGER IF EXISTS reservas_stock_resumen_insert ON reservas_stock;
+DROP TRIGGER IF EXISTS reservas_stock_resumen_update ON reservas_stock;
+DROP TRIGGER IF EXISTS reservas_stock_resumen_delete ON reservas_stock;
+DROP FUNCTION IF EXISTS reservas_stock_resumir();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0005_reservas_stock'),
+    ]
+
+    operations = [
+        migrations.RunSQL(TRIGGER, BORRAR),
+    ]
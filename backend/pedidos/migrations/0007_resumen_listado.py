@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-17 19:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0006_triggers_reservas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pedido',
+            name='cliente_nombre',
+            field=models.CharField(default='', editable=False, max_length=200, verbose_name='Cliente'),
+        ),
+        migrations.AddField(
+            model_name='pedido',
+            name='num_lineas',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Líneas'),
+        ),
+        migrations.AddField(
+            model_name='pedido',
+            name='resumen_productos',
+            field=models.CharField(default='', editable=False, max_length=255, verbose_name='Productos'),
+        ),
+        migrations.AddField(
+            model_name='pedido',
+            name='unidades',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Unidades'),
+        ),
+    ]
@@ -0,0 +1,148 @@
+# Generated by Django 6.0 on 2026-10-17 21:05
+
+from django.db import migrations
+
+
+# Resumen de productos de un pedido: "Silla x3, Mesa x2", recortado a 255
+RESUMEN = """
+    COALESCE((
+        SELECT left(string_agg(pr.nombre || ' x' || l.cantidad, ', ' ORDER BY l.id), 255)
+        FROM pedidos_lineapedido l
+        JOIN productos pr ON pr.id = l.producto_id
+        WHERE l.pedido_id = {pedido}
+    ), '')"""
+
+# La función de la migración 0004 pasa a mantener también líneas, unidades y
+# resumen de productos en el mismo UPDATE por sentencia. Líneas, unidades y
+# total van por delta; el resumen se recompone solo para los pedidos afectados.
+ACTUALIZAR = """
+        UPDATE pedidos_pedido p
+        SET total = p.total + d.total,
+            num_lineas = p.num_lineas + d.lineas,
+            unidades = p.unidades + d.unidades,
+            resumen_productos = {resumen}
+        FROM (
+            SELECT pedido_id, SUM(subtotal) AS total, SUM(signo) AS lineas, SUM(cantidad) AS unidades
+            FROM ({filas}) cambios
+            GROUP BY pedido_id
+        ) d
+        WHERE p.id = d.pedido_id;"""
+
+NUEVAS = "SELECT pedido_id, subtotal, 1 AS signo, cantidad FROM nuevas"
+VIEJAS = "SELECT pedido_id, -subtotal AS subtotal, -1 AS signo, -cantidad AS cantidad FROM viejas"
+
+
+def actualizar(*partes):
+    return ACTUALIZAR.format(resumen=RESUMEN.format(pedido='p.id'), filas=' UNION ALL '.join(partes))
+
+
+LINEAS = f"""
+CREATE OR REPLACE FUNCTION pedidos_lineapedido_total() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN{actualizar(NUEVAS)}
+    ELSIF TG_OP = 'DELETE' THEN{actualizar(VIEJAS)}
+    ELSE{actualizar(NUEVAS, VIEJAS)}
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+LINEAS_ANTERIOR = """
+CREATE OR REPLACE FUNCTION pedidos_lineapedido_total() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE pedidos_pedido p SET total = p.total + d.delta
+        FROM (SELECT pedido_id, SUM(subtotal) AS delta FROM nuevas GROUP BY pedido_id) d
+        WHERE p.id = d.pedido_id AND d.delta <> 0;
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE pedidos_pedido p SET total = p.total - d.delta
+        FROM (SELECT pedido_id, SUM(subtotal) AS delta FROM viejas GROUP BY pedido_id) d
+        WHERE p.id = d.pedido_id AND d.delta <> 0;
+    ELSE
+        UPDATE pedidos_pedido p SET total = p.total + d.delta
+        FROM (
+            SELECT pedido_id, SUM(subtotal) AS delta
+            FROM (SELECT pedido_id, subtotal FROM nuevas
+                  UNION ALL
+                  SELECT pedido_id, -subtotal FROM viejas) cambios
+            GROUP BY pedido_id
+        ) d
+        WHERE p.id = d.pedido_id AND d.delta <> 0;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+# Nombre del cliente: se copia al crear el pedido o cambiar de cliente, y se
+# propaga a sus pedidos cuando se renombra el cliente. Renombrar un producto
+# recompone el resumen de los pedidos que lo llevan.
+NOMBRES = f"""
+CREATE OR REPLACE FUNCTION pedidos_pedido_cliente_nombre() RETURNS trigger AS $$
+BEGIN
+    NEW.cliente_nombre := (SELECT nombre FROM clientes_cliente WHERE id = NEW.cliente_id);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER pedidos_pedido_cliente_nombre
+    BEFORE INSERT OR UPDATE OF cliente_id ON pedidos_pedido
+    FOR EACH ROW EXECUTE FUNCTION pedidos_pedido_cliente_nombre();
+
+CREATE OR REPLACE FUNCTION clientes_cliente_renombrar_pedidos() RETURNS trigger AS $$
+BEGIN
+    UPDATE pedidos_pedido SET cliente_nombre = NEW.nombre WHERE cliente_id = NEW.id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER clientes_cliente_renombrar_pedidos
+    AFTER UPDATE OF nombre ON clientes_cliente
+    FOR EACH ROW WHEN (OLD.nombre IS DISTINCT FROM NEW.nombre)
+    EXECUTE FUNCTION clientes_cliente_renombrar_pedidos();
+
+CREATE OR REPLACE FUNCTION productos_renombrar_pedidos() RETURNS trigger AS $$
+BEGIN
+    UPDATE pedidos_pedido p SET resumen_productos = {RESUMEN.format(pedido='p.id')}
+    WHERE p.id IN (SELECT pedido_id FROM pedidos_lineapedido WHERE producto_id = NEW.id);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER productos_renombrar_pedidos
+    AFTER UPDATE OF nombre ON productos
+    FOR EACH ROW WHEN (OLD.nombre IS DISTINCT FROM NEW.nombre)
+    EXECUTE FUNCTION productos_renombrar_pedidos();
+
+-- Resumen de los pedidos existentes
+UPDATE pedidos_pedido p
+SET cliente_nombre = c.nombre,
+    num_lineas = (SELECT COUNT(*) FROM pedidos_lineapedido l WHERE l.pedido_id = p.id),
+    unidades = (SELECT COALESCE(SUM(cantidad), 0) FROM pedidos_lineapedido l WHERE l.pedido_id = p.id),
+    resumen_productos = {RESUMEN.format(pedido='p.id')}
+FROM clientes_cliente c
+WHERE c.id = p.cliente_id;
+"""
+
+BORRAR_NOMBRES = """
+DROP TRIGGER IF EXISTS pedidos_pedido_cliente_nombre ON pedidos_pedido;
+DROP FUNCTION IF EXISTS pedidos_pedido_cliente_nombre();
+DROP TRIGGER IF EXISTS clientes_cliente_renombrar_pedidos ON clientes_cliente;
+DROP FUNCTION IF EXISTS clientes_cliente_renombrar_pedidos();
+DROP TRIGGER IF EXISTS productos_renombrar_pedidos ON productos;
+DROP FUNCTION IF EXISTS productos_renombrar_pedidos();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0007_resumen_listado'),
+        ('clientes', '0002_version_tabla'),
+    ]
+
+    operations = [
+        migrations.RunSQL(LINEAS, LINEAS_ANTERIOR),
+        migrations.RunSQL(NOMBRES, BORRAR_NOMBRES),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 6.0 on 2026-10-17 21:30
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0008_triggers_resumen_listado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorEstadoPedido',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('en_produccion', 'En Producción'), ('producido', 'Producido'), ('entregado', 'Entregado'), ('cancelado', 'Cancelado')], max_length=20, unique=True, verbose_name='Estado')),
+                ('cantidad', models.IntegerField(default=0, verbose_name='Pedidos')),
+            ],
+            options={
+                'verbose_name': 'Pedidos por estado',
+                'verbose_name_plural': 'Pedidos por estado',
+                'db_table': 'pedidos_por_estado',
+            },
+        ),
+        migrations.CreateModel(
+            name='EventoPedido',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado_anterior', models.CharField(blank=True, max_length=20, verbose_name='Estado anterior')),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('en_produccion', 'En Producción'), ('producido', 'Producido'), ('entregado', 'Entregado'), ('cancelado', 'Cancelado')], max_length=20, verbose_name='Estado')),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Fecha')),
+                ('pedido', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='eventos', to='pedidos.pedido', verbose_name='Pedido')),
+            ],
+            options={
+                'verbose_name': 'Cambio de estado',
+                'verbose_name_plural': 'Cambios de estado',
+                'db_table': 'eventos_pedido',
+                'ordering': ['-fecha', '-id'],
+                'indexes': [models.Index(fields=['pedido', 'fecha'], name='evento_pedido_fecha_idx'), models.Index(fields=['estado', 'fecha'], name='evento_estado_fecha_idx')],
+            },
+        ),
+    ]
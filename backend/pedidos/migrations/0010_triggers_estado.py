@@ -0,0 +1,81 @@
+# Generated by Django 6.0 on 2026-10-17 21:35
+
+from django.db import migrations
+
+
+# Trigger por sentencia en pedidos_pedido: suma y resta por estado las filas
+# nuevas y viejas en pedidos_por_estado (un INSERT ... ON CONFLICT) y escribe
+# en eventos_pedido una fila por pedido cuyo estado ha cambiado (un INSERT).
+# Las sentencias que no tocan el estado (p. ej. los deltas del total) no
+# escriben nada: sus grupos se anulan en el HAVING y el join no da filas.
+CONTAR = """
+        INSERT INTO pedidos_por_estado (estado, cantidad)
+        SELECT estado, SUM(cantidad)
+        FROM ({filas}) cambios
+        GROUP BY estado
+        HAVING SUM(cantidad) <> 0
+        ON CONFLICT (estado)
+        DO UPDATE SET cantidad = pedidos_por_estado.cantidad + EXCLUDED.cantidad;"""
+
+NUEVAS = "SELECT estado, 1 AS cantidad FROM nuevas"
+VIEJAS = "SELECT estado, -1 AS cantidad FROM viejas"
+
+ALTAS = """
+        INSERT INTO eventos_pedido (pedido_id, estado_anterior, estado, fecha)
+        SELECT id, '', estado, now() FROM nuevas;"""
+
+CAMBIOS = """
+        INSERT INTO eventos_pedido (pedido_id, estado_anterior, estado, fecha)
+        SELECT n.id, v.estado, n.estado, now()
+        FROM nuevas n
+        JOIN viejas v ON v.id = n.id
+        WHERE n.estado <> v.estado;"""
+
+TRIGGER = f"""
+CREATE OR REPLACE FUNCTION pedidos_pedido_estado() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN{CONTAR.format(filas=NUEVAS)}{ALTAS}
+    ELSIF TG_OP = 'DELETE' THEN{CONTAR.format(filas=VIEJAS)}
+    ELSE{CONTAR.format(filas=NUEVAS + ' UNION ALL ' + VIEJAS)}{CAMBIOS}
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER pedidos_pedido_estado_insert AFTER INSERT ON pedidos_pedido
+    REFERENCING NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION pedidos_pedido_estado();
+CREATE TRIGGER pedidos_pedido_estado_update AFTER UPDATE ON pedidos_pedido
+    REFERENCING OLD TABLE AS viejas NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION pedidos_pedido_estado();
+CREATE TRIGGER pedidos_pedido_estado_delete AFTER DELETE ON pedidos_pedido
+    REFERENCING OLD TABLE AS viejas
+    FOR EACH STATEMENT EXECUTE FUNCTION pedidos_pedido_estado();
+
+-- Recuento inicial y un evento de alta por pedido existente
+INSERT INTO pedidos_por_estado (estado, cantidad)
+SELECT estado, COUNT(*) FROM pedidos_pedido GROUP BY estado;
+
+INSERT INTO eventos_pedido (pedido_id, estado_anterior, estado, fecha)
+SELECT id, '', estado, fecha_pedido FROM pedidos_pedido;
+"""
+
+BORRAR = """
+DROP TRIGGER IF EXISTS pedidos_pedido_estado_insert ON pedidos_pedido;
+DROP TRIGGER IF EXISTS pedidos_pedido_estado_update ON pedidos_pedido;
+DROP TRIGGER IF EXISTS pedidos_pedido_estado_delete ON pedidos_pedido;
+DROP FUNCTION IF EXISTS pedidos_pedido_estado();
+DELETE FROM eventos_pedido;
+DELETE FROM pedidos_por_estado;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0009_eventos_estado'),
+    ]
+
+    operations = [
+        migrations.RunSQL(TRIGGER, BORRAR),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 6.0 on 2026-10-17 22:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0002_version_tabla'),
+        ('pedidos', '0010_triggers_estado'),
+        ('stock', '0013_propuestas_compra'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VentaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(choices=[('total', 'Total'), ('producto', 'Producto'), ('modelo', 'Modelo'), ('cliente', 'Cliente')], max_length=10)),
+                ('fecha', models.DateField()),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('en_produccion', 'En Producción'), ('producido', 'Producido'), ('entregado', 'Entregado'), ('cancelado', 'Cancelado')], max_length=20)),
+                ('lineas', models.IntegerField(default=0)),
+                ('unidades', models.BigIntegerField(default=0)),
+                ('importe', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('cliente', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='clientes.cliente')),
+                ('modelo', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='stock.modeloproducto')),
+                ('producto', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='stock.producto')),
+            ],
+            options={
+                'verbose_name': 'Venta diaria',
+                'verbose_name_plural': 'Ventas diarias',
+                'db_table': 'ventas_diarias',
+                'constraints': [models.UniqueConstraint(fields=('dimension', 'fecha', 'estado', 'producto', 'modelo', 'cliente'), name='venta_diaria_unica', nulls_distinct=False)],
+            },
+        ),
+    ]
@@ -0,0 +1,135 @@
+# Generated by Django 6.0 on 2026-10-17 22:05
+
+from django.db import migrations
+
+
+# Triggers por sentencia con tablas de transición: cada sentencia suma en
+# ventas_diarias las líneas afectadas con sus atributos nuevos y resta las de
+# los viejos, con un único INSERT ... ON CONFLICT. Los GROUPING SETS sacan las
+# cuatro dimensiones de una sola pasada; los grupos sin cambios se descartan
+# en el HAVING (p. ej. los UPDATE de pedidos que solo tocan el total).
+ACUMULAR = """
+        INSERT INTO ventas_diarias
+            (dimension, fecha, estado, producto_id, modelo_id, cliente_id, lineas, unidades, importe)
+        SELECT CASE WHEN GROUPING(producto_id) = 0 THEN 'producto'
+                    WHEN GROUPING(modelo_id) = 0 THEN 'modelo'
+                    WHEN GROUPING(cliente_id) = 0 THEN 'cliente'
+                    ELSE 'total' END,
+               fecha, estado, producto_id, modelo_id, cliente_id,
+               SUM(lineas), SUM(unidades), SUM(importe)
+        FROM ({filas}
+        ) cambios
+        GROUP BY GROUPING SETS (
+            (fecha, estado), (fecha, estado, producto_id), (fecha, estado, modelo_id), (fecha, estado, cliente_id)
+        )
+        HAVING SUM(lineas) <> 0 OR SUM(unidades) <> 0 OR SUM(importe) <> 0
+        ON CONFLICT (dimension, fecha, estado, producto_id, modelo_id, cliente_id)
+        DO UPDATE SET lineas = ventas_diarias.lineas + EXCLUDED.lineas,
+                      unidades = ventas_diarias.unidades + EXCLUDED.unidades,
+                      importe = ventas_diarias.importe + EXCLUDED.importe;"""
+
+COLUMNAS = """
+            SELECT p.fecha_pedido AS fecha, p.estado, l.producto_id, pr.modelo_id, p.cliente_id,
+                   {signo} AS lineas, {signo} * l.cantidad AS unidades, {signo} * l.subtotal AS importe"""
+
+# Líneas nuevas o viejas con los atributos actuales de su pedido y producto
+LINEAS = COLUMNAS + """
+            FROM {origen} l
+            JOIN pedidos_pedido p ON p.id = l.pedido_id
+            JOIN productos pr ON pr.id = l.producto_id"""
+
+# Líneas de los pedidos que cambian de estado, fecha o cliente
+PEDIDOS = COLUMNAS + """
+            FROM {origen} p
+            JOIN pedidos_lineapedido l ON l.pedido_id = p.id
+            JOIN productos pr ON pr.id = l.producto_id
+            WHERE p.id IN (
+                SELECT n.id FROM nuevas n JOIN viejas v ON v.id = n.id
+                WHERE (n.estado, n.fecha_pedido, n.cliente_id) IS DISTINCT FROM (v.estado, v.fecha_pedido, v.cliente_id)
+            )"""
+
+# Líneas de los productos que cambian de modelo
+PRODUCTOS = COLUMNAS + """
+            FROM {origen} pr
+            JOIN pedidos_lineapedido l ON l.producto_id = pr.id
+            JOIN pedidos_pedido p ON p.id = l.pedido_id
+            WHERE pr.id IN (
+                SELECT n.id FROM nuevas n JOIN viejas v ON v.id = n.id
+                WHERE n.modelo_id IS DISTINCT FROM v.modelo_id
+            )"""
+
+
+def acumular(filas, *origenes):
+    partes = [filas.format(signo=signo, origen=origen) for signo, origen in origenes]
+    return ACUMULAR.format(filas='\n            UNION ALL'.join(partes))
+
+
+TRIGGERS = f"""
+CREATE OR REPLACE FUNCTION pedidos_lineapedido_ventas() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN{acumular(LINEAS, (1, 'nuevas'))}
+    ELSIF TG_OP = 'DELETE' THEN{acumular(LINEAS, (-1, 'viejas'))}
+    ELSE{acumular(LINEAS, (1, 'nuevas'), (-1, 'viejas'))}
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER pedidos_lineapedido_ventas_insert AFTER INSERT ON pedidos_lineapedido
+    REFERENCING NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION pedidos_lineapedido_ventas();
+CREATE TRIGGER pedidos_lineapedido_ventas_update AFTER UPDATE ON pedidos_lineapedido
+    REFERENCING OLD TABLE AS viejas NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION pedidos_lineapedido_ventas();
+CREATE TRIGGER pedidos_lineapedido_ventas_delete AFTER DELETE ON pedidos_lineapedido
+    REFERENCING OLD TABLE AS viejas
+    FOR EACH STATEMENT EXECUTE FUNCTION pedidos_lineapedido_ventas();
+
+-- Un pedido nuevo no tiene líneas y las líneas se borran antes que el pedido:
+-- solo los UPDATE de pedidos y productos mueven ventas
+CREATE OR REPLACE FUNCTION pedidos_pedido_ventas() RETURNS trigger AS $$
+BEGIN{acumular(PEDIDOS, (1, 'nuevas'), (-1, 'viejas'))}
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER pedidos_pedido_ventas_update AFTER UPDATE ON pedidos_pedido
+    REFERENCING OLD TABLE AS viejas NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION pedidos_pedido_ventas();
+
+CREATE OR REPLACE FUNCTION productos_ventas() RETURNS trigger AS $$
+BEGIN{acumular(PRODUCTOS, (1, 'nuevas'), (-1, 'viejas'))}
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER productos_ventas_update AFTER UPDATE ON productos
+    REFERENCING OLD TABLE AS viejas NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION productos_ventas();
+
+-- Ventas de las líneas que ya existen
+{acumular(LINEAS, (1, 'pedidos_lineapedido')).strip()}
+"""
+
+BORRAR = """
+DROP TRIGGER IF EXISTS pedidos_lineapedido_ventas_insert ON pedidos_lineapedido;
+DROP TRIGGER IF EXISTS pedidos_lineapedido_ventas_update ON pedidos_lineapedido;
+DROP TRIGGER IF EXISTS pedidos_lineapedido_ventas_delete ON pedidos_lineapedido;
+DROP FUNCTION IF EXISTS pedidos_lineapedido_ventas();
+DROP TRIGGER IF EXISTS pedidos_pedido_ventas_update ON pedidos_pedido;
+DROP FUNCTION IF EXISTS pedidos_pedido_ventas();
+DROP TRIGGER IF EXISTS productos_ventas_update ON productos;
+DROP FUNCTION IF EXISTS productos_ventas();
+DELETE FROM ventas_diarias;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0011_ventas_diarias'),
+    ]
+
+    operations = [
+        migrations.RunSQL(TRIGGERS, BORRAR),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 6.0 on 2026-10-17 22:40
+
+from django.db import migrations, models
+
+
+# La función de la migración 0010 pasa a sumar también el total de los pedidos
+# por estado. Los deltas del total que escriben los triggers de las líneas
+# llegan aquí como UPDATE de pedidos_pedido y se acumulan en el importe.
+CONTAR = """
+        INSERT INTO pedidos_por_estado (estado, cantidad, importe)
+        SELECT estado, SUM(cantidad), SUM(importe)
+        FROM ({filas}) cambios
+        GROUP BY estado
+        HAVING SUM(cantidad) <> 0 OR SUM(importe) <> 0
+        ON CONFLICT (estado)
+        DO UPDATE SET cantidad = pedidos_por_estado.cantidad + EXCLUDED.cantidad,
+                      importe = pedidos_por_estado.importe + EXCLUDED.importe;"""
+
+NUEVAS = "SELECT estado, 1 AS cantidad, total AS importe FROM nuevas"
+VIEJAS = "SELECT estado, -1 AS cantidad, -total AS importe FROM viejas"
+
+CAMBIOS = """
+        INSERT INTO eventos_pedido (pedido_id, estado_anterior, estado, fecha)
+        SELECT n.id, v.estado, n.estado, now()
+        FROM nuevas n
+        JOIN viejas v ON v.id = n.id
+        WHERE n.estado <> v.estado;"""
+
+ALTAS = """
+        INSERT INTO eventos_pedido (pedido_id, estado_anterior, estado, fecha)
+        SELECT id, '', estado, now() FROM nuevas;"""
+
+FUNCION = """
+CREATE OR REPLACE FUNCTION pedidos_pedido_estado() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN{insertar}{altas}
+    ELSIF TG_OP = 'DELETE' THEN{borrar}
+    ELSE{actualizar}{cambios}
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+TRIGGER = FUNCION.format(
+    insertar=CONTAR.format(filas=NUEVAS),
+    borrar=CONTAR.format(filas=VIEJAS),
+    actualizar=CONTAR.format(filas=NUEVAS + ' UNION ALL ' + VIEJAS),
+    altas=ALTAS, cambios=CAMBIOS,
+) + """
+UPDATE pedidos_por_estado c SET importe = p.importe
+FROM (SELECT estado, SUM(total) AS importe FROM pedidos_pedido GROUP BY estado) p
+WHERE c.estado = p.estado;
+"""
+
+# Versión de la migración 0010, sin importe
+CONTAR_ANTERIOR = """
+        INSERT INTO pedidos_por_estado (estado, cantidad)
+        SELECT estado, SUM(cantidad)
+        FROM ({filas}) cambios
+        GROUP BY estado
+        HAVING SUM(cantidad) <> 0
+        ON CONFLICT (estado)
+        DO UPDATE SET cantidad = pedidos_por_estado.cantidad + EXCLUDED.cantidad;"""
+
+TRIGGER_ANTERIOR = FUNCION.format(
+    insertar=CONTAR_ANTERIOR.format(filas="SELECT estado, 1 AS cantidad FROM nuevas"),
+    borrar=CONTAR_ANTERIOR.format(filas="SELECT estado, -1 AS cantidad FROM viejas"),
+    actualizar=CONTAR_ANTERIOR.format(
+        filas="SELECT estado, 1 AS cantidad FROM nuevas UNION ALL SELECT estado, -1 AS cantidad FROM viejas"
+    ),
+    altas=ALTAS, cambios=CAMBIOS,
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0012_triggers_ventas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contadorestadopedido',
+            name='importe',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Importe'),
+        ),
+        migrations.RunSQL(TRIGGER, TRIGGER_ANTERIOR),
+    ]
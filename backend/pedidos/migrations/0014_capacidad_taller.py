@@ -0,0 +1,41 @@
+# Generated by Django 6.0 on 2026-10-17 23:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0013_importe_por_estado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CapacidadTaller',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(unique=True, verbose_name='Fecha')),
+                ('horas', models.DecimalField(decimal_places=2, max_digits=5, verbose_name='Horas disponibles')),
+                ('motivo', models.CharField(blank=True, max_length=200, verbose_name='Motivo')),
+            ],
+            options={
+                'verbose_name': 'Capacidad del taller',
+                'verbose_name_plural': 'Calendario del taller',
+                'db_table': 'capacidad_taller',
+                'ordering': ['fecha'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CargaTaller',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(unique=True, verbose_name='Fecha de entrega')),
+                ('horas', models.BigIntegerField(default=0, verbose_name='Horas de fabricación')),
+            ],
+            options={
+                'verbose_name': 'Carga del taller',
+                'verbose_name_plural': 'Carga del taller',
+                'db_table': 'carga_taller',
+            },
+        ),
+    ]
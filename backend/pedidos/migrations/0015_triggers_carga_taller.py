@@ -0,0 +1,125 @@
+# Generated by Django 6.0 on 2026-10-17 23:15
+
+from django.db import migrations
+
+
+# Triggers por sentencia con tablas de transición: cada sentencia suma en
+# carga_taller las horas de las líneas afectadas con sus atributos nuevos y
+# resta las de los viejos, por fecha de entrega, con un único INSERT ... ON
+# CONFLICT. Solo cargan el taller los pedidos pendientes o en producción.
+ACUMULAR = """
+        INSERT INTO carga_taller (fecha, horas)
+        SELECT fecha, SUM(horas)
+        FROM ({filas}
+        ) cambios
+        GROUP BY fecha
+        HAVING SUM(horas) <> 0
+        ON CONFLICT (fecha)
+        DO UPDATE SET horas = carga_taller.horas + EXCLUDED.horas;"""
+
+COLUMNAS = """
+            SELECT p.fecha_entrega_estimada AS fecha, {signo} * l.cantidad * pr.tiempo_fabricacion AS horas"""
+
+ABIERTOS = "p.estado IN ('pendiente', 'en_produccion')"
+
+# Líneas nuevas o viejas con el estado y la fecha actuales de su pedido
+LINEAS = COLUMNAS + f"""
+            FROM {{origen}} l
+            JOIN pedidos_pedido p ON p.id = l.pedido_id
+            JOIN productos pr ON pr.id = l.producto_id
+            WHERE {ABIERTOS}"""
+
+# Líneas de los pedidos que cambian de estado o de fecha de entrega
+PEDIDOS = COLUMNAS + f"""
+            FROM {{origen}} p
+            JOIN pedidos_lineapedido l ON l.pedido_id = p.id
+            JOIN productos pr ON pr.id = l.producto_id
+            WHERE {ABIERTOS} AND p.id IN (
+                SELECT n.id FROM nuevas n JOIN viejas v ON v.id = n.id
+                WHERE (n.estado, n.fecha_entrega_estimada) IS DISTINCT FROM (v.estado, v.fecha_entrega_estimada)
+            )"""
+
+# Líneas abiertas de los productos que cambian de tiempo de fabricación
+PRODUCTOS = COLUMNAS + f"""
+            FROM {{origen}} pr
+            JOIN pedidos_lineapedido l ON l.producto_id = pr.id
+            JOIN pedidos_pedido p ON p.id = l.pedido_id
+            WHERE {ABIERTOS} AND pr.id IN (
+                SELECT n.id FROM nuevas n JOIN viejas v ON v.id = n.id
+                WHERE n.tiempo_fabricacion IS DISTINCT FROM v.tiempo_fabricacion
+            )"""
+
+
+def acumular(filas, *origenes):
+    partes = [filas.format(signo=signo, origen=origen) for signo, origen in origenes]
+    return ACUMULAR.format(filas='\n            UNION ALL'.join(partes))
+
+
+TRIGGERS = f"""
+CREATE OR REPLACE FUNCTION pedidos_lineapedido_carga() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN{acumular(LINEAS, (1, 'nuevas'))}
+    ELSIF TG_OP = 'DELETE' THEN{acumular(LINEAS, (-1, 'viejas'))}
+    ELSE{acumular(LINEAS, (1, 'nuevas'), (-1, 'viejas'))}
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER pedidos_lineapedido_carga_insert AFTER INSERT ON pedidos_lineapedido
+    REFERENCING NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION pedidos_lineapedido_carga();
+CREATE TRIGGER pedidos_lineapedido_carga_update AFTER UPDATE ON pedidos_lineapedido
+    REFERENCING OLD TABLE AS viejas NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION pedidos_lineapedido_carga();
+CREATE TRIGGER pedidos_lineapedido_carga_delete AFTER DELETE ON pedidos_lineapedido
+    REFERENCING OLD TABLE AS viejas
+    FOR EACH STATEMENT EXECUTE FUNCTION pedidos_lineapedido_carga();
+
+-- Como en las ventas, solo los UPDATE de pedidos y productos mueven carga
+CREATE OR REPLACE FUNCTION pedidos_pedido_carga() RETURNS trigger AS $$
+BEGIN{acumular(PEDIDOS, (1, 'nuevas'), (-1, 'viejas'))}
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER pedidos_pedido_carga_update AFTER UPDATE ON pedidos_pedido
+    REFERENCING OLD TABLE AS viejas NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION pedidos_pedido_carga();
+
+CREATE OR REPLACE FUNCTION productos_carga() RETURNS trigger AS $$
+BEGIN{acumular(PRODUCTOS, (1, 'nuevas'), (-1, 'viejas'))}
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER productos_carga_update AFTER UPDATE ON productos
+    REFERENCING OLD TABLE AS viejas NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION productos_carga();
+
+-- Carga de los pedidos abiertos que ya existen
+{acumular(LINEAS, (1, 'pedidos_lineapedido')).strip()}
+"""
+
+BORRAR = """
+DROP TRIGGER IF EXISTS pedidos_lineapedido_carga_insert ON pedidos_lineapedido;
+DROP TRIGGER IF EXISTS pedidos_lineapedido_carga_update ON pedidos_lineapedido;
+DROP TRIGGER IF EXISTS pedidos_lineapedido_carga_delete ON pedidos_lineapedido;
+DROP FUNCTION IF EXISTS pedidos_lineapedido_carga();
+DROP TRIGGER IF EXISTS pedidos_pedido_carga_update ON pedidos_pedido;
+DROP FUNCTION IF EXISTS pedidos_pedido_carga();
+DROP TRIGGER IF EXISTS productos_carga_update ON productos;
+DROP FUNCTION IF EXISTS productos_carga();
+DELETE FROM carga_taller;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0014_capacidad_taller'),
+    ]
+
+    operations = [
+        migrations.RunSQL(TRIGGERS, BORRAR),
+    ]
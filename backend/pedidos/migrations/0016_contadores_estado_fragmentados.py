@@ -0,0 +1,112 @@
+# Generated by Django 6.0 on 2026-10-18 09:50
+
+from django.db import migrations, models
+
+
+# Cada estado se reparte en FRAGMENTOS filas: el trigger suma en la fila de su
+# conexión (pg_backend_pid) en vez de en una única fila por estado, que todas
+# las altas de pedidos bloqueaban hasta el commit. Los lectores suman las
+# filas de cada estado. Los grupos se escriben ordenados por estado para que
+# dos sentencias que tocan varios estados bloqueen las filas en el mismo orden.
+FRAGMENTOS = 16
+
+CONTAR = """
+        INSERT INTO pedidos_por_estado (estado, fragmento, cantidad, importe)
+        SELECT estado, pg_backend_pid() % {fragmentos}, SUM(cantidad), SUM(importe)
+        FROM ({{filas}}) cambios
+        GROUP BY estado
+        HAVING SUM(cantidad) <> 0 OR SUM(importe) <> 0
+        ORDER BY estado
+        ON CONFLICT (estado, fragmento)
+        DO UPDATE SET cantidad = pedidos_por_estado.cantidad + EXCLUDED.cantidad,
+                      importe = pedidos_por_estado.importe + EXCLUDED.importe;""".format(fragmentos=FRAGMENTOS)
+
+NUEVAS = "SELECT estado, 1 AS cantidad, total AS importe FROM nuevas"
+VIEJAS = "SELECT estado, -1 AS cantidad, -total AS importe FROM viejas"
+
+CAMBIOS = """
+        INSERT INTO eventos_pedido (pedido_id, estado_anterior, estado, fecha)
+        SELECT n.id, v.estado, n.estado, now()
+        FROM nuevas n
+        JOIN viejas v ON v.id = n.id
+        WHERE n.estado <> v.estado;"""
+
+ALTAS = """
+        INSERT INTO eventos_pedido (pedido_id, estado_anterior, estado, fecha)
+        SELECT id, '', estado, now() FROM nuevas;"""
+
+FUNCION = """
+CREATE OR REPLACE FUNCTION pedidos_pedido_estado() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN{insertar}{altas}
+    ELSIF TG_OP = 'DELETE' THEN{borrar}
+    ELSE{actualizar}{cambios}
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+TRIGGER = FUNCION.format(
+    insertar=CONTAR.format(filas=NUEVAS),
+    borrar=CONTAR.format(filas=VIEJAS),
+    actualizar=CONTAR.format(filas=NUEVAS + ' UNION ALL ' + VIEJAS),
+    altas=ALTAS, cambios=CAMBIOS,
+)
+
+# Versión de la migración 0013, con una fila por estado. Antes de volver a
+# ella se juntan los fragmentos en el 0 para poder restaurar el unique.
+CONTAR_ANTERIOR = """
+        INSERT INTO pedidos_por_estado (estado, cantidad, importe)
+        SELECT estado, SUM(cantidad), SUM(importe)
+        FROM ({filas}) cambios
+        GROUP BY estado
+        HAVING SUM(cantidad) <> 0 OR SUM(importe) <> 0
+        ON CONFLICT (estado)
+        DO UPDATE SET cantidad = pedidos_por_estado.cantidad + EXCLUDED.cantidad,
+                      importe = pedidos_por_estado.importe + EXCLUDED.importe;"""
+
+TRIGGER_ANTERIOR = FUNCION.format(
+    insertar=CONTAR_ANTERIOR.format(filas=NUEVAS),
+    borrar=CONTAR_ANTERIOR.format(filas=VIEJAS),
+    actualizar=CONTAR_ANTERIOR.format(filas=NUEVAS + ' UNION ALL ' + VIEJAS),
+    altas=ALTAS, cambios=CAMBIOS,
+) + """
+INSERT INTO pedidos_por_estado (estado, fragmento, cantidad, importe)
+SELECT DISTINCT estado, 0, 0, 0 FROM pedidos_por_estado
+ON CONFLICT (estado, fragmento) DO NOTHING;
+
+UPDATE pedidos_por_estado c SET cantidad = s.cantidad, importe = s.importe
+FROM (
+    SELECT estado, SUM(cantidad) AS cantidad, SUM(importe) AS importe
+    FROM pedidos_por_estado GROUP BY estado
+) s
+WHERE c.estado = s.estado AND c.fragmento = 0;
+
+DELETE FROM pedidos_por_estado WHERE fragmento <> 0;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0015_triggers_carga_taller'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contadorestadopedido',
+            name='fragmento',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Fragmento'),
+        ),
+        migrations.AlterField(
+            model_name='contadorestadopedido',
+            name='estado',
+            field=models.CharField(choices=[('pendiente', 'Pendiente'), ('en_produccion', 'En Producción'), ('producido', 'Producido'), ('entregado', 'Entregado'), ('cancelado', 'Cancelado')], max_length=20, verbose_name='Estado'),
+        ),
+        migrations.AddConstraint(
+            model_name='contadorestadopedido',
+            constraint=models.UniqueConstraint(fields=('estado', 'fragmento'), name='pedidos_por_estado_fragmento_unico'),
+        ),
+        migrations.RunSQL(TRIGGER, TRIGGER_ANTERIOR),
+    ]
@@ -0,0 +1,127 @@
+# Generated by Django 6.0 on 2026-10-18 10:10
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+# Filas de las líneas, pedidos y productos cambiados, como en la migración 0012
+ventas = import_module('pedidos.migrations.0012_triggers_ventas')
+
+
+# Como pedidos_por_estado (migración 0016): cada grupo de ventas_diarias se
+# reparte en FRAGMENTOS filas y los triggers suman en la de su conexión. Con
+# una fila por grupo, todas las altas de líneas del día esperaban por la fila
+# 'total' de (hoy, 'pendiente') hasta el commit de la anterior. Los grupos se
+# escriben ordenados para que dos sentencias bloqueen sus filas en el mismo
+# orden; resumen_ventas y recalcular_ventas suman los fragmentos.
+FRAGMENTOS = 16
+
+ACUMULAR = """
+        INSERT INTO ventas_diarias
+            (dimension, fragmento, fecha, estado, producto_id, modelo_id, cliente_id, lineas, unidades, importe)
+        SELECT CASE WHEN GROUPING(producto_id) = 0 THEN 'producto'
+                    WHEN GROUPING(modelo_id) = 0 THEN 'modelo'
+                    WHEN GROUPING(cliente_id) = 0 THEN 'cliente'
+                    ELSE 'total' END,
+               pg_backend_pid() % {fragmentos}, fecha, estado, producto_id, modelo_id, cliente_id,
+               SUM(lineas), SUM(unidades), SUM(importe)
+        FROM ({{filas}}
+        ) cambios
+        GROUP BY GROUPING SETS (
+            (fecha, estado), (fecha, estado, producto_id), (fecha, estado, modelo_id), (fecha, estado, cliente_id)
+        )
+        HAVING SUM(lineas) <> 0 OR SUM(unidades) <> 0 OR SUM(importe) <> 0
+        ORDER BY 1, fecha, estado, producto_id, modelo_id, cliente_id
+        ON CONFLICT (dimension, fragmento, fecha, estado, producto_id, modelo_id, cliente_id)
+        DO UPDATE SET lineas = ventas_diarias.lineas + EXCLUDED.lineas,
+                      unidades = ventas_diarias.unidades + EXCLUDED.unidades,
+                      importe = ventas_diarias.importe + EXCLUDED.importe;""".format(fragmentos=FRAGMENTOS)
+
+FUNCIONES = """
+CREATE OR REPLACE FUNCTION pedidos_lineapedido_ventas() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN{insertar}
+    ELSIF TG_OP = 'DELETE' THEN{borrar}
+    ELSE{actualizar}
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION pedidos_pedido_ventas() RETURNS trigger AS $$
+BEGIN{pedidos}
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION productos_ventas() RETURNS trigger AS $$
+BEGIN{productos}
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def funciones(acumular):
+    def filas(plantilla, *origenes):
+        return acumular.format(filas='\n            UNION ALL'.join(
+            plantilla.format(signo=signo, origen=origen) for signo, origen in origenes
+        ))
+
+    return FUNCIONES.format(
+        insertar=filas(ventas.LINEAS, (1, 'nuevas')),
+        borrar=filas(ventas.LINEAS, (-1, 'viejas')),
+        actualizar=filas(ventas.LINEAS, (1, 'nuevas'), (-1, 'viejas')),
+        pedidos=filas(ventas.PEDIDOS, (1, 'nuevas'), (-1, 'viejas')),
+        productos=filas(ventas.PRODUCTOS, (1, 'nuevas'), (-1, 'viejas')),
+    )
+
+
+TRIGGERS = funciones(ACUMULAR)
+
+# Vuelta a la migración 0012: los fragmentos se juntan en el 0 para poder
+# restaurar el unique sin fragmento. Las claves ajenas se comprueban al
+# momento: con comprobaciones diferidas pendientes no se puede alterar la tabla.
+TRIGGERS_ANTERIORES = funciones(ventas.ACUMULAR) + """
+SET CONSTRAINTS ALL IMMEDIATE;
+
+WITH borradas AS (
+    DELETE FROM ventas_diarias WHERE fragmento <> 0
+    RETURNING dimension, fecha, estado, producto_id, modelo_id, cliente_id, lineas, unidades, importe
+)
+INSERT INTO ventas_diarias
+    (dimension, fragmento, fecha, estado, producto_id, modelo_id, cliente_id, lineas, unidades, importe)
+SELECT dimension, 0, fecha, estado, producto_id, modelo_id, cliente_id, SUM(lineas), SUM(unidades), SUM(importe)
+FROM borradas
+GROUP BY dimension, fecha, estado, producto_id, modelo_id, cliente_id
+ON CONFLICT (dimension, fragmento, fecha, estado, producto_id, modelo_id, cliente_id)
+DO UPDATE SET lineas = ventas_diarias.lineas + EXCLUDED.lineas,
+              unidades = ventas_diarias.unidades + EXCLUDED.unidades,
+              importe = ventas_diarias.importe + EXCLUDED.importe;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0002_version_tabla'),
+        ('pedidos', '0016_contadores_estado_fragmentados'),
+        ('stock', '0015_version_tabla_a_comun'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='ventadiaria',
+            name='venta_diaria_unica',
+        ),
+        migrations.AddField(
+            model_name='ventadiaria',
+            name='fragmento',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddConstraint(
+            model_name='ventadiaria',
+            constraint=models.UniqueConstraint(fields=('dimension', 'fragmento', 'fecha', 'estado', 'producto', 'modelo', 'cliente'), name='venta_diaria_fragmento_unica', nulls_distinct=False),
+        ),
+        migrations.RunSQL(TRIGGERS, TRIGGERS_ANTERIORES),
+    ]
@@ -0,0 +1,106 @@
+# Generated by Django 6.0 on 2026-10-18 10:30
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+# Filas de las líneas, pedidos y productos cambiados, como en la migración 0015
+carga = import_module('pedidos.migrations.0015_triggers_carga_taller')
+
+
+# Como ventas_diarias (migración 0017): cada día de carga_taller se reparte en
+# FRAGMENTOS filas y los triggers suman en la de su conexión. Con una fila por
+# fecha de entrega, dos altas de pedidos para el mismo día esperaban una por
+# otra hasta el commit. fecha_entrega_posible y recalcular_carga suman los
+# fragmentos.
+FRAGMENTOS = 16
+
+ACUMULAR = """
+        INSERT INTO carga_taller (fecha, fragmento, horas)
+        SELECT fecha, pg_backend_pid() % {fragmentos}, SUM(horas)
+        FROM ({{filas}}
+        ) cambios
+        GROUP BY fecha
+        HAVING SUM(horas) <> 0
+        ORDER BY fecha
+        ON CONFLICT (fecha, fragmento)
+        DO UPDATE SET horas = carga_taller.horas + EXCLUDED.horas;""".format(fragmentos=FRAGMENTOS)
+
+FUNCIONES = """
+CREATE OR REPLACE FUNCTION pedidos_lineapedido_carga() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN{insertar}
+    ELSIF TG_OP = 'DELETE' THEN{borrar}
+    ELSE{actualizar}
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION pedidos_pedido_carga() RETURNS trigger AS $$
+BEGIN{pedidos}
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION productos_carga() RETURNS trigger AS $$
+BEGIN{productos}
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def funciones(acumular):
+    def filas(plantilla, *origenes):
+        return acumular.format(filas='\n            UNION ALL'.join(
+            plantilla.format(signo=signo, origen=origen) for signo, origen in origenes
+        ))
+
+    return FUNCIONES.format(
+        insertar=filas(carga.LINEAS, (1, 'nuevas')),
+        borrar=filas(carga.LINEAS, (-1, 'viejas')),
+        actualizar=filas(carga.LINEAS, (1, 'nuevas'), (-1, 'viejas')),
+        pedidos=filas(carga.PEDIDOS, (1, 'nuevas'), (-1, 'viejas')),
+        productos=filas(carga.PRODUCTOS, (1, 'nuevas'), (-1, 'viejas')),
+    )
+
+
+TRIGGERS = funciones(ACUMULAR)
+
+# Vuelta a la migración 0015: los fragmentos se juntan en el 0 para poder
+# restaurar el unique de la fecha
+TRIGGERS_ANTERIORES = funciones(carga.ACUMULAR) + """
+WITH borradas AS (
+    DELETE FROM carga_taller WHERE fragmento <> 0 RETURNING fecha, horas
+)
+INSERT INTO carga_taller (fecha, fragmento, horas)
+SELECT fecha, 0, SUM(horas) FROM borradas GROUP BY fecha
+ON CONFLICT (fecha, fragmento)
+DO UPDATE SET horas = carga_taller.horas + EXCLUDED.horas;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0017_ventas_fragmentadas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cargataller',
+            name='fragmento',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Fragmento'),
+        ),
+        migrations.AlterField(
+            model_name='cargataller',
+            name='fecha',
+            field=models.DateField(verbose_name='Fecha de entrega'),
+        ),
+        migrations.AddConstraint(
+            model_name='cargataller',
+            constraint=models.UniqueConstraint(fields=('fecha', 'fragmento'), name='carga_taller_fragmento_unica'),
+        ),
+        migrations.RunSQL(TRIGGERS, TRIGGERS_ANTERIORES),
+    ]
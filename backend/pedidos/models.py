@@ -1,6 +1,7 @@
 from django.db import models
+from django.utils import timezone
 from clientes.models import Cliente
-from stock.models import Producto
+from stock.models import ModeloProducto, Producto
 
 class Pedido(models.Model):
     ESTADOS = [
@@ -11,6 +12,15 @@ class Pedido(models.Model):
         ('cancelado', 'Cancelado'),
     ]
     
+    # Cambios de estado permitidos (services.cambiar_estado)
+    TRANSICIONES = {
+        'pendiente': ('en_produccion', 'cancelado'),
+        'en_produccion': ('pendiente', 'producido', 'cancelado'),
+        'producido': ('en_produccion', 'entregado', 'cancelado'),
+        'entregado': (),
+        'cancelado': (),
+    }
+    
     numero_pedido = models.CharField(max_length=20, unique=True, verbose_name="Número de pedido")
     cliente = models.ForeignKey(Cliente, on_delete=models.PROTECT, verbose_name="Cliente")
     fecha_pedido = models.DateField(auto_now_add=True, verbose_name="Fecha de pedido")
@@ -19,20 +29,56 @@ class Pedido(models.Model):
     observaciones = models.TextField(blank=True, verbose_name="Observaciones")
     total = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name="Total")
     
+    # Resumen para el listado, mantenido por triggers (migración 0008): el
+    # listado lee solo esta tabla, sin join con clientes ni con las líneas
+    cliente_nombre = models.CharField(max_length=200, default='', editable=False, verbose_name="Cliente")
+    num_lineas = models.IntegerField(default=0, editable=False, verbose_name="Líneas")
+    unidades = models.IntegerField(default=0, editable=False, verbose_name="Unidades")
+    resumen_productos = models.CharField(max_length=255, default='', editable=False, verbose_name="Productos")
+    
+    # Columnas que escribe la base de datos y que save() nunca sobrescribe
+    CAMPOS_CALCULADOS = ('total', 'cliente_nombre', 'num_lineas', 'unidades', 'resumen_productos')
+    
     class Meta:
         verbose_name = 'Pedido'
         verbose_name_plural = 'Pedidos'
         ordering = ['-fecha_pedido']
+        indexes = [
+            # Paginación por cursor: un índice (campo, id) por ordenación admitida
+            models.Index(fields=['fecha_pedido', 'id'], name='pedido_fecha_id_idx'),
+            models.Index(fields=['fecha_entrega_estimada', 'id'], name='pedido_entrega_id_idx'),
+            models.Index(fields=['estado', 'id'], name='pedido_estado_id_idx'),
+        ]
     
     def __str__(self):
-        return f"Pedido {self.numero_pedido} - {self.cliente.nombre}"
+        return f"Pedido {self.numero_pedido} - {self.cliente_nombre}"
+    
+    def save(self, *args, **kwargs):
+        """
+        Un pedido nuevo sin número recibe el siguiente de su serie
+        (services.asignar_numero_pedido).
+        
+        El total y el resumen los mantienen los triggers de las líneas
+        (migraciones 0004 y 0008) con total = total + delta. Al guardar un
+        pedido existente no se escriben los CAMPOS_CALCULADOS que haya en
+        memoria, que podrían pisar cambios de otras líneas.
+        """
+        if self._state.adding and not self.numero_pedido:
+            from .services import asignar_numero_pedido
+            self.numero_pedido = asignar_numero_pedido()
+        if not self._state.adding and self.pk is not None and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.CAMPOS_CALCULADOS
+            ]
+        super().save(*args, **kwargs)
     
     def calcular_total(self):
-        """Calcula el total del pedido sumando las líneas"""
-        total = sum(linea.subtotal for linea in self.lineas.all())
-        self.total = total
-        self.save()
-        return total
+        """Recalcula el total desde las líneas en base de datos (ver conciliar_totales)"""
+        from .services import conciliar_totales
+        conciliar_totales(self.pk, self.pk)
+        self.refresh_from_db(fields=['total'])
+        return self.total
 
 
 class LineaPedido(models.Model):
@@ -50,8 +96,217 @@ class LineaPedido(models.Model):
         return f"{self.producto.nombre} x{self.cantidad}"
     
     def save(self, *args, **kwargs):
-        """Calcula el subtotal automáticamente"""
+        """Calcula el subtotal automáticamente (el total del pedido lo ajusta un trigger)"""
         self.subtotal = self.cantidad * self.precio_unitario
         super().save(*args, **kwargs)
-        # Actualizar total del pedido
-        self.pedido.calcular_total()
\ No newline at end of file
+
+# ========================================
+# RESERVAS DE STOCK
+# ========================================
+
+class ReservaStock(models.Model):
+    """
+    Unidades de un producto reservadas para un pedido confirmado, para su
+    fecha de entrega. Se crean al confirmar el pedido y se liberan al
+    cancelarlo o se consumen (salida de stock) al entregarlo; ver services.py.
+    """
+    pedido = models.ForeignKey(Pedido, on_delete=models.CASCADE, related_name='reservas', verbose_name="Pedido")
+    producto = models.ForeignKey(Producto, on_delete=models.PROTECT, related_name='reservas_pedido',
+                                 verbose_name="Producto")
+    fecha = models.DateField(verbose_name="Fecha de entrega")
+    cantidad = models.IntegerField(verbose_name="Cantidad")
+    
+    class Meta:
+        db_table = 'reservas_stock'
+        verbose_name = 'Reserva de stock'
+        verbose_name_plural = 'Reservas de stock'
+        constraints = [
+            models.UniqueConstraint(fields=['pedido', 'producto'], name='reserva_pedido_producto_unica'),
+        ]
+    
+    def __str__(self):
+        return f"{self.pedido_id} - {self.producto_id} x{self.cantidad}"
+
+
+class ReservaProducto(models.Model):
+    """
+    Total reservado de cada producto por fecha de entrega. Lo mantienen
+    triggers por sentencia en reservas_stock (migración 0006), así que la
+    disponibilidad se calcula sin recorrer pedidos ni líneas.
+    """
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='reservas_fecha',
+                                 verbose_name="Producto")
+    fecha = models.DateField(verbose_name="Fecha de entrega")
+    cantidad = models.IntegerField(default=0, verbose_name="Cantidad reservada")
+    
+    class Meta:
+        db_table = 'reservas_producto'
+        verbose_name = 'Reserva por producto y fecha'
+        verbose_name_plural = 'Reservas por producto y fecha'
+        constraints = [
+            models.UniqueConstraint(fields=['producto', 'fecha'], name='reserva_producto_fecha_unica'),
+        ]
+    
+    def __str__(self):
+        return f"{self.producto_id} {self.fecha}: {self.cantidad}"
+
+
+# ========================================
+# ESTADOS
+# ========================================
+
+class EventoPedido(models.Model):
+    """
+    Cambio de estado de un pedido. Lo escribe un trigger por sentencia en
+    pedidos_pedido (migración 0010): una fila por pedido cuyo estado cambia,
+    venga el cambio de la API, del admin o de un UPDATE masivo. El alta de un
+    pedido se registra con estado_anterior vacío.
+    """
+    pedido = models.ForeignKey(Pedido, on_delete=models.CASCADE, related_name='eventos', verbose_name="Pedido")
+    estado_anterior = models.CharField(max_length=20, blank=True, verbose_name="Estado anterior")
+    estado = models.CharField(max_length=20, choices=Pedido.ESTADOS, verbose_name="Estado")
+    fecha = models.DateTimeField(default=timezone.now, verbose_name="Fecha")
+    
+    class Meta:
+        db_table = 'eventos_pedido'
+        verbose_name = 'Cambio de estado'
+        verbose_name_plural = 'Cambios de estado'
+        ordering = ['-fecha', '-id']
+        indexes = [
+            models.Index(fields=['pedido', 'fecha'], name='evento_pedido_fecha_idx'),
+            models.Index(fields=['estado', 'fecha'], name='evento_estado_fecha_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.pedido_id}: {self.estado_anterior or '-'} -> {self.estado}"
+
+
+class ContadorEstadoPedido(models.Model):
+    """
+    Número de pedidos en cada estado y la suma de sus totales, mantenidos por
+    el mismo trigger que escribe los eventos (migraciones 0010, 0013 y 0016): los
+    recuentos por estado se leen sin recorrer pedidos.
+    
+    Cada estado se reparte en varias filas (`fragmento`, según la conexión que
+    escribe) y el recuento es su suma: dos altas o cambios de estado
+    concurrentes casi nunca esperan por la misma fila hasta el commit.
+    """
+    estado = models.CharField(max_length=20, choices=Pedido.ESTADOS, verbose_name="Estado")
+    fragmento = models.PositiveSmallIntegerField(default=0, verbose_name="Fragmento")
+    cantidad = models.IntegerField(default=0, verbose_name="Pedidos")
+    importe = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name="Importe")
+    
+    class Meta:
+        db_table = 'pedidos_por_estado'
+        verbose_name = 'Pedidos por estado'
+        verbose_name_plural = 'Pedidos por estado'
+        constraints = [
+            models.UniqueConstraint(fields=['estado', 'fragmento'], name='pedidos_por_estado_fragmento_unico'),
+        ]
+    
+    def __str__(self):
+        return f"{self.estado}/{self.fragmento}: {self.cantidad}"
+
+
+# ========================================
+# VENTAS
+# ========================================
+
+class VentaDiaria(models.Model):
+    """
+    Líneas, unidades e importe de las líneas de pedido agregados por fecha del
+    pedido y estado, y además por producto, por modelo o por cliente según la
+    `dimension` (en 'total' los tres van a NULL).
+
+    Lo mantienen triggers por sentencia (migración 0012) con la diferencia
+    entre las filas nuevas y las viejas: en las líneas, en los pedidos cuando
+    cambian de estado, fecha o cliente, y en los productos cuando cambian de
+    modelo. `services.recalcular_ventas` lo reconstruye por tramos de fechas.
+
+    Cada grupo se reparte en varias filas (`fragmento`, según la conexión que
+    escribe, migración 0017) y sus cifras son la suma: dos altas de pedidos
+    del mismo día no esperan por la misma fila 'total' hasta el commit.
+    """
+    DIMENSIONES = [
+        ('total', 'Total'),
+        ('producto', 'Producto'),
+        ('modelo', 'Modelo'),
+        ('cliente', 'Cliente'),
+    ]
+    
+    dimension = models.CharField(max_length=10, choices=DIMENSIONES)
+    fragmento = models.PositiveSmallIntegerField(default=0)
+    fecha = models.DateField()
+    estado = models.CharField(max_length=20, choices=Pedido.ESTADOS)
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, null=True, blank=True)
+    modelo = models.ForeignKey(ModeloProducto, on_delete=models.CASCADE, null=True, blank=True)
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, null=True, blank=True)
+    lineas = models.IntegerField(default=0)
+    unidades = models.BigIntegerField(default=0)
+    importe = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    
+    class Meta:
+        db_table = 'ventas_diarias'
+        verbose_name = 'Venta diaria'
+        verbose_name_plural = 'Ventas diarias'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dimension', 'fragmento', 'fecha', 'estado', 'producto', 'modelo', 'cliente'],
+                nulls_distinct=False,
+                name='venta_diaria_fragmento_unica',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.dimension} {self.fecha} {self.estado}: {self.importe}"
+
+
+# ========================================
+# CAPACIDAD DEL TALLER
+# ========================================
+
+class CapacidadTaller(models.Model):
+    """
+    Horas de taller de un día concreto (festivos, horas extra...). Los días
+    sin fila tienen las horas de su día de la semana en settings.TALLER.
+    """
+    fecha = models.DateField(unique=True, verbose_name="Fecha")
+    horas = models.DecimalField(max_digits=5, decimal_places=2, verbose_name="Horas disponibles")
+    motivo = models.CharField(max_length=200, blank=True, verbose_name="Motivo")
+    
+    class Meta:
+        db_table = 'capacidad_taller'
+        verbose_name = 'Capacidad del taller'
+        verbose_name_plural = 'Calendario del taller'
+        ordering = ['fecha']
+    
+    def __str__(self):
+        return f"{self.fecha}: {self.horas} h"
+
+
+class CargaTaller(models.Model):
+    """
+    Horas de fabricación (cantidad x Producto.tiempo_fabricacion) de los
+    pedidos abiertos, por fecha de entrega. Lo mantienen triggers por sentencia
+    en las líneas, en los pedidos (estado y fecha de entrega) y en los
+    productos (tiempo de fabricación), ver migración 0015: el cálculo de plazos
+    lee unas pocas filas por día en lugar de recorrer los pedidos pendientes.
+
+    Cada día se reparte en varias filas (`fragmento`, según la conexión que
+    escribe, migración 0018) y su carga es la suma: dos pedidos con la misma
+    fecha de entrega no esperan por la misma fila hasta el commit.
+    """
+    fecha = models.DateField(verbose_name="Fecha de entrega")
+    fragmento = models.PositiveSmallIntegerField(default=0, verbose_name="Fragmento")
+    horas = models.BigIntegerField(default=0, verbose_name="Horas de fabricación")
+    
+    class Meta:
+        db_table = 'carga_taller'
+        verbose_name = 'Carga del taller'
+        verbose_name_plural = 'Carga del taller'
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'fragmento'], name='carga_taller_fragmento_unica'),
+        ]
+    
+    def __str__(self):
+        return f"{self.fecha}/{self.fragmento}: {self.horas} h"
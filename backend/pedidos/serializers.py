@@ -1,7 +1,20 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Prefetch
 from rest_framework import serializers
-from .models import Pedido, LineaPedido
+from .models import Pedido, LineaPedido, CapacidadTaller
 from clientes.serializers import ClienteSerializer
+from stock.models import Producto
 from stock.serializers import ProductoSerializer
+from .services import (
+    asignar_numero_pedido, numeracion_sin_huecos,
+    reservar_pedido, liberar_reservas, consumir_reservas, ReservaError,
+)
+from .signals import pedidos_cambiados
+
+# Límite de los importes (DecimalField de 10 dígitos con 2 decimales)
+MAXIMO_IMPORTE = Decimal('1e8')
 
 class LineaPedidoSerializer(serializers.ModelSerializer):
     producto_nombre = serializers.CharField(source='producto.nombre', read_only=True)
@@ -12,13 +25,23 @@ class LineaPedidoSerializer(serializers.ModelSerializer):
         fields = ['id', 'producto', 'producto_nombre', 'producto_codigo', 'cantidad', 'precio_unitario', 'subtotal']
         read_only_fields = ('subtotal',)
 
+class LineaPedidoSueltaSerializer(LineaPedidoSerializer):
+    """Línea de /api/lineas-pedido/: indica además su pedido"""
+    
+    class Meta(LineaPedidoSerializer.Meta):
+        fields = ['pedido'] + LineaPedidoSerializer.Meta.fields
+
 class PedidoListSerializer(serializers.ModelSerializer):
-    """Serializer para listar pedidos (sin detalles de líneas)"""
-    cliente_nombre = serializers.CharField(source='cliente.nombre', read_only=True)
+    """
+    Serializer para listar pedidos (sin detalles de líneas). El nombre del
+    cliente y el resumen de líneas son columnas del propio pedido que mantienen
+    los triggers, así que el listado es una sola consulta sin joins.
+    """
     
     class Meta:
         model = Pedido
-        fields = ['id', 'numero_pedido', 'cliente', 'cliente_nombre', 'fecha_pedido', 'fecha_entrega_estimada', 'estado', 'total']
+        fields = ['id', 'numero_pedido', 'cliente', 'cliente_nombre', 'fecha_pedido', 'fecha_entrega_estimada',
+                  'estado', 'total', 'num_lineas', 'unidades', 'resumen_productos']
 
 class PedidoDetailSerializer(serializers.ModelSerializer):
     """Serializer para ver detalle de un pedido (con líneas)"""
@@ -28,4 +51,144 @@ class PedidoDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = Pedido
         fields = '__all__'
-        read_only_fields = ('total', 'fecha_pedido')
\ No newline at end of file
+        read_only_fields = ('total', 'fecha_pedido')
+
+class LineaPedidoEscrituraSerializer(serializers.Serializer):
+    """Línea dentro de un pedido. Sin precio_unitario se toma el precio de venta del producto."""
+    producto = serializers.IntegerField(min_value=1)
+    cantidad = serializers.IntegerField(min_value=1)
+    precio_unitario = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False)
+
+
+class PedidoEscrituraSerializer(serializers.ModelSerializer):
+    """
+    Alta y modificación de un pedido con sus líneas en una sola petición.
+    Las líneas se insertan con un único bulk_create y el trigger de las líneas
+    suma su total una vez, todo en una transacción: el número de consultas no
+    depende del número de líneas. Al modificar, si se envían "lineas"
+    sustituyen a las anteriores.
+    
+    numero_pedido lo asigna siempre el servidor (services.asignar_numero_pedido).
+    Los cambios de estado siguen Pedido.TRANSICIONES; para muchos pedidos a la
+    vez está services.cambiar_estado.
+    """
+    lineas = LineaPedidoEscrituraSerializer(many=True, required=False)
+    
+    class Meta:
+        model = Pedido
+        fields = ['id', 'numero_pedido', 'cliente', 'fecha_entrega_estimada', 'estado', 'observaciones',
+                  'total', 'lineas']
+        read_only_fields = ('numero_pedido', 'total')
+    
+    def validate_estado(self, estado):
+        """
+        Un pedido nuevo empieza siempre en 'pendiente'; al modificar, solo los
+        cambios de Pedido.TRANSICIONES. update() lo vuelve a comprobar con la
+        fila bloqueada, por si otra petición ha cambiado el estado entretanto.
+        """
+        if self.instance is None and estado != 'pendiente':
+            raise serializers.ValidationError("Un pedido nuevo empieza en 'pendiente'")
+        if self.instance is not None and estado != self.instance.estado \
+                and estado not in Pedido.TRANSICIONES[self.instance.estado]:
+            raise serializers.ValidationError(
+                f"No se puede pasar de '{self.instance.estado}' a '{estado}'"
+            )
+        return estado
+    
+    def validate_lineas(self, lineas):
+        """Comprueba todos los productos con una consulta y completa precios y subtotales"""
+        ids = {linea['producto'] for linea in lineas}
+        precios = dict(Producto.objects.filter(id__in=ids).values_list('id', 'precio_venta'))
+        inexistentes = sorted(ids - set(precios))
+        if inexistentes:
+            raise serializers.ValidationError(f"Productos inexistentes: {inexistentes}")
+        
+        for linea in lineas:
+            linea.setdefault('precio_unitario', precios[linea['producto']])
+            linea['subtotal'] = linea['cantidad'] * linea['precio_unitario']
+            if linea['subtotal'] >= MAXIMO_IMPORTE:
+                raise serializers.ValidationError("El subtotal de una línea supera el máximo admitido")
+        if sum(linea['subtotal'] for linea in lineas) >= MAXIMO_IMPORTE:
+            raise serializers.ValidationError("El total del pedido supera el máximo admitido")
+        return lineas
+    
+    def _guardar_lineas(self, pedido, lineas):
+        LineaPedido.objects.bulk_create(
+            LineaPedido(pedido=pedido, producto_id=linea['producto'], cantidad=linea['cantidad'],
+                        precio_unitario=linea['precio_unitario'], subtotal=linea['subtotal'])
+            for linea in lineas
+        )
+    
+    def create(self, validated_data):
+        lineas = validated_data.pop('lineas', [])
+        # Sin huecos, el número se reserva en Pedido.save() dentro de la transacción;
+        # si no, antes de abrirla, para no retener el contador de la serie
+        numero = '' if numeracion_sin_huecos() else asignar_numero_pedido()
+        with transaction.atomic():
+            pedido = Pedido.objects.create(numero_pedido=numero, **validated_data)
+            self._guardar_lineas(pedido, lineas)
+            pedidos_cambiados.send(sender=Pedido, pedido_ids=[pedido.id])
+        return pedido
+    
+    def update(self, instance, validated_data):
+        lineas = validated_data.pop('lineas', None)
+        with transaction.atomic():
+            # Se relee el pedido con FOR UPDATE: un cambio de estado concurrente
+            # (p. ej. services.cambiar_estado) espera o ya se ve aquí
+            instance.refresh_from_db(from_queryset=Pedido.objects.select_for_update())
+            estado_anterior, fecha_anterior = instance.estado, instance.fecha_entrega_estimada
+            estado = validated_data.get('estado', estado_anterior)
+            if estado != estado_anterior and estado not in Pedido.TRANSICIONES[estado_anterior]:
+                raise serializers.ValidationError(
+                    {'estado': [f"No se puede pasar de '{estado_anterior}' a '{estado}'"]}
+                )
+            if lineas is not None:
+                instance.lineas.all().delete()
+                self._guardar_lineas(instance, lineas)
+            for campo, valor in validated_data.items():
+                setattr(instance, campo, valor)
+            instance.save()
+            self._sincronizar_reservas(instance, estado_anterior, fecha_anterior, lineas is not None)
+            if lineas is not None or instance.estado != estado_anterior \
+                    or instance.fecha_entrega_estimada != fecha_anterior:
+                pedidos_cambiados.send(sender=Pedido, pedido_ids=[instance.id])
+        return instance
+    
+    def _sincronizar_reservas(self, pedido, estado_anterior, fecha_anterior, lineas_cambiadas):
+        """
+        Al cancelar se liberan las reservas y al entregar se consumen. Si el
+        pedido tiene reservas y cambian sus líneas se vuelven a reservar; si
+        cambia la fecha de entrega se mueven a la nueva fecha.
+        """
+        if pedido.estado != estado_anterior and pedido.estado == 'cancelado':
+            liberar_reservas([pedido.id])
+        elif pedido.estado != estado_anterior and pedido.estado == 'entregado':
+            consumir_reservas([pedido.id])
+        elif (lineas_cambiadas or pedido.fecha_entrega_estimada != fecha_anterior) and pedido.reservas.exists():
+            if lineas_cambiadas:
+                try:
+                    reservar_pedido(pedido.id)
+                except ReservaError as e:
+                    raise serializers.ValidationError({'lineas': str(e), 'faltantes': e.faltantes})
+            else:
+                pedido.reservas.update(fecha=pedido.fecha_entrega_estimada)
+    
+    def to_representation(self, instance):
+        """Devuelve el pedido como el detalle (con líneas), leído con consultas fijas"""
+        pedido = Pedido.objects.select_related('cliente').prefetch_related(
+            Prefetch('lineas', queryset=LineaPedido.objects.select_related('producto'))
+        ).get(pk=instance.pk)
+        return PedidoDetailSerializer(pedido, context=self.context).data
+
+
+class CapacidadTallerSerializer(serializers.ModelSerializer):
+    """Horas de taller de un día concreto (el resto de días, las de settings.TALLER)"""
+    
+    class Meta:
+        model = CapacidadTaller
+        fields = ['id', 'fecha', 'horas', 'motivo']
+    
+    def validate_horas(self, horas):
+        if horas < 0 or horas > 24:
+            raise serializers.ValidationError("Las horas deben estar entre 0 y 24")
+        return horas
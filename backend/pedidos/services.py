@@ -0,0 +1,874 @@
+"""
+Servicios de pedidos: operaciones que trabajan directamente con la base de datos
+"""
+import re
+import string
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+from django.db.models import Count, F, Q, Sum, Window
+from django.db.models.functions import Coalesce, RowNumber, Trunc
+from django.utils import timezone
+
+from clientes.models import Cliente
+from comun.condicional import version_listado
+from stock.models import (
+    ContadorAlertaStock, MateriaPrima, MovimientoStock, Producto, SecuenciaCodigo, ValoracionStock,
+)
+from .models import (
+    Pedido, LineaPedido, ReservaStock, ReservaProducto, EventoPedido, ContadorEstadoPedido, VentaDiaria,
+    CapacidadTaller, CargaTaller,
+)
+from .signals import pedidos_cambiados
+
+
+class ReservaError(ValueError):
+    """No se puede reservar el pedido; `faltantes` lista los productos sin stock suficiente"""
+
+    def __init__(self, mensaje, faltantes=None):
+        super().__init__(mensaje)
+        self.faltantes = faltantes or []
+
+
+class PlazoEntregaError(ValueError):
+    """No se puede calcular la fecha de entrega (líneas no válidas o sin capacidad en el horizonte)"""
+
+
+class TransicionError(ValueError):
+    """
+    Cambio de estado no permitido; `rechazados` lista los pedidos cuyo estado
+    no admite el cambio y `no_encontrados` los ids que no existen
+    """
+
+    def __init__(self, mensaje, rechazados=None, no_encontrados=None):
+        super().__init__(mensaje)
+        self.rechazados = rechazados or []
+        self.no_encontrados = no_encontrados or []
+
+
+# ========================================
+# NUMERACIÓN DE PEDIDOS
+# ========================================
+
+def _numeracion():
+    return {'PATRON': '{anio}-{numero:06d}', 'SIN_HUECOS': False,
+            **getattr(settings, 'PEDIDOS_NUMERACION', {})}
+
+
+def _serie(patron, fecha):
+    """
+    Serie del patrón en una fecha, expresión regular que extrae el número de
+    los pedidos de esa serie y formato del número:
+    '{anio}-{numero:06d}' -> ('2026-{}', '^2026-([0-9]+)$', '06d')
+    """
+    serie = []
+    regex = []
+    formato_numero = None
+    for literal, campo, formato, _ in string.Formatter().parse(patron):
+        serie.append(literal.replace('{', '{{').replace('}', '}}'))
+        regex.append(re.escape(literal))
+        if campo == 'numero':
+            formato_numero = formato or ''
+            serie.append('{}')
+            regex.append('([0-9]+)')
+        elif campo == 'anio':
+            valor = format(fecha.year, formato or '')
+            serie.append(valor)
+            regex.append(re.escape(valor))
+        elif campo is not None:
+            raise ImproperlyConfigured(f"PEDIDOS_NUMERACION: campo desconocido {{{campo}}} en el patrón")
+    if formato_numero is None:
+        raise ImproperlyConfigured("PEDIDOS_NUMERACION: el patrón debe incluir {numero}")
+    return ''.join(serie), f"^{''.join(regex)}$", formato_numero
+
+
+def numeracion_sin_huecos():
+    """Indica si el número se reserva dentro de la transacción del alta"""
+    return _numeracion()['SIN_HUECOS']
+
+
+def asignar_numero_pedido(fecha=None):
+    """
+    Reserva el siguiente número de pedido de la serie de `fecha` (hoy por
+    defecto) con el patrón de settings.PEDIDOS_NUMERACION.
+
+    El contador de cada serie es una fila de SecuenciaCodigo: un UPDATE ...
+    RETURNING, sin recorrer la tabla de pedidos ni reintentos. La fila queda
+    bloqueada hasta el fin de la transacción en curso: llamado dentro de la
+    transacción del alta la numeración no tiene huecos; fuera (autocommit) el
+    bloqueo dura lo que el UPDATE.
+    """
+    serie, regex, formato = _serie(_numeracion()['PATRON'], fecha or timezone.localdate())
+    numero = SecuenciaCodigo.objects.reservar(Pedido, serie, campo='numero_pedido', patron=regex)
+    return serie.format(format(numero, formato))
+
+
+# ========================================
+# CONCILIACIÓN DE TOTALES
+# ========================================
+
+def conciliar_totales(desde_id, hasta_id, reparar=True):
+    """
+    Compara el total de los pedidos con id entre desde_id y hasta_id (ambos
+    incluidos) con la suma de sus líneas y, si reparar es True, corrige los
+    que no cuadran. Devuelve la lista de (id, total, calculado) descuadrados.
+
+    Los pedidos del tramo se bloquean antes de sumar las líneas: una escritura
+    de líneas en curso espera a que termine (o la conciliación espera a su
+    commit), así que el total corregido nunca pisa un delta de los triggers.
+    """
+    tabla = connection.ops.quote_name(Pedido._meta.db_table)
+    tabla_lineas = connection.ops.quote_name(LineaPedido._meta.db_table)
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT id FROM {tabla} WHERE id BETWEEN %s AND %s ORDER BY id FOR UPDATE",
+                [desde_id, hasta_id],
+            )
+            cursor.execute(
+                f"""
+                SELECT p.id, p.total, COALESCE(l.suma, 0)
+                FROM {tabla} p
+                LEFT JOIN (
+                    SELECT pedido_id, SUM(subtotal) AS suma
+                    FROM {tabla_lineas}
+                    WHERE pedido_id BETWEEN %(desde)s AND %(hasta)s
+                    GROUP BY pedido_id
+                ) l ON l.pedido_id = p.id
+                WHERE p.id BETWEEN %(desde)s AND %(hasta)s
+                  AND p.total <> COALESCE(l.suma, 0)
+                ORDER BY p.id
+                """,
+                {'desde': desde_id, 'hasta': hasta_id},
+            )
+            descuadres = cursor.fetchall()
+
+            if reparar and descuadres:
+                cursor.execute(
+                    f"""
+                    UPDATE {tabla} p SET total = c.calculado
+                    FROM unnest(%s::bigint[], %s::numeric[]) AS c(id, calculado)
+                    WHERE p.id = c.id
+                    """,
+                    [[fila[0] for fila in descuadres], [fila[2] for fila in descuadres]],
+                )
+    return descuadres
+
+
+def tramos_pedidos(tamano):
+    """Divide los ids de pedido en tramos (desde, hasta) de como mucho `tamano` pedidos"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT MIN(id), MAX(id)
+            FROM (
+                SELECT id, (ROW_NUMBER() OVER (ORDER BY id) - 1) / %s AS tramo
+                FROM {connection.ops.quote_name(Pedido._meta.db_table)}
+            ) t
+            GROUP BY tramo
+            ORDER BY tramo
+            """,
+            [tamano],
+        )
+        return cursor.fetchall()
+
+
+# ========================================
+# RESERVAS DE STOCK
+# ========================================
+
+ESTADOS_CERRADOS = ('entregado', 'cancelado')
+
+
+def _tabla(model):
+    return connection.ops.quote_name(model._meta.db_table)
+
+
+def _bloquear_productos(cursor, subconsulta, parametros):
+    """Bloquea en orden de id los productos de la subconsulta (evita interbloqueos)"""
+    cursor.execute(
+        f"SELECT id FROM {_tabla(Producto)} WHERE id IN ({subconsulta}) ORDER BY id FOR UPDATE",
+        parametros,
+    )
+
+
+def reservar_pedido(pedido_id, forzar=False):
+    """
+    Reserva el stock de las líneas del pedido (una fila por producto) para su
+    fecha de entrega, sustituyendo las reservas que tuviera.
+
+    Se bloquean los productos del pedido y se compara lo pedido con el stock
+    disponible (stock_actual menos todo lo reservado, leído de
+    reservas_producto). Si falta stock se lanza ReservaError con los
+    productos afectados, salvo con forzar=True, que reserva igualmente.
+    Devuelve la lista de faltantes (vacía si había stock de todo).
+    """
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT estado, fecha_entrega_estimada FROM {_tabla(Pedido)} WHERE id = %s FOR UPDATE",
+                [pedido_id],
+            )
+            fila = cursor.fetchone()
+            if fila is None:
+                raise ReservaError(f"El pedido {pedido_id} no existe")
+            estado, fecha = fila
+            if estado in ESTADOS_CERRADOS:
+                raise ReservaError(f"No se puede reservar un pedido en estado '{estado}'")
+
+            _bloquear_productos(
+                cursor, f"SELECT producto_id FROM {_tabla(LineaPedido)} WHERE pedido_id = %s", [pedido_id]
+            )
+            cursor.execute(f"DELETE FROM {_tabla(ReservaStock)} WHERE pedido_id = %s", [pedido_id])
+            cursor.execute(
+                f"""
+                SELECT n.producto_id, p.codigo, n.cantidad,
+                       p.stock_actual - COALESCE(r.reservado, 0) AS disponible
+                FROM (
+                    SELECT producto_id, SUM(cantidad) AS cantidad
+                    FROM {_tabla(LineaPedido)}
+                    WHERE pedido_id = %s
+                    GROUP BY producto_id
+                ) n
+                JOIN {_tabla(Producto)} p ON p.id = n.producto_id
+                LEFT JOIN (
+                    SELECT producto_id, SUM(cantidad) AS reservado
+                    FROM {_tabla(ReservaProducto)}
+                    GROUP BY producto_id
+                ) r ON r.producto_id = n.producto_id
+                WHERE n.cantidad > p.stock_actual - COALESCE(r.reservado, 0)
+                ORDER BY p.codigo
+                """,
+                [pedido_id],
+            )
+            faltantes = [
+                {'producto': producto, 'codigo': codigo, 'cantidad': cantidad, 'disponible': disponible}
+                for producto, codigo, cantidad, disponible in cursor.fetchall()
+            ]
+            if faltantes and not forzar:
+                raise ReservaError("Stock insuficiente para reservar el pedido", faltantes)
+
+            cursor.execute(
+                f"""
+                INSERT INTO {_tabla(ReservaStock)} (pedido_id, producto_id, fecha, cantidad)
+                SELECT %s, producto_id, %s, SUM(cantidad)
+                FROM {_tabla(LineaPedido)}
+                WHERE pedido_id = %s
+                GROUP BY producto_id
+                HAVING SUM(cantidad) > 0
+                """,
+                [pedido_id, fecha, pedido_id],
+            )
+    return faltantes
+
+
+def resincronizar_reservas(pedido_ids):
+    """
+    Vuelve a reservar, con sus líneas actuales, los pedidos de la lista que
+    tienen reservas (tras cambiar líneas sueltas fuera de PedidoEscrituraSerializer).
+    Lanza ReservaError, como reservar_pedido, si ya no hay stock para alguno.
+    """
+    with transaction.atomic():
+        reservados = ReservaStock.objects.filter(pedido_id__in=pedido_ids).values_list('pedido_id', flat=True)
+        for pedido_id in sorted(set(reservados)):
+            reservar_pedido(pedido_id)
+
+
+def liberar_reservas(pedido_ids):
+    """Borra las reservas de los pedidos con un único DELETE. Devuelve las filas borradas."""
+    borradas, _ = ReservaStock.objects.filter(pedido_id__in=pedido_ids).delete()
+    return borradas
+
+
+def consumir_reservas(pedido_ids):
+    """
+    Da salida del stock reservado por los pedidos (entregados): un movimiento
+    'venta' por reserva con el número de pedido como referencia, el stock_actual
+    de cada producto reducido en lo reservado y las reservas borradas.
+    Tras bloquear los productos es una sola sentencia, sea cual sea el número
+    de pedidos. Devuelve el número de reservas consumidas.
+    """
+    pedido_ids = list(pedido_ids)
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            _bloquear_productos(
+                cursor, f"SELECT producto_id FROM {_tabla(ReservaStock)} WHERE pedido_id = ANY(%s)", [pedido_ids]
+            )
+            cursor.execute(
+                f"""
+                WITH consumidas AS (
+                    DELETE FROM {_tabla(ReservaStock)}
+                    WHERE pedido_id = ANY(%s)
+                    RETURNING pedido_id, producto_id, cantidad
+                ),
+                movimientos AS (
+                    INSERT INTO {_tabla(MovimientoStock)} (tipo, producto_id, cantidad, fecha, referencia)
+                    SELECT 'venta', c.producto_id, -c.cantidad, now(), p.numero_pedido
+                    FROM consumidas c
+                    JOIN {_tabla(Pedido)} p ON p.id = c.pedido_id
+                ),
+                stock AS (
+                    UPDATE {_tabla(Producto)} t
+                    SET stock_actual = t.stock_actual - s.cantidad
+                    FROM (SELECT producto_id, SUM(cantidad) AS cantidad FROM consumidas GROUP BY producto_id) s
+                    WHERE t.id = s.producto_id
+                )
+                SELECT COUNT(*) FROM consumidas
+                """,
+                [pedido_ids],
+            )
+            return cursor.fetchone()[0]
+
+
+def disponible_para_prometer(fecha, productos=None):
+    """
+    Disponible para prometer por producto, desde reservas_producto (una fila
+    por producto y fecha), sin leer pedidos ni líneas:
+    - reservado: todo lo reservado
+    - proyectado: stock_actual menos lo reservado con entrega hasta `fecha`
+    - disponible: stock_actual menos todo lo reservado, lo que se puede
+      comprometer sin dejar sin stock ninguna reserva posterior
+    Sin `productos` (lista de ids) se devuelven los productos activos.
+    """
+    queryset = Producto.objects.all()
+    if productos is None:
+        queryset = queryset.filter(activo=True)
+    else:
+        queryset = queryset.filter(id__in=productos)
+    filas = queryset.annotate(
+        reservado=Coalesce(Sum('reservas_fecha__cantidad'), 0),
+        reservado_a_fecha=Coalesce(Sum('reservas_fecha__cantidad', filter=Q(reservas_fecha__fecha__lte=fecha)), 0),
+    ).values('id', 'codigo', 'nombre', 'stock_actual', 'reservado', 'reservado_a_fecha').order_by('codigo')
+    return [
+        {
+            'id': fila['id'],
+            'codigo': fila['codigo'],
+            'nombre': fila['nombre'],
+            'stock_actual': fila['stock_actual'],
+            'reservado': fila['reservado'],
+            'proyectado': fila['stock_actual'] - fila['reservado_a_fecha'],
+            'disponible': fila['stock_actual'] - fila['reservado'],
+        }
+        for fila in filas
+    ]
+
+
+# ========================================
+# CAMBIOS DE ESTADO
+# ========================================
+
+# Pedidos como máximo por llamada a cambiar_estado
+MAXIMO_CAMBIO_ESTADO = 10000
+
+
+def estados_origen(estado):
+    """Estados desde los que se puede pasar a `estado` según Pedido.TRANSICIONES"""
+    return [origen for origen, destinos in Pedido.TRANSICIONES.items() if estado in destinos]
+
+
+def cambiar_estado(pedido_ids, estado, parcial=False):
+    """
+    Pasa a `estado` los pedidos de `pedido_ids` con una sola sentencia que
+    valida las transiciones (Pedido.TRANSICIONES) y actualiza los válidos. El
+    registro de eventos y los contadores por estado los escribe el trigger de
+    pedidos_pedido (migración 0010), una fila de evento por pedido.
+
+    Si algún pedido no admite el cambio o no existe se lanza TransicionError y
+    no cambia ninguno, salvo con parcial=True, que cambia los válidos.
+    Al cancelar se liberan las reservas de stock y al entregar se consumen.
+    Los pedidos cambiados se notifican con la señal pedidos_cambiados.
+    Devuelve {'cambiados': [...], 'rechazados': [{'id', 'estado'}], 'no_encontrados': [...]}.
+    """
+    if estado not in Pedido.TRANSICIONES:
+        raise TransicionError(f"Estado desconocido: '{estado}'")
+    if not isinstance(pedido_ids, (list, tuple)):
+        raise TransicionError("'ids' debe ser una lista de ids")
+    try:
+        ids = sorted({int(pedido_id) for pedido_id in pedido_ids})
+    except (TypeError, ValueError):
+        raise TransicionError("'ids' debe ser una lista de ids")
+    if len(ids) > MAXIMO_CAMBIO_ESTADO:
+        raise TransicionError(f"Como máximo {MAXIMO_CAMBIO_ESTADO} pedidos por cambio")
+
+    origenes = estados_origen(estado)
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            # Bloqueo en orden de id: dos cambios masivos solapados no se interbloquean
+            cursor.execute(f"SELECT id FROM {_tabla(Pedido)} WHERE id = ANY(%s) ORDER BY id FOR UPDATE", [ids])
+            cursor.execute(
+                f"""
+                WITH solicitados AS (
+                    SELECT id, estado FROM {_tabla(Pedido)} WHERE id = ANY(%(ids)s)
+                ),
+                rechazados AS (
+                    SELECT id, estado FROM solicitados WHERE estado <> ALL(%(origenes)s::varchar[])
+                ),
+                cambiados AS (
+                    UPDATE {_tabla(Pedido)} p
+                    SET estado = %(estado)s
+                    FROM solicitados s
+                    WHERE p.id = s.id
+                      AND s.estado = ANY(%(origenes)s::varchar[])
+                      AND (%(parcial)s OR (
+                          NOT EXISTS (SELECT 1 FROM rechazados)
+                          AND (SELECT COUNT(*) FROM solicitados) = %(total)s
+                      ))
+                    RETURNING p.id
+                )
+                SELECT s.id, s.estado, c.id IS NOT NULL
+                FROM solicitados s
+                LEFT JOIN cambiados c ON c.id = s.id
+                ORDER BY s.id
+                """,
+                {'ids': ids, 'estado': estado, 'origenes': origenes,
+                 'parcial': bool(parcial), 'total': len(ids)},
+            )
+            filas = cursor.fetchall()
+
+        cambiados = [pedido_id for pedido_id, _, cambiado in filas if cambiado]
+        rechazados = [{'id': pedido_id, 'estado': anterior}
+                      for pedido_id, anterior, _ in filas if anterior not in origenes]
+        no_encontrados = sorted(set(ids) - {pedido_id for pedido_id, _, _ in filas})
+        if not parcial and (rechazados or no_encontrados):
+            raise TransicionError(f"No se puede pasar a '{estado}' alguno de los pedidos",
+                                  rechazados, no_encontrados)
+
+        if estado == 'cancelado':
+            liberar_reservas(cambiados)
+        elif estado == 'entregado':
+            consumir_reservas(cambiados)
+        if cambiados:
+            pedidos_cambiados.send(sender=Pedido, pedido_ids=cambiados)
+    return {'cambiados': cambiados, 'rechazados': rechazados, 'no_encontrados': no_encontrados}
+
+
+def pedidos_por_estado(desde=None):
+    """
+    Número de pedidos en cada estado (suma de los fragmentos de
+    pedidos_por_estado, sin recorrer pedidos). Con `desde` (fecha y hora) se
+    añaden los pedidos que han entrado en cada estado desde entonces, contados
+    en eventos_pedido.
+    """
+    cantidades = dict(
+        ContadorEstadoPedido.objects.order_by().values('estado')
+        .annotate(pedidos=Sum('cantidad')).values_list('estado', 'pedidos')
+    )
+    entradas = {}
+    if desde is not None:
+        entradas = dict(
+            EventoPedido.objects.filter(fecha__gte=desde).order_by().values('estado')
+            .annotate(pedidos=Count('pedido', distinct=True)).values_list('estado', 'pedidos')
+        )
+    resultado = []
+    for estado, nombre in Pedido.ESTADOS:
+        fila = {'estado': estado, 'nombre': nombre, 'cantidad': cantidades.get(estado, 0),
+                'siguientes': list(Pedido.TRANSICIONES[estado])}
+        if desde is not None:
+            fila['entradas'] = entradas.get(estado, 0)
+        resultado.append(fila)
+    return resultado
+
+
+# ========================================
+# VENTAS DIARIAS
+# ========================================
+
+# Agregación completa de las líneas de los pedidos con fecha en [%(desde)s, %(hasta)s],
+# con las mismas columnas que mantienen los triggers de la migración 0012
+VENTAS_COMPLETAS = """
+    SELECT CASE WHEN GROUPING(producto_id) = 0 THEN 'producto'
+                WHEN GROUPING(modelo_id) = 0 THEN 'modelo'
+                WHEN GROUPING(cliente_id) = 0 THEN 'cliente'
+                ELSE 'total' END AS dimension,
+           fecha, estado, producto_id, modelo_id, cliente_id,
+           COUNT(*) AS lineas, SUM(unidades) AS unidades, SUM(importe) AS importe
+    FROM (
+        SELECT p.fecha_pedido AS fecha, p.estado, l.producto_id, pr.modelo_id, p.cliente_id,
+               l.cantidad AS unidades, l.subtotal AS importe
+        FROM pedidos_lineapedido l
+        JOIN pedidos_pedido p ON p.id = l.pedido_id
+        JOIN productos pr ON pr.id = l.producto_id
+        WHERE p.fecha_pedido BETWEEN %(desde)s AND %(hasta)s
+    ) lineas
+    GROUP BY GROUPING SETS (
+        (fecha, estado), (fecha, estado, producto_id), (fecha, estado, modelo_id), (fecha, estado, cliente_id)
+    )
+"""
+
+# Agrupaciones y periodos que admite resumen_ventas
+AGRUPACIONES_VENTAS = ('producto', 'modelo', 'cliente', 'estado')
+PERIODOS_VENTAS = ('dia', 'semana', 'mes', 'anio', 'total')
+ORDENES_VENTAS = ('importe', 'unidades', 'lineas')
+
+
+def tramos_ventas(dias):
+    """
+    Divide en tramos (desde, hasta) de `dias` días las fechas de los pedidos
+    y las de ventas_diarias (por si quedan filas de fechas sin pedidos)
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT MIN(fecha), MAX(fecha)
+            FROM (
+                SELECT MIN(fecha_pedido) AS fecha FROM {_tabla(Pedido)}
+                UNION ALL SELECT MAX(fecha_pedido) FROM {_tabla(Pedido)}
+                UNION ALL SELECT MIN(fecha) FROM {_tabla(VentaDiaria)}
+                UNION ALL SELECT MAX(fecha) FROM {_tabla(VentaDiaria)}
+            ) limites
+            """
+        )
+        primera, ultima = cursor.fetchone()
+    tramos = []
+    while primera is not None and primera <= ultima:
+        hasta = min(primera + timedelta(days=dias - 1), ultima)
+        tramos.append((primera, hasta))
+        primera = hasta + timedelta(days=1)
+    return tramos
+
+
+def recalcular_ventas(desde, hasta, reparar=True):
+    """
+    Reconstruye ventas_diarias entre las fechas desde y hasta (ambas
+    incluidas) con una agregación completa de las líneas de esos días, para
+    conciliar si algo se escribió saltándose los triggers. Los fragmentos de
+    cada grupo se comparan sumados y al reparar se juntan en el 0. Si reparar
+    es False solo compara. Devuelve el número de grupos que no cuadraban.
+
+    Bloquea las escrituras de pedidos, líneas y productos mientras dura: los
+    tramos son de fechas distintas y pueden recalcularse a la vez, cada uno en
+    su conexión (los bloqueos SHARE no se excluyen entre sí).
+    """
+    tabla = _tabla(VentaDiaria)
+    columnas = "dimension, fecha, estado, producto_id, modelo_id, cliente_id"
+    parametros = {'desde': desde, 'hasta': hasta}
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"LOCK TABLE {_tabla(LineaPedido)}, {_tabla(Pedido)}, {_tabla(Producto)} IN SHARE MODE"
+            )
+            cursor.execute(f"CREATE TEMP TABLE ventas_calculadas ON COMMIT DROP AS {VENTAS_COMPLETAS}", parametros)
+            cursor.execute(
+                f"""
+                SELECT COUNT(*)
+                FROM (
+                    SELECT {columnas}, SUM(lineas) AS lineas, SUM(unidades) AS unidades, SUM(importe) AS importe
+                    FROM {tabla}
+                    WHERE fecha BETWEEN %(desde)s AND %(hasta)s
+                    GROUP BY {columnas}
+                    HAVING SUM(lineas) <> 0 OR SUM(unidades) <> 0 OR SUM(importe) <> 0
+                ) m
+                FULL JOIN ventas_calculadas c
+                  ON c.dimension = m.dimension AND c.fecha = m.fecha AND c.estado = m.estado
+                 AND c.producto_id IS NOT DISTINCT FROM m.producto_id
+                 AND c.modelo_id IS NOT DISTINCT FROM m.modelo_id
+                 AND c.cliente_id IS NOT DISTINCT FROM m.cliente_id
+                WHERE (m.lineas, m.unidades, m.importe) IS DISTINCT FROM (c.lineas, c.unidades, c.importe)
+                """,
+                parametros,
+            )
+            descuadres = cursor.fetchone()[0]
+
+            if reparar:
+                cursor.execute(f"DELETE FROM {tabla} WHERE fecha BETWEEN %(desde)s AND %(hasta)s", parametros)
+                cursor.execute(
+                    f"""
+                    INSERT INTO {tabla} ({columnas}, fragmento, lineas, unidades, importe)
+                    SELECT {columnas}, 0, lineas, unidades, importe FROM ventas_calculadas
+                    """
+                )
+            # Dentro de una transacción exterior el ON COMMIT no llega en cada tramo
+            cursor.execute("DROP TABLE ventas_calculadas")
+    return descuadres
+
+
+def resumen_ventas(desde, hasta, agrupar=None, periodo='total', estados=None, orden='importe', limite=None):
+    """
+    Ventas entre dos fechas (del pedido, ambas incluidas) leídas de
+    ventas_diarias: el coste depende de los días y de los grupos del
+    intervalo, no del número de líneas.
+
+    - agrupar: None o uno de AGRUPACIONES_VENTAS
+    - periodo: uno de PERIODOS_VENTAS ('total' sin desglose temporal)
+    - estados: estados de pedido que cuentan (por defecto todos menos cancelado)
+    - orden/limite: los `limite` grupos con más `orden` (de cada periodo si
+      se desglosa por periodo)
+
+    Devuelve una fila por periodo y grupo con lineas, unidades e importe.
+    """
+    if estados is None:
+        estados = [estado for estado, _ in Pedido.ESTADOS if estado != 'cancelado']
+    dimension = agrupar if agrupar in ('producto', 'modelo', 'cliente') else 'total'
+    filas = VentaDiaria.objects.filter(dimension=dimension, fecha__range=(desde, hasta), estado__in=estados)
+
+    claves = []
+    if periodo != 'total':
+        filas = filas.annotate(periodo=F('fecha') if periodo == 'dia' else Trunc(
+            'fecha', {'semana': 'week', 'mes': 'month', 'anio': 'year'}[periodo]
+        ))
+        claves.append('periodo')
+    if agrupar == 'estado':
+        claves.append('estado')
+    elif agrupar is not None:
+        claves += [agrupar, f'{agrupar}__nombre']
+
+    totales = {'total_lineas': Sum('lineas'), 'total_unidades': Sum('unidades'), 'total_importe': Sum('importe')}
+    if not claves:
+        # Sin periodo ni agrupación: una sola fila con el total
+        grupos = [filas.aggregate(**totales)]
+    else:
+        grupos = filas.values(*claves).annotate(**totales).filter(total_lineas__gt=0)
+        if periodo != 'total':
+            grupos = grupos.order_by('periodo', f'-total_{orden}')
+            if limite:
+                # Puesto de cada grupo dentro de su periodo
+                grupos = grupos.annotate(puesto=Window(
+                    RowNumber(), partition_by=[F('periodo')], order_by=F(f'total_{orden}').desc(),
+                )).filter(puesto__lte=limite)
+        else:
+            grupos = grupos.order_by(f'-total_{orden}')
+            if limite:
+                grupos = grupos[:limite]
+
+    resultado = []
+    for fila in grupos:
+        datos = {}
+        if periodo != 'total':
+            datos['periodo'] = fila['periodo']
+        if agrupar == 'estado':
+            datos['estado'] = fila['estado']
+        elif agrupar is not None:
+            datos.update(id=fila[agrupar], nombre=fila[f'{agrupar}__nombre'])
+        datos.update(
+            lineas=fila['total_lineas'] or 0,
+            unidades=fila['total_unidades'] or 0,
+            importe=str((fila['total_importe'] or Decimal(0)).quantize(Decimal('0.01'))),
+        )
+        resultado.append(datos)
+    return resultado
+
+
+# ========================================
+# DASHBOARD
+# ========================================
+
+def _calcular_estadisticas():
+    """
+    Todas las cifras del dashboard en una consulta, leídas de los contadores
+    que mantienen los triggers (pedidos_por_estado, contadores_alerta_stock y
+    valoraciones_stock). Solo los clientes se cuentan directamente.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT
+                (SELECT COUNT(*) FROM {_tabla(Cliente)}),
+                (SELECT COUNT(*) FROM {_tabla(Cliente)} WHERE activo),
+                (SELECT COALESCE(SUM(articulos), 0) FROM {_tabla(ValoracionStock)} WHERE ambito = 'productos'),
+                (SELECT COALESCE(SUM(alertas), 0) FROM {_tabla(ContadorAlertaStock)} WHERE ambito = 'productos'),
+                (SELECT COALESCE(SUM(articulos), 0) FROM {_tabla(ValoracionStock)} WHERE ambito = 'materias_primas'),
+                (SELECT COALESCE(SUM(alertas), 0) FROM {_tabla(ContadorAlertaStock)}
+                 WHERE ambito = 'materias_primas'),
+                (SELECT array_agg(ARRAY[estado, cantidad::text, importe::text])
+                 FROM (SELECT estado, SUM(cantidad) AS cantidad, SUM(importe) AS importe
+                       FROM {_tabla(ContadorEstadoPedido)} GROUP BY estado) contadores)
+            """
+        )
+        (clientes, activos, productos, productos_alerta, materias, materias_alerta,
+         contadores) = cursor.fetchone()
+
+    por_estado = {estado: (int(cantidad), Decimal(importe)) for estado, cantidad, importe in contadores or []}
+    pedidos = []
+    for estado, nombre in Pedido.ESTADOS:
+        cantidad, importe = por_estado.get(estado, (0, Decimal(0)))
+        pedidos.append({'estado': estado, 'nombre': nombre, 'cantidad': cantidad,
+                        'importe': str(importe.quantize(Decimal('0.01')))})
+    return {
+        'clientes': {'total': clientes, 'activos': activos},
+        'productos': {'total': productos, 'bajo_stock': productos_alerta},
+        'materias_primas': {'total': materias, 'bajo_stock': materias_alerta},
+        'pedidos': {
+            'total': sum(fila['cantidad'] for fila in pedidos),
+            'pendientes': por_estado.get('pendiente', (0, 0))[0],
+            'por_estado': pedidos,
+        },
+    }
+
+
+def estadisticas_dashboard():
+    """
+    Cifras del dashboard guardadas en la caché (DASHBOARD_CACHE_SEGUNDOS).
+    La clave incluye las versiones de las tablas de las que salen
+    (versiones_tabla, ver comun/condicional.py): cualquier escritura, también
+    en SQL o de otro proceso, cambia la clave y la siguiente petición recalcula.
+    """
+    version, _ = version_listado([Cliente, Pedido, Producto, MateriaPrima])
+    clave = f'dashboard:stats:{version}'
+    datos = cache.get(clave)
+    if datos is None:
+        datos = _calcular_estadisticas()
+        cache.set(clave, datos, getattr(settings, 'DASHBOARD_CACHE_SEGUNDOS', 30))
+    return datos
+
+
+# ========================================
+# PLAZOS DE ENTREGA
+# ========================================
+
+# Estados de pedido que cargan el taller (los mismos que los triggers de la migración 0015)
+ESTADOS_CON_CARGA = ('pendiente', 'en_produccion')
+
+
+def _taller():
+    return {'HORAS_SEMANA': [8, 8, 8, 8, 8, 0, 0], 'HORIZONTE_DIAS': 365,
+            **getattr(settings, 'TALLER', {})}
+
+
+def horas_taller(desde, hasta):
+    """
+    Horas de trabajo del taller de cada día entre `desde` y `hasta` (ambos
+    incluidos): las de capacidad_taller si el día tiene una, si no las de
+    settings.TALLER['HORAS_SEMANA'] según el día de la semana. Una consulta.
+    """
+    semana = _taller()['HORAS_SEMANA']
+    excepciones = dict(
+        CapacidadTaller.objects.filter(fecha__range=(desde, hasta)).values_list('fecha', 'horas')
+    )
+    horas = {}
+    fecha = desde
+    while fecha <= hasta:
+        horas[fecha] = excepciones.get(fecha, Decimal(semana[fecha.weekday()]))
+        fecha += timedelta(days=1)
+    return horas
+
+
+def recalcular_carga():
+    """
+    Reconstruye carga_taller desde las líneas de los pedidos abiertos, para
+    conciliar si algo se escribió saltándose los triggers (los fragmentos de
+    cada fecha se comparan sumados y se juntan en el 0). Bloquea las
+    escrituras de pedidos, líneas y productos mientras dura. Devuelve el número
+    de fechas cuya carga mantenida no cuadraba.
+    """
+    tabla = _tabla(CargaTaller)
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"LOCK TABLE {_tabla(LineaPedido)}, {_tabla(Pedido)}, {_tabla(Producto)} IN SHARE MODE"
+            )
+            cursor.execute(
+                f"""
+                CREATE TEMP TABLE carga_calculada ON COMMIT DROP AS
+                SELECT p.fecha_entrega_estimada AS fecha, SUM(l.cantidad * pr.tiempo_fabricacion) AS horas
+                FROM {_tabla(LineaPedido)} l
+                JOIN {_tabla(Pedido)} p ON p.id = l.pedido_id
+                JOIN {_tabla(Producto)} pr ON pr.id = l.producto_id
+                WHERE p.estado = ANY(%s)
+                GROUP BY p.fecha_entrega_estimada
+                HAVING SUM(l.cantidad * pr.tiempo_fabricacion) <> 0
+                """,
+                [list(ESTADOS_CON_CARGA)],
+            )
+            cursor.execute(
+                f"""
+                SELECT COUNT(*)
+                FROM (SELECT fecha, SUM(horas) AS horas FROM {tabla} GROUP BY fecha HAVING SUM(horas) <> 0) m
+                FULL JOIN carga_calculada c ON c.fecha = m.fecha
+                WHERE m.horas IS DISTINCT FROM c.horas
+                """
+            )
+            descuadres = cursor.fetchone()[0]
+            cursor.execute(f"DELETE FROM {tabla}")
+            cursor.execute(
+                f"INSERT INTO {tabla} (fecha, fragmento, horas) SELECT fecha, 0, horas FROM carga_calculada"
+            )
+            cursor.execute("DROP TABLE carga_calculada")
+    return descuadres
+
+
+def horas_fabricacion(lineas):
+    """
+    Horas de fabricación de unas líneas [{'producto': id, 'cantidad': n}]
+    (cantidad x Producto.tiempo_fabricacion), con una consulta
+    """
+    tiempos = dict(
+        Producto.objects.filter(id__in={linea['producto'] for linea in lineas})
+        .values_list('id', 'tiempo_fabricacion')
+    )
+    inexistentes = sorted({linea['producto'] for linea in lineas} - set(tiempos))
+    if inexistentes:
+        raise PlazoEntregaError(f"Productos inexistentes: {inexistentes}")
+    return sum(linea['cantidad'] * tiempos[linea['producto']] for linea in lineas)
+
+
+def fecha_entrega_posible(horas, desde=None, excluir_pedido=None):
+    """
+    Primera fecha de entrega en la que el taller puede fabricar `horas` más
+    sin retrasar ningún pedido abierto.
+
+    Para cada día d desde `desde` (mañana por defecto) la holgura es la
+    capacidad acumulada hasta d (calendario del taller) menos la carga
+    acumulada con entrega hasta d (carga_taller; lo atrasado cuenta el primer
+    día). Un pedido nuevo con entrega D consume `horas` de la holgura de todos
+    los días desde D, así que D es el primer día en que la holgura de ahí en
+    adelante no baja de `horas`. Es una sola consulta sobre unas pocas filas
+    por día (los fragmentos de carga_taller, que se suman en `carga`), sin
+    recorrer pedidos ni líneas.
+
+    `excluir_pedido` descuenta la carga de ese pedido, para volver a calcular
+    el plazo de un pedido que ya existe. Lanza PlazoEntregaError si no hay
+    hueco dentro del horizonte (settings.TALLER['HORIZONTE_DIAS']).
+    """
+    taller = _taller()
+    desde = desde or timezone.localdate() + timedelta(days=1)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            WITH carga AS (
+                SELECT GREATEST(fecha, %(desde)s::date) AS fecha, SUM(horas) AS horas
+                FROM (
+                    SELECT fecha, horas FROM {_tabla(CargaTaller)} WHERE horas <> 0
+                    UNION ALL
+                    SELECT p.fecha_entrega_estimada, -SUM(l.cantidad * pr.tiempo_fabricacion)
+                    FROM {_tabla(Pedido)} p
+                    JOIN {_tabla(LineaPedido)} l ON l.pedido_id = p.id
+                    JOIN {_tabla(Producto)} pr ON pr.id = l.producto_id
+                    WHERE p.id = %(excluir)s AND p.estado = ANY(%(abiertos)s)
+                    GROUP BY p.fecha_entrega_estimada
+                ) cargas
+                GROUP BY 1
+            ),
+            dias AS (
+                SELECT d::date AS fecha
+                FROM generate_series(
+                    %(desde)s::date,
+                    GREATEST(%(desde)s::date, (SELECT MAX(fecha) FROM carga)) + %(horizonte)s,
+                    interval '1 day'
+                ) d
+            ),
+            holguras AS (
+                SELECT d.fecha,
+                       SUM(COALESCE(c.horas, (%(semana)s::numeric[])[EXTRACT(ISODOW FROM d.fecha)::int])) OVER w
+                       - SUM(COALESCE(l.horas, 0)) OVER w AS holgura
+                FROM dias d
+                LEFT JOIN {_tabla(CapacidadTaller)} c ON c.fecha = d.fecha
+                LEFT JOIN carga l ON l.fecha = d.fecha
+                WINDOW w AS (ORDER BY d.fecha)
+            )
+            SELECT fecha
+            FROM (SELECT fecha, MIN(holgura) OVER (ORDER BY fecha DESC) AS minima FROM holguras) h
+            WHERE minima >= %(horas)s
+            ORDER BY fecha
+            LIMIT 1
+            """,
+            {'desde': desde, 'horas': horas, 'excluir': excluir_pedido, 'abiertos': list(ESTADOS_CON_CARGA),
+             'horizonte': taller['HORIZONTE_DIAS'], 'semana': taller['HORAS_SEMANA']},
+        )
+        fila = cursor.fetchone()
+    if fila is None:
+        raise PlazoEntregaError("El taller no tiene capacidad para el pedido dentro del horizonte de planificación")
+    return fila[0]
@@ -0,0 +1,8 @@
+"""
+Señales de pedidos para las demás aplicaciones
+"""
+from django.dispatch import Signal
+
+# Cambia el estado, las líneas o la fecha de entrega de unos pedidos.
+# Argumentos: pedido_ids. Se envía dentro de la transacción del cambio.
+pedidos_cambiados = Signal()
@@ -1,3 +1,1037 @@
-from django.test import TestCase
+import io
+import threading
+from datetime import date
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.db.models import F, Sum
+from django.db import transaction
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+
+from clientes.models import Cliente
+from stock.models import Familia, MateriaPrima, ModeloProducto, MovimientoStock, Producto
+from .admin import LineaPedidoInline
+from .models import (
+    Pedido, LineaPedido, ReservaProducto, EventoPedido, ContadorEstadoPedido, VentaDiaria, CapacidadTaller, CargaTaller,
+)
+from .serializers import PedidoEscrituraSerializer
+from .services import (
+    asignar_numero_pedido, conciliar_totales, recalcular_ventas, recalcular_carga, fecha_entrega_posible,
+    PlazoEntregaError,
+)
+from .signals import pedidos_cambiados
+
+
+def crear_pedido(cliente, numero):
+    return Pedido.objects.create(numero_pedido=numero, cliente=cliente,
+                                 fecha_entrega_estimada=date(2026, 12, 1))
+
+
+def escribir_a_la_vez(test, primera, segunda):
+    """
+    Ejecuta `primera` en otra conexión y, sin que esta haya hecho commit,
+    `segunda` con lock_timeout de 2 s: falla si la segunda espera por filas
+    que ha bloqueado la primera. Se salta si las dos conexiones caen en el
+    mismo fragmento de los contadores (pg_backend_pid() % 16).
+    """
+    escrita = threading.Event()
+    terminar = threading.Event()
+    pids = []
+    errores = []
+
+    def en_hilo():
+        try:
+            with transaction.atomic():
+                primera()
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT pg_backend_pid()")
+                    pids.append(cursor.fetchone()[0])
+                escrita.set()
+                terminar.wait(10)
+        except Exception as e:
+            errores.append(e)
+        finally:
+            connections.close_all()
+
+    hilo = threading.Thread(target=en_hilo)
+    hilo.start()
+    try:
+        test.assertTrue(escrita.wait(10))
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_backend_pid()")
+            pid = cursor.fetchone()[0]
+        if pid % 16 == pids[0] % 16:
+            test.skipTest("Las dos conexiones escriben en el mismo fragmento")
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL lock_timeout = '2s'")
+            segunda()
+    finally:
+        terminar.set()
+        hilo.join()
+    test.assertEqual(errores, [])
+
+
+def crear_cliente(nif='B00000001'):
+    return Cliente.objects.create(
+        nombre='Muebles Yecla', contacto='Ana', email='ana@example.com',
+        telefono='600000000', nif_cif=nif,
+    )
+
+
+# ========================================
+# EXPORTACIÓN
+# ========================================
+
+class ExportarPedidosTests(TestCase):
+    """Exportación en streaming de pedidos y líneas"""
+
+    def setUp(self):
+        self.client = APIClient()
+        cliente = crear_cliente()
+        producto = Producto.objects.create(codigo='P-001', nombre='Silla', stock_minimo=1, precio_venta=10)
+        pedido = crear_pedido(cliente, '2026-0001')
+        LineaPedido.objects.create(pedido=pedido, producto=producto, cantidad=2, precio_unitario=10)
+
+    def test_exportar_pedidos_csv(self):
+        response = self.client.get('/api/pedidos/exportar/')
+        self.assertEqual(response.status_code, 200)
+        lineas = b''.join(response.streaming_content).decode().splitlines()
+        fila = dict(zip(lineas[0].split(';'), lineas[1].split(';')))
+        self.assertEqual(fila['numero_pedido'], '2026-0001')
+        self.assertEqual(fila['cliente_nombre'], 'Muebles Yecla')
+        self.assertEqual(fila['total'], '20.00')
+
+    def test_exportar_lineas_requiere_autenticacion(self):
+        self.assertEqual(self.client.get('/api/lineas-pedido/exportar/').status_code, 401)
+
+        self.client.force_authenticate(User.objects.create_user('ventas'))
+        response = self.client.get('/api/lineas-pedido/exportar/?formato=ndjson')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'"producto_codigo": "P-001"', b''.join(response.streaming_content))
+
+
+# ========================================
+# PAGINACIÓN
+# ========================================
+
+class PaginacionPedidosTests(TestCase):
+    """Listado de pedidos por cursor sobre -fecha_pedido (con empates de fecha)"""
+
+    def test_recorre_pedidos_del_mismo_dia(self):
+        client = APIClient()
+        cliente = crear_cliente()
+        for i in range(5):
+            crear_pedido(cliente, f'2026-{i:04d}')
+
+        numeros = []
+        url = '/api/pedidos/?page_size=2&contar=false'
+        while url:
+            data = client.get(url).json()
+            numeros += [p['numero_pedido'] for p in data['results']]
+            url = data['next']
+        self.assertEqual(numeros, [f'2026-{i:04d}' for i in reversed(range(5))])
+
+
+# ========================================
+# ALTA DE PEDIDOS CON LÍNEAS
+# ========================================
+
+class PedidoConLineasTests(TestCase):
+    """Alta y modificación de cabecera y líneas en una sola petición"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.cliente = crear_cliente()
+        self.productos = [
+            Producto.objects.create(codigo=f'P-{i:03d}', nombre=f'Silla {i}', stock_minimo=1, precio_venta=10 + i)
+            for i in range(20)
+        ]
+
+    def datos(self, lineas):
+        return {
+            'cliente': self.cliente.id,
+            'fecha_entrega_estimada': '2026-12-01',
+            'lineas': lineas,
+        }
+
+    def crear(self, productos):
+        lineas = [{'producto': p.id, 'cantidad': 2} for p in productos]
+        return self.client.post('/api/pedidos/', self.datos(lineas), format='json')
+
+    def test_crea_lineas_y_total(self):
+        lineas = [
+            {'producto': self.productos[0].id, 'cantidad': 2, 'precio_unitario': '9.50'},
+            {'producto': self.productos[1].id, 'cantidad': 3},
+        ]
+        response = self.client.post('/api/pedidos/', self.datos(lineas), format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['total'], '52.00')
+        self.assertEqual(
+            [(l['producto_codigo'], l['precio_unitario'], l['subtotal']) for l in response.data['lineas']],
+            [('P-000', '9.50', '19.00'), ('P-001', '11.00', '33.00')],
+        )
+
+    def test_consultas_constantes(self):
+        self.crear(self.productos[:1])  # Primer número de la serie
+        with CaptureQueriesContext(connection) as una:
+            self.crear(self.productos[:1])
+        with CaptureQueriesContext(connection) as veinte:
+            response = self.crear(self.productos)
+        self.assertEqual(len(una), len(veinte))
+        self.assertEqual(LineaPedido.objects.filter(pedido=response.data['id']).count(), 20)
+
+    def test_producto_inexistente_no_crea_nada(self):
+        lineas = [{'producto': self.productos[0].id, 'cantidad': 1}, {'producto': 999999, 'cantidad': 1}]
+        response = self.client.post('/api/pedidos/', self.datos(lineas), format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('999999', str(response.data['lineas']))
+        self.assertFalse(Pedido.objects.exists())
+
+    def test_modificar_sustituye_lineas(self):
+        pedido_id = self.crear(self.productos[:3]).data['id']
+        datos = self.datos([{'producto': self.productos[5].id, 'cantidad': 1}])
+        response = self.client.put(f'/api/pedidos/{pedido_id}/', datos, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((len(response.data['lineas']), response.data['total']), (1, '15.00'))
+
+        # Sin "lineas" solo cambia la cabecera
+        response = self.client.patch(f'/api/pedidos/{pedido_id}/', {'estado': 'en_produccion'}, format='json')
+        self.assertEqual((response.data['estado'], response.data['total']), ('en_produccion', '15.00'))
+        self.assertEqual(LineaPedido.objects.filter(pedido_id=pedido_id).count(), 1)
+
+
+# ========================================
+# TOTAL DEL PEDIDO
+# ========================================
+
+class TotalPedidoTests(TestCase):
+    """Total mantenido por los triggers de las líneas y su conciliación"""
+
+    def setUp(self):
+        cliente = crear_cliente()
+        self.silla = Producto.objects.create(codigo='P-001', nombre='Silla', stock_minimo=1, precio_venta=10)
+        self.pedido = crear_pedido(cliente, '2026-0001')
+        self.otro = crear_pedido(cliente, '2026-0002')
+
+    def total(self, pedido):
+        return Pedido.objects.values_list('total', flat=True).get(pk=pedido.pk)
+
+    def linea(self, pedido, cantidad, precio=10):
+        return LineaPedido.objects.create(pedido=pedido, producto=self.silla, cantidad=cantidad,
+                                          precio_unitario=precio)
+
+    def test_alta_modificacion_y_borrado(self):
+        primera = self.linea(self.pedido, 2)
+        self.linea(self.pedido, 1, precio='4.50')
+        self.assertEqual(self.total(self.pedido), Decimal('24.50'))
+
+        primera.cantidad = 5
+        primera.save()
+        self.assertEqual(self.total(self.pedido), Decimal('54.50'))
+
+        primera.delete()
+        self.assertEqual(self.total(self.pedido), Decimal('4.50'))
+
+    def test_operaciones_masivas(self):
+        LineaPedido.objects.bulk_create([
+            LineaPedido(pedido=pedido, producto=self.silla, cantidad=1, precio_unitario=10, subtotal=10)
+            for pedido in (self.pedido, self.pedido, self.otro)
+        ])
+        self.assertEqual((self.total(self.pedido), self.total(self.otro)), (20, 10))
+
+        LineaPedido.objects.update(cantidad=F('cantidad') * 3, subtotal=F('subtotal') * 3)
+        self.assertEqual((self.total(self.pedido), self.total(self.otro)), (60, 30))
+
+        # Una línea que cambia de pedido resta en uno y suma en el otro
+        LineaPedido.objects.filter(pk=LineaPedido.objects.filter(pedido=self.pedido).first().pk).update(
+            pedido=self.otro
+        )
+        self.assertEqual((self.total(self.pedido), self.total(self.otro)), (30, 60))
+
+        LineaPedido.objects.filter(pedido=self.otro).delete()
+        self.assertEqual((self.total(self.pedido), self.total(self.otro)), (30, 0))
+
+    def test_guardar_pedido_no_pisa_el_total(self):
+        self.linea(self.pedido, 3)
+        self.pedido.observaciones = 'Urgente'
+        self.pedido.save()
+        self.assertEqual(self.total(self.pedido), 30)
+        self.assertEqual(self.pedido.calcular_total(), 30)
+
+    def test_conciliar_repara_descuadres(self):
+        self.linea(self.pedido, 3)
+        Pedido.objects.filter(pk=self.pedido.pk).update(total=99)
+
+        salida = io.StringIO()
+        call_command('conciliar_totales', '--procesos', '1', '--comprobar', stdout=salida)
+        self.assertIn('Pedidos descuadrados encontrados: 1', salida.getvalue())
+        self.assertEqual(self.total(self.pedido), 99)
+
+        self.assertEqual(conciliar_totales(self.pedido.pk, self.otro.pk),
+                         [(self.pedido.pk, Decimal('99.00'), Decimal('30.00'))])
+        self.assertEqual(self.total(self.pedido), 30)
+        self.assertEqual(conciliar_totales(self.pedido.pk, self.otro.pk), [])
+
+        with self.assertRaises(CommandError):
+            call_command('conciliar_totales', '--lote', '0', stdout=salida)
+
+
+class TotalPedidoConcurrenciaTests(TransactionTestCase):
+    """Líneas añadidas a la vez al mismo pedido desde varias conexiones"""
+
+    def test_20_lineas_en_paralelo(self):
+        pedido = crear_pedido(crear_cliente(), '2026-0001')
+        silla = Producto.objects.create(codigo='P-001', nombre='Silla', stock_minimo=1, precio_venta=10)
+        errores = []
+        barrera = threading.Barrier(20)
+
+        def alta(i):
+            try:
+                barrera.wait()
+                LineaPedido.objects.create(pedido=pedido, producto=silla, cantidad=i + 1, precio_unitario=1)
+            except Exception as e:
+                errores.append(e)
+            finally:
+                connections.close_all()
+
+        hilos = [threading.Thread(target=alta, args=(i,)) for i in range(20)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(errores, [])
+        pedido.refresh_from_db()
+        self.assertEqual(pedido.total, sum(range(1, 21)))
+
+
+# ========================================
+# NUMERACIÓN DE PEDIDOS
+# ========================================
+
+class NumeroPedidoTests(TestCase):
+    """Número de pedido asignado por el servidor según el patrón de la serie"""
+
+    def setUp(self):
+        self.cliente = crear_cliente()
+        self.anio = timezone.localdate().year
+
+    def alta(self):
+        return Pedido.objects.create(cliente=self.cliente, fecha_entrega_estimada=date(2026, 12, 1))
+
+    def test_numeros_consecutivos_por_serie(self):
+        self.assertEqual([self.alta().numero_pedido for _ in range(2)],
+                         [f'{self.anio}-000001', f'{self.anio}-000002'])
+        self.assertEqual(asignar_numero_pedido(date(2030, 5, 1)), '2030-000001')
+
+    def test_continua_desde_los_numeros_existentes(self):
+        crear_pedido(self.cliente, f'{self.anio}-000041')
+        crear_pedido(self.cliente, 'MANUAL-99')
+        self.assertEqual(self.alta().numero_pedido, f'{self.anio}-000042')
+
+    @override_settings(PEDIDOS_NUMERACION={'PATRON': 'PED{anio}/{numero:04d}'})
+    def test_patron_configurable(self):
+        self.assertEqual(self.alta().numero_pedido, f'PED{self.anio}/0001')
+
+    def test_el_cliente_no_elige_el_numero(self):
+        response = APIClient().post('/api/pedidos/', {
+            'numero_pedido': 'A MANO', 'cliente': self.cliente.id, 'fecha_entrega_estimada': '2026-12-01',
+        }, format='json')
+        self.assertEqual(response.data['numero_pedido'], f'{self.anio}-000001')
+
+    @override_settings(PEDIDOS_NUMERACION={'PATRON': '{anio}-{numero:06d}', 'SIN_HUECOS': True})
+    def test_sin_huecos_un_alta_deshecha_no_consume_numero(self):
+        self.alta()
+        try:
+            with transaction.atomic():
+                self.alta()
+                raise ValueError('alta cancelada')
+        except ValueError:
+            pass
+        self.assertEqual(self.alta().numero_pedido, f'{self.anio}-000002')
+
+
+class NumeroPedidoConcurrenciaTests(TransactionTestCase):
+    """Altas simultáneas: ningún número repetido ni reintentos"""
+
+    def altas_en_paralelo(self, alta, hilos=40):
+        errores = []
+        barrera = threading.Barrier(hilos)
+
+        def ejecutar(i):
+            try:
+                barrera.wait()
+                alta(i)
+            except Exception as e:
+                errores.append(e)
+            finally:
+                connections.close_all()
+
+        lista = [threading.Thread(target=ejecutar, args=(i,)) for i in range(hilos)]
+        for hilo in lista:
+            hilo.start()
+        for hilo in lista:
+            hilo.join()
+        self.assertEqual(errores, [])
+        anio = timezone.localdate().year
+        numeros = sorted(Pedido.objects.values_list('numero_pedido', flat=True))
+        self.assertEqual(numeros, [f'{anio}-{n:06d}' for n in range(1, hilos + 1)])
+
+    def test_altas_por_api(self):
+        cliente = crear_cliente()
+        datos = {'cliente': cliente.id, 'fecha_entrega_estimada': '2026-12-01'}
+
+        def alta(i):
+            response = APIClient().post('/api/pedidos/', datos, format='json')
+            if response.status_code != 201:
+                raise AssertionError(response.data)
+
+        self.altas_en_paralelo(alta)
+
+    @override_settings(PEDIDOS_NUMERACION={'PATRON': '{anio}-{numero:06d}', 'SIN_HUECOS': True})
+    def test_altas_sin_huecos(self):
+        cliente = crear_cliente()
+
+        def alta(i):
+            with transaction.atomic():
+                Pedido.objects.create(cliente=cliente, fecha_entrega_estimada=date(2026, 12, 1))
+
+        self.altas_en_paralelo(alta)
+
+
+# ========================================
+# RESERVAS DE STOCK
+# ========================================
+
+class ReservaStockTests(TestCase):
+    """Reserva al confirmar, liberación, consumo y disponible para prometer"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.cliente = crear_cliente()
+        self.silla = Producto.objects.create(codigo='P-001', nombre='Silla', stock_actual=10,
+                                             stock_minimo=1, precio_venta=10)
+        self.mesa = Producto.objects.create(codigo='P-002', nombre='Mesa', stock_actual=2,
+                                            stock_minimo=1, precio_venta=50)
+
+    def pedido(self, fecha, *lineas):
+        datos = {'cliente': self.cliente.id, 'fecha_entrega_estimada': fecha,
+                 'lineas': [{'producto': p.id, 'cantidad': c} for p, c in lineas]}
+        return self.client.post('/api/pedidos/', datos, format='json').data['id']
+
+    def reservar(self, pedido_id, **datos):
+        return self.client.post(f'/api/pedidos/{pedido_id}/reservar/', datos, format='json')
+
+    def disponible(self, fecha='2026-12-31'):
+        with self.assertNumQueries(1):
+            data = self.client.get(f'/api/pedidos/disponibilidad/?fecha={fecha}').data
+        return {p['codigo']: (p['reservado'], p['proyectado'], p['disponible']) for p in data['productos']}
+
+    def test_reserva_y_disponible_por_fecha(self):
+        primero = self.pedido('2026-11-01', (self.silla, 3), (self.silla, 1), (self.mesa, 2))
+        segundo = self.pedido('2026-12-15', (self.silla, 4))
+        self.assertEqual(self.reservar(primero).data['faltantes'], [])
+        self.reservar(segundo)
+
+        self.assertEqual(self.disponible('2026-11-30'), {'P-001': (8, 6, 2), 'P-002': (2, 0, 0)})
+        self.assertEqual(self.disponible(), {'P-001': (8, 2, 2), 'P-002': (2, 0, 0)})
+        self.assertEqual(ReservaProducto.objects.count(), 3)
+
+    def test_sin_stock_no_reserva_salvo_forzando(self):
+        self.reservar(self.pedido('2026-11-01', (self.mesa, 2)))
+        pedido_id = self.pedido('2026-11-02', (self.mesa, 1), (self.silla, 1))
+
+        response = self.reservar(pedido_id)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['faltantes'],
+                         [{'producto': self.mesa.id, 'codigo': 'P-002', 'cantidad': 1, 'disponible': 0}])
+        self.assertEqual(self.disponible()['P-001'], (0, 10, 10))
+
+        self.assertEqual(len(self.reservar(pedido_id, forzar=True).data['faltantes']), 1)
+        self.assertEqual(self.disponible()['P-002'], (3, -1, -1))
+
+    def test_cancelar_libera_y_entregar_consume(self):
+        cancelado = self.pedido('2026-11-01', (self.silla, 3))
+        entregado = self.pedido('2026-11-01', (self.silla, 2), (self.mesa, 1))
+        self.reservar(cancelado)
+        self.reservar(entregado)
+
+        self.client.patch(f'/api/pedidos/{cancelado}/', {'estado': 'cancelado'}, format='json')
+        self.assertEqual(self.disponible()['P-001'], (2, 8, 8))
+
+        for estado in ('en_produccion', 'producido'):
+            self.client.post('/api/pedidos/cambiar_estado/', {'ids': [entregado], 'estado': estado}, format='json')
+        self.assertEqual(self.disponible()['P-001'], (2, 8, 8))
+        self.client.patch(f'/api/pedidos/{entregado}/', {'estado': 'entregado'}, format='json')
+        self.assertEqual(self.disponible(), {'P-001': (0, 8, 8), 'P-002': (0, 1, 1)})
+        self.assertFalse(ReservaProducto.objects.exists())
+        numero = Pedido.objects.get(pk=entregado).numero_pedido
+        self.assertEqual(
+            sorted(MovimientoStock.objects.filter(referencia=numero).values_list('tipo', 'cantidad')),
+            [('venta', Decimal('-2.00')), ('venta', Decimal('-1.00'))],
+        )
+        self.assertEqual(self.reservar(entregado).status_code, 400)
+
+    def test_cambios_de_lineas_y_fecha_mueven_la_reserva(self):
+        pedido_id = self.pedido('2026-11-01', (self.silla, 3))
+        self.reservar(pedido_id)
+
+        self.client.patch(f'/api/pedidos/{pedido_id}/', {'fecha_entrega_estimada': '2026-12-20'}, format='json')
+        self.assertEqual(self.disponible('2026-11-30')['P-001'], (3, 10, 7))
+
+        response = self.client.patch(f'/api/pedidos/{pedido_id}/', {'lineas': [
+            {'producto': self.silla.id, 'cantidad': 5},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.disponible()['P-001'], (5, 5, 5))
+
+        response = self.client.patch(f'/api/pedidos/{pedido_id}/', {'lineas': [
+            {'producto': self.silla.id, 'cantidad': 11},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.disponible()['P-001'], (5, 5, 5))
+
+    def test_lineas_sueltas_vuelven_a_reservar(self):
+        self.client.force_authenticate(User.objects.create_user('almacen'))
+        pedido_id = self.pedido('2026-11-01', (self.silla, 3))
+        self.reservar(pedido_id)
+        linea_id = LineaPedido.objects.get(pedido_id=pedido_id).id
+
+        response = self.client.post('/api/lineas-pedido/', {
+            'pedido': pedido_id, 'producto': self.mesa.id, 'cantidad': 1, 'precio_unitario': 50,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.disponible(), {'P-001': (3, 7, 7), 'P-002': (1, 1, 1)})
+
+        # Sin stock: no se guarda la línea ni cambian las reservas
+        response = self.client.patch(f'/api/lineas-pedido/{linea_id}/', {'cantidad': 11}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['faltantes'][0]['codigo'], 'P-001')
+        self.assertEqual(LineaPedido.objects.get(pk=linea_id).cantidad, 3)
+
+        self.assertEqual(self.client.delete(f'/api/lineas-pedido/{linea_id}/').status_code, 204)
+        self.assertEqual(self.disponible(), {'P-001': (0, 10, 10), 'P-002': (1, 1, 1)})
+
+    def test_admin_no_edita_lineas_de_pedidos_reservados(self):
+        pedido = Pedido.objects.get(pk=self.pedido('2026-11-01', (self.silla, 3)))
+        request = RequestFactory().get('/admin/')
+        request.user = User.objects.create_superuser('admin')
+        inline = LineaPedidoInline(Pedido, admin.site)
+        self.assertTrue(inline.has_change_permission(request, pedido))
+
+        self.reservar(pedido.id)
+        self.assertFalse(inline.has_change_permission(request, pedido))
+        self.assertFalse(inline.has_add_permission(request, pedido))
+        linea_admin = admin.site._registry[LineaPedido]
+        self.assertFalse(linea_admin.has_delete_permission(request, pedido.lineas.get()))
+
+
+# ========================================
+# LISTADO
+# ========================================
+
+class ResumenListadoTests(TestCase):
+    """Columnas del listado mantenidas por triggers y consultas fijas"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.cliente = crear_cliente()
+        self.silla = Producto.objects.create(codigo='P-001', nombre='Silla', stock_minimo=1, precio_venta=10)
+        self.mesa = Producto.objects.create(codigo='P-002', nombre='Mesa', stock_minimo=1, precio_venta=50)
+        self.pedido = crear_pedido(self.cliente, '2026-0001')
+
+    def resumen(self):
+        return Pedido.objects.values_list(
+            'cliente_nombre', 'num_lineas', 'unidades', 'resumen_productos'
+        ).get(pk=self.pedido.pk)
+
+    def test_lineas_y_renombrados(self):
+        self.assertEqual(self.resumen(), ('Muebles Yecla', 0, 0, ''))
+        silla = LineaPedido.objects.create(pedido=self.pedido, producto=self.silla, cantidad=3, precio_unitario=10)
+        LineaPedido.objects.create(pedido=self.pedido, producto=self.mesa, cantidad=1, precio_unitario=50)
+        self.assertEqual(self.resumen(), ('Muebles Yecla', 2, 4, 'Silla x3, Mesa x1'))
+
+        silla.delete()
+        self.assertEqual(self.resumen(), ('Muebles Yecla', 1, 1, 'Mesa x1'))
+
+        Cliente.objects.filter(pk=self.cliente.pk).update(nombre='Muebles Jumilla')
+        Producto.objects.filter(pk=self.mesa.pk).update(nombre='Mesa extensible')
+        self.assertEqual(self.resumen(), ('Muebles Jumilla', 1, 1, 'Mesa extensible x1'))
+
+        otro = Cliente.objects.create(nombre='Hábitat Sur', contacto='Luis', email='luis@example.com',
+                                      telefono='600000001', nif_cif='B00000002')
+        self.pedido.cliente = otro
+        self.pedido.save()
+        self.assertEqual(self.resumen()[0], 'Hábitat Sur')
+
+    def test_listado_sin_joins_y_buscable(self):
+        LineaPedido.objects.create(pedido=self.pedido, producto=self.silla, cantidad=2, precio_unitario=10)
+        with CaptureQueriesContext(connection) as uno:
+            self.client.get('/api/pedidos/?page_size=50')
+        for i in range(20):
+            crear_pedido(self.cliente, f'2026-1{i:03d}')
+        with CaptureQueriesContext(connection) as veinte:
+            data = self.client.get('/api/pedidos/?page_size=50&search=yecla').json()
+        self.assertEqual(len(uno), len(veinte))
+        self.assertEqual(len(data['results']), 21)
+        self.assertNotIn('JOIN', veinte.captured_queries[-1]['sql'])
+        fila = next(p for p in data['results'] if p['id'] == self.pedido.pk)
+        self.assertEqual((fila['num_lineas'], fila['unidades'], fila['resumen_productos']), (1, 2, 'Silla x2'))
+
+    def test_detalle_consultas_constantes(self):
+        otro = crear_pedido(self.cliente, '2026-0002')
+        LineaPedido.objects.create(pedido=self.pedido, producto=self.silla, cantidad=1, precio_unitario=10)
+        productos = [
+            Producto.objects.create(codigo=f'P-1{i:02d}', nombre=f'Sillón {i}', stock_minimo=1, precio_venta=10)
+            for i in range(20)
+        ]
+        LineaPedido.objects.bulk_create([
+            LineaPedido(pedido=otro, producto=p, cantidad=1, precio_unitario=10, subtotal=10) for p in productos
+        ])
+        with CaptureQueriesContext(connection) as una:
+            self.client.get(f'/api/pedidos/{self.pedido.pk}/')
+        with CaptureQueriesContext(connection) as veinte:
+            response = self.client.get(f'/api/pedidos/{otro.pk}/')
+        self.assertEqual(len(una), len(veinte))
+        self.assertEqual(len(response.data['lineas']), 20)
+
+
+
+# ========================================
+# CAMBIOS DE ESTADO
+# ========================================
+
+class CambioEstadoTests(TestCase):
+    """Transiciones de estado en bloque, registro de eventos y contadores"""
+
+    def setUp(self):
+        self.client = APIClient()
+        cliente = crear_cliente()
+        self.silla = Producto.objects.create(codigo='P-001', nombre='Silla', stock_minimo=1, precio_venta=10,
+                                             stock_actual=10)
+        self.pedidos = [crear_pedido(cliente, f'2026-{i:04d}').id for i in range(300)]
+
+    def cambiar(self, ids, estado, **extra):
+        return self.client.post('/api/pedidos/cambiar_estado/', {'ids': ids, 'estado': estado, **extra},
+                                format='json')
+
+    def cantidades(self):
+        return {fila['estado']: fila['cantidad'] for fila in self.client.get('/api/pedidos/estados/').data}
+
+    def test_300_pedidos_en_una_sentencia(self):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.cambiar(self.pedidos, 'en_produccion')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['cambiados'], self.pedidos)
+        self.assertEqual(len([q for q in consultas if 'SET estado' in q['sql']]), 1)
+
+        self.assertEqual(EventoPedido.objects.filter(estado_anterior='pendiente', estado='en_produccion').count(),
+                         300)
+        self.assertEqual(self.cantidades(),
+                         {'pendiente': 0, 'en_produccion': 300, 'producido': 0, 'entregado': 0, 'cancelado': 0})
+
+    def test_transicion_no_permitida_no_cambia_nada(self):
+        self.cambiar(self.pedidos[:2], 'cancelado')
+        response = self.cambiar(self.pedidos[:5] + [0], 'en_produccion')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['rechazados'],
+                         [{'id': self.pedidos[0], 'estado': 'cancelado'},
+                          {'id': self.pedidos[1], 'estado': 'cancelado'}])
+        self.assertEqual(response.data['no_encontrados'], [0])
+        self.assertEqual(self.cantidades()['en_produccion'], 0)
+
+        response = self.cambiar(self.pedidos[:5], 'en_produccion', parcial=True)
+        self.assertEqual(response.data['cambiados'], self.pedidos[2:5])
+        self.assertEqual(self.cantidades()['en_produccion'], 3)
+
+        self.assertEqual(self.cambiar(self.pedidos[:1], 'archivado').status_code, 400)
+        response = self.client.patch(f'/api/pedidos/{self.pedidos[0]}/', {'estado': 'pendiente'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_estado_se_valida_con_la_fila_bloqueada(self):
+        # El serializer carga el pedido en 'pendiente' y otro proceso lo cancela antes de guardar
+        serializer = PedidoEscrituraSerializer(Pedido.objects.get(id=self.pedidos[0]),
+                                               data={'estado': 'en_produccion'}, partial=True)
+        self.assertTrue(serializer.is_valid())
+        self.cambiar(self.pedidos[:1], 'cancelado')
+        with self.assertRaises(ValidationError):
+            serializer.save()
+        self.assertEqual(Pedido.objects.get(id=self.pedidos[0]).estado, 'cancelado')
+
+        # Un cambio que no toca el estado tampoco lo devuelve al anterior
+        serializer = PedidoEscrituraSerializer(Pedido.objects.get(id=self.pedidos[1]),
+                                               data={'observaciones': 'urgente'}, partial=True)
+        self.assertTrue(serializer.is_valid())
+        self.cambiar(self.pedidos[1:2], 'en_produccion')
+        serializer.save()
+        self.assertEqual(Pedido.objects.get(id=self.pedidos[1]).estado, 'en_produccion')
+
+    def test_alta_solo_en_pendiente(self):
+        datos = {'cliente': Pedido.objects.get(id=self.pedidos[0]).cliente_id,
+                 'fecha_entrega_estimada': '2026-12-01', 'estado': 'entregado'}
+        response = self.client.post('/api/pedidos/', datos, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('estado', response.data)
+        enviados = []
+
+        def receptor(sender, pedido_ids, **kwargs):
+            enviados.append(pedido_ids)
+
+        pedidos_cambiados.connect(receptor)
+        try:
+            response = self.client.post('/api/pedidos/', {**datos, 'estado': 'pendiente'}, format='json')
+        finally:
+            pedidos_cambiados.disconnect(receptor)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(enviados, [[response.data['id']]])
+
+    def test_eventos_de_cualquier_origen_y_recuento_desde(self):
+        Pedido.objects.filter(id__in=self.pedidos[:10]).update(estado='en_produccion')
+        self.client.patch(f'/api/pedidos/{self.pedidos[0]}/', {'estado': 'producido'}, format='json')
+        Pedido.objects.filter(id=self.pedidos[-1]).delete()
+
+        self.assertEqual(
+            list(EventoPedido.objects.filter(pedido=self.pedidos[0]).order_by('id')
+                 .values_list('estado_anterior', 'estado')),
+            [('', 'pendiente'), ('pendiente', 'en_produccion'), ('en_produccion', 'producido')],
+        )
+        self.assertEqual(
+            dict(ContadorEstadoPedido.objects.order_by().values('estado')
+                 .annotate(pedidos=Sum('cantidad')).filter(pedidos__gt=0).values_list('estado', 'pedidos')),
+            {'pendiente': 289, 'en_produccion': 9, 'producido': 1},
+        )
+        hoy = timezone.localdate().isoformat()
+        estados = {fila['estado']: fila for fila in self.client.get(f'/api/pedidos/estados/?desde={hoy}').data}
+        self.assertEqual((estados['en_produccion']['entradas'], estados['producido']['entradas']), (10, 1))
+        self.assertEqual(estados['producido']['siguientes'], ['en_produccion', 'entregado', 'cancelado'])
+
+    def test_cancelar_en_bloque_libera_reservas(self):
+        LineaPedido.objects.create(pedido_id=self.pedidos[0], producto=self.silla, cantidad=4, precio_unitario=10)
+        self.client.post(f'/api/pedidos/{self.pedidos[0]}/reservar/', format='json')
+        self.assertTrue(ReservaProducto.objects.exists())
+
+        self.cambiar(self.pedidos[:50], 'cancelado')
+        self.assertFalse(ReservaProducto.objects.exists())
+
+
+
+class ContadorEstadoConcurrenciaTests(TransactionTestCase):
+    """Altas de pedidos con líneas desde dos conexiones a la vez"""
+
+    def test_altas_en_paralelo_no_esperan_por_los_contadores(self):
+        cliente = crear_cliente()
+        silla = Producto.objects.create(codigo='P-001', nombre='Silla', stock_minimo=1, precio_venta=10)
+
+        def alta(numero):
+            pedido = crear_pedido(cliente, numero)
+            LineaPedido.objects.create(pedido=pedido, producto=silla, cantidad=1, precio_unitario=10)
+
+        # Mismo cliente, producto, día y fecha de entrega: con una fila por estado
+        # (o por día de ventas o de carga) la segunda alta esperaría a la primera
+        escribir_a_la_vez(self, lambda: alta('2026-0001'), lambda: alta('2026-0002'))
+        self.assertEqual(
+            ContadorEstadoPedido.objects.filter(estado='pendiente')
+            .aggregate(pedidos=Sum('cantidad'), importe=Sum('importe')),
+            {'pedidos': 2, 'importe': 20},
+        )
+
+
+# ========================================
+# VENTAS DIARIAS
+# ========================================
+
+class VentasDiariasTests(TestCase):
+    """Ventas agregadas por triggers y servidas desde ventas_diarias"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.yecla = crear_cliente()
+        self.jumilla = Cliente.objects.create(nombre='Muebles Jumilla', contacto='Luis', email='luis@example.com',
+                                              telefono='600000001', nif_cif='B00000002')
+        self.maria = ModeloProducto.objects.create(codigo='MARIA', nombre='María', tipo='PRODUCTO')
+        self.silla = Producto.objects.create(codigo='P-001', nombre='Silla', modelo=self.maria,
+                                             stock_minimo=1, precio_venta=10)
+        self.mesa = Producto.objects.create(codigo='P-002', nombre='Mesa', stock_minimo=1, precio_venta=50)
+
+        self.enero = self.pedido(self.yecla, date(2026, 1, 15), (self.silla, 4), (self.mesa, 1))
+        self.febrero = self.pedido(self.jumilla, date(2026, 2, 3), (self.silla, 2))
+        self.marzo = self.pedido(self.jumilla, date(2026, 3, 9), (self.mesa, 3))
+
+    def pedido(self, cliente, fecha, *lineas):
+        pedido = crear_pedido(cliente, '')
+        LineaPedido.objects.bulk_create(
+            LineaPedido(pedido=pedido, producto=producto, cantidad=cantidad, precio_unitario=producto.precio_venta,
+                        subtotal=cantidad * producto.precio_venta)
+            for producto, cantidad in lineas
+        )
+        Pedido.objects.filter(pk=pedido.pk).update(fecha_pedido=fecha)
+        return pedido
+
+    def ventas(self, consulta):
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/pedidos/ventas/?desde=2026-01-01&hasta=2026-12-31&{consulta}')
+        return response.data['resultados']
+
+    def test_por_mes_y_por_grupo(self):
+        self.assertEqual(
+            [(fila['periodo'], fila['importe']) for fila in self.ventas('periodo=mes')],
+            [(date(2026, 1, 1), '90.00'), (date(2026, 2, 1), '20.00'), (date(2026, 3, 1), '150.00')],
+        )
+        self.assertEqual(
+            [(fila['nombre'], fila['unidades']) for fila in self.ventas('agrupar=producto&orden=unidades&limite=1')],
+            [('Silla', 6)],
+        )
+        self.assertEqual(
+            [(fila['periodo'].month, fila['nombre'])
+             for fila in self.ventas('periodo=mes&agrupar=producto&limite=1')],
+            [(1, 'Mesa'), (2, 'Silla'), (3, 'Mesa')],
+        )
+        self.assertEqual(
+            [(fila['nombre'], fila['importe']) for fila in self.ventas('agrupar=cliente')],
+            [('Muebles Jumilla', '170.00'), ('Muebles Yecla', '90.00')],
+        )
+        self.assertEqual(
+            {fila['id']: fila['lineas'] for fila in self.ventas('agrupar=modelo')},
+            {self.maria.id: 2, None: 2},
+        )
+
+    def test_cambios_de_lineas_estado_y_modelo(self):
+        LineaPedido.objects.filter(pedido=self.febrero).update(cantidad=5, subtotal=50)
+        LineaPedido.objects.filter(pedido=self.marzo).delete()
+        self.client.post('/api/pedidos/cambiar_estado/', {'ids': [self.enero.id], 'estado': 'cancelado'},
+                         format='json')
+        Producto.objects.filter(pk=self.silla.pk).update(modelo=None)
+
+        self.assertEqual([(fila['importe'], fila['unidades']) for fila in self.ventas('')], [('50.00', 5)])
+        self.assertEqual(
+            [(fila['estado'], fila['importe']) for fila in self.ventas('agrupar=estado&estados=pendiente,cancelado')],
+            [('cancelado', '90.00'), ('pendiente', '50.00')],
+        )
+        self.assertEqual([fila['id'] for fila in self.ventas('agrupar=modelo')], [None])
+        self.assertEqual(recalcular_ventas(date(2026, 1, 1), date(2026, 12, 31), reparar=False), 0)
+
+    def test_recalcular_por_tramos(self):
+        VentaDiaria.objects.filter(fecha=date(2026, 2, 3)).delete()
+        VentaDiaria.objects.create(dimension='total', fecha=date(2025, 6, 1), estado='pendiente', lineas=1,
+                                   unidades=1, importe=1)
+        salida = io.StringIO()
+        call_command('recalcular_ventas', '--dias', '30', '--procesos', '1', stdout=salida)
+        self.assertIn('Grupos descuadrados corregidos: 5', salida.getvalue())
+        self.assertEqual([fila['importe'] for fila in self.ventas('')], ['260.00'])
+        self.assertFalse(VentaDiaria.objects.filter(fecha=date(2025, 6, 1)).exists())
+        with self.assertRaises(CommandError):
+            call_command('recalcular_ventas', '--dias', '0')
+
+    def test_parametros_no_validos(self):
+        for consulta in ('agrupar=familia', 'periodo=hora', 'estados=archivado', 'desde=2026-02-30', 'limite=x',
+                         'limite=0', 'limite=-1'):
+            self.assertEqual(self.client.get(f'/api/pedidos/ventas/?{consulta}').status_code, 400)
+
+
+
+class VentasDiariasConcurrenciaTests(TransactionTestCase):
+    """Pedidos con líneas dados de alta a la vez desde dos conexiones"""
+
+    def test_altas_con_lineas_no_esperan_por_las_ventas(self):
+        yecla, jumilla = crear_cliente(), crear_cliente('B00000002')
+        silla = Producto.objects.create(codigo='P-001', nombre='Silla', stock_minimo=1, precio_venta=10)
+        mesa = Producto.objects.create(codigo='P-002', nombre='Mesa', stock_minimo=1, precio_venta=50)
+
+        def alta(cliente, numero, producto, entrega):
+            pedido = Pedido.objects.create(numero_pedido=numero, cliente=cliente, fecha_entrega_estimada=entrega)
+            LineaPedido.objects.create(pedido=pedido, producto=producto, cantidad=1, precio_unitario=1)
+
+        # Mismo día y estado: con una fila 'total' por día y estado la segunda esperaría
+        escribir_a_la_vez(self, lambda: alta(yecla, '2026-0001', silla, date(2026, 12, 1)),
+                          lambda: alta(jumilla, '2026-0002', mesa, date(2026, 12, 2)))
+        self.assertEqual(
+            VentaDiaria.objects.filter(dimension='total').aggregate(lineas=Sum('lineas'), unidades=Sum('unidades')),
+            {'lineas': 2, 'unidades': 2},
+        )
+
+
+# ========================================
+# DASHBOARD
+# ========================================
+
+class DashboardStatsTests(TestCase):
+    """Cifras del dashboard en una consulta, en caché hasta la siguiente escritura"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.cliente = crear_cliente()
+        self.silla = Producto.objects.create(codigo='P-001', nombre='Silla', stock_actual=0, stock_minimo=5,
+                                             precio_venta=10)
+        Producto.objects.create(codigo='P-002', nombre='Mesa', stock_actual=9, stock_minimo=5, precio_venta=50)
+        familia = Familia.objects.create(codigo='01', nombre='Madera')
+        modelo = ModeloProducto.objects.create(codigo='MARTINA', nombre='Martina', tipo='MATERIA')
+        MateriaPrima.objects.create(familia=familia, modelo=modelo, nombre='Tablero', unidad_medida='M2',
+                                    stock_actual=1, stock_minimo=2, precio_unitario='2.50')
+        for i in range(3):
+            pedido = crear_pedido(self.cliente, f'2026-{i:04d}')
+            LineaPedido.objects.create(pedido=pedido, producto=self.silla, cantidad=i + 1, precio_unitario=10)
+        self.pedido = pedido
+
+    def stats(self, consultas):
+        with self.assertNumQueries(consultas):
+            return self.client.get('/api/dashboard/stats/').data
+
+    def test_cifras(self):
+        data = self.stats(2)
+        self.assertEqual(data['clientes'], {'total': 1, 'activos': 1})
+        self.assertEqual(data['productos'], {'total': 2, 'bajo_stock': 1})
+        self.assertEqual(data['materias_primas'], {'total': 1, 'bajo_stock': 1})
+        self.assertEqual((data['pedidos']['total'], data['pedidos']['pendientes']), (3, 3))
+        self.assertEqual(data['pedidos']['por_estado'][0],
+                         {'estado': 'pendiente', 'nombre': 'Pendiente', 'cantidad': 3, 'importe': '60.00'})
+
+    def test_cache_hasta_la_siguiente_escritura(self):
+        self.stats(2)
+        self.assertEqual(self.stats(1)['pedidos']['pendientes'], 3)
+
+        LineaPedido.objects.filter(pedido=self.pedido).update(cantidad=10, subtotal=100)
+        Pedido.objects.filter(pk=self.pedido.pk).update(estado='en_produccion')
+        data = self.stats(2)
+        self.assertEqual(
+            [(fila['estado'], fila['cantidad'], fila['importe']) for fila in data['pedidos']['por_estado'][:2]],
+            [('pendiente', 2, '30.00'), ('en_produccion', 1, '100.00')],
+        )
+
+    def test_consultas_constantes(self):
+        Cliente.objects.bulk_create(
+            Cliente(nombre=f'Cliente {i}', contacto='-', email='c@example.com', telefono='0', nif_cif=f'X{i:07d}')
+            for i in range(50)
+        )
+        self.assertEqual(self.stats(2)['clientes']['total'], 51)
+
+
+# ========================================
+# PLAZOS DE ENTREGA
+# ========================================
+
+class PlazoEntregaTests(TestCase):
+    """Carga del taller por fecha de entrega y primera fecha que se puede prometer"""
+
+    # Lunes; el taller trabaja 8 horas de lunes a viernes
+    LUNES = date(2026, 10, 19)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.cliente = crear_cliente()
+        self.silla = Producto.objects.create(codigo='P-001', nombre='Silla', stock_minimo=0, precio_venta=10,
+                                             tiempo_fabricacion=2)
+        self.mesa = Producto.objects.create(codigo='P-002', nombre='Mesa', stock_minimo=0, precio_venta=50,
+                                            tiempo_fabricacion=5)
+        # 10 horas con entrega el miércoles
+        self.pedido = Pedido.objects.create(numero_pedido='2026-0001', cliente=self.cliente,
+                                            fecha_entrega_estimada=date(2026, 10, 21))
+        self.linea = LineaPedido.objects.create(pedido=self.pedido, producto=self.silla, cantidad=5,
+                                                precio_unitario=10)
+
+    def carga(self):
+        return dict(CargaTaller.objects.order_by().values('fecha').annotate(total=Sum('horas'))
+                    .exclude(total=0).values_list('fecha', 'total'))
+
+    def test_carga_mantenida(self):
+        self.assertEqual(self.carga(), {date(2026, 10, 21): 10})
+        LineaPedido.objects.create(pedido=self.pedido, producto=self.mesa, cantidad=1, precio_unitario=50)
+        self.assertEqual(self.carga(), {date(2026, 10, 21): 15})
+        Producto.objects.filter(pk=self.silla.pk).update(tiempo_fabricacion=3)
+        self.assertEqual(self.carga(), {date(2026, 10, 21): 20})
+        Pedido.objects.filter(pk=self.pedido.pk).update(fecha_entrega_estimada=date(2026, 10, 23))
+        self.assertEqual(self.carga(), {date(2026, 10, 23): 20})
+        self.linea.delete()
+        self.assertEqual(self.carga(), {date(2026, 10, 23): 5})
+        Pedido.objects.filter(pk=self.pedido.pk).update(estado='cancelado')
+        self.assertEqual(self.carga(), {})
+        self.assertEqual(recalcular_carga(), 0)
+
+    def test_recalcular_carga_repara(self):
+        CargaTaller.objects.update(horas=0)
+        self.assertEqual(recalcular_carga(), 1)
+        self.assertEqual(self.carga(), {date(2026, 10, 21): 10})
+        self.assertEqual(recalcular_carga(), 0)
+
+    def test_fecha_segun_capacidad_y_carga(self):
+        # Holgura acumulada: lunes 8, martes 16, miércoles 24 - 10 = 14, jueves 22
+        self.assertEqual(fecha_entrega_posible(8, desde=self.LUNES), date(2026, 10, 19))
+        self.assertEqual(fecha_entrega_posible(10, desde=self.LUNES), date(2026, 10, 20))
+        # El martes tendría 16 horas, pero quitarlas dejaría sin hacer el pedido del miércoles
+        self.assertEqual(fecha_entrega_posible(15, desde=self.LUNES), date(2026, 10, 22))
+        # El fin de semana no suma: 40 + 10 horas no caben hasta el martes siguiente
+        self.assertEqual(fecha_entrega_posible(40, desde=self.LUNES), date(2026, 10, 27))
+
+    def test_calendario_del_taller(self):
+        CapacidadTaller.objects.create(fecha=date(2026, 10, 22), horas=0, motivo='Fiesta local')
+        CapacidadTaller.objects.create(fecha=date(2026, 10, 24), horas=8, motivo='Sábado de recuperación')
+        self.assertEqual(fecha_entrega_posible(15, desde=self.LUNES), date(2026, 10, 23))
+        self.assertEqual(fecha_entrega_posible(30, desde=self.LUNES), date(2026, 10, 24))
+
+    def test_atrasados_cuentan_el_primer_dia(self):
+        atrasado = Pedido.objects.create(numero_pedido='2026-0002', cliente=self.cliente,
+                                         fecha_entrega_estimada=date(2026, 10, 1))
+        LineaPedido.objects.create(pedido=atrasado, producto=self.silla, cantidad=4, precio_unitario=10)
+        self.assertEqual(fecha_entrega_posible(1, desde=self.LUNES), date(2026, 10, 20))
+
+    def test_excluir_pedido(self):
+        self.assertEqual(fecha_entrega_posible(15, desde=self.LUNES, excluir_pedido=self.pedido.pk),
+                         date(2026, 10, 20))
+
+    def test_sin_capacidad_en_el_horizonte(self):
+        with override_settings(TALLER={'HORIZONTE_DIAS': 30}):
+            with self.assertRaises(PlazoEntregaError):
+                fecha_entrega_posible(10000, desde=self.LUNES)
+
+    def test_consultas_constantes(self):
+        for i in range(20):
+            pedido = Pedido.objects.create(numero_pedido=f'2026-1{i:03d}', cliente=self.cliente,
+                                           fecha_entrega_estimada=date(2026, 11, 1 + i))
+            LineaPedido.objects.create(pedido=pedido, producto=self.mesa, cantidad=1, precio_unitario=50)
+        with self.assertNumQueries(1):
+            fecha_entrega_posible(8, desde=self.LUNES)
+
+    def test_api(self):
+        response = self.client.post('/api/pedidos/plazo_entrega/', {
+            'lineas': [{'producto': self.silla.pk, 'cantidad': 3}, {'producto': self.mesa.pk, 'cantidad': 2}],
+            'pedido': self.pedido.pk,
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['horas'], 16)
+        self.assertGreater(response.data['fecha_entrega'], timezone.localdate())
+
+        response = self.client.post('/api/pedidos/plazo_entrega/', {
+            'lineas': [{'producto': 999999, 'cantidad': 1}],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('999999', response.data['error'])
+
+        response = self.client.post('/api/pedidos/plazo_entrega/', {'lineas': [{'cantidad': 0}]}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class CargaTallerConcurrenciaTests(TransactionTestCase):
+    """Pedidos con la misma fecha de entrega dados de alta a la vez"""
+
+    def test_misma_fecha_de_entrega_no_espera_por_la_carga(self):
+        cliente = crear_cliente()
+        silla = Producto.objects.create(codigo='P-001', nombre='Silla', stock_minimo=0, precio_venta=10,
+                                        tiempo_fabricacion=2)
+
+        def alta(numero):
+            pedido = crear_pedido(cliente, numero)
+            LineaPedido.objects.create(pedido=pedido, producto=silla, cantidad=1, precio_unitario=10)
+
+        # Con una fila por fecha de entrega la segunda alta esperaría al commit de la primera
+        escribir_a_la_vez(self, lambda: alta('2026-0001'), lambda: alta('2026-0002'))
+        self.assertEqual(CargaTaller.objects.filter(fecha=date(2026, 12, 1)).aggregate(horas=Sum('horas')),
+                         {'horas': 4})
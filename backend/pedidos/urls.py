@@ -1,9 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import PedidoViewSet, LineaPedidoViewSet
+from .views import PedidoViewSet, LineaPedidoViewSet, CapacidadTallerViewSet, DashboardStatsView
 
 router = DefaultRouter()
 router.register(r'pedidos', PedidoViewSet)
 router.register(r'lineas-pedido', LineaPedidoViewSet)
+router.register(r'capacidad-taller', CapacidadTallerViewSet)
 
-urlpatterns = router.urls
\ No newline at end of file
+urlpatterns = router.urls + [
+    path('dashboard/stats/', DashboardStatsView.as_view(), name='dashboard-stats'),
+]
\ No newline at end of file
@@ -1,23 +1,82 @@
+from datetime import datetime, time, timedelta
+
 from rest_framework.permissions import AllowAny
-from rest_framework import viewsets, filters
+from rest_framework import viewsets, filters, status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from .models import Pedido, LineaPedido
-from .serializers import PedidoListSerializer, PedidoDetailSerializer, LineaPedidoSerializer
+from rest_framework.views import APIView
+from .models import Pedido, LineaPedido, CapacidadTaller
+from .serializers import (
+    PedidoListSerializer, PedidoDetailSerializer, PedidoEscrituraSerializer, LineaPedidoSueltaSerializer,
+    LineaPedidoEscrituraSerializer, CapacidadTallerSerializer,
+)
+from comun.exports import exportar_listado
+from comun.pagination import PaginacionCursor
+from comun.condicional import ListadoCondicionalMixin
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from clientes.models import Cliente
+from .services import (
+    reservar_pedido, liberar_reservas, resincronizar_reservas, disponible_para_prometer, ReservaError,
+    cambiar_estado, pedidos_por_estado, TransicionError,
+    resumen_ventas, AGRUPACIONES_VENTAS, PERIODOS_VENTAS, ORDENES_VENTAS, estadisticas_dashboard,
+    horas_fabricacion, fecha_entrega_posible, PlazoEntregaError,
+)
+from .signals import pedidos_cambiados
+
+# Columnas de exportación: (nombre en el archivo, campo)
+COLUMNAS_EXPORTACION_PEDIDOS = [
+    ('id', 'id'),
+    ('numero_pedido', 'numero_pedido'),
+    ('cliente', 'cliente_id'),
+    ('cliente_nombre', 'cliente_nombre'),
+    ('fecha_pedido', 'fecha_pedido'),
+    ('fecha_entrega_estimada', 'fecha_entrega_estimada'),
+    ('estado', 'estado'),
+    ('total', 'total'),
+]
+COLUMNAS_EXPORTACION_LINEAS = [
+    ('id', 'id'),
+    ('pedido', 'pedido_id'),
+    ('numero_pedido', 'pedido__numero_pedido'),
+    ('producto', 'producto_id'),
+    ('producto_codigo', 'producto__codigo'),
+    ('producto_nombre', 'producto__nombre'),
+    ('cantidad', 'cantidad'),
+    ('precio_unitario', 'precio_unitario'),
+    ('subtotal', 'subtotal'),
+]
 
-class PedidoViewSet(viewsets.ModelViewSet):
+class PedidoViewSet(ListadoCondicionalMixin, viewsets.ModelViewSet):
     queryset = Pedido.objects.all()
     permission_classes = [AllowAny]
+    pagination_class = PaginacionCursor
+    modelos_version = [Pedido, Cliente]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ['numero_pedido', 'cliente__nombre']
+    search_fields = ['numero_pedido', 'cliente_nombre']
     ordering_fields = ['fecha_pedido', 'fecha_entrega_estimada', 'estado']
     ordering = ['-fecha_pedido']
     
+    def get_queryset(self):
+        """El detalle carga cliente y líneas con sus productos en consultas fijas"""
+        queryset = super().get_queryset()
+        if self.action == 'retrieve':
+            queryset = queryset.select_related('cliente').prefetch_related(
+                Prefetch('lineas', queryset=LineaPedido.objects.select_related('producto'))
+            )
+        return queryset
+    
     def get_serializer_class(self):
         """Use different serializers for list and detail views"""
         if self.action == 'retrieve':
             return PedidoDetailSerializer
+        if self.action in ('create', 'update', 'partial_update'):
+            # Cabecera y líneas en una sola petición
+            return PedidoEscrituraSerializer
         return PedidoListSerializer
     
     @action(detail=False, methods=['get'])
@@ -29,8 +88,240 @@ class PedidoViewSet(viewsets.ModelViewSet):
             serializer = self.get_serializer(pedidos, many=True)
             return Response(serializer.data)
         return Response({'error': 'Parámetro estado requerido'}, status=400)
+    
+    @action(detail=False, methods=['post'])
+    def cambiar_estado(self, request):
+        """
+        Cambia el estado de muchos pedidos a la vez:
+        {"ids": [1, 2, ...], "estado": "en_produccion", "parcial": false}.
+        Si alguno no admite el cambio responde 400 y no cambia ninguno,
+        salvo con "parcial": true, que cambia los válidos.
+        """
+        datos = request.data if isinstance(request.data, dict) else {}
+        try:
+            resultado = cambiar_estado(datos.get('ids'), datos.get('estado'), parcial=bool(datos.get('parcial')))
+        except TransicionError as e:
+            return Response(
+                {'error': str(e), 'rechazados': e.rechazados, 'no_encontrados': e.no_encontrados},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response({'estado': datos['estado'], **resultado})
+    
+    @action(detail=False, methods=['get'])
+    def estados(self, request):
+        """
+        Pedidos en cada estado y estados a los que se puede pasar. Con
+        ?desde=AAAA-MM-DD[THH:MM] añade los pedidos que han entrado en cada
+        estado desde entonces.
+        """
+        desde = None
+        if request.query_params.get('desde'):
+            valor = request.query_params['desde']
+            try:
+                desde = parse_datetime(valor) or parse_date(valor)
+            except ValueError:
+                desde = None
+            if desde is None:
+                return Response({'error': 'Fecha no válida, use AAAA-MM-DD'}, status=400)
+            if not isinstance(desde, datetime):
+                desde = datetime.combine(desde, time.min)
+            if timezone.is_naive(desde):
+                desde = timezone.make_aware(desde)
+        return Response(pedidos_por_estado(desde))
+    
+    @action(detail=False, methods=['post'])
+    def plazo_entrega(self, request):
+        """
+        Primera fecha de entrega que el taller puede cumplir para unas líneas,
+        según su tiempo de fabricación, la carga de los pedidos abiertos y el
+        calendario del taller: {"lineas": [{"producto": 1, "cantidad": 2}],
+        "pedido": id}. Con "pedido" (al modificar uno existente) no se cuenta
+        su propia carga.
+        """
+        datos = request.data if isinstance(request.data, dict) else {}
+        lineas = LineaPedidoEscrituraSerializer(data=datos.get('lineas'), many=True)
+        if not lineas.is_valid():
+            return Response({'error': 'Líneas no válidas', 'lineas': lineas.errors}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            excluir = int(datos['pedido']) if datos.get('pedido') else None
+        except (TypeError, ValueError):
+            return Response({'error': 'pedido debe ser un id'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            horas = horas_fabricacion(lineas.validated_data)
+            fecha = fecha_entrega_posible(horas, excluir_pedido=excluir)
+        except PlazoEntregaError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'fecha_entrega': fecha, 'horas': horas})
+    
+    @action(detail=False, methods=['get'])
+    def ventas(self, request):
+        """
+        Ventas por fecha del pedido, leídas de ventas_diarias:
+        ?desde=&hasta=AAAA-MM-DD (por defecto el último año),
+        ?agrupar=producto|modelo|cliente|estado, ?periodo=dia|semana|mes|anio|total,
+        ?estados=pendiente,entregado (por defecto todos menos cancelado),
+        ?orden=importe|unidades|lineas y ?limite=N (los N grupos con más ventas de
+        cada periodo)
+        """
+        params = request.query_params
+        hasta = timezone.localdate()
+        desde = hasta - timedelta(days=365)
+        try:
+            if params.get('desde'):
+                desde = parse_date(params['desde'])
+            if params.get('hasta'):
+                hasta = parse_date(params['hasta'])
+        except ValueError:
+            desde = hasta = None
+        if desde is None or hasta is None:
+            return Response({'error': 'Fecha no válida, use AAAA-MM-DD'}, status=400)
+
+        agrupar = params.get('agrupar') or None
+        periodo = params.get('periodo', 'total')
+        orden = params.get('orden', 'importe')
+        if agrupar is not None and agrupar not in AGRUPACIONES_VENTAS:
+            return Response({'error': f"agrupar debe ser uno de: {', '.join(AGRUPACIONES_VENTAS)}"}, status=400)
+        if periodo not in PERIODOS_VENTAS:
+            return Response({'error': f"periodo debe ser uno de: {', '.join(PERIODOS_VENTAS)}"}, status=400)
+        if orden not in ORDENES_VENTAS:
+            return Response({'error': f"orden debe ser uno de: {', '.join(ORDENES_VENTAS)}"}, status=400)
+
+        estados = None
+        if params.get('estados'):
+            estados = [estado.strip() for estado in params['estados'].split(',') if estado.strip()]
+            desconocidos = sorted(set(estados) - {estado for estado, _ in Pedido.ESTADOS})
+            if desconocidos:
+                return Response({'error': f"Estados desconocidos: {', '.join(desconocidos)}"}, status=400)
+        limite = None
+        if params.get('limite'):
+            try:
+                limite = int(params['limite'])
+            except ValueError:
+                return Response({'error': 'limite debe ser un número'}, status=400)
+            if limite < 1:
+                return Response({'error': 'limite debe ser al menos 1'}, status=400)
+
+        return Response({
+            'desde': desde,
+            'hasta': hasta,
+            'resultados': resumen_ventas(desde, hasta, agrupar, periodo, estados, orden, limite),
+        })
+    
+    @action(detail=False, methods=['get'])
+    def exportar(self, request):
+        """Exporta los pedidos en streaming (?formato=csv|ndjson, ?gzip=true)"""
+        return exportar_listado(self, COLUMNAS_EXPORTACION_PEDIDOS, 'pedidos')
+    
+    @action(detail=True, methods=['post'])
+    def reservar(self, request, pk=None):
+        """
+        Confirma el pedido reservando el stock de sus líneas. Si falta stock
+        responde 400 con los "faltantes", salvo con {"forzar": true}.
+        """
+        pedido = self.get_object()
+        forzar = isinstance(request.data, dict) and bool(request.data.get('forzar'))
+        try:
+            faltantes = reservar_pedido(pedido.id, forzar=forzar)
+        except ReservaError as e:
+            return Response({'error': str(e), 'faltantes': e.faltantes}, status=status.HTTP_400_BAD_REQUEST)
+        reservas = pedido.reservas.order_by('producto_id').values('producto', 'fecha', 'cantidad')
+        return Response({'reservas': list(reservas), 'faltantes': faltantes})
+    
+    @action(detail=True, methods=['post'])
+    def liberar(self, request, pk=None):
+        """Libera las reservas de stock del pedido"""
+        return Response({'liberadas': liberar_reservas([self.get_object().id])})
+    
+    @action(detail=False, methods=['get'])
+    def disponibilidad(self, request):
+        """
+        Disponible para prometer por producto (?fecha=AAAA-MM-DD, por defecto
+        hoy; ?productos=1,2,3, por defecto los activos)
+        """
+        fecha = timezone.localdate()
+        if request.query_params.get('fecha'):
+            try:
+                fecha = parse_date(request.query_params['fecha'])
+            except ValueError:
+                fecha = None
+            if fecha is None:
+                return Response({'error': 'Fecha no válida, use AAAA-MM-DD'}, status=400)
+        productos = None
+        if request.query_params.get('productos'):
+            try:
+                productos = [int(p) for p in request.query_params['productos'].split(',')]
+            except ValueError:
+                return Response({'error': 'productos debe ser una lista de ids'}, status=400)
+        return Response({'fecha': fecha, 'productos': disponible_para_prometer(fecha, productos)})
 
 class LineaPedidoViewSet(viewsets.ModelViewSet):
+    """
+    Líneas sueltas. Si el pedido tiene reservas se vuelven a reservar en la
+    misma transacción; sin stock suficiente responde 400 con los "faltantes".
+    Los pedidos tocados se notifican con pedidos_cambiados (p. ej. para
+    planificarlos de nuevo).
+    """
     queryset = LineaPedido.objects.all()
-    serializer_class = LineaPedidoSerializer
-    permission_classes = [IsAuthenticated]
\ No newline at end of file
+    serializer_class = LineaPedidoSueltaSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            linea = serializer.save()
+            self._resincronizar([linea.pedido_id])
+    
+    def perform_update(self, serializer):
+        anterior = serializer.instance.pedido_id
+        with transaction.atomic():
+            linea = serializer.save()
+            self._resincronizar([anterior, linea.pedido_id])
+    
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            self._resincronizar([instance.pedido_id])
+    
+    def _resincronizar(self, pedido_ids):
+        try:
+            resincronizar_reservas(pedido_ids)
+        except ReservaError as e:
+            raise ValidationError({'error': str(e), 'faltantes': e.faltantes})
+        pedidos_cambiados.send(sender=Pedido, pedido_ids=pedido_ids)
+    
+    @action(detail=False, methods=['get'])
+    def exportar(self, request):
+        """Exporta las líneas de pedido en streaming (?formato=csv|ndjson, ?gzip=true)"""
+        return exportar_listado(self, COLUMNAS_EXPORTACION_LINEAS, 'lineas_pedido')
+
+class CapacidadTallerViewSet(viewsets.ModelViewSet):
+    """
+    Calendario del taller: días con una capacidad distinta de la habitual
+    (?desde=&hasta=AAAA-MM-DD para filtrar)
+    """
+    queryset = CapacidadTaller.objects.all()
+    serializer_class = CapacidadTallerSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        for parametro, filtro in (('desde', 'fecha__gte'), ('hasta', 'fecha__lte')):
+            valor = self.request.query_params.get(parametro)
+            if valor:
+                try:
+                    fecha = parse_date(valor)
+                except ValueError:
+                    fecha = None
+                if fecha is not None:
+                    queryset = queryset.filter(**{filtro: fecha})
+        return queryset
+
+class DashboardStatsView(APIView):
+    """
+    GET /api/dashboard/stats/ - Clientes, productos y materias primas (con los
+    que están bajo mínimos) y pedidos por estado con su importe, de una sola
+    consulta a los contadores y guardado en caché unos segundos
+    """
+    permission_classes = [AllowAny]
+    
+    def get(self, request):
+        return Response(estadisticas_dashboard())
@@ -1,3 +1,38 @@
 from django.contrib import admin
+from .models import ComponenteProducto, OrdenTrabajo, PlanProduccion, PuestoTrabajo
 
-# Register your models here.
+
+@admin.register(ComponenteProducto)
+class ComponenteProductoAdmin(admin.ModelAdmin):
+    list_display = ('producto', 'materia_prima', 'cantidad', 'merma')
+    search_fields = ('producto__codigo', 'producto__nombre', 'materia_prima__codigo', 'materia_prima__nombre')
+    autocomplete_fields = ('producto', 'materia_prima')
+    list_select_related = ('producto', 'materia_prima')
+
+
+
+@admin.register(PuestoTrabajo)
+class PuestoTrabajoAdmin(admin.ModelAdmin):
+    list_display = ('codigo', 'nombre', 'horas_dia', 'activo')
+    list_filter = ('activo',)
+    search_fields = ('codigo', 'nombre')
+
+
+@admin.register(PlanProduccion)
+class PlanProduccionAdmin(admin.ModelAdmin):
+    list_display = ('inicio', 'replanificado')
+
+
+@admin.register(OrdenTrabajo)
+class OrdenTrabajoAdmin(admin.ModelAdmin):
+    """Solo lectura: el plan lo escriben services.replanificar y planificar_pedidos"""
+    list_display = ('pedido', 'producto', 'puesto', 'fecha_entrega', 'horas', 'duracion')
+    list_filter = ('puesto',)
+    search_fields = ('pedido__numero_pedido', 'producto__codigo')
+    list_select_related = ('pedido', 'producto', 'puesto')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class ProduccionConfig(AppConfig):
     name = 'produccion'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,132 @@
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import ROUND_CEILING, Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from clientes.models import Cliente
+from pedidos.models import LineaPedido, Pedido
+from pedidos.services import ESTADOS_CON_CARGA
+from produccion.models import ComponenteProducto
+from produccion.services import necesidades_materiales
+from stock.models import Familia, MateriaPrima, ModeloProducto, Producto
+
+
+class _Rollback(Exception):
+    """Fuerza el rollback de los datos de prueba"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide la explosión de la lista de materiales sobre las líneas de los "
+        "pedidos abiertos: una sentencia SQL frente a recorrer las líneas en "
+        "Python. Los datos de prueba se descartan al terminar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lineas', type=int, default=100000,
+                            help='Líneas de pedido abiertas a crear')
+        parser.add_argument('--productos', type=int, default=1000,
+                            help='Productos con lista de materiales')
+        parser.add_argument('--componentes', type=int, default=10,
+                            help='Materias primas por producto')
+        parser.add_argument('--materias', type=int, default=2000)
+        parser.add_argument('--repeticiones', type=int, default=3)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                inicio = time.perf_counter()
+                self._crear_datos(options)
+                self.stdout.write(f"Datos de prueba: {time.perf_counter() - inicio:.1f} s")
+
+                casos = [
+                    ('sql', lambda: necesidades_materiales()),
+                    ('python por línea', self._por_linea),
+                ]
+                self.stdout.write(f"{'modo':>18} | {'ms':>8} | {'materiales':>10}")
+                resultados = {}
+                for nombre, funcion in casos:
+                    ms, resultados[nombre] = self._medir(funcion, options['repeticiones'])
+                    self.stdout.write(f"{nombre:>18} | {ms:>8.1f} | {len(resultados[nombre]):>10}")
+                iguales = (
+                    {fila['id']: fila['bruto'] for fila in resultados['sql']}
+                    == {fila['id']: fila['bruto'] for fila in resultados['python por línea']}
+                )
+                self.stdout.write(f"Mismo resultado: {'sí' if iguales else 'NO'}")
+                raise _Rollback()
+        except _Rollback:
+            pass
+
+    def _crear_datos(self, options):
+        familia = Familia.objects.create(codigo='ZZ', nombre='Bench')
+        modelo = ModeloProducto.objects.create(codigo='BENCH', nombre='Bench', tipo='MATERIA')
+        materias = MateriaPrima.objects.bulk_create(
+            (MateriaPrima(codigo=f'BENCH-{i:06d}', familia=familia, modelo=modelo,
+                          nombre=f'Material {i}', stock_actual=i % 500, stock_minimo=10,
+                          precio_unitario='2.50', unidad_medida='M')
+             for i in range(options['materias'])),
+            batch_size=5000,
+        )
+        productos = Producto.objects.bulk_create(
+            (Producto(codigo=f'BENCH-{i:06d}', nombre=f'Producto {i}', stock_actual=i % 3,
+                      stock_minimo=0, precio_venta='100.00', tiempo_fabricacion=1)
+             for i in range(options['productos'])),
+            batch_size=5000,
+        )
+        ComponenteProducto.objects.bulk_create(
+            (ComponenteProducto(producto=producto, materia_prima=materias[(i * 7 + j * 13) % len(materias)],
+                                cantidad=Decimal(j + 1) / 4, merma=j % 5)
+             for i, producto in enumerate(productos) for j in range(options['componentes'])),
+            batch_size=10000,
+            ignore_conflicts=True,
+        )
+        cliente = Cliente.objects.create(nombre='Bench', contacto='-', email='bench@example.com',
+                                         telefono='0', nif_cif='BENCH0001')
+        lineas_por_pedido = 10
+        pedidos = Pedido.objects.bulk_create(
+            (Pedido(numero_pedido=f'BENCH-{i:07d}', cliente=cliente,
+                    fecha_entrega_estimada=date.today() + timedelta(days=i % 90),
+                    estado=ESTADOS_CON_CARGA[i % len(ESTADOS_CON_CARGA)])
+             for i in range(options['lineas'] // lineas_por_pedido + 1)),
+            batch_size=5000,
+        )
+        LineaPedido.objects.bulk_create(
+            (LineaPedido(pedido=pedidos[i // lineas_por_pedido], producto=productos[i % len(productos)],
+                         cantidad=i % 4 + 1, precio_unitario='100.00', subtotal=Decimal(100 * (i % 4 + 1)))
+             for i in range(options['lineas'])),
+            batch_size=10000,
+        )
+
+    def _por_linea(self):
+        """La misma explosión recorriendo las líneas una a una"""
+        componentes = defaultdict(list)
+        for producto, materia, cantidad, merma in ComponenteProducto.objects.values_list(
+                'producto_id', 'materia_prima_id', 'cantidad', 'merma'):
+            componentes[producto].append((materia, cantidad * (1 + merma / 100)))
+        demanda = defaultdict(int)
+        for producto, cantidad in LineaPedido.objects.filter(
+                pedido__estado__in=ESTADOS_CON_CARGA).values_list('producto_id', 'cantidad').iterator():
+            demanda[producto] += cantidad
+        stock = dict(Producto.objects.filter(id__in=demanda).values_list('id', 'stock_actual'))
+        bruto = defaultdict(Decimal)
+        for producto, unidades in demanda.items():
+            fabricar = max(unidades - max(stock[producto], 0), 0)
+            for materia, por_unidad in componentes[producto]:
+                bruto[materia] += fabricar * por_unidad
+        centimo = Decimal('0.01')
+        return [
+            {'id': materia, 'bruto': valor.quantize(centimo, rounding=ROUND_CEILING)}
+            for materia, valor in bruto.items() if valor > 0
+        ]
+
+    def _medir(self, funcion, repeticiones):
+        """Mejor tiempo en milisegundos y el último resultado"""
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            resultado = funcion()
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        return min(tiempos), resultado
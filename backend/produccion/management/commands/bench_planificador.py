@@ -0,0 +1,90 @@
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from clientes.models import Cliente
+from pedidos.models import LineaPedido, Pedido
+from produccion.models import PuestoTrabajo
+from produccion.services import planificar_pedidos, replanificar
+from stock.models import Producto
+
+
+class _Rollback(Exception):
+    """Fuerza el rollback de los datos de prueba"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide la latencia del planificador con 1.000, 10.000 y 100.000 órdenes de "
+        "trabajo: reconstrucción completa frente a insertar o retirar un pedido. "
+        "Los datos de prueba se descartan al terminar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ordenes', type=int, nargs='+', default=[1000, 10000, 100000])
+        parser.add_argument('--puestos', type=int, default=10)
+        parser.add_argument('--lineas', type=int, default=5, help='Líneas por pedido')
+        parser.add_argument('--cambios', type=int, default=20,
+                            help='Pedidos insertados y retirados en cada medida')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'órdenes':>8} | {'replanificar ms':>15} | {'insertar ms':>11} | {'retirar ms':>10}")
+        for ordenes in options['ordenes']:
+            try:
+                with transaction.atomic():
+                    cambios = self._crear_datos(ordenes, options)
+                    completo = self._medir(replanificar)
+                    insertar, retirar = [], []
+                    for pedido in cambios:
+                        Pedido.objects.filter(pk=pedido).update(estado='en_produccion')
+                        insertar.append(self._medir(lambda: planificar_pedidos([pedido])))
+                        Pedido.objects.filter(pk=pedido).update(estado='pendiente')
+                        retirar.append(self._medir(lambda: planificar_pedidos([pedido])))
+                    self.stdout.write(
+                        f"{ordenes:>8} | {completo:>15.1f} | {statistics.median(insertar):>11.1f} | "
+                        f"{statistics.median(retirar):>10.1f}"
+                    )
+                    raise _Rollback()
+            except _Rollback:
+                pass
+
+    def _crear_datos(self, ordenes, options):
+        """Pedidos en producción con `ordenes` líneas y pedidos pendientes para insertar"""
+        aleatorio = random.Random(ordenes)
+        PuestoTrabajo.objects.bulk_create(
+            PuestoTrabajo(codigo=f'BENCH-{i:03d}', nombre=f'Puesto {i}', horas_dia=(8, 8, 16, 4)[i % 4])
+            for i in range(options['puestos'])
+        )
+        productos = Producto.objects.bulk_create(
+            Producto(codigo=f'BENCH-{i:04d}', nombre=f'Producto {i}', stock_minimo=0, precio_venta='10.00',
+                     tiempo_fabricacion=i % 8 + 1)
+            for i in range(200)
+        )
+        cliente = Cliente.objects.create(nombre='Bench', contacto='-', email='bench@example.com',
+                                         telefono='0', nif_cif='BENCH0001')
+        lineas = options['lineas']
+        pedidos = ordenes // lineas + options['cambios']
+        creados = Pedido.objects.bulk_create(
+            (Pedido(numero_pedido=f'BENCH-{i:07d}', cliente=cliente,
+                    fecha_entrega_estimada=date(2026, 11, 2) + timedelta(days=aleatorio.randrange(365)),
+                    estado='en_produccion' if i >= options['cambios'] else 'pendiente')
+             for i in range(pedidos)),
+            batch_size=5000,
+        )
+        LineaPedido.objects.bulk_create(
+            (LineaPedido(pedido=pedido, producto=aleatorio.choice(productos), cantidad=aleatorio.randint(1, 3),
+                         precio_unitario='10.00', subtotal=Decimal('10.00'))
+             for pedido in creados for _ in range(lineas)),
+            batch_size=10000,
+        )
+        return [pedido.pk for pedido in creados[:options['cambios']]]
+
+    def _medir(self, funcion):
+        inicio = time.perf_counter()
+        funcion()
+        return (time.perf_counter() - inicio) * 1000
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from produccion.services import PlanificacionError, replanificar
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye el plan de producción: reparte las líneas de los pedidos en "
+        "producción entre los puestos activos desde mañana (o --inicio). "
+        "Conviene ejecutarlo cada noche para rehacer el reparto y mover el "
+        "origen del plan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--inicio', help='Primer día del plan (AAAA-MM-DD)')
+
+    def handle(self, *args, **options):
+        inicio = None
+        if options['inicio']:
+            try:
+                inicio = parse_date(options['inicio'])
+            except ValueError:
+                inicio = None
+            if inicio is None:
+                raise CommandError("Fecha no válida (AAAA-MM-DD)")
+        try:
+            resultado = replanificar(inicio)
+        except PlanificacionError as e:
+            raise CommandError(str(e))
+        self.stdout.write(
+            f"{resultado['ordenes']} órdenes en {resultado['puestos']} puestos desde {resultado['inicio']}, "
+            f"{resultado['dias']} días laborables"
+        )
@@ -0,0 +1,35 @@
+# Generated by Django 6.0 on 2026-10-17 23:40
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('stock', '0013_propuestas_compra'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ComponenteProducto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.DecimalField(decimal_places=4, max_digits=12, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Cantidad por unidad')),
+                ('merma', models.DecimalField(decimal_places=2, default=0, help_text='Porcentaje', max_digits=5, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(100)], verbose_name='Merma')),
+                ('materia_prima', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='usos', to='stock.materiaprima', verbose_name='Materia prima')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='componentes', to='stock.producto', verbose_name='Producto')),
+            ],
+            options={
+                'verbose_name': 'Componente de producto',
+                'verbose_name_plural': 'Lista de materiales',
+                'db_table': 'componentes_producto',
+                'ordering': ['producto', 'materia_prima'],
+                'indexes': [models.Index(fields=['materia_prima', 'producto'], name='componente_materia_idx')],
+                'constraints': [models.UniqueConstraint(fields=('producto', 'materia_prima'), name='componente_producto_unico'), models.CheckConstraint(condition=models.Q(('cantidad__gte', 0)), name='componente_cantidad_positiva'), models.CheckConstraint(condition=models.Q(('merma__gte', 0), ('merma__lte', 100)), name='componente_merma_valida')],
+            },
+        ),
+    ]
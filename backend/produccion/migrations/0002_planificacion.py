@@ -0,0 +1,86 @@
+# Generated by Django 6.0 on 2026-10-18 00:05
+
+import django.core.validators
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0015_triggers_carga_taller'),
+        ('produccion', '0001_initial'),
+        ('stock', '0013_propuestas_compra'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlanProduccion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('inicio', models.DateField(verbose_name='Inicio del plan')),
+                ('replanificado', models.DateTimeField(blank=True, null=True, verbose_name='Última replanificación completa')),
+            ],
+            options={
+                'verbose_name': 'Plan de producción',
+                'verbose_name_plural': 'Plan de producción',
+                'db_table': 'plan_produccion',
+            },
+        ),
+        migrations.CreateModel(
+            name='PuestoTrabajo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('codigo', models.CharField(max_length=20, unique=True, verbose_name='Código')),
+                ('nombre', models.CharField(max_length=100, verbose_name='Nombre')),
+                ('horas_dia', models.DecimalField(decimal_places=2, default=8, max_digits=5, validators=[django.core.validators.MinValueValidator(Decimal('0.01')), django.core.validators.MaxValueValidator(24)], verbose_name='Horas por día')),
+                ('activo', models.BooleanField(default=True)),
+            ],
+            options={
+                'verbose_name': 'Puesto de trabajo',
+                'verbose_name_plural': 'Puestos de trabajo',
+                'db_table': 'puestos_trabajo',
+                'ordering': ['codigo'],
+                'constraints': [models.CheckConstraint(condition=models.Q(('horas_dia__gt', 0)), name='puesto_horas_positivas')],
+            },
+        ),
+        migrations.CreateModel(
+            name='OrdenTrabajo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_entrega', models.DateField(verbose_name='Fecha de entrega')),
+                ('horas', models.IntegerField(verbose_name='Horas de fabricación')),
+                ('duracion', models.DecimalField(decimal_places=4, max_digits=14, verbose_name='Duración (días)')),
+                ('desfase', models.DecimalField(decimal_places=4, max_digits=14, verbose_name='Inicio dentro de su cola (días)')),
+                ('linea', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='orden_trabajo', to='pedidos.lineapedido', verbose_name='Línea')),
+                ('pedido', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ordenes_trabajo', to='pedidos.pedido', verbose_name='Pedido')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='stock.producto', verbose_name='Producto')),
+                ('puesto', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='ordenes', to='produccion.puestotrabajo', verbose_name='Puesto')),
+            ],
+            options={
+                'verbose_name': 'Orden de trabajo',
+                'verbose_name_plural': 'Órdenes de trabajo',
+                'db_table': 'ordenes_trabajo',
+                'ordering': ['puesto', 'fecha_entrega', 'pedido_id', 'id'],
+                'indexes': [models.Index(fields=['puesto', 'fecha_entrega', 'pedido', 'id'], include=('duracion',), name='orden_puesto_prioridad_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ColaPuesto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_entrega', models.DateField(verbose_name='Fecha de entrega')),
+                ('inicio', models.DecimalField(decimal_places=4, max_digits=14, verbose_name='Inicio (días)')),
+                ('duracion', models.DecimalField(decimal_places=4, max_digits=14, verbose_name='Duración (días)')),
+                ('ordenes', models.IntegerField(verbose_name='Órdenes')),
+                ('puesto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='colas', to='produccion.puestotrabajo', verbose_name='Puesto')),
+            ],
+            options={
+                'verbose_name': 'Cola de puesto',
+                'verbose_name_plural': 'Colas de puesto',
+                'db_table': 'colas_puesto',
+                'constraints': [models.UniqueConstraint(fields=('puesto', 'fecha_entrega'), name='cola_puesto_fecha_unica')],
+            },
+        ),
+    ]
@@ -1,3 +1,152 @@
+from decimal import Decimal
+
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from pedidos.models import LineaPedido, Pedido
+from stock.models import MateriaPrima, Producto
+
+
+# ========================================
+# LISTA DE MATERIALES
+# ========================================
+
+class ComponenteProducto(models.Model):
+    """
+    Línea de la lista de materiales (escandallo) de un producto: cuánta
+    materia prima consume cada unidad fabricada. La merma es el porcentaje que
+    se pierde al fabricar, así que por unidad se necesitan
+    cantidad * (1 + merma / 100).
+    """
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='componentes',
+                                 verbose_name="Producto")
+    materia_prima = models.ForeignKey(MateriaPrima, on_delete=models.PROTECT, related_name='usos',
+                                      verbose_name="Materia prima")
+    cantidad = models.DecimalField(max_digits=12, decimal_places=4, validators=[MinValueValidator(0)],
+                                   verbose_name="Cantidad por unidad")
+    merma = models.DecimalField(max_digits=5, decimal_places=2, default=0,
+                                validators=[MinValueValidator(0), MaxValueValidator(100)],
+                                help_text="Porcentaje", verbose_name="Merma")
+    
+    class Meta:
+        db_table = 'componentes_producto'
+        verbose_name = 'Componente de producto'
+        verbose_name_plural = 'Lista de materiales'
+        ordering = ['producto', 'materia_prima']
+        constraints = [
+            models.UniqueConstraint(fields=['producto', 'materia_prima'], name='componente_producto_unico'),
+            models.CheckConstraint(condition=models.Q(cantidad__gte=0), name='componente_cantidad_positiva'),
+            models.CheckConstraint(condition=models.Q(merma__gte=0, merma__lte=100), name='componente_merma_valida'),
+        ]
+        indexes = [
+            # Dónde se usa cada materia prima
+            models.Index(fields=['materia_prima', 'producto'], name='componente_materia_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.producto_id} <- {self.materia_prima_id} x{self.cantidad}"
+
+
+# ========================================
+# PLANIFICACIÓN DE LA PRODUCCIÓN
+# ========================================
+
+class PuestoTrabajo(models.Model):
+    """Puesto de trabajo del taller y las horas que trabaja cada día laborable"""
+    codigo = models.CharField(max_length=20, unique=True, verbose_name="Código")
+    nombre = models.CharField(max_length=100, verbose_name="Nombre")
+    horas_dia = models.DecimalField(max_digits=5, decimal_places=2, default=8,
+                                    validators=[MinValueValidator(Decimal('0.01')), MaxValueValidator(24)],
+                                    verbose_name="Horas por día")
+    activo = models.BooleanField(default=True)
+    
+    class Meta:
+        db_table = 'puestos_trabajo'
+        verbose_name = 'Puesto de trabajo'
+        verbose_name_plural = 'Puestos de trabajo'
+        ordering = ['codigo']
+        constraints = [
+            models.CheckConstraint(condition=models.Q(horas_dia__gt=0), name='puesto_horas_positivas'),
+        ]
+    
+    def __str__(self):
+        return f"{self.codigo} - {self.nombre}"
+
+
+class PlanProduccion(models.Model):
+    """
+    Origen del plan (una sola fila): inicio y fin de las órdenes de trabajo se
+    cuentan en días laborables desde `inicio`, que se mueve al replanificar
+    """
+    inicio = models.DateField(verbose_name="Inicio del plan")
+    replanificado = models.DateTimeField(null=True, blank=True, verbose_name="Última replanificación completa")
+    
+    class Meta:
+        db_table = 'plan_produccion'
+        verbose_name = 'Plan de producción'
+        verbose_name_plural = 'Plan de producción'
+    
+    def __str__(self):
+        return f"Plan desde {self.inicio}"
+
+
+class ColaPuesto(models.Model):
+    """
+    Órdenes de trabajo de un puesto con una misma fecha de entrega. Las colas
+    de cada puesto van seguidas por fecha: inicio es la suma de las duraciones
+    de las anteriores. Así, al insertar o retirar una orden solo se mueven las
+    órdenes de su cola y el inicio de las colas posteriores, no cada orden.
+    """
+    puesto = models.ForeignKey(PuestoTrabajo, on_delete=models.CASCADE, related_name='colas',
+                               verbose_name="Puesto")
+    fecha_entrega = models.DateField(verbose_name="Fecha de entrega")
+    inicio = models.DecimalField(max_digits=14, decimal_places=4, verbose_name="Inicio (días)")
+    duracion = models.DecimalField(max_digits=14, decimal_places=4, verbose_name="Duración (días)")
+    ordenes = models.IntegerField(verbose_name="Órdenes")
+    
+    class Meta:
+        db_table = 'colas_puesto'
+        verbose_name = 'Cola de puesto'
+        verbose_name_plural = 'Colas de puesto'
+        constraints = [
+            models.UniqueConstraint(fields=['puesto', 'fecha_entrega'], name='cola_puesto_fecha_unica'),
+        ]
+    
+    def __str__(self):
+        return f"{self.puesto_id} {self.fecha_entrega}: {self.ordenes}"
+
 
-# Create your models here.
+class OrdenTrabajo(models.Model):
+    """
+    Fabricación de una línea de un pedido en producción en un puesto. Las
+    órdenes de cada puesto se ejecutan en orden de prioridad (fecha de
+    entrega, pedido, id) sin huecos. El inicio es el de su cola (ColaPuesto)
+    más `desfase`, en días laborables desde PlanProduccion.inicio; ver
+    services.anotar_plan. Las mantiene services.planificar_pedidos.
+    """
+    pedido = models.ForeignKey(Pedido, on_delete=models.CASCADE, related_name='ordenes_trabajo',
+                               verbose_name="Pedido")
+    # Si se borra la línea, la orden queda hasta que se vuelva a planificar el pedido
+    linea = models.OneToOneField(LineaPedido, on_delete=models.SET_NULL, null=True, blank=True,
+                                 related_name='orden_trabajo', verbose_name="Línea")
+    producto = models.ForeignKey(Producto, on_delete=models.PROTECT, verbose_name="Producto")
+    puesto = models.ForeignKey(PuestoTrabajo, on_delete=models.PROTECT, related_name='ordenes',
+                               verbose_name="Puesto")
+    fecha_entrega = models.DateField(verbose_name="Fecha de entrega")
+    horas = models.IntegerField(verbose_name="Horas de fabricación")
+    duracion = models.DecimalField(max_digits=14, decimal_places=4, verbose_name="Duración (días)")
+    desfase = models.DecimalField(max_digits=14, decimal_places=4, verbose_name="Inicio dentro de su cola (días)")
+    
+    class Meta:
+        db_table = 'ordenes_trabajo'
+        verbose_name = 'Orden de trabajo'
+        verbose_name_plural = 'Órdenes de trabajo'
+        ordering = ['puesto', 'fecha_entrega', 'pedido_id', 'id']
+        indexes = [
+            # Cola de cada puesto por prioridad: lo que ocupan las órdenes
+            # anteriores de la misma cola se lee del índice
+            models.Index(fields=['puesto', 'fecha_entrega', 'pedido', 'id'], include=['duracion'],
+                         name='orden_puesto_prioridad_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.pedido_id}/{self.producto_id} en {self.puesto_id}"
@@ -0,0 +1,53 @@
+from rest_framework import serializers
+from .models import ComponenteProducto, OrdenTrabajo, PuestoTrabajo
+
+
+class ComponenteProductoSerializer(serializers.ModelSerializer):
+    producto_codigo = serializers.CharField(source='producto.codigo', read_only=True)
+    materia_prima_codigo = serializers.CharField(source='materia_prima.codigo', read_only=True)
+    materia_prima_nombre = serializers.CharField(source='materia_prima.nombre', read_only=True)
+    unidad_medida = serializers.CharField(source='materia_prima.unidad_medida', read_only=True)
+    
+    class Meta:
+        model = ComponenteProducto
+        fields = [
+            'id', 'producto', 'producto_codigo', 'materia_prima', 'materia_prima_codigo',
+            'materia_prima_nombre', 'unidad_medida', 'cantidad', 'merma',
+        ]
+
+
+class PuestoTrabajoSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PuestoTrabajo
+        fields = ['id', 'codigo', 'nombre', 'horas_dia', 'activo']
+
+
+class OrdenTrabajoSerializer(serializers.ModelSerializer):
+    """
+    Orden de trabajo con sus fechas. Necesita un queryset con services.anotar_plan
+    y el CalendarioPlan en context['calendario'].
+    """
+    numero_pedido = serializers.CharField(source='pedido.numero_pedido', read_only=True)
+    producto_codigo = serializers.CharField(source='producto.codigo', read_only=True)
+    puesto_codigo = serializers.CharField(source='puesto.codigo', read_only=True)
+    inicio = serializers.DecimalField(max_digits=14, decimal_places=4, read_only=True)
+    fin = serializers.DecimalField(max_digits=14, decimal_places=4, read_only=True)
+    fecha_inicio = serializers.SerializerMethodField()
+    fecha_fin = serializers.SerializerMethodField()
+    retrasada = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = OrdenTrabajo
+        fields = [
+            'id', 'pedido', 'numero_pedido', 'linea', 'producto', 'producto_codigo', 'puesto', 'puesto_codigo',
+            'fecha_entrega', 'horas', 'inicio', 'fin', 'fecha_inicio', 'fecha_fin', 'retrasada',
+        ]
+    
+    def get_fecha_inicio(self, obj):
+        return self.context['calendario'].fecha_inicio(obj.inicio)
+    
+    def get_fecha_fin(self, obj):
+        return self.context['calendario'].fecha_fin(obj.fin)
+    
+    def get_retrasada(self, obj):
+        return self.context['calendario'].fecha_fin(obj.fin) > obj.fecha_entrega
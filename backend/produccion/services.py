@@ -0,0 +1,530 @@
+"""
+Planificación de materiales (MRP) y de la producción.
+
+La demanda de los pedidos abiertos se agrega por producto, se descuenta el
+stock de producto terminado disponible y lo que queda por fabricar se
+multiplica por la lista de materiales (unidades por producto x consumo por
+unidad y materia prima). Es el producto de un vector de demanda por una matriz
+dispersa, y se resuelve en una sola sentencia SQL: el coste depende del número
+de productos y componentes, no de las líneas que se leen una a una.
+
+Las líneas de los pedidos en producción se reparten en órdenes de trabajo
+entre los puestos del taller (ver PLANIFICACIÓN DE LA PRODUCCIÓN).
+"""
+import heapq
+import math
+from datetime import timedelta
+from decimal import ROUND_CEILING, Decimal
+
+from django.db import connection, transaction
+from django.db.models import F, Max, OuterRef, Subquery
+from django.utils import timezone
+
+from pedidos.models import LineaPedido, Pedido, ReservaStock
+from pedidos.services import ESTADOS_CON_CARGA, horas_taller
+from stock.models import MateriaPrima, Producto
+from .models import ColaPuesto, ComponenteProducto, OrdenTrabajo, PlanProduccion, PuestoTrabajo
+
+
+class PlanificacionError(ValueError):
+    """No se puede planificar: no hay puestos activos o el calendario no tiene días laborables"""
+
+
+def _tabla(model):
+    return connection.ops.quote_name(model._meta.db_table)
+
+
+# ========================================
+# NECESIDADES DE MATERIALES
+# ========================================
+
+# Productos a fabricar: demanda de los pedidos abiertos con entrega hasta
+# %(hasta)s (todas sin fecha) menos el stock de producto que no está reservado
+# para otros pedidos (los que quedan fuera de la demanda, como los producidos)
+FABRICAR = """
+    WITH pedidos_demanda AS (
+        SELECT id
+        FROM {pedidos}
+        WHERE estado = ANY(%(abiertos)s)
+          AND (%(hasta)s::date IS NULL OR fecha_entrega_estimada <= %(hasta)s::date)
+    ),
+    demanda AS (
+        SELECT l.producto_id, SUM(l.cantidad) AS unidades
+        FROM {lineas} l
+        JOIN pedidos_demanda p ON p.id = l.pedido_id
+        GROUP BY l.producto_id
+    ),
+    reservado_fuera AS (
+        SELECT r.producto_id, SUM(r.cantidad) AS unidades
+        FROM {reservas} r
+        WHERE r.producto_id IN (SELECT producto_id FROM demanda)
+          AND r.pedido_id NOT IN (SELECT id FROM pedidos_demanda)
+        GROUP BY r.producto_id
+    ),
+    fabricar AS (
+        SELECT d.producto_id, d.unidades,
+               GREATEST(d.unidades - GREATEST(pr.stock_actual - COALESCE(f.unidades, 0), 0), 0) AS fabricar
+        FROM demanda d
+        JOIN {productos} pr ON pr.id = d.producto_id
+        LEFT JOIN reservado_fuera f ON f.producto_id = d.producto_id
+    )"""
+
+
+def necesidades_materiales(hasta=None, solo_faltantes=False):
+    """
+    Necesidades de materias primas para fabricar lo que piden los pedidos
+    abiertos (pendientes y en producción) con entrega hasta `hasta`.
+
+    Por materia prima:
+    - bruto: suma de unidades a fabricar x cantidad x (1 + merma / 100) de
+      cada producto que la usa, redondeado hacia arriba al céntimo
+    - stock_actual: existencias
+    - neto: lo que falta comprar, max(bruto - stock_actual, 0)
+    Con solo_faltantes=True solo se devuelven las que tienen neto positivo.
+    Una consulta, ordenada por código.
+    """
+    sql = FABRICAR.format(
+        pedidos=_tabla(Pedido), lineas=_tabla(LineaPedido), reservas=_tabla(ReservaStock),
+        productos=_tabla(Producto),
+    ) + f"""
+    ,
+    brutas AS (
+        SELECT c.materia_prima_id,
+               CEIL(SUM(f.fabricar * c.cantidad * (1 + c.merma / 100)) * 100) / 100 AS bruto
+        FROM fabricar f
+        JOIN {_tabla(ComponenteProducto)} c ON c.producto_id = f.producto_id
+        WHERE f.fabricar > 0
+        GROUP BY c.materia_prima_id
+    )
+    SELECT mp.id, mp.codigo, mp.nombre, mp.unidad_medida, b.bruto, mp.stock_actual,
+           GREATEST(b.bruto - mp.stock_actual, 0) AS neto
+    FROM brutas b
+    JOIN {_tabla(MateriaPrima)} mp ON mp.id = b.materia_prima_id
+    WHERE b.bruto > 0 AND (NOT %(solo_faltantes)s OR b.bruto > mp.stock_actual)
+    ORDER BY mp.codigo
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {
+            'abiertos': list(ESTADOS_CON_CARGA), 'hasta': hasta, 'solo_faltantes': solo_faltantes,
+        })
+        columnas = [col[0] for col in cursor.description]
+        return [dict(zip(columnas, fila)) for fila in cursor.fetchall()]
+
+
+def productos_a_fabricar(hasta=None):
+    """
+    Unidades pedidas y a fabricar (descontado el stock disponible) de cada
+    producto con demanda abierta, con la misma regla que necesidades_materiales
+    """
+    sql = FABRICAR.format(
+        pedidos=_tabla(Pedido), lineas=_tabla(LineaPedido), reservas=_tabla(ReservaStock),
+        productos=_tabla(Producto),
+    ) + f"""
+    SELECT pr.id, pr.codigo, pr.nombre, f.unidades AS pedido, f.fabricar
+    FROM fabricar f
+    JOIN {_tabla(Producto)} pr ON pr.id = f.producto_id
+    ORDER BY pr.codigo
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {'abiertos': list(ESTADOS_CON_CARGA), 'hasta': hasta})
+        columnas = [col[0] for col in cursor.description]
+        return [dict(zip(columnas, fila)) for fila in cursor.fetchall()]
+
+
+# ========================================
+# PLANIFICACIÓN DE LA PRODUCCIÓN
+# ========================================
+#
+# Cada línea de un pedido en producción es una orden de trabajo de
+# cantidad x tiempo_fabricacion horas. Cada puesto ejecuta sus órdenes en
+# orden de prioridad (fecha de entrega, pedido, id), una detrás de otra, y los
+# tiempos se cuentan en días laborables desde PlanProduccion.inicio (un puesto
+# de 8 horas por día tarda 0,5 días en una orden de 4 horas).
+#
+# Las órdenes de un puesto con la misma fecha de entrega forman una cola
+# (ColaPuesto) que guarda su inicio; cada orden guarda solo su desfase dentro
+# de la cola. Insertar o retirar una orden mueve las órdenes de su cola y el
+# inicio de las colas posteriores del puesto (una por fecha), no todas las
+# órdenes que van detrás.
+#
+# replanificar() reconstruye el plan entero: recorre las órdenes por prioridad
+# y asigna cada una al puesto en el que termina antes, con colas de prioridad
+# de puestos por día libre. planificar_pedidos() lo mantiene al insertar o
+# retirar pedidos sin reconstruirlo.
+
+ESTADO_PLANIFICADO = 'en_produccion'
+
+# Días máximos sin ningún día laborable antes de dar el calendario por vacío
+MAXIMO_DIAS_SIN_TRABAJO = 3660
+
+_DIEZMILESIMA = Decimal('0.0001')
+
+# Órdenes a planificar (id de línea, pedido, producto, fecha de entrega, horas) por prioridad
+TRABAJOS = """
+    SELECT l.id, l.pedido_id, l.producto_id, p.fecha_entrega_estimada, l.cantidad * pr.tiempo_fabricacion
+    FROM {lineas} l
+    JOIN {pedidos} p ON p.id = l.pedido_id
+    JOIN {productos} pr ON pr.id = l.producto_id
+    WHERE p.estado = %(estado)s {filtro}
+    ORDER BY p.fecha_entrega_estimada, l.pedido_id, l.id
+"""
+
+# Mueve dentro de su cola las órdenes que van detrás de los `cambios`
+# (puesto, fecha, pedido, duración) de la misma cola
+DESPLAZAR_EN_COLA = """
+    desplazadas AS (
+        UPDATE {ordenes} o
+        SET desfase = o.desfase {signo} d.delta
+        FROM (
+            SELECT o.id, SUM(c.duracion) AS delta
+            FROM {ordenes} o
+            JOIN cambios c ON c.puesto_id = o.puesto_id AND c.fecha_entrega = o.fecha_entrega
+                          AND c.pedido_id < o.pedido_id
+            WHERE o.pedido_id <> ALL(%(ids)s)
+            GROUP BY o.id
+        ) d
+        WHERE o.id = d.id
+    )"""
+
+
+def _duracion(horas, horas_dia):
+    """Días laborables que ocupa una orden de `horas` en un puesto de `horas_dia`"""
+    return (Decimal(horas) / horas_dia).quantize(_DIEZMILESIMA, rounding=ROUND_CEILING)
+
+
+def _trabajos(cursor, filtro='', parametros=None):
+    cursor.execute(
+        TRABAJOS.format(lineas=_tabla(LineaPedido), pedidos=_tabla(Pedido), productos=_tabla(Producto),
+                        filtro=filtro),
+        {'estado': ESTADO_PLANIFICADO, **(parametros or {})},
+    )
+    return cursor.fetchall()
+
+
+def _ajustar_colas(cursor, cambios, signo):
+    """
+    Suma (signo 1) o resta (-1) a las colas los cambios [(puesto, fecha,
+    duración, órdenes)], borra las que quedan vacías y recalcula el inicio de
+    las colas de los puestos afectados. Dos sentencias.
+    """
+    tabla = _tabla(ColaPuesto)
+    puestos, fechas, duraciones, ordenes = (list(columna) for columna in zip(*cambios))
+    cursor.execute(
+        f"""
+        INSERT INTO {tabla} AS c (puesto_id, fecha_entrega, inicio, duracion, ordenes)
+        SELECT puesto_id, fecha_entrega, 0, %(signo)s * duracion, %(signo)s * ordenes
+        FROM unnest(%(puestos)s::bigint[], %(fechas)s::date[], %(duraciones)s::numeric[], %(ordenes)s::int[])
+            AS n(puesto_id, fecha_entrega, duracion, ordenes)
+        ON CONFLICT (puesto_id, fecha_entrega)
+        DO UPDATE SET duracion = c.duracion + EXCLUDED.duracion, ordenes = c.ordenes + EXCLUDED.ordenes
+        """,
+        {'signo': signo, 'puestos': puestos, 'fechas': fechas, 'duraciones': duraciones, 'ordenes': ordenes},
+    )
+    cursor.execute(
+        f"""
+        WITH vacias AS (
+            DELETE FROM {tabla} WHERE puesto_id = ANY(%(puestos)s) AND ordenes = 0
+        ),
+        inicios AS (
+            SELECT id, SUM(duracion) OVER (PARTITION BY puesto_id ORDER BY fecha_entrega) - duracion AS inicio
+            FROM {tabla}
+            WHERE puesto_id = ANY(%(puestos)s) AND ordenes > 0
+        )
+        UPDATE {tabla} c
+        SET inicio = i.inicio
+        FROM inicios i
+        WHERE c.id = i.id AND c.inicio <> i.inicio
+        """,
+        {'puestos': sorted(set(puestos))},
+    )
+
+
+def _insertar(cursor, ordenes):
+    """Inserta las órdenes [(linea, pedido, producto, fecha, horas, puesto, duración, desfase)] con una sentencia"""
+    cursor.execute(
+        f"""
+        INSERT INTO {_tabla(OrdenTrabajo)}
+            (linea_id, pedido_id, producto_id, fecha_entrega, horas, puesto_id, duracion, desfase)
+        SELECT * FROM unnest(%s::bigint[], %s::bigint[], %s::bigint[], %s::date[], %s::int[],
+                             %s::bigint[], %s::numeric[], %s::numeric[])
+        """,
+        [list(columna) for columna in zip(*ordenes)],
+    )
+
+
+def _colas(ordenes):
+    """Duración y número de órdenes por (puesto, fecha) de las órdenes de _insertar"""
+    colas = {}
+    for _, _, _, fecha, _, puesto, duracion, _ in ordenes:
+        total, cantidad = colas.get((puesto, fecha), (Decimal(0), 0))
+        colas[puesto, fecha] = (total + duracion, cantidad + 1)
+    return [(puesto, fecha, duracion, cantidad) for (puesto, fecha), (duracion, cantidad) in colas.items()]
+
+
+def plan_produccion():
+    """La fila de PlanProduccion; se crea empezando mañana si no existe"""
+    plan, _ = PlanProduccion.objects.get_or_create(
+        pk=1, defaults={'inicio': timezone.localdate() + timedelta(days=1)}
+    )
+    return plan
+
+
+def anotar_plan(queryset):
+    """Añade a un queryset de OrdenTrabajo su inicio y fin (días laborables desde el inicio del plan)"""
+    inicio_cola = Subquery(
+        ColaPuesto.objects.filter(puesto=OuterRef('puesto'), fecha_entrega=OuterRef('fecha_entrega'))
+        .values('inicio')[:1]
+    )
+    return queryset.annotate(inicio=inicio_cola + F('desfase')).annotate(fin=F('inicio') + F('duracion'))
+
+
+def replanificar(inicio=None):
+    """
+    Reconstruye todas las órdenes de trabajo desde `inicio` (mañana por
+    defecto): las líneas de los pedidos en producción, por prioridad, cada una
+    en el puesto activo en el que termina antes.
+
+    Los puestos esperan en colas de prioridad por el día en que quedan libres,
+    una por cada valor de horas_dia: en cada cola el primero es el que antes
+    termina cualquier orden, así que cada orden se asigna comparando solo los
+    primeros de cada cola. Devuelve {'ordenes', 'puestos', 'inicio', 'dias'}
+    (dias: días laborables hasta el fin del plan).
+    """
+    inicio = inicio or timezone.localdate() + timedelta(days=1)
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            # Excluye otras planificaciones, no las lecturas
+            cursor.execute(f"LOCK TABLE {_tabla(OrdenTrabajo)}, {_tabla(ColaPuesto)} IN SHARE ROW EXCLUSIVE MODE")
+            trabajos = _trabajos(cursor)
+            puestos = list(PuestoTrabajo.objects.filter(activo=True).values_list('id', 'horas_dia'))
+            if trabajos and not puestos:
+                raise PlanificacionError("No hay puestos de trabajo activos")
+
+            colas = {}
+            for puesto, horas_dia in puestos:
+                colas.setdefault(horas_dia, []).append((Decimal(0), puesto))
+            # Listas ordenadas: ya son montículos válidos
+
+            ordenes = []
+            inicio_cola = {}
+            dias = Decimal(0)
+            for linea, pedido, producto, fecha, horas in trabajos:
+                fin, horas_dia = min(
+                    (cola[0][0] + _duracion(horas, horas_dia), horas_dia) for horas_dia, cola in colas.items()
+                )
+                libre, puesto = heapq.heapreplace(colas[horas_dia], (fin, colas[horas_dia][0][1]))
+                # Cada puesto recibe sus órdenes por prioridad: la primera de una fecha abre su cola
+                desde = inicio_cola.setdefault((puesto, fecha), libre)
+                ordenes.append((linea, pedido, producto, fecha, horas, puesto, fin - libre, libre - desde))
+                dias = max(dias, fin)
+
+            cursor.execute(f"DELETE FROM {_tabla(OrdenTrabajo)}")
+            cursor.execute(f"DELETE FROM {_tabla(ColaPuesto)}")
+            if ordenes:
+                _insertar(cursor, ordenes)
+                _ajustar_colas(cursor, _colas(ordenes), 1)
+        PlanProduccion.objects.update_or_create(
+            pk=1, defaults={'inicio': inicio, 'replanificado': timezone.now()}
+        )
+    return {'ordenes': len(ordenes), 'puestos': len(puestos), 'inicio': inicio, 'dias': dias}
+
+
+def planificar_pedidos(pedido_ids):
+    """
+    Actualiza el plan para unos pedidos sin reconstruirlo: retira sus órdenes
+    de trabajo y, si están en producción, vuelve a planificar sus líneas. Es lo
+    que se hace al pasar un pedido a producción, al sacarlo (cancelado,
+    producido...) o al cambiar sus líneas o su fecha de entrega.
+
+    Las órdenes retiradas dejan de ocupar su puesto y las posteriores se
+    adelantan. Cada orden nueva va al puesto en el que termina antes, detrás
+    de las órdenes con más prioridad que ya tiene, y retrasa a las de menos
+    prioridad de ese puesto. Las órdenes de los demás pedidos no cambian de
+    puesto, así que con el tiempo el reparto se aleja del de replanificar().
+
+    Solo se escriben las órdenes de las colas tocadas y el inicio de las colas
+    posteriores, con un número fijo de consultas. Solo se bloquean los pedidos
+    y los puestos tocados, y nada si no hay órdenes que retirar ni pedidos en
+    producción. Devuelve {'retiradas',
+    'planificadas'}; sin puestos activos los pedidos se quedan sin planificar.
+    """
+    ids = sorted({int(pedido_id) for pedido_id in pedido_ids})
+    ordenes_tabla = _tabla(OrdenTrabajo)
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT EXISTS(SELECT 1 FROM {ordenes_tabla} WHERE pedido_id = ANY(%(ids)s))
+                    OR EXISTS(SELECT 1 FROM {_tabla(Pedido)} WHERE id = ANY(%(ids)s) AND estado = %(estado)s)
+                """,
+                {'ids': ids, 'estado': ESTADO_PLANIFICADO},
+            )
+            if not cursor.fetchone()[0]:
+                # Sin órdenes que retirar ni pedidos en producción (p. ej. pedidos pendientes): sin bloqueos
+                return {'retiradas': 0, 'planificadas': 0}
+
+            # Espera a un replanificar() en curso; no excluye otras planificaciones
+            cursor.execute(f"LOCK TABLE {ordenes_tabla}, {_tabla(ColaPuesto)} IN ROW EXCLUSIVE MODE")
+            # Las órdenes y líneas de estos pedidos no cambian mientras se planifican
+            cursor.execute(f"SELECT id FROM {_tabla(Pedido)} WHERE id = ANY(%(ids)s) ORDER BY id FOR UPDATE",
+                           {'ids': ids})
+            trabajos = _trabajos(cursor, 'AND p.id = ANY(%(ids)s)', {'ids': ids})
+            # Se bloquean, por id, los puestos cuyas colas se tocan: los de las órdenes
+            # que se retiran y, si hay líneas que planificar, todos los activos.
+            # Dos planificaciones solo se esperan si comparten algún puesto.
+            cursor.execute(
+                f"""
+                SELECT id, horas_dia, activo
+                FROM {_tabla(PuestoTrabajo)}
+                WHERE id IN (SELECT puesto_id FROM {ordenes_tabla} WHERE pedido_id = ANY(%(ids)s))
+                   OR (activo AND %(planificar)s)
+                ORDER BY id
+                FOR NO KEY UPDATE
+                """,
+                {'ids': ids, 'planificar': bool(trabajos)},
+            )
+            puestos = {puesto: horas_dia for puesto, horas_dia, activo in cursor.fetchall() if activo} \
+                if trabajos else {}
+
+            cursor.execute(
+                f"""
+                WITH cambios AS (
+                    DELETE FROM {ordenes_tabla} WHERE pedido_id = ANY(%(ids)s)
+                    RETURNING puesto_id, fecha_entrega, pedido_id, duracion
+                ),
+                {DESPLAZAR_EN_COLA.strip().format(ordenes=ordenes_tabla, signo='-')}
+                SELECT puesto_id, fecha_entrega, SUM(duracion), COUNT(*)
+                FROM cambios
+                GROUP BY puesto_id, fecha_entrega
+                """,
+                {'ids': ids},
+            )
+            retiradas = cursor.fetchall()
+            if retiradas:
+                _ajustar_colas(cursor, retiradas, -1)
+            if not puestos:
+                return {'retiradas': sum(fila[3] for fila in retiradas), 'planificadas': 0}
+
+            # Para cada pedido y puesto: fin de la cola anterior a su fecha y lo
+            # que ocupan en su propia cola las órdenes con más prioridad
+            claves = sorted({(fecha, pedido) for _, pedido, _, fecha, _ in trabajos})
+            cursor.execute(
+                f"""
+                SELECT j.fecha, j.pedido, w.id,
+                       COALESCE((SELECT c.inicio + c.duracion
+                                 FROM {_tabla(ColaPuesto)} c
+                                 WHERE c.puesto_id = w.id AND c.fecha_entrega < j.fecha
+                                 ORDER BY c.fecha_entrega DESC
+                                 LIMIT 1), 0),
+                       COALESCE((SELECT SUM(o.duracion)
+                                 FROM {ordenes_tabla} o
+                                 WHERE o.puesto_id = w.id AND o.fecha_entrega = j.fecha
+                                   AND o.pedido_id < j.pedido), 0)
+                FROM unnest(%s::date[], %s::bigint[]) AS j(fecha, pedido)
+                CROSS JOIN unnest(%s::bigint[]) AS w(id)
+                """,
+                [[fecha for fecha, _ in claves], [pedido for _, pedido in claves], list(puestos)],
+            )
+            anterior = {(fecha, pedido, puesto): (cola, en_cola)
+                        for fecha, pedido, puesto, cola, en_cola in cursor.fetchall()}
+
+            # Las órdenes nuevas van por prioridad: cada una retrasa a las siguientes de su puesto
+            añadido = dict.fromkeys(puestos, Decimal(0))
+            añadido_cola = {}
+            ordenes = []
+            for linea, pedido, producto, fecha, horas in trabajos:
+                fin, puesto = min(
+                    (sum(anterior[fecha, pedido, puesto]) + añadido[puesto] + _duracion(horas, horas_dia), puesto)
+                    for puesto, horas_dia in puestos.items()
+                )
+                duracion = _duracion(horas, puestos[puesto])
+                desfase = anterior[fecha, pedido, puesto][1] + añadido_cola.get((puesto, fecha), 0)
+                añadido[puesto] += duracion
+                añadido_cola[puesto, fecha] = añadido_cola.get((puesto, fecha), 0) + duracion
+                ordenes.append((linea, pedido, producto, fecha, horas, puesto, duracion, desfase))
+
+            cursor.execute(
+                f"""
+                WITH cambios AS (
+                    SELECT * FROM unnest(%(puestos)s::bigint[], %(fechas)s::date[], %(pedidos)s::bigint[],
+                                         %(duraciones)s::numeric[]) AS n(puesto_id, fecha_entrega, pedido_id, duracion)
+                ),
+                {DESPLAZAR_EN_COLA.strip().format(ordenes=ordenes_tabla, signo='+')}
+                SELECT COUNT(*) FROM cambios
+                """,
+                {'ids': ids,
+                 'puestos': [orden[5] for orden in ordenes], 'fechas': [orden[3] for orden in ordenes],
+                 'pedidos': [orden[1] for orden in ordenes], 'duraciones': [orden[6] for orden in ordenes]},
+            )
+            _insertar(cursor, ordenes)
+            _ajustar_colas(cursor, _colas(ordenes), 1)
+    return {'retiradas': sum(fila[3] for fila in retiradas), 'planificadas': len(ordenes)}
+
+
+class CalendarioPlan:
+    """
+    Fechas de los días laborables del plan: los días con horas de taller
+    (pedidos.services.horas_taller) desde `inicio`, leídos por tramos según
+    se piden
+    """
+    TRAMO = 64
+
+    def __init__(self, inicio):
+        self.inicio = inicio
+        self.dias = []
+        self._leido = inicio - timedelta(days=1)
+
+    def dia(self, indice):
+        """Fecha del día laborable `indice` (0 es el primero)"""
+        sin_trabajo = 0
+        while len(self.dias) <= indice:
+            tramo = max(self.TRAMO, 2 * (indice + 1 - len(self.dias)))
+            desde, self._leido = self._leido + timedelta(days=1), self._leido + timedelta(days=tramo)
+            nuevos = [fecha for fecha, horas in horas_taller(desde, self._leido).items() if horas > 0]
+            sin_trabajo = 0 if nuevos else sin_trabajo + tramo
+            if sin_trabajo > MAXIMO_DIAS_SIN_TRABAJO:
+                raise PlanificacionError("El calendario del taller no tiene días laborables")
+            self.dias += nuevos
+        return self.dias[indice]
+
+    def fecha_inicio(self, inicio):
+        return self.dia(int(inicio))
+
+    def fecha_fin(self, fin):
+        return self.dia(max(math.ceil(fin) - 1, 0))
+
+
+def resumen_plan():
+    """
+    Carga de cada puesto en el plan: órdenes, horas, día laborable en que
+    termina y órdenes que acaban después de su fecha de entrega. Dos consultas
+    más las del calendario, sea cual sea el número de órdenes.
+    """
+    plan = plan_produccion()
+    calendario = CalendarioPlan(plan.inicio)
+    fin = ColaPuesto.objects.aggregate(fin=Max(F('inicio') + F('duracion')))['fin'] or 0
+    calendario.fecha_fin(fin)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT w.id, w.codigo, w.nombre, w.horas_dia, w.activo,
+                   COUNT(o.id), COALESCE(SUM(o.horas), 0), MAX(c.inicio + o.desfase + o.duracion),
+                   COUNT(o.id) FILTER (
+                       WHERE (%s::date[])[GREATEST(CEIL(c.inicio + o.desfase + o.duracion)::int, 1)]
+                             > o.fecha_entrega
+                   )
+            FROM {_tabla(PuestoTrabajo)} w
+            LEFT JOIN {_tabla(OrdenTrabajo)} o ON o.puesto_id = w.id
+            LEFT JOIN {_tabla(ColaPuesto)} c ON c.puesto_id = o.puesto_id AND c.fecha_entrega = o.fecha_entrega
+            GROUP BY w.id
+            ORDER BY w.codigo
+            """,
+            [calendario.dias],
+        )
+        puestos = [
+            {'id': puesto, 'codigo': codigo, 'nombre': nombre, 'horas_dia': horas_dia, 'activo': activo,
+             'ordenes': ordenes, 'horas': horas, 'fin': calendario.fecha_fin(ultimo) if ultimo else None,
+             'retrasadas': retrasadas}
+            for puesto, codigo, nombre, horas_dia, activo, ordenes, horas, ultimo, retrasadas in cursor.fetchall()
+        ]
+    return {'inicio': plan.inicio, 'replanificado': plan.replanificado, 'puestos': puestos}
@@ -0,0 +1,13 @@
+"""
+Señales de producción: el plan sigue a los pedidos en producción
+"""
+from django.dispatch import receiver
+
+from pedidos.signals import pedidos_cambiados
+from .services import planificar_pedidos
+
+
+@receiver(pedidos_cambiados)
+def actualizar_plan(sender, pedido_ids, **kwargs):
+    """Retira y vuelve a planificar los pedidos cambiados, en la misma transacción"""
+    planificar_pedidos(pedido_ids)
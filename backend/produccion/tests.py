@@ -1,3 +1,370 @@
-from django.test import TestCase
+import random
+import threading
+from datetime import date, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.db import connection, connections, transaction
+from django.db.models import Count, Sum
+from django.test import RequestFactory, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from clientes.models import Cliente
+from pedidos.models import LineaPedido, Pedido
+from pedidos.services import cambiar_estado, reservar_pedido
+from stock.models import Familia, MateriaPrima, ModeloProducto, Producto
+from .models import ColaPuesto, ComponenteProducto, OrdenTrabajo, PuestoTrabajo
+from .services import (
+    necesidades_materiales, productos_a_fabricar, anotar_plan, planificar_pedidos, replanificar, PlanificacionError,
+)
+
+
+# ========================================
+# NECESIDADES DE MATERIALES
+# ========================================
+
+class NecesidadesMaterialesTests(TestCase):
+    """Explosión de la lista de materiales sobre los pedidos abiertos"""
+
+    def setUp(self):
+        self.cliente = Cliente.objects.create(nombre='Muebles Yecla', contacto='Ana', email='ana@example.com',
+                                              telefono='600000000', nif_cif='B00000001')
+        familia = Familia.objects.create(codigo='01', nombre='Madera')
+        modelo = ModeloProducto.objects.create(codigo='MARTINA', nombre='Martina', tipo='MATERIA')
+        self.tablero = MateriaPrima.objects.create(codigo='MP-1', familia=familia, modelo=modelo, nombre='Tablero',
+                                                   unidad_medida='M2', stock_actual=3, stock_minimo=0,
+                                                   precio_unitario='2.50')
+        self.tornillo = MateriaPrima.objects.create(codigo='MP-2', familia=familia, modelo=modelo, nombre='Tornillo',
+                                                    unidad_medida='UD', stock_actual=100, stock_minimo=0,
+                                                    precio_unitario='0.05')
+        self.silla = Producto.objects.create(codigo='P-001', nombre='Silla', stock_minimo=0, precio_venta=10)
+        self.mesa = Producto.objects.create(codigo='P-002', nombre='Mesa', stock_minimo=0, precio_venta=50)
+        ComponenteProducto.objects.create(producto=self.silla, materia_prima=self.tablero, cantidad='0.5', merma=10)
+        ComponenteProducto.objects.create(producto=self.silla, materia_prima=self.tornillo, cantidad=8)
+        ComponenteProducto.objects.create(producto=self.mesa, materia_prima=self.tablero, cantidad='1.5')
+        ComponenteProducto.objects.create(producto=self.mesa, materia_prima=self.tornillo, cantidad=12)
+
+    def pedido(self, numero, lineas, estado='pendiente', entrega=date(2026, 11, 2)):
+        pedido = Pedido.objects.create(numero_pedido=numero, cliente=self.cliente,
+                                       fecha_entrega_estimada=entrega, estado=estado)
+        LineaPedido.objects.bulk_create(
+            LineaPedido(pedido=pedido, producto=producto, cantidad=cantidad, precio_unitario=1, subtotal=cantidad)
+            for producto, cantidad in lineas
+        )
+        return pedido
+
+    def necesidades(self, **kwargs):
+        return {fila['codigo']: (fila['bruto'], fila['neto']) for fila in necesidades_materiales(**kwargs)}
+
+    def test_explosion_con_merma(self):
+        self.pedido('2026-0001', [(self.silla, 4), (self.mesa, 2)])
+        self.pedido('2026-0002', [(self.silla, 6)], estado='en_produccion')
+        # Tablero: 10 sillas x 0,5 x 1,10 + 2 mesas x 1,5 = 8,5
+        self.assertEqual(self.necesidades(), {
+            'MP-1': (Decimal('8.50'), Decimal('5.50')),
+            'MP-2': (Decimal('104.00'), Decimal('4.00')),
+        })
+        self.assertEqual(self.necesidades(solo_faltantes=True)['MP-1'][1], Decimal('5.50'))
+
+    def test_solo_pedidos_abiertos_y_hasta_fecha(self):
+        self.pedido('2026-0001', [(self.mesa, 2)])
+        self.pedido('2026-0002', [(self.mesa, 5)], estado='producido')
+        self.pedido('2026-0003', [(self.mesa, 5)], estado='cancelado')
+        self.pedido('2026-0004', [(self.mesa, 1)], entrega=date(2026, 12, 1))
+        self.assertEqual(self.necesidades()['MP-1'], (Decimal('4.50'), Decimal('1.50')))
+        self.assertEqual(self.necesidades(hasta=date(2026, 11, 30))['MP-1'], (Decimal('3.00'), Decimal('0')))
+        self.assertEqual(self.necesidades(hasta=date(2026, 11, 30), solo_faltantes=True), {})
+
+    def test_descuenta_stock_de_producto_disponible(self):
+        Producto.objects.filter(pk=self.mesa.pk).update(stock_actual=3)
+        producido = self.pedido('2026-0001', [(self.mesa, 2)], estado='producido')
+        reservar_pedido(producido.pk)
+        abierto = self.pedido('2026-0002', [(self.mesa, 4)])
+        reservar_pedido(abierto.pk, forzar=True)
+        # De las 3 mesas en stock, 2 son del pedido producido: quedan 4 - 1 por fabricar
+        self.assertEqual(
+            [(fila['codigo'], fila['pedido'], fila['fabricar']) for fila in productos_a_fabricar()],
+            [('P-002', 4, 3)],
+        )
+        self.assertEqual(self.necesidades()['MP-1'][0], Decimal('4.50'))
+
+    def test_consultas_constantes(self):
+        for i in range(30):
+            self.pedido(f'2026-1{i:03d}', [(self.silla, i + 1), (self.mesa, 1)])
+        with self.assertNumQueries(1):
+            necesidades_materiales()
+
+    def test_api(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('planificador'))
+        self.pedido('2026-0001', [(self.silla, 10)])
+        response = client.get('/api/produccion/necesidades/', {'faltantes': '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([fila['codigo'] for fila in response.data['materiales']], ['MP-1'])
+        self.assertEqual(response.data['productos'][0]['fabricar'], 10)
+        self.assertEqual(client.get('/api/produccion/necesidades/', {'hasta': 'mañana'}).status_code, 400)
+
+        response = client.get('/api/lista-materiales/', {'producto': self.silla.pk})
+        self.assertEqual([fila['materia_prima_codigo'] for fila in response.data['results']], ['MP-1', 'MP-2'])
+        response = client.post('/api/lista-materiales/', {
+            'producto': self.silla.pk, 'materia_prima': self.tablero.pk, 'cantidad': '1',
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+# ========================================
+# PLANIFICACIÓN DE LA PRODUCCIÓN
+# ========================================
+
+class PlanificacionTests(TestCase):
+    """Órdenes de trabajo por puesto, reconstruidas o mantenidas al cambiar los pedidos"""
+
+    # Lunes; el taller trabaja de lunes a viernes
+    LUNES = date(2026, 10, 19)
+
+    def setUp(self):
+        self.cliente = Cliente.objects.create(nombre='Muebles Yecla', contacto='Ana', email='ana@example.com',
+                                              telefono='600000000', nif_cif='B00000001')
+        self.silla = Producto.objects.create(codigo='P-001', nombre='Silla', stock_minimo=0, precio_venta=10,
+                                             tiempo_fabricacion=2)
+        self.mesa = Producto.objects.create(codigo='P-002', nombre='Mesa', stock_minimo=0, precio_venta=50,
+                                            tiempo_fabricacion=8)
+        PuestoTrabajo.objects.create(codigo='A', nombre='Banco A', horas_dia=8)
+        PuestoTrabajo.objects.create(codigo='B', nombre='Banco B', horas_dia=4)
+        self.numeros = iter(range(1, 10000))
+
+    def pedido(self, entrega, lineas, estado='en_produccion'):
+        pedido = Pedido.objects.create(numero_pedido=f'2026-{next(self.numeros):04d}', cliente=self.cliente,
+                                       fecha_entrega_estimada=entrega, estado=estado)
+        LineaPedido.objects.bulk_create(
+            LineaPedido(pedido=pedido, producto=producto, cantidad=cantidad, precio_unitario=1, subtotal=cantidad)
+            for producto, cantidad in lineas
+        )
+        return pedido
+
+    def plan(self):
+        return {
+            (orden.pedido.numero_pedido, orden.producto.codigo): (orden.puesto.codigo, orden.inicio, orden.fin)
+            for orden in anotar_plan(OrdenTrabajo.objects.select_related('pedido', 'producto', 'puesto'))
+        }
+
+    def assertPlanValido(self):
+        """Una orden por línea en producción, las colas al día y cada puesto sin huecos ni solapes"""
+        lineas = set(LineaPedido.objects.filter(pedido__estado='en_produccion').values_list('id', flat=True))
+        self.assertEqual(set(OrdenTrabajo.objects.values_list('linea_id', flat=True)), lineas)
+        colas = OrdenTrabajo.objects.order_by().values('puesto', 'fecha_entrega').annotate(
+            total=Sum('duracion'), cantidad=Count('id'))
+        self.assertEqual(
+            set(ColaPuesto.objects.values_list('puesto', 'fecha_entrega', 'duracion', 'ordenes')),
+            {(cola['puesto'], cola['fecha_entrega'], cola['total'], cola['cantidad']) for cola in colas},
+        )
+        for puesto in PuestoTrabajo.objects.all():
+            fin = Decimal(0)
+            for orden in anotar_plan(puesto.ordenes.order_by('fecha_entrega', 'pedido_id', 'id')):
+                self.assertEqual(orden.inicio, fin)
+                fin = orden.fin
+
+    def test_replanificar(self):
+        p1 = self.pedido(date(2026, 10, 30), [(self.mesa, 1)])
+        p2 = self.pedido(date(2026, 10, 23), [(self.silla, 2)])
+        self.pedido(date(2026, 10, 20), [(self.mesa, 5)], estado='pendiente')
+        resultado = replanificar(self.LUNES)
+        self.assertEqual((resultado['ordenes'], resultado['puestos'], resultado['dias']), (2, 2, Decimal('1.5')))
+        # Primero la entrega más próxima; cada orden, en el puesto donde termina antes
+        self.assertEqual(self.plan(), {
+            (p2.numero_pedido, 'P-001'): ('A', Decimal('0'), Decimal('0.5')),
+            (p1.numero_pedido, 'P-002'): ('A', Decimal('0.5'), Decimal('1.5')),
+        })
+
+    def test_insertar_y_retirar_sin_reconstruir(self):
+        self.pedido(date(2026, 10, 30), [(self.mesa, 1)])
+        self.pedido(date(2026, 10, 23), [(self.silla, 2)])
+        replanificar(self.LUNES)
+        inicial = self.plan()
+
+        urgente = self.pedido(date(2026, 10, 20), [(self.silla, 4)], estado='pendiente')
+        cambiar_estado([urgente.pk], 'en_produccion')
+        plan = self.plan()
+        self.assertEqual(plan[urgente.numero_pedido, 'P-001'], ('A', Decimal('0'), Decimal('1')))
+        # Las órdenes posteriores del puesto se retrasan lo que ocupa la nueva
+        self.assertEqual([plan[clave][1:] for clave in inicial],
+                         [(inicio + 1, fin + 1) for _, inicio, fin in inicial.values()])
+        self.assertPlanValido()
+
+        cambiar_estado([urgente.pk], 'cancelado')
+        self.assertEqual(self.plan(), inicial)
+
+    def test_cambios_del_pedido(self):
+        pedido = self.pedido(date(2026, 10, 30), [(self.mesa, 1)])
+        self.pedido(date(2026, 10, 23), [(self.silla, 2)])
+        replanificar(self.LUNES)
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('planificador'))
+
+        response = client.patch(f'/api/pedidos/{pedido.pk}/', {'fecha_entrega_estimada': '2026-10-20'},
+                                format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.plan()[pedido.numero_pedido, 'P-002'], ('A', Decimal('0'), Decimal('1')))
+        response = client.patch(f'/api/pedidos/{pedido.pk}/', {'lineas': [{'producto': self.silla.pk, 'cantidad': 1}]},
+                                format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.plan()[pedido.numero_pedido, 'P-001'], ('A', Decimal('0'), Decimal('0.25')))
+        self.assertPlanValido()
+
+        client.patch(f'/api/pedidos/{pedido.pk}/', {'estado': 'producido'}, format='json')
+        self.assertNotIn(pedido.pk, OrdenTrabajo.objects.values_list('pedido', flat=True))
+        self.assertPlanValido()
+
+    def test_cambios_aleatorios(self):
+        aleatorio = random.Random(24)
+        pedidos = [
+            self.pedido(self.LUNES + timedelta(days=aleatorio.randrange(20)),
+                        [(producto, aleatorio.randint(1, 5)) for producto in (self.silla, self.mesa)
+                         if aleatorio.random() < 0.7] or [(self.silla, 1)],
+                        estado='pendiente')
+            for _ in range(30)
+        ]
+        replanificar(self.LUNES)
+        for _ in range(40):
+            muestra = aleatorio.sample(pedidos, aleatorio.randint(1, 4))
+            estado = aleatorio.choice(['en_produccion', 'pendiente'])
+            cambiar_estado([pedido.pk for pedido in muestra], estado, parcial=True)
+            self.assertPlanValido()
+
+    def test_consultas_constantes(self):
+        for i in range(20):
+            self.pedido(self.LUNES + timedelta(days=i), [(self.silla, 1), (self.mesa, 1)])
+        replanificar(self.LUNES)
+        uno = self.pedido(date(2026, 10, 25), [(self.silla, 1)], estado='pendiente')
+        varios = [self.pedido(date(2026, 10, 21 + i), [(self.silla, 1), (self.mesa, 2)], estado='pendiente')
+                  for i in range(10)]
+        with CaptureQueriesContext(connection) as una:
+            planificar_pedidos_en_produccion([uno])
+        with CaptureQueriesContext(connection) as diez:
+            planificar_pedidos_en_produccion(varios)
+        self.assertEqual(len(una), len(diez))
+        self.assertPlanValido()
+
+    def test_lineas_sueltas_y_admin_replanifican(self):
+        pedido = self.pedido(date(2026, 10, 30), [(self.mesa, 1)])
+        replanificar(self.LUNES)
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('planificador'))
+
+        response = client.post('/api/lineas-pedido/', {'pedido': pedido.pk, 'producto': self.silla.pk,
+                                                       'cantidad': 2, 'precio_unitario': 1}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(pedido.ordenes_trabajo.count(), 2)
+        self.assertPlanValido()
+        client.delete(f'/api/lineas-pedido/{response.data["id"]}/')
+        self.assertEqual(pedido.ordenes_trabajo.count(), 1)
+        self.assertPlanValido()
+
+        # Una línea que pasa a otro pedido en el admin replanifica los dos
+        otro = self.pedido(date(2026, 10, 23), [(self.silla, 1)])
+        planificar_pedidos([otro.pk])
+        request = RequestFactory().post('/admin/')
+        request.user = User.objects.create_superuser('admin')
+        linea_admin = admin.site._registry[LineaPedido]
+        linea = pedido.lineas.get()
+        form = linea_admin.get_form(request, linea)(
+            {'pedido': otro.pk, 'producto': self.mesa.pk, 'cantidad': 1, 'precio_unitario': 1, 'subtotal': 1},
+            instance=linea,
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        linea_admin.save_model(request, form.save(commit=False), form, True)
+        self.assertFalse(pedido.ordenes_trabajo.exists())
+        self.assertEqual(otro.ordenes_trabajo.count(), 2)
+        self.assertPlanValido()
+
+    def test_pedidos_sin_plan_no_bloquean(self):
+        self.pedido(date(2026, 10, 30), [(self.mesa, 1)])
+        replanificar(self.LUNES)
+        pendiente = self.pedido(date(2026, 10, 23), [(self.silla, 2)], estado='pendiente')
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(planificar_pedidos([pendiente.pk]), {'retiradas': 0, 'planificadas': 0})
+        self.assertEqual([q['sql'] for q in consultas if 'LOCK' in q['sql'] or 'FOR ' in q['sql']], [])
+
+    def test_sin_puestos(self):
+        PuestoTrabajo.objects.update(activo=False)
+        pedido = self.pedido(date(2026, 10, 30), [(self.mesa, 1)], estado='pendiente')
+        cambiar_estado([pedido.pk], 'en_produccion')
+        self.assertFalse(OrdenTrabajo.objects.exists())
+        with self.assertRaises(PlanificacionError):
+            replanificar(self.LUNES)
+
+    def test_api(self):
+        self.pedido(date(2026, 10, 30), [(self.mesa, 1)])
+        self.pedido(date(2026, 10, 19), [(self.silla, 2)])
+        replanificar(self.LUNES)
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('planificador'))
+
+        response = client.get('/api/ordenes-trabajo/')
+        self.assertEqual(
+            [(fila['producto_codigo'], fila['fecha_inicio'], fila['fecha_fin'], fila['retrasada'])
+             for fila in response.data['results']],
+            [('P-001', date(2026, 10, 19), date(2026, 10, 19), False),
+             ('P-002', date(2026, 10, 19), date(2026, 10, 20), False)],
+        )
+        resumen = client.get('/api/ordenes-trabajo/resumen/').data
+        self.assertEqual([(p['codigo'], p['ordenes'], p['horas'], p['fin']) for p in resumen['puestos']],
+                         [('A', 2, 12, date(2026, 10, 20)), ('B', 0, 0, None)])
+        self.assertEqual(client.post('/api/ordenes-trabajo/replanificar/').status_code, 200)
+
+
+class PlanificacionConcurrenciaTests(TransactionTestCase):
+    """Pedidos modificados mientras otra transacción planifica"""
+
+    def test_pedido_pendiente_no_espera_al_plan(self):
+        cliente = Cliente.objects.create(nombre='Muebles Yecla', contacto='Ana', email='ana@example.com',
+                                         telefono='600000000', nif_cif='B00000001')
+        silla = Producto.objects.create(codigo='P-001', nombre='Silla', stock_minimo=0, precio_venta=10,
+                                        tiempo_fabricacion=2)
+        PuestoTrabajo.objects.create(codigo='A', nombre='Banco A', horas_dia=8)
+        en_produccion, pendiente = (
+            Pedido.objects.create(numero_pedido=numero, cliente=cliente, fecha_entrega_estimada=date(2026, 10, 30))
+            for numero in ('2026-0001', '2026-0002')
+        )
+        LineaPedido.objects.create(pedido=en_produccion, producto=silla, cantidad=1, precio_unitario=1)
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('planificador'))
+        planificado = threading.Event()
+        terminar = threading.Event()
+        errores = []
+
+        def planificar():
+            try:
+                with transaction.atomic():
+                    cambiar_estado([en_produccion.pk], 'en_produccion')
+                    planificado.set()
+                    terminar.wait(10)
+            except Exception as e:
+                errores.append(e)
+            finally:
+                connections.close_all()
+
+        hilo = threading.Thread(target=planificar)
+        hilo.start()
+        try:
+            self.assertTrue(planificado.wait(10))
+            # Con el plan bloqueado por tabla este cambio esperaría al commit del otro
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL lock_timeout = '2s'")
+                response = client.patch(f'/api/pedidos/{pendiente.pk}/', {'fecha_entrega_estimada': '2026-10-23'},
+                                        format='json')
+            self.assertEqual(response.status_code, 200)
+        finally:
+            terminar.set()
+            hilo.join()
+
+        self.assertEqual(errores, [])
+        self.assertEqual(list(OrdenTrabajo.objects.values_list('pedido', flat=True)), [en_produccion.pk])
+
+
+def planificar_pedidos_en_produccion(pedidos):
+    Pedido.objects.filter(pk__in=[pedido.pk for pedido in pedidos]).update(estado='en_produccion')
+    return planificar_pedidos([pedido.pk for pedido in pedidos])
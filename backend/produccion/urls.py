@@ -0,0 +1,12 @@
+from django.urls import path
+from rest_framework.routers import DefaultRouter
+from .views import ComponenteProductoViewSet, NecesidadesMaterialesView, OrdenTrabajoViewSet, PuestoTrabajoViewSet
+
+router = DefaultRouter()
+router.register(r'lista-materiales', ComponenteProductoViewSet)
+router.register(r'puestos-trabajo', PuestoTrabajoViewSet)
+router.register(r'ordenes-trabajo', OrdenTrabajoViewSet)
+
+urlpatterns = router.urls + [
+    path('produccion/necesidades/', NecesidadesMaterialesView.as_view(), name='necesidades-materiales'),
+]
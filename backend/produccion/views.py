@@ -1,3 +1,99 @@
-from django.shortcuts import render
+from django.utils.dateparse import parse_date
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-# Create your views here.
+from .models import ComponenteProducto, OrdenTrabajo, PuestoTrabajo
+from .serializers import ComponenteProductoSerializer, OrdenTrabajoSerializer, PuestoTrabajoSerializer
+from .services import (
+    necesidades_materiales, productos_a_fabricar,
+    CalendarioPlan, PlanificacionError, anotar_plan, plan_produccion, replanificar, resumen_plan,
+)
+
+
+class ComponenteProductoViewSet(viewsets.ModelViewSet):
+    """
+    Lista de materiales: ?producto=<id> para el escandallo de un producto,
+    ?materia_prima=<id> para ver dónde se usa una materia prima
+    """
+    queryset = ComponenteProducto.objects.select_related('producto', 'materia_prima')
+    serializer_class = ComponenteProductoSerializer
+    permission_classes = [IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['producto', 'materia_prima']
+
+
+class NecesidadesMaterialesView(APIView):
+    """
+    Explosión de la lista de materiales sobre los pedidos abiertos.
+    GET /api/produccion/necesidades/?hasta=AAAA-MM-DD&faltantes=1
+    - hasta: solo pedidos con entrega hasta esa fecha
+    - faltantes: solo las materias primas que hay que comprar
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        hasta = None
+        if request.query_params.get('hasta'):
+            try:
+                hasta = parse_date(request.query_params['hasta'])
+            except ValueError:
+                hasta = None
+            if hasta is None:
+                return Response({'error': 'Fecha no válida (AAAA-MM-DD)'}, status=status.HTTP_400_BAD_REQUEST)
+        faltantes = request.query_params.get('faltantes', '').lower() in ('1', 'true', 'si', 'sí')
+        return Response({
+            'hasta': hasta,
+            'productos': productos_a_fabricar(hasta),
+            'materiales': necesidades_materiales(hasta, solo_faltantes=faltantes),
+        })
+
+
+class PuestoTrabajoViewSet(viewsets.ModelViewSet):
+    """
+    Puestos de trabajo. Los cambios de horas_dia o de activo se aplican al
+    plan en la siguiente replanificación completa.
+    """
+    queryset = PuestoTrabajo.objects.all()
+    serializer_class = PuestoTrabajoSerializer
+    permission_classes = [IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['activo']
+
+
+class OrdenTrabajoViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Plan de producción: órdenes de trabajo por puesto y orden de ejecución
+    (?puesto=, ?pedido=). Las mantiene el cambio de estado de los pedidos;
+    POST replanificar/ reconstruye el plan desde mañana.
+    """
+    queryset = anotar_plan(OrdenTrabajo.objects.select_related('pedido', 'producto', 'puesto'))
+    serializer_class = OrdenTrabajoSerializer
+    permission_classes = [IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['puesto', 'pedido']
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['calendario'] = CalendarioPlan(plan_produccion().inicio)
+        return context
+    
+    @action(detail=False, methods=['get'])
+    def resumen(self, request):
+        """Carga, fin y órdenes retrasadas de cada puesto"""
+        try:
+            return Response(resumen_plan())
+        except PlanificacionError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    @action(detail=False, methods=['post'])
+    def replanificar(self, request):
+        """Reconstruye el plan completo (también: manage.py replanificar_produccion)"""
+        try:
+            resultado = replanificar()
+        except PlanificacionError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(resultado)
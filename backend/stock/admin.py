@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Familia, ModeloProducto, MateriaPrima, Producto
+from .models import (
+    Familia, ModeloProducto, MateriaPrima, Producto, MovimientoStock, CierreStock,
+    PropuestaCompra, PedidoCompra,
+)
 
 
 # ========================================
@@ -177,4 +180,62 @@ class ProductoAdmin(admin.ModelAdmin):
         if not obj.codigo and obj.modelo:
             obj.save()  # Esto activará el save() del modelo que genera el código
         else:
-            super().save_model(request, obj, form, change)
\ No newline at end of file
+            super().save_model(request, obj, form, change)
+
+
+# ========================================
+# ADMIN PARA EL LIBRO DE MOVIMIENTOS
+# ========================================
+
+@admin.register(MovimientoStock)
+class MovimientoStockAdmin(admin.ModelAdmin):
+    """Consulta de movimientos de stock (solo lectura)"""
+    list_display = ('fecha', 'tipo', 'materia_prima', 'producto', 'cantidad', 'referencia')
+    list_filter = ('tipo', 'fecha')
+    search_fields = ('referencia', 'materia_prima__codigo', 'producto__codigo')
+    list_select_related = ('materia_prima', 'producto')
+    date_hierarchy = 'fecha'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(CierreStock)
+class CierreStockAdmin(admin.ModelAdmin):
+    """Consulta de cierres de stock (solo lectura)"""
+    list_display = ('fecha', 'materia_prima', 'producto', 'stock', 'movimientos_purgados')
+    search_fields = ('materia_prima__codigo', 'producto__codigo')
+    list_select_related = ('materia_prima', 'producto')
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+# ========================================
+# ADMIN PARA PROPUESTAS DE COMPRA
+# ========================================
+
+class PedidoCompraInline(admin.TabularInline):
+    model = PedidoCompra
+    fields = ('proveedor', 'estado', 'lineas', 'total')
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+
+@admin.register(PropuestaCompra)
+class PropuestaCompraAdmin(admin.ModelAdmin):
+    """Consulta de propuestas de compra (se generan desde la API)"""
+    list_display = ('id', 'fecha', 'estado', 'cobertura_dias', 'lineas', 'total')
+    list_filter = ('estado',)
+    readonly_fields = ('fecha', 'cobertura_dias', 'dias_historial', 'estado', 'lineas', 'total')
+    inlines = [PedidoCompraInline]
+    
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,69 @@
+"""
+Búsqueda de texto de los listados de stock.
+
+?search= ya no es un OR de icontains sobre tablas unidas (recorrido completo en
+cada pulsación), sino una consulta sobre la columna `busqueda` (tsvector con
+código, nombre, familia y modelo, índice GIN) que mantienen los triggers de la
+migración 0009. Cada palabra se busca por prefijo ("sill gri" encuentra
+"Silla gris") y el texto completo también encuentra por prefijo de código.
+"""
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import Case, F, FloatField, Q, Value, When
+from rest_framework.filters import OrderingFilter, SearchFilter
+
+CONFIGURACION = 'spanish'
+
+# Mismo reemplazo que la función SQL busqueda_normalizar
+TILDES = str.maketrans('áéíóúàèìòùäëïöü', 'aeiouaeiouaeiou')
+PALABRA = re.compile(r'\w+')
+
+
+def normalizar_busqueda(texto):
+    return texto.lower().translate(TILDES)
+
+
+def consulta_prefijos(texto):
+    """'sill gri' -> to_tsquery('spanish', 'sill:* & gri:*'), o None si no hay palabras"""
+    palabras = PALABRA.findall(normalizar_busqueda(texto))
+    if not palabras:
+        return None
+    return SearchQuery(
+        ' & '.join(f'{palabra}:*' for palabra in palabras),
+        search_type='raw',
+        config=CONFIGURACION,
+    )
+
+
+class BusquedaTextoFilter(SearchFilter):
+    """
+    ?search= sobre el vector de búsqueda. Anota `relevancia` (ts_rank, más 1
+    si el código empieza por el texto buscado) para OrdenRelevanciaFilter.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        texto = request.query_params.get(self.search_param, '').strip()
+        if not texto:
+            return queryset
+
+        # Índice varchar_pattern_ops del campo único codigo
+        condicion = Q(codigo__startswith=texto.upper())
+        relevancia = Case(When(condicion, then=Value(1.0)), default=Value(0.0), output_field=FloatField())
+
+        consulta = consulta_prefijos(texto)
+        if consulta is not None:
+            condicion |= Q(busqueda=consulta)
+            relevancia = relevancia + SearchRank(F('busqueda'), consulta)
+
+        return queryset.filter(condicion).annotate(relevancia=relevancia)
+
+
+class OrdenRelevanciaFilter(OrderingFilter):
+    """Con ?search= y sin ?ordering=, ordena por relevancia y después por código"""
+
+    def get_ordering(self, request, queryset, view):
+        if (not request.query_params.get(self.ordering_param)
+                and 'relevancia' in queryset.query.annotations):
+            return ['-relevancia', 'codigo']
+        return super().get_ordering(request, queryset, view)
@@ -0,0 +1,401 @@
+"""
+Importación masiva del catálogo (materias primas y productos) desde CSV o XLSX.
+
+Las filas se vuelcan con COPY a una tabla temporal y a partir de ahí todo se
+hace con SQL sobre el conjunto: resolución de familias y modelos, validación,
+asignación de códigos por bloques y alta/actualización en las tablas reales.
+Las filas con errores no se importan y se devuelven en el informe.
+"""
+import csv
+import io
+import os
+
+from django.db import connection, transaction
+
+from .models import MateriaPrima, Producto, MovimientoStock, SecuenciaCodigo
+
+
+class ImportacionError(ValueError):
+    """El archivo no se puede importar (formato o cabeceras no válidos)"""
+
+
+# Columnas aceptadas en el archivo para cada modelo y obligatorias en la cabecera
+COLUMNAS = {
+    MateriaPrima: [
+        'codigo', 'nombre', 'descripcion', 'familia', 'modelo', 'unidad_medida',
+        'stock_actual', 'stock_minimo', 'precio_unitario', 'proveedor',
+    ],
+    Producto: [
+        'codigo', 'nombre', 'descripcion', 'modelo',
+        'stock_actual', 'stock_minimo', 'precio_venta', 'tiempo_fabricacion',
+    ],
+}
+OBLIGATORIAS = {
+    MateriaPrima: ['nombre', 'stock_minimo', 'precio_unitario'],
+    Producto: ['nombre', 'stock_minimo', 'precio_venta'],
+}
+NUMERICAS = {'stock_actual', 'stock_minimo', 'precio_unitario', 'precio_venta', 'tiempo_fabricacion'}
+
+# Columnas de la tabla temporal (las del archivo más las resueltas en SQL)
+STAGING = [
+    'fila', 'codigo', 'nombre', 'descripcion', 'familia', 'modelo', 'unidad_medida',
+    'stock_actual', 'stock_minimo', 'precio', 'proveedor', 'tiempo_fabricacion',
+]
+
+DECIMAL = r'^-?[0-9]{1,8}(\.[0-9]{1,2})?$'  # numeric(10, 2)
+ENTERO = r'^-?[0-9]{1,9}$'
+
+
+# ========================================
+# LECTURA DEL ARCHIVO
+# ========================================
+
+def _leer_csv(archivo):
+    """Genera las filas de un CSV (separador , ; o tabulador)"""
+    texto = io.TextIOWrapper(archivo, encoding='utf-8-sig', newline='')
+    muestra = texto.read(4096)
+    texto.seek(0)
+    try:
+        dialecto = csv.Sniffer().sniff(muestra, delimiters=',;\t')
+    except csv.Error:
+        dialecto = csv.excel
+    yield from csv.reader(texto, dialecto)
+
+
+def _texto_celda(valor):
+    """Texto de una celda XLSX (los enteros guardados como 4.0 se leen como 4)"""
+    if valor is None:
+        return ''
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return str(valor)
+
+
+def _leer_xlsx(archivo):
+    """Genera las filas de la primera hoja de un XLSX"""
+    from openpyxl import load_workbook
+
+    libro = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        for fila in libro.worksheets[0].iter_rows(values_only=True):
+            yield [_texto_celda(valor) for valor in fila]
+    finally:
+        libro.close()
+
+
+def leer_filas(archivo, nombre, model):
+    """
+    Lee la cabecera de un archivo CSV o XLSX y devuelve un generador de
+    (numero_fila, {columna: valor}); los valores vacíos se devuelven como None.
+    Las cabeceras no válidas se detectan aquí, antes de empezar a importar.
+    """
+    extension = os.path.splitext(nombre)[1].lower()
+    if extension == '.xlsx':
+        filas = _leer_xlsx(archivo)
+    elif extension in ('.csv', '.txt'):
+        filas = _leer_csv(archivo)
+    else:
+        raise ImportacionError("Formato no soportado, use CSV o XLSX")
+
+    try:
+        cabecera = [str(c).strip().lower() for c in next(filas)]
+    except StopIteration:
+        raise ImportacionError("El archivo está vacío")
+
+    faltan = [c for c in OBLIGATORIAS[model] if c not in cabecera]
+    if faltan:
+        raise ImportacionError(f"Faltan columnas obligatorias: {', '.join(faltan)}")
+
+    posiciones = {c: cabecera.index(c) for c in COLUMNAS[model] if c in cabecera}
+    return _datos_filas(filas, posiciones)
+
+
+def _datos_filas(filas, posiciones):
+    """Genera las filas de datos ya normalizadas (ver leer_filas)"""
+    for numero, fila in enumerate(filas, start=2):
+        if not any(str(valor).strip() for valor in fila):
+            continue
+        datos = {}
+        for columna, posicion in posiciones.items():
+            valor = fila[posicion].strip() if posicion < len(fila) else ''
+            if columna in NUMERICAS:
+                valor = valor.replace(',', '.')
+            datos[columna] = valor or None
+        yield numero, datos
+
+
+class _FlujoCopy:
+    """Adapta un generador de líneas CSV a la interfaz de archivo que usa COPY"""
+
+    def __init__(self, lineas):
+        self._lineas = lineas
+        self._buffer = ''
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            try:
+                self._buffer += next(self._lineas)
+            except StopIteration:
+                break
+        if size < 0:
+            size = len(self._buffer)
+        datos, self._buffer = self._buffer[:size], self._buffer[size:]
+        return datos
+
+    readline = read
+
+
+def _lineas_copy(filas, model):
+    """Convierte las filas leídas en líneas CSV con las columnas de la tabla temporal"""
+    salida = io.StringIO()
+    writer = csv.writer(salida, lineterminator='\n')
+    precio = 'precio_unitario' if model is MateriaPrima else 'precio_venta'
+
+    for numero, datos in filas:
+        writer.writerow([
+            numero if columna == 'fila' else
+            datos.get(precio if columna == 'precio' else columna) or ''
+            for columna in STAGING
+        ])
+        yield salida.getvalue()
+        salida.seek(0)
+        salida.truncate()
+
+
+# ========================================
+# IMPORTACIÓN
+# ========================================
+
+def _validaciones(model):
+    """
+    Reglas de validación como (condición SQL, mensaje SQL). Se aplican en orden
+    y cada fila se queda con el primer error que encuentra.
+    """
+    reglas = [
+        ("nombre IS NULL", "'Falta el nombre'"),
+        ("stock_minimo IS NULL", "'Falta stock_minimo'"),
+        ("precio IS NULL", "'Falta el precio'"),
+    ]
+
+    if model is MateriaPrima:
+        reglas += [
+            ("familia IS NOT NULL AND familia_id IS NULL",
+             "'La familia ' || familia || ' no existe'"),
+            ("modelo IS NOT NULL AND modelo_id IS NULL",
+             "'El modelo ' || modelo || ' no existe o no es de materias primas'"),
+            ("codigo IS NULL AND (familia_id IS NULL OR modelo_id IS NULL)",
+             "'Se requieren familia y modelo para generar el código'"),
+            ("unidad_medida IS NOT NULL AND upper(unidad_medida) <> ALL(%(unidades)s)",
+             "'Unidad de medida no válida: ' || unidad_medida"),
+            (f"stock_actual !~ '{DECIMAL}'", "'stock_actual no es un número válido'"),
+            (f"stock_minimo !~ '{DECIMAL}'", "'stock_minimo no es un número válido'"),
+            (f"precio !~ '{DECIMAL}'", "'precio_unitario no es un número válido'"),
+        ]
+    else:
+        reglas += [
+            ("modelo IS NOT NULL AND modelo_id IS NULL",
+             "'El modelo ' || modelo || ' no existe o no es de productos'"),
+            ("codigo IS NULL AND modelo_id IS NULL",
+             "'Se requiere un modelo para generar el código'"),
+            (f"stock_actual !~ '{ENTERO}'", "'stock_actual debe ser un número entero'"),
+            (f"stock_minimo !~ '{ENTERO}'", "'stock_minimo debe ser un número entero'"),
+            (f"precio !~ '{DECIMAL}'", "'precio_venta no es un número válido'"),
+            (f"tiempo_fabricacion !~ '{ENTERO}'", "'tiempo_fabricacion debe ser un número entero'"),
+        ]
+
+    return reglas
+
+
+def _prefijo_sql(model):
+    """Expresión SQL del prefijo de código de una fila de la tabla temporal"""
+    if model is MateriaPrima:
+        return "familia || '-' || modelo"
+    return "modelo"
+
+
+def importar_catalogo(model, archivo, nombre, referencia='Importación'):
+    """
+    Importa un archivo CSV/XLSX de materias primas o productos.
+
+    Las filas con código que ya existe actualizan el artículo (sin tocar su
+    stock, que solo cambia con movimientos); el resto se dan de alta, generando
+    el código por bloques si no viene en el archivo, y su stock inicial queda
+    registrado como movimiento de ajuste.
+
+    Devuelve {'creados', 'actualizados', 'errores': [{'fila', 'error'}]}.
+    """
+    filas = leer_filas(archivo, nombre, model)
+    tabla = connection.ops.quote_name(model._meta.db_table)
+    ambito = model._meta.db_table
+    tipo_modelo = 'MATERIA' if model is MateriaPrima else 'PRODUCTO'
+    unidades = [valor for valor, _ in model._meta.get_field('unidad_medida').choices] \
+        if model is MateriaPrima else []
+    prefijo = _prefijo_sql(model)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"""
+            CREATE TEMP TABLE staging_catalogo (
+                fila integer PRIMARY KEY,
+                {', '.join(f'{c} text' for c in STAGING[1:])},
+                familia_id bigint,
+                modelo_id bigint,
+                error text
+            ) ON COMMIT DROP
+        """)
+        cursor.copy_expert(
+            f"COPY staging_catalogo ({', '.join(STAGING)}) FROM STDIN WITH (FORMAT csv)",
+            _FlujoCopy(_lineas_copy(filas, model)),
+        )
+
+        # Resolver familias y modelos por código, de una vez
+        if model is MateriaPrima:
+            cursor.execute("""
+                UPDATE staging_catalogo s SET familia_id = f.id
+                FROM familias f WHERE f.codigo = s.familia
+            """)
+        cursor.execute("""
+            UPDATE staging_catalogo s SET modelo_id = m.id
+            FROM modelos_producto m WHERE m.codigo = s.modelo AND m.tipo = %s
+        """, [tipo_modelo])
+
+        for condicion, mensaje in _validaciones(model):
+            cursor.execute(
+                f"UPDATE staging_catalogo SET error = {mensaje} WHERE error IS NULL AND {condicion}",
+                {'unidades': unidades},
+            )
+        cursor.execute("""
+            UPDATE staging_catalogo s SET error = 'Código repetido en el archivo'
+            FROM (
+                SELECT fila, row_number() OVER (PARTITION BY codigo ORDER BY fila) AS n
+                FROM staging_catalogo WHERE error IS NULL AND codigo IS NOT NULL
+            ) r
+            WHERE s.fila = r.fila AND r.n > 1
+        """)
+
+        # Los códigos explícitos del tipo PREFIJO-NNN adelantan su contador para
+        # que los códigos que se generen después no choquen con ellos
+        cursor.execute(f"""
+            WITH explicitos AS (
+                SELECT substring(codigo FROM '^(.+)-[0-9]{{1,18}}$') AS prefijo,
+                       max(substring(codigo FROM '-([0-9]{{1,18}})$')::bigint) AS maximo
+                FROM staging_catalogo
+                WHERE error IS NULL AND codigo ~ '^.+-[0-9]{{1,18}}$'
+                GROUP BY 1
+            ), existentes AS (
+                SELECT substring(t.codigo FROM '^(.+)-[0-9]{{1,18}}$') AS prefijo,
+                       max(substring(t.codigo FROM '-([0-9]{{1,18}})$')::bigint) AS maximo
+                FROM {tabla} t
+                WHERE t.codigo ~ '^.+-[0-9]{{1,18}}$'
+                  AND substring(t.codigo FROM '^(.+)-[0-9]{{1,18}}$') IN (SELECT prefijo FROM explicitos)
+                GROUP BY 1
+            )
+            INSERT INTO secuencias_codigo (ambito, prefijo, ultimo)
+            SELECT %s, e.prefijo, greatest(e.maximo, COALESCE(x.maximo, 0))
+            FROM explicitos e LEFT JOIN existentes x USING (prefijo)
+            ON CONFLICT (ambito, prefijo)
+            DO UPDATE SET ultimo = greatest(secuencias_codigo.ultimo, EXCLUDED.ultimo)
+        """, [ambito])
+
+        # Reservar un bloque de códigos por prefijo y repartirlos entre las filas
+        cursor.execute(f"""
+            SELECT {prefijo}, count(*) FROM staging_catalogo
+            WHERE error IS NULL AND codigo IS NULL
+            GROUP BY 1
+        """)
+        bloques = [
+            (p, SecuenciaCodigo.objects.reservar(model, p, cantidad))
+            for p, cantidad in cursor.fetchall()
+        ]
+        if bloques:
+            cursor.execute(f"""
+                UPDATE staging_catalogo s
+                SET codigo = b.prefijo || '-' || lpad(n::text, greatest(3, length(n::text)), '0')
+                FROM (
+                    SELECT fila, {prefijo} AS prefijo,
+                           row_number() OVER (PARTITION BY {prefijo} ORDER BY fila) AS rn
+                    FROM staging_catalogo WHERE error IS NULL AND codigo IS NULL
+                ) r
+                JOIN unnest(%s::text[], %s::bigint[]) AS b(prefijo, primero) ON b.prefijo = r.prefijo
+                CROSS JOIN LATERAL (SELECT b.primero + r.rn - 1 AS n) numero
+                WHERE s.fila = r.fila
+            """, [[b[0] for b in bloques], [b[1] for b in bloques]])
+
+        actualizados = _actualizar_existentes(cursor, model, tabla)
+        creados = _insertar_nuevos(cursor, model, tabla, referencia)
+
+        cursor.execute("SELECT fila, error FROM staging_catalogo WHERE error IS NOT NULL ORDER BY fila")
+        errores = [{'fila': fila, 'error': error} for fila, error in cursor.fetchall()]
+
+    return {'creados': creados, 'actualizados': actualizados, 'errores': errores}
+
+
+def _actualizar_existentes(cursor, model, tabla):
+    """Actualiza con un solo UPDATE los artículos cuyo código ya existe"""
+    if model is MateriaPrima:
+        columnas = """
+            familia_id = COALESCE(s.familia_id, t.familia_id),
+            modelo_id = COALESCE(s.modelo_id, t.modelo_id),
+            unidad_medida = COALESCE(upper(s.unidad_medida), t.unidad_medida),
+            stock_minimo = s.stock_minimo::numeric,
+            precio_unitario = s.precio::numeric,
+            proveedor = COALESCE(s.proveedor, t.proveedor),
+        """
+    else:
+        columnas = """
+            modelo_id = COALESCE(s.modelo_id, t.modelo_id),
+            stock_minimo = s.stock_minimo::integer,
+            precio_venta = s.precio::numeric,
+            tiempo_fabricacion = COALESCE(s.tiempo_fabricacion::integer, t.tiempo_fabricacion),
+        """
+
+    cursor.execute(f"""
+        UPDATE {tabla} t SET
+            nombre = s.nombre,
+            descripcion = COALESCE(s.descripcion, t.descripcion),
+            {columnas}
+            updated_at = now()
+        FROM staging_catalogo s
+        WHERE s.error IS NULL AND s.codigo = t.codigo
+    """)
+    return cursor.rowcount
+
+
+def _insertar_nuevos(cursor, model, tabla, referencia):
+    """
+    Da de alta con un solo INSERT los artículos nuevos y registra su stock
+    inicial en el libro de movimientos en la misma sentencia.
+    """
+    if model is MateriaPrima:
+        columnas = "familia_id, modelo_id, unidad_medida, stock_actual, stock_minimo, precio_unitario, proveedor"
+        valores = """
+            s.familia_id, s.modelo_id, COALESCE(upper(s.unidad_medida), 'KG'),
+            COALESCE(s.stock_actual, '0')::numeric, s.stock_minimo::numeric,
+            s.precio::numeric, COALESCE(s.proveedor, '')
+        """
+        campo = 'materia_prima_id'
+    else:
+        columnas = "modelo_id, stock_actual, stock_minimo, precio_venta, tiempo_fabricacion"
+        valores = """
+            s.modelo_id, COALESCE(s.stock_actual, '0')::integer, s.stock_minimo::integer,
+            s.precio::numeric, COALESCE(s.tiempo_fabricacion, '0')::integer
+        """
+        campo = 'producto_id'
+
+    cursor.execute(f"""
+        WITH nuevos AS (
+            INSERT INTO {tabla} (codigo, nombre, descripcion, {columnas}, activo, created_at, updated_at)
+            SELECT s.codigo, s.nombre, COALESCE(s.descripcion, ''), {valores}, true, now(), now()
+            FROM staging_catalogo s
+            WHERE s.error IS NULL
+              AND NOT EXISTS (SELECT 1 FROM {tabla} t WHERE t.codigo = s.codigo)
+            ORDER BY s.fila
+            RETURNING id, stock_actual
+        ), movimientos AS (
+            INSERT INTO {connection.ops.quote_name(MovimientoStock._meta.db_table)}
+                (tipo, {campo}, cantidad, fecha, referencia)
+            SELECT 'ajuste', id, stock_actual, now(), %s
+            FROM nuevos WHERE stock_actual <> 0
+        )
+        SELECT count(*) FROM nuevos
+    """, [referencia])
+    return cursor.fetchone()[0]
@@ -0,0 +1,113 @@
+"""
+Listados rápidos de stock: values() en lugar de instancias de modelo.
+
+El serializer completo crea una instancia por fila, llama a get_*_display y a
+los SerializerMethodField. Aquí la consulta devuelve diccionarios con las
+columnas justas, la etiqueta de las choices y la alerta se calculan en SQL, y
+cada valor pasa solo por el to_representation de su campo, así que la salida
+es la misma que la del serializer.
+
+Parámetros de list():
+- ?fields=id,codigo,stock_actual   Solo esas columnas
+- ?view=minimal                    Serializer mínimo (serializer_minimal_class)
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Case, CharField, Value, When
+from rest_framework import serializers, status
+from rest_framework.relations import RelatedField
+from rest_framework.response import Response
+
+
+def _etiquetas_sql(model, campo):
+    """CASE campo WHEN 'KG' THEN 'Kilogramos' ... END"""
+    field = model._meta.get_field(campo)
+    return Case(
+        *[When(**{campo: valor}, then=Value(str(etiqueta))) for valor, etiqueta in field.flatchoices],
+        default=Value(''),
+        output_field=CharField(),
+    )
+
+
+def _sin_conversion(valor):
+    return valor
+
+
+def columnas_listado(serializer_class, model, campos=None, columnas_sql=None):
+    """
+    Traduce los campos del serializer a columnas de values().
+    Devuelve (columnas, anotaciones): columnas es una lista de
+    (nombre en la respuesta, clave en values(), función de conversión).
+    Lanza ValueError con los nombres de `campos` que el serializer no tiene.
+    """
+    fields = serializer_class().fields
+    columnas_sql = columnas_sql or {}
+    if campos:
+        desconocidos = [campo for campo in campos if campo not in fields]
+        if desconocidos:
+            raise ValueError(', '.join(desconocidos))
+        nombres = [nombre for nombre in fields if nombre in campos]
+    else:
+        nombres = list(fields)
+
+    columnas = []
+    anotaciones = {}
+    for nombre in nombres:
+        field = fields[nombre]
+        if nombre in columnas_sql:
+            columnas.append((nombre, columnas_sql[nombre], _sin_conversion))
+        elif field.source.startswith('get_') and field.source.endswith('_display'):
+            anotaciones[nombre] = _etiquetas_sql(model, field.source[len('get_'):-len('_display')])
+            columnas.append((nombre, nombre, _sin_conversion))
+        elif isinstance(field, RelatedField):
+            # Clave primaria del objeto relacionado, sin cargarlo
+            columnas.append((nombre, field.source, _sin_conversion))
+        elif isinstance(field, serializers.SerializerMethodField) or '.' in field.source:
+            raise ImproperlyConfigured(f"{serializer_class.__name__}.{nombre} necesita una entrada en columnas_sql")
+        else:
+            columnas.append((nombre, field.source, field.to_representation))
+    return columnas, anotaciones
+
+
+def filas_listado(filas, columnas):
+    """Convierte las filas de values() a la representación del serializer"""
+    return [
+        {
+            nombre: None if fila[clave] is None else convertir(fila[clave])
+            for nombre, clave, convertir in columnas
+        }
+        for fila in filas
+    ]
+
+
+class ListadoRapidoMixin:
+    """
+    list() por values(). `columnas_sql` asocia los campos calculados del
+    serializer (SerializerMethodField) con una columna o anotación del queryset.
+    """
+    serializer_minimal_class = None
+    columnas_sql = {}
+
+    def list(self, request, *args, **kwargs):
+        serializer_class = self.get_serializer_class()
+        if request.query_params.get('view') == 'minimal' and self.serializer_minimal_class:
+            serializer_class = self.serializer_minimal_class
+
+        campos = [c.strip() for c in request.query_params.get('fields', '').split(',') if c.strip()]
+        queryset = self.filter_queryset(self.get_queryset())
+        try:
+            columnas, anotaciones = columnas_listado(
+                serializer_class, queryset.model, campos, self.columnas_sql
+            )
+        except ValueError as e:
+            return Response({"error": f"Campos no válidos: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # También las columnas de ordenación, que la paginación por cursor necesita
+        claves = {'id'} | {clave for _, clave, _ in columnas}
+        claves |= {campo.lstrip('-') for campo in queryset.query.order_by}
+        claves |= set(queryset.query.annotations)
+        queryset = queryset.annotate(**anotaciones).values(*claves)
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(filas_listado(page, columnas))
+        return Response(filas_listado(queryset, columnas))
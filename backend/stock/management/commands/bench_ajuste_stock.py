@@ -0,0 +1,67 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from stock.models import Producto
+from stock.services import ajustar_stock
+
+
+class _Rollback(Exception):
+    """Fuerza el rollback de los datos de prueba"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara el ajuste de stock fila a fila con el ajuste masivo: "
+        "número de consultas y latencia según el tamaño de la lista. "
+        "Todos los datos de prueba se descartan al terminar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tamanos', type=int, nargs='+', default=[10, 100, 500, 1000, 5000],
+            help='Tamaños de lista a medir',
+        )
+
+    def handle(self, *args, **options):
+        tamanos = options['tamanos']
+        self.stdout.write(
+            f"{'líneas':>8} | {'consultas fila a fila':>22} | {'ms fila a fila':>14} | "
+            f"{'consultas masivo':>16} | {'ms masivo':>10}"
+        )
+
+        try:
+            with transaction.atomic():
+                productos = Producto.objects.bulk_create(
+                    Producto(codigo=f"BENCH-{i:06d}", nombre=f"Bench {i}",
+                             stock_minimo=0, precio_venta=1)
+                    for i in range(max(tamanos))
+                )
+                for tamano in tamanos:
+                    datos = [{'id': p.id, 'cantidad': 1} for p in productos[:tamano]]
+                    legado = self._medir(lambda: self._fila_a_fila(datos))
+                    masivo = self._medir(lambda: ajustar_stock(Producto, datos))
+                    self.stdout.write(
+                        f"{tamano:>8} | {legado[0]:>22} | {legado[1]:>14.1f} | "
+                        f"{masivo[0]:>16} | {masivo[1]:>10.1f}"
+                    )
+                raise _Rollback()
+        except _Rollback:
+            pass
+
+    def _medir(self, funcion):
+        """Devuelve (consultas, milisegundos)"""
+        with CaptureQueriesContext(connection) as consultas:
+            inicio = time.perf_counter()
+            funcion()
+            ms = (time.perf_counter() - inicio) * 1000
+        return len(consultas), ms
+
+    def _fila_a_fila(self, datos):
+        """Implementación anterior: un get() y un save() por línea"""
+        for item in datos:
+            producto = Producto.objects.get(id=item['id'])
+            producto.stock_actual += item['cantidad']
+            producto.save()
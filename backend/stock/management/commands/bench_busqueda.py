@@ -0,0 +1,90 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+from rest_framework.filters import SearchFilter
+from rest_framework.request import Request
+
+from stock.filters import BusquedaTextoFilter, OrdenRelevanciaFilter
+from stock.models import Familia, MateriaPrima, ModeloProducto
+from stock.views import MateriaPrimaViewSet
+
+ARTICULOS = ['Tela', 'Tablero', 'Pata', 'Tornillo', 'Espuma', 'Barniz', 'Bisagra', 'Cojín']
+ACABADOS = ['gris', 'roble', 'nogal', 'blanco', 'negro', 'beige', 'cromado', 'haya']
+
+
+class _Rollback(Exception):
+    """Fuerza el rollback de los datos de prueba"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara la latencia de ?search= en materias primas: OR de icontains "
+        "(SearchFilter) frente al vector de búsqueda con índice GIN. "
+        "Los datos de prueba se descartan al terminar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', type=int, default=100000,
+                            help='Materias primas de prueba a crear')
+        parser.add_argument('--terminos', nargs='+',
+                            default=['gris', 'tabl roble', 'BENCH-0001', 'martina', 'inexistente'],
+                            help='Textos a buscar')
+        parser.add_argument('--repeticiones', type=int, default=5)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._crear_datos(options['filas'])
+                with connection.cursor() as cursor:
+                    cursor.execute("ANALYZE materias_primas")
+
+                self.stdout.write(
+                    f"{'búsqueda':>14} | {'filas':>6} | {'ms icontains':>12} | {'ms vector':>10}"
+                )
+                for termino in options['terminos']:
+                    filas, legado = self._medir(termino, False, options['repeticiones'])
+                    _, vector = self._medir(termino, True, options['repeticiones'])
+                    self.stdout.write(
+                        f"{termino:>14} | {filas:>6} | {legado:>12.1f} | {vector:>10.1f}"
+                    )
+                raise _Rollback()
+        except _Rollback:
+            pass
+
+    def _crear_datos(self, filas):
+        azar = random.Random(0)
+        familia = Familia.objects.create(codigo='ZZ', nombre='Tapicería bench')
+        modelos = [
+            ModeloProducto.objects.create(codigo=f'BENCH{i}', nombre=nombre, tipo='MATERIA')
+            for i, nombre in enumerate(['Martina', 'María', 'Lucía'])
+        ]
+        for inicio in range(0, filas, 5000):
+            MateriaPrima.objects.bulk_create(
+                MateriaPrima(
+                    codigo=f'BENCH-{i:06d}', familia=familia, modelo=azar.choice(modelos),
+                    nombre=f'{azar.choice(ARTICULOS)} {azar.choice(ACABADOS)} {i}',
+                    unidad_medida='UN', stock_minimo=0, precio_unitario=1,
+                )
+                for i in range(inicio, min(inicio + 5000, filas))
+            )
+
+    def _medir(self, termino, vector, repeticiones):
+        """Devuelve (filas encontradas, mediana en ms de COUNT + primera página)"""
+        request = Request(RequestFactory().get('/', {'search': termino}))
+        vista = MateriaPrimaViewSet(request=request, format_kwarg=None, action='list')
+        backends = [BusquedaTextoFilter, OrdenRelevanciaFilter] if vector else [SearchFilter]
+
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            queryset = vista.get_queryset()
+            for backend in backends:
+                queryset = backend().filter_queryset(request, queryset, vista)
+            total = queryset.count()
+            list(queryset[:100])
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        return total, statistics.median(tiempos)
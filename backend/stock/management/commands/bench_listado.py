@@ -0,0 +1,77 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from stock import referencias
+from stock.listados import columnas_listado, filas_listado
+from stock.models import Familia, MateriaPrima, ModeloProducto
+from stock.serializers import MateriaPrimaMinimalSerializer, MateriaPrimaSerializer
+from stock.views import MateriaPrimaViewSet
+
+
+class _Rollback(Exception):
+    """Fuerza el rollback de los datos de prueba"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara filas/segundo del listado de materias primas: serializer con "
+        "instancias de modelo frente al listado por values(). "
+        "Los datos de prueba se descartan al terminar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', type=int, default=20000,
+                            help='Materias primas de prueba a crear')
+        parser.add_argument('--repeticiones', type=int, default=3)
+
+    def handle(self, *args, **options):
+        filas = options['filas']
+        try:
+            with transaction.atomic():
+                self._crear_datos(filas)
+                referencias.familias()
+                queryset = MateriaPrima.objects.filter(codigo__startswith='BENCH-').order_by('codigo')
+
+                casos = [
+                    ('serializer', lambda: MateriaPrimaSerializer(queryset, many=True).data),
+                    ('values', lambda: self._rapido(queryset, MateriaPrimaSerializer)),
+                    ('values ?fields=', lambda: self._rapido(
+                        queryset, MateriaPrimaSerializer, ['id', 'codigo', 'stock_actual'])),
+                    ('values ?view=minimal', lambda: self._rapido(queryset, MateriaPrimaMinimalSerializer)),
+                ]
+                self.stdout.write(f"{'modo':>22} | {'ms':>8} | {'filas/s':>10}")
+                for nombre, funcion in casos:
+                    ms = self._medir(funcion, options['repeticiones'])
+                    self.stdout.write(f"{nombre:>22} | {ms:>8.1f} | {filas / ms * 1000:>10.0f}")
+                raise _Rollback()
+        except _Rollback:
+            pass
+
+    def _crear_datos(self, filas):
+        familia = Familia.objects.create(codigo='ZZ', nombre='Bench')
+        modelo = ModeloProducto.objects.create(codigo='BENCH', nombre='Bench', tipo='MATERIA')
+        MateriaPrima.objects.bulk_create(
+            (MateriaPrima(codigo=f'BENCH-{i:06d}', familia=familia, modelo=modelo,
+                          nombre=f'Material {i}', stock_actual=i % 50, stock_minimo=10,
+                          precio_unitario='2.50', unidad_medida='M')
+             for i in range(filas)),
+            batch_size=5000,
+        )
+
+    def _rapido(self, queryset, serializer_class, campos=None):
+        columnas, anotaciones = columnas_listado(
+            serializer_class, MateriaPrima, campos, MateriaPrimaViewSet.columnas_sql
+        )
+        claves = {clave for _, clave, _ in columnas}
+        return filas_listado(queryset.annotate(**anotaciones).values(*claves), columnas)
+
+    def _medir(self, funcion, repeticiones):
+        """Mejor tiempo en milisegundos"""
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            funcion()
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        return min(tiempos)
@@ -0,0 +1,64 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from stock.models import Familia, MateriaPrima, ModeloProducto, MovimientoStock
+from stock.services import generar_propuesta_compra
+
+
+class _Rollback(Exception):
+    """Fuerza el rollback de los datos de prueba"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el planificador de reposición sobre materias primas de prueba "
+        "con consumos repartidos entre varios proveedores. "
+        "Los datos de prueba se descartan al terminar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', type=int, default=50000,
+                            help='Materias primas de prueba a crear')
+        parser.add_argument('--proveedores', type=int, default=200)
+        parser.add_argument('--consumos', type=int, default=5,
+                            help='Movimientos de consumo por materia prima')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._crear_datos(options['filas'], options['proveedores'], options['consumos'])
+
+                inicio = time.perf_counter()
+                propuesta = generar_propuesta_compra(cobertura_dias=15, dias_historial=90)
+                ms = (time.perf_counter() - inicio) * 1000
+
+                self.stdout.write(
+                    f"{options['filas']} materias primas -> {propuesta.lineas} líneas en "
+                    f"{propuesta.pedidos.count()} pedidos, total {propuesta.total}: {ms:.0f} ms"
+                )
+                raise _Rollback()
+        except _Rollback:
+            pass
+
+    def _crear_datos(self, filas, proveedores, consumos):
+        familia = Familia.objects.create(codigo='ZZ', nombre='Bench')
+        modelo = ModeloProducto.objects.create(codigo='BENCH', nombre='Bench', tipo='MATERIA')
+        materias = MateriaPrima.objects.bulk_create(
+            (MateriaPrima(codigo=f'BENCH-{i:06d}', familia=familia, modelo=modelo,
+                          nombre=f'Material {i}', stock_actual=i % 50, stock_minimo=20,
+                          precio_unitario='2.50', unidad_medida='M',
+                          proveedor=f'Proveedor {i % proveedores}')
+             for i in range(filas)),
+            batch_size=5000,
+        )
+        ahora = timezone.now()
+        MovimientoStock.objects.bulk_create(
+            (MovimientoStock(tipo='consumo', materia_prima=materia, cantidad=-(n + 1),
+                             fecha=ahora - timedelta(days=n * 7))
+             for materia in materias for n in range(consumos)),
+            batch_size=10000,
+        )
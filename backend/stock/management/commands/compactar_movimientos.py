@@ -0,0 +1,43 @@
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from stock.services import compactar_movimientos
+
+
+class Command(BaseCommand):
+    help = (
+        "Crea cierres de stock en una fecha de corte para que las consultas "
+        "de stock histórico lean el cierre más cercano y pocos movimientos. "
+        "Pensado para ejecutarse periódicamente (p. ej. cada noche)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hasta', type=str,
+            help='Fecha de corte AAAA-MM-DD (incluida). Por defecto, el final de ayer.',
+        )
+        parser.add_argument(
+            '--purgar', action='store_true',
+            help='Borra los movimientos con fecha <= corte tras dejar un cierre por cada día con movimientos',
+        )
+
+    def handle(self, *args, **options):
+        if options['hasta']:
+            dia = parse_date(options['hasta'])
+            if dia is None:
+                raise CommandError("Fecha no válida, use AAAA-MM-DD")
+        else:
+            dia = timezone.localdate() - timedelta(days=1)
+        hasta = timezone.make_aware(datetime.combine(dia, time.max))
+
+        try:
+            creados, borrados = compactar_movimientos(hasta, purgar=options['purgar'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Cierres creados a {dia:%Y-%m-%d}: {creados}. Movimientos purgados: {borrados}."
+        ))
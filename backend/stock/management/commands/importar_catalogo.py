@@ -0,0 +1,45 @@
+import csv
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from stock.importers import importar_catalogo, ImportacionError
+from stock.models import MateriaPrima, Producto
+
+
+class Command(BaseCommand):
+    help = "Importa un catálogo de materias primas o productos desde CSV o XLSX"
+
+    def add_arguments(self, parser):
+        parser.add_argument('tipo', choices=['materias', 'productos'])
+        parser.add_argument('archivo', help='Ruta del archivo .csv o .xlsx')
+        parser.add_argument(
+            '--informe', type=str,
+            help='Escribe las filas con error en este CSV (fila;error)',
+        )
+
+    def handle(self, *args, **options):
+        model = MateriaPrima if options['tipo'] == 'materias' else Producto
+        inicio = time.perf_counter()
+
+        try:
+            with open(options['archivo'], 'rb') as archivo:
+                informe = importar_catalogo(model, archivo, options['archivo'])
+        except OSError as e:
+            raise CommandError(str(e))
+        except ImportacionError as e:
+            raise CommandError(str(e))
+
+        if options['informe']:
+            with open(options['informe'], 'w', newline='', encoding='utf-8') as salida:
+                writer = csv.writer(salida, delimiter=';')
+                writer.writerow(['fila', 'error'])
+                writer.writerows((e['fila'], e['error']) for e in informe['errores'])
+
+        segundos = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f"Creados: {informe['creados']}. Actualizados: {informe['actualizados']}. "
+            f"Errores: {len(informe['errores'])}. Tiempo: {segundos:.1f} s."
+        ))
+        for error in informe['errores'][:20]:
+            self.stdout.write(f"  Fila {error['fila']}: {error['error']}")
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from stock.services import recalcular_valoracion
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye la valoración de inventario (valoraciones_stock) con una "
+        "agregación completa y muestra cuántos grupos no cuadraban con la "
+        "valoración mantenida por los triggers."
+    )
+
+    def handle(self, *args, **options):
+        descuadres = recalcular_valoracion()
+        estilo = self.style.SUCCESS if descuadres == 0 else self.style.WARNING
+        self.stdout.write(estilo(f"Valoración recalculada. Grupos que no cuadraban: {descuadres}."))
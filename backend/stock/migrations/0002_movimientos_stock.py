@@ -0,0 +1,52 @@
+# Generated by Django 6.0 on 2026-10-17 18:41
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CierreStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateTimeField(verbose_name='Fecha de cierre')),
+                ('stock', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Stock')),
+                ('materia_prima', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='cierres', to='stock.materiaprima', verbose_name='Materia prima')),
+                ('producto', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='cierres', to='stock.producto', verbose_name='Producto')),
+            ],
+            options={
+                'verbose_name': 'Cierre de Stock',
+                'verbose_name_plural': 'Cierres de Stock',
+                'db_table': 'cierres_stock',
+                'ordering': ['-fecha'],
+                'constraints': [models.UniqueConstraint(fields=('materia_prima', 'fecha'), name='cierre_materia_fecha_unico'), models.UniqueConstraint(fields=('producto', 'fecha'), name='cierre_producto_fecha_unico'), models.CheckConstraint(condition=models.Q(models.Q(('materia_prima__isnull', False), ('producto__isnull', True)), models.Q(('materia_prima__isnull', True), ('producto__isnull', False)), _connector='OR'), name='cierre_un_solo_articulo')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MovimientoStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('recepcion', 'Recepción'), ('consumo', 'Consumo'), ('venta', 'Venta'), ('ajuste', 'Ajuste')], max_length=20, verbose_name='Tipo')),
+                ('cantidad', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Cantidad')),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Fecha')),
+                ('referencia', models.CharField(blank=True, max_length=100, verbose_name='Referencia')),
+                ('materia_prima', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='movimientos', to='stock.materiaprima', verbose_name='Materia prima')),
+                ('producto', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='movimientos', to='stock.producto', verbose_name='Producto')),
+            ],
+            options={
+                'verbose_name': 'Movimiento de Stock',
+                'verbose_name_plural': 'Movimientos de Stock',
+                'db_table': 'movimientos_stock',
+                'ordering': ['-fecha', '-id'],
+                'indexes': [models.Index(fields=['materia_prima', 'fecha'], name='mov_materia_fecha_idx'), models.Index(fields=['producto', 'fecha'], name='mov_producto_fecha_idx')],
+                'constraints': [models.CheckConstraint(condition=models.Q(models.Q(('materia_prima__isnull', False), ('producto__isnull', True)), models.Q(('materia_prima__isnull', True), ('producto__isnull', False)), _connector='OR'), name='movimiento_un_solo_articulo')],
+            },
+        ),
+    ]
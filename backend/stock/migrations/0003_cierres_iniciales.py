@@ -0,0 +1,32 @@
+# Generated by Django 6.0 on 2026-10-17 18:41
+
+from django.db import migrations
+from django.utils import timezone
+
+
+def crear_cierres_iniciales(apps, schema_editor):
+    """El stock existente antes del libro de movimientos pasa a ser el primer cierre"""
+    MateriaPrima = apps.get_model('stock', 'MateriaPrima')
+    Producto = apps.get_model('stock', 'Producto')
+    CierreStock = apps.get_model('stock', 'CierreStock')
+    ahora = timezone.now()
+
+    CierreStock.objects.bulk_create(
+        CierreStock(materia_prima_id=pk, fecha=ahora, stock=stock)
+        for pk, stock in MateriaPrima.objects.values_list('pk', 'stock_actual').iterator()
+    )
+    CierreStock.objects.bulk_create(
+        CierreStock(producto_id=pk, fecha=ahora, stock=stock)
+        for pk, stock in Producto.objects.values_list('pk', 'stock_actual').iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0002_movimientos_stock'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_cierres_iniciales, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0 on 2026-10-17 18:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0003_cierres_iniciales'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SecuenciaCodigo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ambito', models.CharField(max_length=50)),
+                ('prefijo', models.CharField(max_length=50)),
+                ('ultimo', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Secuencia de Código',
+                'verbose_name_plural': 'Secuencias de Código',
+                'db_table': 'secuencias_codigo',
+                'constraints': [models.UniqueConstraint(fields=('ambito', 'prefijo'), name='secuencia_ambito_prefijo_unica')],
+            },
+        ),
+    ]
@@ -0,0 +1,104 @@
+# Generated by Django 6.0 on 2026-10-17 18:46
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0004_secuencias_codigo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorAlertaStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ambito', models.CharField(choices=[('materias_primas', 'Materias primas'), ('productos', 'Productos')], max_length=20)),
+                ('alertas', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Contador de Alertas',
+                'verbose_name_plural': 'Contadores de Alertas',
+                'db_table': 'contadores_alerta_stock',
+            },
+        ),
+        migrations.AddField(
+            model_name='familia',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='Fecha de creación'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='familia',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Última modificación'),
+        ),
+        migrations.AddField(
+            model_name='materiaprima',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='Fecha de creación'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='materiaprima',
+            name='en_alerta',
+            field=models.GeneratedField(db_persist=True, expression=models.Q(('stock_actual__lte', models.F('stock_minimo'))), output_field=models.BooleanField(), verbose_name='En alerta'),
+        ),
+        migrations.AddField(
+            model_name='materiaprima',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Última modificación'),
+        ),
+        migrations.AddField(
+            model_name='modeloproducto',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='Fecha de creación'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='modeloproducto',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Última modificación'),
+        ),
+        migrations.AddField(
+            model_name='producto',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='Fecha de creación'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='producto',
+            name='en_alerta',
+            field=models.GeneratedField(db_persist=True, expression=models.Q(('stock_actual__lte', models.F('stock_minimo'))), output_field=models.BooleanField(), verbose_name='En alerta'),
+        ),
+        migrations.AddField(
+            model_name='producto',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Última modificación'),
+        ),
+        migrations.AddIndex(
+            model_name='materiaprima',
+            index=models.Index(condition=models.Q(('activo', True), ('en_alerta', True)), fields=['codigo'], name='mp_activas_en_alerta_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(condition=models.Q(('activo', True), ('en_alerta', True)), fields=['codigo'], name='prod_activos_en_alerta_idx'),
+        ),
+        migrations.AddField(
+            model_name='contadoralertastock',
+            name='familia',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='stock.familia'),
+        ),
+        migrations.AddField(
+            model_name='contadoralertastock',
+            name='modelo',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='stock.modeloproducto'),
+        ),
+        migrations.AddConstraint(
+            model_name='contadoralertastock',
+            constraint=models.UniqueConstraint(fields=('ambito', 'familia', 'modelo'), name='contador_alerta_unico', nulls_distinct=False),
+        ),
+    ]
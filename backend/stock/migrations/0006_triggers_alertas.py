@@ -0,0 +1,84 @@
+# Generated by Django 6.0 on 2026-10-17 18:50
+
+from django.db import migrations
+
+
+# Triggers por sentencia con tablas de transición: un UPDATE masivo de 500 filas
+# ajusta los contadores con un único INSERT ... ON CONFLICT agregado.
+FUNCION = """
+CREATE OR REPLACE FUNCTION {tabla}_contar_alertas() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO contadores_alerta_stock (ambito, familia_id, modelo_id, alertas)
+        SELECT '{tabla}', {familia}, modelo_id, COUNT(*)
+        FROM nuevas WHERE activo AND en_alerta
+        GROUP BY 2, 3
+        ON CONFLICT (ambito, familia_id, modelo_id)
+        DO UPDATE SET alertas = contadores_alerta_stock.alertas + EXCLUDED.alertas;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO contadores_alerta_stock (ambito, familia_id, modelo_id, alertas)
+        SELECT '{tabla}', {familia}, modelo_id, -COUNT(*)
+        FROM viejas WHERE activo AND en_alerta
+        GROUP BY 2, 3
+        ON CONFLICT (ambito, familia_id, modelo_id)
+        DO UPDATE SET alertas = contadores_alerta_stock.alertas + EXCLUDED.alertas;
+    ELSE
+        INSERT INTO contadores_alerta_stock (ambito, familia_id, modelo_id, alertas)
+        SELECT '{tabla}', familia_id, modelo_id, SUM(delta)
+        FROM (
+            SELECT {familia} AS familia_id, modelo_id, 1 AS delta
+            FROM nuevas WHERE activo AND en_alerta
+            UNION ALL
+            SELECT {familia}, modelo_id, -1
+            FROM viejas WHERE activo AND en_alerta
+        ) cambios
+        GROUP BY familia_id, modelo_id
+        HAVING SUM(delta) <> 0
+        ON CONFLICT (ambito, familia_id, modelo_id)
+        DO UPDATE SET alertas = contadores_alerta_stock.alertas + EXCLUDED.alertas;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER {tabla}_alertas_insert AFTER INSERT ON {tabla}
+    REFERENCING NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION {tabla}_contar_alertas();
+CREATE TRIGGER {tabla}_alertas_update AFTER UPDATE ON {tabla}
+    REFERENCING OLD TABLE AS viejas NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION {tabla}_contar_alertas();
+CREATE TRIGGER {tabla}_alertas_delete AFTER DELETE ON {tabla}
+    REFERENCING OLD TABLE AS viejas
+    FOR EACH STATEMENT EXECUTE FUNCTION {tabla}_contar_alertas();
+
+INSERT INTO contadores_alerta_stock (ambito, familia_id, modelo_id, alertas)
+SELECT '{tabla}', {familia}, modelo_id, COUNT(*)
+FROM {tabla} WHERE activo AND en_alerta
+GROUP BY 2, 3;
+"""
+
+BORRAR = """
+DROP TRIGGER IF EXISTS {tabla}_alertas_insert ON {tabla};
+DROP TRIGGER IF EXISTS {tabla}_alertas_update ON {tabla};
+DROP TRIGGER IF EXISTS {tabla}_alertas_delete ON {tabla};
+DROP FUNCTION IF EXISTS {tabla}_contar_alertas();
+DELETE FROM contadores_alerta_stock WHERE ambito = '{tabla}';
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0005_alertas_stock'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            FUNCION.format(tabla='materias_primas', familia='familia_id'),
+            BORRAR.format(tabla='materias_primas'),
+        ),
+        migrations.RunSQL(
+            FUNCION.format(tabla='productos', familia='NULL::bigint'),
+            BORRAR.format(tabla='productos'),
+        ),
+    ]
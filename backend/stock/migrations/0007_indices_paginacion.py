@@ -0,0 +1,41 @@
+# Generated by Django 6.0 on 2026-10-17 18:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0006_triggers_alertas'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='materiaprima',
+            index=models.Index(fields=['nombre', 'id'], name='mp_nombre_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='materiaprima',
+            index=models.Index(fields=['stock_actual', 'id'], name='mp_stock_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='materiaprima',
+            index=models.Index(fields=['created_at', 'id'], name='mp_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['nombre', 'id'], name='prod_nombre_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['stock_actual', 'id'], name='prod_stock_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['precio_venta', 'id'], name='prod_precio_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['created_at', 'id'], name='prod_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-17 18:56
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0007_indices_paginacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='materiaprima',
+            name='busqueda',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='producto',
+            name='busqueda',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='materiaprima',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['busqueda'], name='mp_busqueda_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['busqueda'], name='prod_busqueda_idx'),
+        ),
+    ]
@@ -0,0 +1,105 @@
+# Generated by Django 6.0 on 2026-10-17 18:58
+
+from django.db import migrations
+
+
+# Las tildes se eliminan al indexar y al buscar (no hay extensión unaccent):
+# "maria" encuentra "María". Debe coincidir con stock.filters.normalizar_busqueda.
+NORMALIZAR = """
+CREATE OR REPLACE FUNCTION busqueda_normalizar(texto text) RETURNS text AS $$
+    SELECT translate(lower(texto), 'áéíóúàèìòùäëïöü', 'aeiouaeiouaeiou')
+$$ LANGUAGE sql IMMUTABLE;
+"""
+
+# Código y nombre con peso A; familia y modelo con peso B. El trigger salta
+# también cuando se escribe la propia columna, así que "SET busqueda = NULL"
+# fuerza el recálculo. Los UPDATE de solo stock no lo disparan.
+FUNCION = """
+CREATE OR REPLACE FUNCTION {tabla}_busqueda() RETURNS trigger AS $$
+BEGIN
+    NEW.busqueda :=
+        setweight(to_tsvector('spanish', busqueda_normalizar(
+            concat_ws(' ', NEW.codigo, NEW.nombre))), 'A') ||
+        setweight(to_tsvector('spanish', busqueda_normalizar(concat_ws(' ',
+            {familia},
+            (SELECT nombre FROM modelos_producto WHERE id = NEW.modelo_id)))), 'B');
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER {tabla}_busqueda
+    BEFORE INSERT OR UPDATE OF codigo, nombre, {columnas}modelo_id, busqueda ON {tabla}
+    FOR EACH ROW EXECUTE FUNCTION {tabla}_busqueda();
+
+UPDATE {tabla} SET busqueda = NULL;
+"""
+
+BORRAR = """
+DROP TRIGGER IF EXISTS {tabla}_busqueda ON {tabla};
+DROP FUNCTION IF EXISTS {tabla}_busqueda();
+UPDATE {tabla} SET busqueda = NULL;
+"""
+
+# Al renombrar una familia o un modelo se recalculan solo sus artículos
+RENOMBRAR = """
+CREATE OR REPLACE FUNCTION {tabla}_renombrar_busqueda() RETURNS trigger AS $$
+BEGIN
+{actualizaciones}
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER {tabla}_renombrar_busqueda AFTER UPDATE ON {tabla}
+    REFERENCING OLD TABLE AS viejas NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION {tabla}_renombrar_busqueda();
+"""
+
+ACTUALIZAR = """
+    UPDATE {articulos} a SET busqueda = NULL
+    FROM nuevas n JOIN viejas v ON v.id = n.id
+    WHERE a.{columna} = n.id AND n.nombre IS DISTINCT FROM v.nombre;"""
+
+BORRAR_RENOMBRAR = """
+DROP TRIGGER IF EXISTS {tabla}_renombrar_busqueda ON {tabla};
+DROP FUNCTION IF EXISTS {tabla}_renombrar_busqueda();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0008_busqueda'),
+    ]
+
+    operations = [
+        migrations.RunSQL(NORMALIZAR, "DROP FUNCTION IF EXISTS busqueda_normalizar(text);"),
+        migrations.RunSQL(
+            FUNCION.format(
+                tabla='materias_primas',
+                familia='(SELECT nombre FROM familias WHERE id = NEW.familia_id)',
+                columnas='familia_id, ',
+            ),
+            BORRAR.format(tabla='materias_primas'),
+        ),
+        migrations.RunSQL(
+            FUNCION.format(tabla='productos', familia='NULL', columnas=''),
+            BORRAR.format(tabla='productos'),
+        ),
+        migrations.RunSQL(
+            RENOMBRAR.format(
+                tabla='familias',
+                actualizaciones=ACTUALIZAR.format(articulos='materias_primas', columna='familia_id'),
+            ),
+            BORRAR_RENOMBRAR.format(tabla='familias'),
+        ),
+        migrations.RunSQL(
+            RENOMBRAR.format(
+                tabla='modelos_producto',
+                actualizaciones=(
+                    ACTUALIZAR.format(articulos='materias_primas', columna='modelo_id')
+                    + ACTUALIZAR.format(articulos='productos', columna='modelo_id')
+                ),
+            ),
+            BORRAR_RENOMBRAR.format(tabla='modelos_producto'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 6.0 on 2026-10-17 19:01
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+# Función común: la usan también los triggers de clientes y pedidos
+FUNCION = """
+CREATE OR REPLACE FUNCTION versiones_tabla_incrementar() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO versiones_tabla (tabla, version, modificado)
+    VALUES (TG_TABLE_NAME, 1, now())
+    ON CONFLICT (tabla)
+    DO UPDATE SET version = versiones_tabla.version + 1, modificado = now();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+TRIGGER = """
+CREATE TRIGGER {tabla}_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {tabla}
+    FOR EACH STATEMENT EXECUTE FUNCTION versiones_tabla_incrementar();
+INSERT INTO versiones_tabla (tabla, version, modificado) VALUES ('{tabla}', 1, now());
+"""
+
+BORRAR_TRIGGER = "DROP TRIGGER IF EXISTS {tabla}_version ON {tabla};"
+
+TABLAS = ['familias', 'modelos_producto', 'materias_primas', 'productos']
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0009_triggers_busqueda'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionTabla',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tabla', models.CharField(max_length=63, unique=True)),
+                ('version', models.BigIntegerField(default=0)),
+                ('modificado', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Versión de tabla',
+                'verbose_name_plural': 'Versiones de tabla',
+                'db_table': 'versiones_tabla',
+            },
+        ),
+        migrations.RunSQL(FUNCION, "DROP FUNCTION IF EXISTS versiones_tabla_incrementar();"),
+    ] + [
+        migrations.RunSQL(TRIGGER.format(tabla=tabla), BORRAR_TRIGGER.format(tabla=tabla))
+        for tabla in TABLAS
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 6.0 on 2026-10-17 19:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0010_versiones_tabla'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ValoracionStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ambito', models.CharField(choices=[('materias_primas', 'Materias primas'), ('productos', 'Productos')], max_length=20)),
+                ('unidad_medida', models.CharField(blank=True, max_length=20, null=True)),
+                ('proveedor', models.CharField(blank=True, max_length=200, null=True)),
+                ('articulos', models.IntegerField(default=0)),
+                ('unidades', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('valor', models.DecimalField(decimal_places=4, default=0, max_digits=20)),
+                ('familia', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='stock.familia')),
+                ('modelo', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='stock.modeloproducto')),
+            ],
+            options={
+                'verbose_name': 'Valoración de stock',
+                'verbose_name_plural': 'Valoraciones de stock',
+                'db_table': 'valoraciones_stock',
+                'constraints': [models.UniqueConstraint(fields=('ambito', 'familia', 'modelo', 'unidad_medida', 'proveedor'), name='valoracion_stock_unica', nulls_distinct=False)],
+            },
+        ),
+    ]
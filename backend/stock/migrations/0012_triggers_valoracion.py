@@ -0,0 +1,94 @@
+# Generated by Django 6.0 on 2026-10-17 19:10
+
+from django.db import migrations
+
+
+# Triggers por sentencia con tablas de transición: cada sentencia suma a la
+# valoración las filas nuevas y resta las viejas, agrupadas, con un único
+# INSERT ... ON CONFLICT. Los grupos sin cambios se descartan en el HAVING.
+FILAS = """
+            SELECT {familia} AS familia_id, modelo_id, {unidad} AS unidad_medida,
+                   {proveedor} AS proveedor, {signo} AS signo,
+                   stock_actual::numeric AS stock, {precio} AS precio
+            FROM {origen}"""
+
+ACUMULAR = """
+        INSERT INTO valoraciones_stock
+            (ambito, familia_id, modelo_id, unidad_medida, proveedor, articulos, unidades, valor)
+        SELECT '{tabla}', familia_id, modelo_id, unidad_medida, proveedor,
+               SUM(signo), SUM(signo * stock), SUM(signo * stock * precio)
+        FROM ({filas}
+        ) cambios
+        GROUP BY familia_id, modelo_id, unidad_medida, proveedor
+        HAVING SUM(signo) <> 0 OR SUM(signo * stock) <> 0 OR SUM(signo * stock * precio) <> 0
+        ON CONFLICT (ambito, familia_id, modelo_id, unidad_medida, proveedor)
+        DO UPDATE SET articulos = valoraciones_stock.articulos + EXCLUDED.articulos,
+                      unidades = valoraciones_stock.unidades + EXCLUDED.unidades,
+                      valor = valoraciones_stock.valor + EXCLUDED.valor;"""
+
+FUNCION = """
+CREATE OR REPLACE FUNCTION {tabla}_valorar() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN{insertar}
+    ELSIF TG_OP = 'DELETE' THEN{borrar}
+    ELSE{actualizar}
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER {tabla}_valoracion_insert AFTER INSERT ON {tabla}
+    REFERENCING NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION {tabla}_valorar();
+CREATE TRIGGER {tabla}_valoracion_update AFTER UPDATE ON {tabla}
+    REFERENCING OLD TABLE AS viejas NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION {tabla}_valorar();
+CREATE TRIGGER {tabla}_valoracion_delete AFTER DELETE ON {tabla}
+    REFERENCING OLD TABLE AS viejas
+    FOR EACH STATEMENT EXECUTE FUNCTION {tabla}_valorar();
+{inicial}
+"""
+
+BORRAR = """
+DROP TRIGGER IF EXISTS {tabla}_valoracion_insert ON {tabla};
+DROP TRIGGER IF EXISTS {tabla}_valoracion_update ON {tabla};
+DROP TRIGGER IF EXISTS {tabla}_valoracion_delete ON {tabla};
+DROP FUNCTION IF EXISTS {tabla}_valorar();
+DELETE FROM valoraciones_stock WHERE ambito = '{tabla}';
+"""
+
+
+def triggers(tabla, familia, unidad, proveedor, precio):
+    def filas(signo, origen):
+        return FILAS.format(familia=familia, unidad=unidad, proveedor=proveedor,
+                            precio=precio, signo=signo, origen=origen)
+
+    def acumular(*partes):
+        return ACUMULAR.format(tabla=tabla, filas='\n            UNION ALL'.join(partes))
+
+    return FUNCION.format(
+        tabla=tabla,
+        insertar=acumular(filas(1, 'nuevas')),
+        borrar=acumular(filas(-1, 'viejas')),
+        actualizar=acumular(filas(1, 'nuevas'), filas(-1, 'viejas')),
+        # Valoración inicial de lo que ya hay en la tabla
+        inicial=acumular(filas(1, tabla)).strip(),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0011_valoracion_stock'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            triggers('materias_primas', 'familia_id', 'unidad_medida', 'proveedor', 'precio_unitario'),
+            BORRAR.format(tabla='materias_primas'),
+        ),
+        migrations.RunSQL(
+            triggers('productos', 'NULL::bigint', 'NULL::varchar', 'NULL::varchar', 'precio_venta'),
+            BORRAR.format(tabla='productos'),
+        ),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 6.0 on 2026-10-17 19:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0012_triggers_valoracion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LineaPedidoCompra',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stock_actual', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Stock actual')),
+                ('stock_minimo', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Stock mínimo')),
+                ('consumo_diario', models.DecimalField(decimal_places=4, default=0, max_digits=12, verbose_name='Consumo diario')),
+                ('cantidad', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Cantidad')),
+                ('precio_unitario', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Precio unitario')),
+                ('importe', models.DecimalField(decimal_places=2, max_digits=14, verbose_name='Importe')),
+            ],
+            options={
+                'verbose_name': 'Línea de pedido de compra',
+                'verbose_name_plural': 'Líneas de pedido de compra',
+                'db_table': 'lineas_pedido_compra',
+                'ordering': ['pedido', 'id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PedidoCompra',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('proveedor', models.CharField(blank=True, max_length=200, verbose_name='Proveedor')),
+                ('estado', models.CharField(choices=[('borrador', 'Borrador'), ('aprobado', 'Aprobado'), ('descartado', 'Descartado')], default='borrador', max_length=20, verbose_name='Estado')),
+                ('lineas', models.IntegerField(default=0, verbose_name='Líneas')),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Total')),
+            ],
+            options={
+                'verbose_name': 'Pedido de compra',
+                'verbose_name_plural': 'Pedidos de compra',
+                'db_table': 'pedidos_compra',
+                'ordering': ['propuesta', 'proveedor'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PropuestaCompra',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateTimeField(auto_now_add=True, verbose_name='Fecha')),
+                ('cobertura_dias', models.PositiveIntegerField(default=0, verbose_name='Días de cobertura')),
+                ('dias_historial', models.PositiveIntegerField(default=90, verbose_name='Días de historial')),
+                ('estado', models.CharField(choices=[('borrador', 'Borrador'), ('aprobada', 'Aprobada'), ('descartada', 'Descartada')], default='borrador', max_length=20, verbose_name='Estado')),
+                ('lineas', models.IntegerField(default=0, verbose_name='Líneas')),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Total')),
+            ],
+            options={
+                'verbose_name': 'Propuesta de compra',
+                'verbose_name_plural': 'Propuestas de compra',
+                'db_table': 'propuestas_compra',
+                'ordering': ['-fecha', '-id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='movimientostock',
+            index=models.Index(condition=models.Q(('materia_prima__isnull', False), ('tipo', 'consumo')), fields=['fecha', 'materia_prima'], name='mov_consumo_fecha_idx'),
+        ),
+        migrations.AddField(
+            model_name='lineapedidocompra',
+            name='materia_prima',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='stock.materiaprima', verbose_name='Materia prima'),
+        ),
+        migrations.AddField(
+            model_name='lineapedidocompra',
+            name='pedido',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lineas_pedido', to='stock.pedidocompra', verbose_name='Pedido de compra'),
+        ),
+        migrations.AddField(
+            model_name='pedidocompra',
+            name='propuesta',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pedidos', to='stock.propuestacompra', verbose_name='Propuesta'),
+        ),
+        migrations.AddConstraint(
+            model_name='pedidocompra',
+            constraint=models.UniqueConstraint(fields=('propuesta', 'proveedor'), name='pedido_compra_proveedor_unico'),
+        ),
+    ]
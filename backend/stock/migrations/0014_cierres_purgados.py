@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 09:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0013_propuestas_compra'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cierrestock',
+            name='movimientos_purgados',
+            field=models.BooleanField(default=False, verbose_name='Movimientos purgados'),
+        ),
+    ]
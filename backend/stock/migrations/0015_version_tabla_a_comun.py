@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 09:25
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0014_cierres_purgados'),
+        ('comun', '0001_initial'),
+    ]
+
+    # El modelo pasa a comun; la tabla versiones_tabla se queda como está
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[migrations.DeleteModel(name='VersionTabla')],
+        ),
+    ]
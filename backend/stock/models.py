@@ -1,4 +1,10 @@
-from django.db import models
+import re
+from decimal import Decimal
+
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import connection, models, transaction
+from django.utils import timezone
 
 # ========================================
 # MODELOS PARA CODIFICACIÓN DE PRODUCTOS
@@ -10,6 +16,8 @@ class Familia(models.Model):
     nombre = models.CharField(max_length=100)  # "Madera", "Consumibles"
     descripcion = models.TextField(blank=True, null=True)
     activo = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de creación")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Última modificación")
     
     class Meta:
         db_table = 'familias'
@@ -33,6 +41,8 @@ class ModeloProducto(models.Model):
     tipo = models.CharField(max_length=10, choices=TIPO_CHOICES)  # Para qué se usa
     descripcion = models.TextField(blank=True, null=True)
     activo = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de creación")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Última modificación")
     
     class Meta:
         db_table = 'modelos_producto'
@@ -44,6 +54,82 @@ class ModeloProducto(models.Model):
         return f"{self.codigo} - {self.nombre}"
 
 
+class SecuenciaCodigoManager(models.Manager):
+    
+    def reservar(self, model, prefijo, cantidad=1, campo='codigo', patron=None):
+        """
+        Reserva `cantidad` números consecutivos para el prefijo y devuelve el primero.
+        
+        En régimen normal es un único UPDATE ... RETURNING sobre la fila del
+        contador, que queda bloqueada hasta el fin de la transacción, así que dos
+        altas simultáneas nunca obtienen el mismo número. La primera vez que se usa
+        un prefijo se siembra con el mayor número ya existente en el `campo` de
+        model, leído con la expresión regular `patron` (por defecto
+        "<prefijo>-<número>").
+        """
+        tabla = connection.ops.quote_name(self.model._meta.db_table)
+        ambito = model._meta.db_table
+        columna = connection.ops.quote_name(model._meta.get_field(campo).column)
+        if patron is None:
+            patron = f"^{re.escape(prefijo)}-([0-9]+)$"
+        
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {tabla} SET ultimo = ultimo + %s "
+                f"WHERE ambito = %s AND prefijo = %s RETURNING ultimo",
+                [cantidad, ambito, prefijo],
+            )
+            fila = cursor.fetchone()
+            if fila is None:
+                cursor.execute(
+                    f"""
+                    INSERT INTO {tabla} (ambito, prefijo, ultimo)
+                    SELECT %(ambito)s, %(prefijo)s,
+                           COALESCE(MAX(substring({columna} FROM %(patron)s)::bigint), 0) + %(cantidad)s
+                    FROM {connection.ops.quote_name(ambito)}
+                    WHERE {columna} ~ %(patron)s
+                    ON CONFLICT (ambito, prefijo)
+                    DO UPDATE SET ultimo = {tabla}.ultimo + %(cantidad)s
+                    RETURNING ultimo
+                    """,
+                    {
+                        'ambito': ambito,
+                        'prefijo': prefijo,
+                        'cantidad': cantidad,
+                        'patron': patron,
+                    },
+                )
+                fila = cursor.fetchone()
+        
+        return fila[0] - cantidad + 1
+
+
+class SecuenciaCodigo(models.Model):
+    """
+    Contador del último número asignado a cada prefijo de código
+    ("01-MARTINA" en materias primas, "MARTINA" en productos) y a cada serie
+    de números de pedido ("2026").
+    Se indexa por el prefijo y no por la familia/modelo: si se renombra el código
+    de una familia, la numeración del nuevo prefijo empieza de cero sin chocar.
+    """
+    ambito = models.CharField(max_length=50)  # Tabla: "materias_primas", "productos", "pedidos_pedido"
+    prefijo = models.CharField(max_length=50)
+    ultimo = models.BigIntegerField(default=0)
+    
+    objects = SecuenciaCodigoManager()
+    
+    class Meta:
+        db_table = 'secuencias_codigo'
+        verbose_name = 'Secuencia de Código'
+        verbose_name_plural = 'Secuencias de Código'
+        constraints = [
+            models.UniqueConstraint(fields=['ambito', 'prefijo'], name='secuencia_ambito_prefijo_unica'),
+        ]
+    
+    def __str__(self):
+        return f"{self.prefijo}: {self.ultimo}"
+
+
 # ========================================
 # MODELOS DE STOCK MODIFICADOS
 # ========================================
@@ -92,11 +178,38 @@ class MateriaPrima(models.Model):
     
     activo = models.BooleanField(default=True)
     
+    # Calculado por la base de datos en cada escritura (también en UPDATE masivos)
+    en_alerta = models.GeneratedField(
+        expression=models.Q(stock_actual__lte=models.F('stock_minimo')),
+        output_field=models.BooleanField(),
+        db_persist=True,
+        verbose_name="En alerta",
+    )
+    
+    # Vector de búsqueda (código, nombre, familia y modelo), lo mantienen los
+    # triggers de la migración 0009
+    busqueda = SearchVectorField(null=True, editable=False)
+    
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de creación")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Última modificación")
+    
     class Meta:
         db_table = 'materias_primas'
         verbose_name = 'Materia Prima'
         verbose_name_plural = 'Materias Primas'
         ordering = ['codigo']
+        indexes = [
+            models.Index(
+                fields=['codigo'],
+                condition=models.Q(activo=True, en_alerta=True),
+                name='mp_activas_en_alerta_idx',
+            ),
+            # Paginación por cursor: un índice (campo, id) por ordenación admitida
+            models.Index(fields=['nombre', 'id'], name='mp_nombre_id_idx'),
+            models.Index(fields=['stock_actual', 'id'], name='mp_stock_id_idx'),
+            models.Index(fields=['created_at', 'id'], name='mp_created_id_idx'),
+            GinIndex(fields=['busqueda'], name='mp_busqueda_idx'),
+        ]
     
     def __str__(self):
         return f"{self.codigo} - {self.nombre}"
@@ -110,28 +223,20 @@ class MateriaPrima(models.Model):
         """Generar código automáticamente si no existe"""
         if not self.codigo and self.familia and self.modelo:
             self.codigo = self._generar_codigo()
-        super().save(*args, **kwargs)
+        _guardar_con_movimiento(self, 'materia_prima', super().save, *args, **kwargs)
     
     def _generar_codigo(self):
         """Genera código en formato: 01-MARTINA-001"""
-        familia_code = self.familia.codigo
-        modelo_code = self.modelo.codigo
-        
-        # Buscar el último secuencial para esta familia y modelo
-        ultimo = MateriaPrima.objects.filter(
-            familia=self.familia,
-            modelo=self.modelo
-        ).order_by('-codigo').first()
-        
-        if ultimo:
-            # Extraer el número al final: "01-MARTINA-001" -> 001
-            partes = ultimo.codigo.split('-')
-            numero = int(partes[-1]) + 1
-        else:
-            numero = 1
+        return MateriaPrima.generar_codigos(self.familia, self.modelo)[0]
+    
+    @classmethod
+    def generar_codigos(cls, familia, modelo, cantidad=1):
+        """Reserva un bloque de `cantidad` códigos consecutivos para familia y modelo"""
+        prefijo = f"{familia.codigo}-{modelo.codigo}"
+        primero = SecuenciaCodigo.objects.reservar(cls, prefijo, cantidad)
         
         # Formatear: 01-MARTINA-001
-        return f"{familia_code}-{modelo_code}-{numero:03d}"
+        return [f"{prefijo}-{numero:03d}" for numero in range(primero, primero + cantidad)]
 
 
 class Producto(models.Model):
@@ -160,11 +265,39 @@ class Producto(models.Model):
     
     activo = models.BooleanField(default=True)
     
+    # Calculado por la base de datos en cada escritura (también en UPDATE masivos)
+    en_alerta = models.GeneratedField(
+        expression=models.Q(stock_actual__lte=models.F('stock_minimo')),
+        output_field=models.BooleanField(),
+        db_persist=True,
+        verbose_name="En alerta",
+    )
+    
+    # Vector de búsqueda (código, nombre, familia y modelo), lo mantienen los
+    # triggers de la migración 0009
+    busqueda = SearchVectorField(null=True, editable=False)
+    
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de creación")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Última modificación")
+    
     class Meta:
         db_table = 'productos'
         verbose_name = 'Producto'
         verbose_name_plural = 'Productos'
         ordering = ['codigo']
+        indexes = [
+            models.Index(
+                fields=['codigo'],
+                condition=models.Q(activo=True, en_alerta=True),
+                name='prod_activos_en_alerta_idx',
+            ),
+            # Paginación por cursor: un índice (campo, id) por ordenación admitida
+            models.Index(fields=['nombre', 'id'], name='prod_nombre_id_idx'),
+            models.Index(fields=['stock_actual', 'id'], name='prod_stock_id_idx'),
+            models.Index(fields=['precio_venta', 'id'], name='prod_precio_id_idx'),
+            models.Index(fields=['created_at', 'id'], name='prod_created_id_idx'),
+            GinIndex(fields=['busqueda'], name='prod_busqueda_idx'),
+        ]
     
     def __str__(self):
         return f"{self.codigo} - {self.nombre}"
@@ -178,23 +311,302 @@ class Producto(models.Model):
         """Generar código automáticamente si no existe"""
         if not self.codigo and self.modelo:
             self.codigo = self._generar_codigo()
-        super().save(*args, **kwargs)
+        _guardar_con_movimiento(self, 'producto', super().save, *args, **kwargs)
     
     def _generar_codigo(self):
         """Genera código en formato: MARTINA-001"""
-        modelo_code = self.modelo.codigo
-        
-        # Buscar el último secuencial para este modelo
-        ultimo = Producto.objects.filter(
-            modelo=self.modelo
-        ).order_by('-codigo').first()
-        
-        if ultimo:
-            # Extraer el número al final: "MARTINA-001" -> 001
-            partes = ultimo.codigo.split('-')
-            numero = int(partes[-1]) + 1
-        else:
-            numero = 1
+        return Producto.generar_codigos(self.modelo)[0]
+    
+    @classmethod
+    def generar_codigos(cls, modelo, cantidad=1):
+        """Reserva un bloque de `cantidad` códigos consecutivos para el modelo"""
+        prefijo = modelo.codigo
+        primero = SecuenciaCodigo.objects.reservar(cls, prefijo, cantidad)
         
         # Formatear: MARTINA-001
-        return f"{modelo_code}-{numero:03d}"
\ No newline at end of file
+        return [f"{prefijo}-{numero:03d}" for numero in range(primero, primero + cantidad)]
+
+
+# ========================================
+# CONTADORES DE ALERTAS DE STOCK
+# ========================================
+
+class ContadorAlertaStock(models.Model):
+    """
+    Número de artículos activos en alerta por familia y modelo.
+    Lo mantienen triggers de base de datos en materias_primas y productos
+    (ver migración 0006), así que cubre también los UPDATE masivos.
+    """
+    AMBITOS = [
+        ('materias_primas', 'Materias primas'),
+        ('productos', 'Productos'),
+    ]
+    
+    ambito = models.CharField(max_length=20, choices=AMBITOS)
+    familia = models.ForeignKey(Familia, on_delete=models.CASCADE, null=True, blank=True)
+    modelo = models.ForeignKey(ModeloProducto, on_delete=models.CASCADE, null=True, blank=True)
+    alertas = models.IntegerField(default=0)
+    
+    class Meta:
+        db_table = 'contadores_alerta_stock'
+        verbose_name = 'Contador de Alertas'
+        verbose_name_plural = 'Contadores de Alertas'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['ambito', 'familia', 'modelo'],
+                nulls_distinct=False,
+                name='contador_alerta_unico',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.ambito} {self.familia_id}/{self.modelo_id}: {self.alertas}"
+
+
+# ========================================
+# VALORACIÓN DE INVENTARIO
+# ========================================
+
+class ValoracionStock(models.Model):
+    """
+    Valor del stock agregado por familia, modelo, unidad de medida y proveedor.
+    Lo mantienen triggers por sentencia en materias_primas y productos (ver
+    migración 0012) con la diferencia entre las filas nuevas y las viejas, así
+    que cubre los cambios de stock, de precio y de clasificación, también en
+    UPDATE masivos. `recalcular_valoracion` lo reconstruye desde cero.
+    
+    Los productos se valoran a precio de venta (no hay coste de fabricación)
+    y no tienen familia, unidad ni proveedor.
+    """
+    AMBITOS = ContadorAlertaStock.AMBITOS
+    
+    ambito = models.CharField(max_length=20, choices=AMBITOS)
+    familia = models.ForeignKey(Familia, on_delete=models.CASCADE, null=True, blank=True)
+    modelo = models.ForeignKey(ModeloProducto, on_delete=models.CASCADE, null=True, blank=True)
+    unidad_medida = models.CharField(max_length=20, null=True, blank=True)
+    proveedor = models.CharField(max_length=200, null=True, blank=True)
+    articulos = models.IntegerField(default=0)
+    unidades = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    # Cuatro decimales: producto exacto de stock (2) por precio (2), sin redondeos acumulados
+    valor = models.DecimalField(max_digits=20, decimal_places=4, default=0)
+    
+    class Meta:
+        db_table = 'valoraciones_stock'
+        verbose_name = 'Valoración de stock'
+        verbose_name_plural = 'Valoraciones de stock'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['ambito', 'familia', 'modelo', 'unidad_medida', 'proveedor'],
+                nulls_distinct=False,
+                name='valoracion_stock_unica',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.ambito} {self.familia_id}/{self.modelo_id}: {self.valor}"
+
+
+# ========================================
+# LIBRO DE MOVIMIENTOS DE STOCK
+# ========================================
+
+class MovimientoStock(models.Model):
+    """
+    Movimiento de stock (solo se insertan, nunca se modifican).
+    stock_actual de MateriaPrima/Producto es la foto del saldo que se mantiene
+    sumando cada movimiento en la misma transacción.
+    """
+    TIPOS = [
+        ('recepcion', 'Recepción'),
+        ('consumo', 'Consumo'),
+        ('venta', 'Venta'),
+        ('ajuste', 'Ajuste'),
+    ]
+    
+    tipo = models.CharField(max_length=20, choices=TIPOS, verbose_name="Tipo")
+    materia_prima = models.ForeignKey(MateriaPrima, on_delete=models.CASCADE, null=True, blank=True,
+                                      related_name='movimientos', verbose_name="Materia prima")
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, null=True, blank=True,
+                                 related_name='movimientos', verbose_name="Producto")
+    cantidad = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="Cantidad")
+    fecha = models.DateTimeField(default=timezone.now, verbose_name="Fecha")
+    referencia = models.CharField(max_length=100, blank=True, verbose_name="Referencia")
+    
+    class Meta:
+        db_table = 'movimientos_stock'
+        verbose_name = 'Movimiento de Stock'
+        verbose_name_plural = 'Movimientos de Stock'
+        ordering = ['-fecha', '-id']
+        indexes = [
+            models.Index(fields=['materia_prima', 'fecha'], name='mov_materia_fecha_idx'),
+            models.Index(fields=['producto', 'fecha'], name='mov_producto_fecha_idx'),
+            # Consumo reciente de todas las materias primas (planificador de reposición)
+            models.Index(
+                fields=['fecha', 'materia_prima'],
+                condition=models.Q(tipo='consumo', materia_prima__isnull=False),
+                name='mov_consumo_fecha_idx',
+            ),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=(
+                    models.Q(materia_prima__isnull=False, producto__isnull=True)
+                    | models.Q(materia_prima__isnull=True, producto__isnull=False)
+                ),
+                name='movimiento_un_solo_articulo',
+            ),
+        ]
+    
+    def __str__(self):
+        articulo = self.materia_prima or self.producto
+        return f"{self.get_tipo_display()} {self.cantidad} - {articulo}"
+
+
+class CierreStock(models.Model):
+    """
+    Punto de control del libro de movimientos: stock acumulado de un artículo
+    incluyendo todos sus movimientos con fecha <= fecha del cierre.
+    Lo genera el comando compactar_movimientos. movimientos_purgados indica que
+    los movimientos hasta la fecha del cierre ya se borraron del libro.
+    """
+    materia_prima = models.ForeignKey(MateriaPrima, on_delete=models.CASCADE, null=True, blank=True,
+                                      related_name='cierres', verbose_name="Materia prima")
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, null=True, blank=True,
+                                 related_name='cierres', verbose_name="Producto")
+    fecha = models.DateTimeField(verbose_name="Fecha de cierre")
+    stock = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="Stock")
+    movimientos_purgados = models.BooleanField(default=False, verbose_name="Movimientos purgados")
+    
+    class Meta:
+        db_table = 'cierres_stock'
+        verbose_name = 'Cierre de Stock'
+        verbose_name_plural = 'Cierres de Stock'
+        ordering = ['-fecha']
+        constraints = [
+            models.UniqueConstraint(fields=['materia_prima', 'fecha'], name='cierre_materia_fecha_unico'),
+            models.UniqueConstraint(fields=['producto', 'fecha'], name='cierre_producto_fecha_unico'),
+            models.CheckConstraint(
+                condition=(
+                    models.Q(materia_prima__isnull=False, producto__isnull=True)
+                    | models.Q(materia_prima__isnull=True, producto__isnull=False)
+                ),
+                name='cierre_un_solo_articulo',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"Cierre {self.fecha:%Y-%m-%d %H:%M} - {self.materia_prima or self.producto}: {self.stock}"
+
+
+
+# ========================================
+# PROPUESTAS DE COMPRA (REPOSICIÓN)
+# ========================================
+
+class PropuestaCompra(models.Model):
+    """
+    Resultado de una pasada del planificador de reposición
+    (services.generar_propuesta_compra): un pedido de compra en borrador por
+    proveedor con las materias primas que hay que reponer.
+    """
+    ESTADOS = [
+        ('borrador', 'Borrador'),
+        ('aprobada', 'Aprobada'),
+        ('descartada', 'Descartada'),
+    ]
+    
+    fecha = models.DateTimeField(auto_now_add=True, verbose_name="Fecha")
+    # Días de consumo que se quieren cubrir por encima del stock mínimo
+    cobertura_dias = models.PositiveIntegerField(default=0, verbose_name="Días de cobertura")
+    # Días de consumos registrados con los que se calcula el consumo diario
+    dias_historial = models.PositiveIntegerField(default=90, verbose_name="Días de historial")
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='borrador', verbose_name="Estado")
+    lineas = models.IntegerField(default=0, verbose_name="Líneas")
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Total")
+    
+    class Meta:
+        db_table = 'propuestas_compra'
+        verbose_name = 'Propuesta de compra'
+        verbose_name_plural = 'Propuestas de compra'
+        ordering = ['-fecha', '-id']
+    
+    def __str__(self):
+        return f"Propuesta {self.id} ({self.fecha:%Y-%m-%d}) - {self.get_estado_display()}"
+
+
+class PedidoCompra(models.Model):
+    """Pedido de compra de una propuesta para un proveedor ('' si el artículo no tiene)"""
+    ESTADOS = [
+        ('borrador', 'Borrador'),
+        ('aprobado', 'Aprobado'),
+        ('descartado', 'Descartado'),
+    ]
+    
+    propuesta = models.ForeignKey(PropuestaCompra, on_delete=models.CASCADE, related_name='pedidos',
+                                  verbose_name="Propuesta")
+    proveedor = models.CharField(max_length=200, blank=True, verbose_name="Proveedor")
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='borrador', verbose_name="Estado")
+    lineas = models.IntegerField(default=0, verbose_name="Líneas")
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Total")
+    
+    class Meta:
+        db_table = 'pedidos_compra'
+        verbose_name = 'Pedido de compra'
+        verbose_name_plural = 'Pedidos de compra'
+        ordering = ['propuesta', 'proveedor']
+        constraints = [
+            models.UniqueConstraint(fields=['propuesta', 'proveedor'], name='pedido_compra_proveedor_unico'),
+        ]
+    
+    def __str__(self):
+        return f"{self.proveedor or 'Sin proveedor'} - {self.total}"
+
+
+class LineaPedidoCompra(models.Model):
+    """Materia prima a reponer, con los datos de stock con los que se calculó"""
+    pedido = models.ForeignKey(PedidoCompra, on_delete=models.CASCADE, related_name='lineas_pedido',
+                               verbose_name="Pedido de compra")
+    materia_prima = models.ForeignKey(MateriaPrima, on_delete=models.PROTECT, verbose_name="Materia prima")
+    stock_actual = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Stock actual")
+    stock_minimo = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Stock mínimo")
+    consumo_diario = models.DecimalField(max_digits=12, decimal_places=4, default=0,
+                                         verbose_name="Consumo diario")
+    cantidad = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Cantidad")
+    precio_unitario = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Precio unitario")
+    importe = models.DecimalField(max_digits=14, decimal_places=2, verbose_name="Importe")
+    
+    class Meta:
+        db_table = 'lineas_pedido_compra'
+        verbose_name = 'Línea de pedido de compra'
+        verbose_name_plural = 'Líneas de pedido de compra'
+        ordering = ['pedido', 'id']
+    
+    def __str__(self):
+        return f"{self.materia_prima_id} x{self.cantidad}"
+
+
+def _guardar_con_movimiento(instancia, campo, guardar, *args, **kwargs):
+    """
+    Guarda un artículo registrando como movimiento de ajuste la diferencia
+    entre el stock_actual guardado y el que había en base de datos.
+    """
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and 'stock_actual' not in update_fields:
+        return guardar(*args, **kwargs)
+    
+    with transaction.atomic():
+        anterior = None
+        if instancia.pk is not None:
+            anterior = type(instancia).objects.select_for_update().filter(
+                pk=instancia.pk
+            ).values_list('stock_actual', flat=True).first()
+        guardar(*args, **kwargs)
+        
+        delta = Decimal(str(instancia.stock_actual)) - (anterior or 0)
+        if delta:
+            MovimientoStock.objects.create(
+                tipo='ajuste',
+                cantidad=delta,
+                referencia='Alta' if anterior is None else 'Edición manual',
+                **{campo: instancia},
+            )
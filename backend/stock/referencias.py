@@ -0,0 +1,116 @@
+"""
+Caché en memoria de los datos de referencia: familias y modelos de producto.
+
+Son tablas pequeñas que cambian unas pocas veces al año, pero los desplegables
+del frontend y los serializers de stock las consultan constantemente. Cada
+proceso guarda una copia completa junto con el número de versión con el que la
+cargó. La versión vive en la caché compartida de Django (alias 'referencias')
+y la incrementan las señales de stock/signals.py al guardar o borrar una familia
+o un modelo. Cada proceso compara su versión con la compartida como mucho una
+vez cada INTERVALO_COMPROBACION segundos y recarga si ha cambiado.
+"""
+import threading
+import time
+
+from django.core.cache import caches
+
+ALIAS_CACHE = 'referencias'
+CLAVE_VERSION = 'stock:referencias:version'
+
+# Segundos entre comprobaciones de la versión compartida (otros procesos)
+INTERVALO_COMPROBACION = 1.0
+
+_lock = threading.Lock()
+_estado = {'version': None, 'comprobado': 0.0, 'datos': None}
+_contadores = {'aciertos': 0, 'fallos': 0}
+
+
+def _cache():
+    return caches[ALIAS_CACHE]
+
+
+def _version_compartida():
+    version = _cache().get(CLAVE_VERSION)
+    if version is None:
+        _cache().add(CLAVE_VERSION, 1, timeout=None)
+        version = _cache().get(CLAVE_VERSION, 1)
+    return version
+
+
+def _cargar():
+    """Lee las dos tablas completas (dos consultas) y las indexa por id"""
+    from .models import Familia, ModeloProducto
+    from .serializers import FamiliaSerializer, ModeloProductoSerializer
+
+    familias = [dict(f) for f in FamiliaSerializer(Familia.objects.order_by('codigo'), many=True).data]
+    modelos = [dict(m) for m in ModeloProductoSerializer(ModeloProducto.objects.order_by('codigo'), many=True).data]
+    return {
+        'familias': familias,
+        'modelos': modelos,
+        'familias_por_id': {f['id']: f for f in familias},
+        'modelos_por_id': {m['id']: m for m in modelos},
+    }
+
+
+def _datos():
+    ahora = time.monotonic()
+    with _lock:
+        if _estado['datos'] is not None:
+            if ahora - _estado['comprobado'] < INTERVALO_COMPROBACION:
+                _contadores['aciertos'] += 1
+                return _estado['datos']
+            if _version_compartida() == _estado['version']:
+                _estado['comprobado'] = ahora
+                _contadores['aciertos'] += 1
+                return _estado['datos']
+
+        _contadores['fallos'] += 1
+        # La versión se lee antes que los datos: si cambia durante la carga,
+        # la siguiente comprobación vuelve a cargar
+        version = _version_compartida()
+        _estado.update(version=version, comprobado=ahora, datos=_cargar())
+        return _estado['datos']
+
+
+def invalidar():
+    """Incrementa la versión compartida y descarta la copia de este proceso"""
+    try:
+        _cache().incr(CLAVE_VERSION)
+    except ValueError:
+        _cache().add(CLAVE_VERSION, 1, timeout=None)
+    with _lock:
+        _estado['datos'] = None
+
+
+# ========================================
+# LECTURA
+# ========================================
+
+def familias():
+    """Todas las familias serializadas, por código"""
+    return _datos()['familias']
+
+
+def modelos():
+    """Todos los modelos serializados, por código"""
+    return _datos()['modelos']
+
+
+def familia(familia_id):
+    """Familia serializada con ese id, o None"""
+    return _datos()['familias_por_id'].get(familia_id)
+
+
+def modelo(modelo_id):
+    """Modelo serializado con ese id, o None"""
+    return _datos()['modelos_por_id'].get(modelo_id)
+
+
+def estadisticas():
+    """Aciertos y fallos de este proceso desde que arrancó"""
+    with _lock:
+        return {
+            'version': _estado['version'],
+            'aciertos': _contadores['aciertos'],
+            'fallos': _contadores['fallos'],
+        }
@@ -1,5 +1,25 @@
 from rest_framework import serializers
-from .models import Producto, MateriaPrima, Familia, ModeloProducto
+from . import referencias
+from .models import (
+    Producto, MateriaPrima, Familia, ModeloProducto, MovimientoStock,
+    PropuestaCompra, PedidoCompra, LineaPedidoCompra,
+)
+
+
+class ReferenciaField(serializers.ReadOnlyField):
+    """
+    Atributo de la familia o del modelo de un artículo leído de la caché de
+    referencias (stock/referencias.py), sin join ni consulta adicional.
+    """
+    def __init__(self, tipo, atributo, **kwargs):
+        kwargs['source'] = f'{tipo}_id'
+        super().__init__(**kwargs)
+        self.tipo = tipo
+        self.atributo = atributo
+    
+    def to_representation(self, value):
+        datos = getattr(referencias, self.tipo)(value)
+        return datos[self.atributo] if datos else None
 
 
 # ========================================
@@ -48,8 +68,8 @@ class ModeloProductoSerializer(serializers.ModelSerializer):
 
 class MateriaPrimaSerializer(serializers.ModelSerializer):
     """Serializer para materias primas con relaciones"""
-    familia_nombre = serializers.CharField(source='familia.nombre', read_only=True)
-    modelo_nombre = serializers.CharField(source='modelo.nombre', read_only=True)
+    familia_nombre = ReferenciaField('familia', 'nombre')
+    modelo_nombre = ReferenciaField('modelo', 'nombre')
     unidad_medida_display = serializers.CharField(source='get_unidad_medida_display', read_only=True)
     alerta_stock = serializers.SerializerMethodField()
     
@@ -99,7 +119,7 @@ class MateriaPrimaSerializer(serializers.ModelSerializer):
 
 class ProductoSerializer(serializers.ModelSerializer):
     """Serializer para productos finales con relaciones"""
-    modelo_nombre = serializers.CharField(source='modelo.nombre', read_only=True)
+    modelo_nombre = ReferenciaField('modelo', 'nombre')
     alerta_stock = serializers.SerializerMethodField()
     
     class Meta:
@@ -148,8 +168,8 @@ class ProductoSerializer(serializers.ModelSerializer):
 
 class MateriaPrimaMinimalSerializer(serializers.ModelSerializer):
     """Serializer simplificado para listar materias primas"""
-    familia_codigo = serializers.CharField(source='familia.codigo', read_only=True)
-    modelo_codigo = serializers.CharField(source='modelo.codigo', read_only=True)
+    familia_codigo = ReferenciaField('familia', 'codigo')
+    modelo_codigo = ReferenciaField('modelo', 'codigo')
     
     class Meta:
         model = MateriaPrima
@@ -167,7 +187,7 @@ class MateriaPrimaMinimalSerializer(serializers.ModelSerializer):
 
 class ProductoMinimalSerializer(serializers.ModelSerializer):
     """Serializer simplificado para listar productos"""
-    modelo_codigo = serializers.CharField(source='modelo.codigo', read_only=True)
+    modelo_codigo = ReferenciaField('modelo', 'codigo')
     
     class Meta:
         model = Producto
@@ -179,4 +199,92 @@ class ProductoMinimalSerializer(serializers.ModelSerializer):
             'stock_actual',
             'stock_minimo',
             'precio_venta',
-        ]
\ No newline at end of file
+        ]
+
+
+# ========================================
+# SERIALIZERS DEL LIBRO DE MOVIMIENTOS
+# ========================================
+
+class MovimientoStockSerializer(serializers.ModelSerializer):
+    """Serializer de solo lectura para los movimientos de stock"""
+    tipo_display = serializers.CharField(source='get_tipo_display', read_only=True)
+    
+    class Meta:
+        model = MovimientoStock
+        fields = [
+            'id',
+            'tipo',
+            'tipo_display',
+            'materia_prima',
+            'producto',
+            'cantidad',
+            'fecha',
+            'referencia',
+        ]
+        read_only_fields = fields
+
+
+# ========================================
+# SERIALIZERS DE PROPUESTAS DE COMPRA
+# ========================================
+
+class LineaPedidoCompraSerializer(serializers.ModelSerializer):
+    """Línea de un pedido de compra propuesto"""
+    materia_prima_codigo = serializers.CharField(source='materia_prima.codigo', read_only=True)
+    materia_prima_nombre = serializers.CharField(source='materia_prima.nombre', read_only=True)
+    
+    class Meta:
+        model = LineaPedidoCompra
+        fields = [
+            'id',
+            'materia_prima',
+            'materia_prima_codigo',
+            'materia_prima_nombre',
+            'stock_actual',
+            'stock_minimo',
+            'consumo_diario',
+            'cantidad',
+            'precio_unitario',
+            'importe',
+        ]
+        read_only_fields = fields
+
+
+class PedidoCompraSerializer(serializers.ModelSerializer):
+    """Pedido de compra propuesto para un proveedor, con sus líneas"""
+    estado_display = serializers.CharField(source='get_estado_display', read_only=True)
+    lineas_pedido = LineaPedidoCompraSerializer(many=True, read_only=True)
+    
+    class Meta:
+        model = PedidoCompra
+        fields = ['id', 'proveedor', 'estado', 'estado_display', 'lineas', 'total', 'lineas_pedido']
+        read_only_fields = fields
+
+
+class PropuestaCompraSerializer(serializers.ModelSerializer):
+    """Cabecera de una propuesta de compra (listado)"""
+    estado_display = serializers.CharField(source='get_estado_display', read_only=True)
+    
+    class Meta:
+        model = PropuestaCompra
+        fields = [
+            'id',
+            'fecha',
+            'cobertura_dias',
+            'dias_historial',
+            'estado',
+            'estado_display',
+            'lineas',
+            'total',
+        ]
+        read_only_fields = fields
+
+
+class PropuestaCompraDetalleSerializer(PropuestaCompraSerializer):
+    """Propuesta de compra con sus pedidos por proveedor y las líneas"""
+    pedidos = PedidoCompraSerializer(many=True, read_only=True)
+    
+    class Meta(PropuestaCompraSerializer.Meta):
+        fields = PropuestaCompraSerializer.Meta.fields + ['pedidos']
+        read_only_fields = fields
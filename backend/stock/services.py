@@ -0,0 +1,536 @@
+"""
+Servicios de stock: operaciones masivas que trabajan directamente con la base de datos
+"""
+from datetime import datetime, time
+from decimal import Decimal, InvalidOperation
+
+from django.db import DataError, connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import (
+    MateriaPrima, MovimientoStock, CierreStock, ValoracionStock,
+    PropuestaCompra, PedidoCompra, LineaPedidoCompra,
+)
+
+
+class AjusteStockError(ValueError):
+    """Error de validación en una lista de ajustes de stock"""
+
+
+class PropuestaCompraError(ValueError):
+    """Parámetros no válidos o propuesta de compra ya cerrada"""
+
+
+class StockHistoricoError(ValueError):
+    """El stock pedido cae en un tramo cuyos movimientos ya se purgaron"""
+
+
+# ========================================
+# AJUSTE MASIVO DE STOCK
+# ========================================
+
+def _campo_movimiento(model):
+    """Nombre del campo de MovimientoStock/CierreStock que apunta a model"""
+    for field in MovimientoStock._meta.get_fields():
+        if field.is_relation and field.related_model is model:
+            return field.name
+    raise ValueError(f"{model.__name__} no tiene libro de movimientos")
+
+
+def _validar_lineas(model, datos):
+    """
+    Valida la lista [{"id": 1, "cantidad": 10, "tipo": "recepcion"}, ...].
+    Devuelve las líneas normalizadas como (id, tipo, cantidad).
+    """
+    if not isinstance(datos, list):
+        raise AjusteStockError("Debe enviar una lista")
+
+    entero = model._meta.get_field('stock_actual').get_internal_type() == 'IntegerField'
+    tipos = dict(MovimientoStock.TIPOS)
+    lineas = []
+
+    for posicion, item in enumerate(datos):
+        if not isinstance(item, dict) or 'id' not in item:
+            raise AjusteStockError(f"Elemento {posicion}: se requiere 'id'")
+        try:
+            item_id = int(item['id'])
+        except (TypeError, ValueError):
+            raise AjusteStockError(f"Elemento {posicion}: 'id' no es válido")
+
+        cantidad = item.get('cantidad', 0)
+        try:
+            cantidad = Decimal(str(cantidad))
+        except InvalidOperation:
+            raise AjusteStockError(f"Elemento {posicion}: 'cantidad' no es numérica")
+        if not cantidad.is_finite():
+            raise AjusteStockError(f"Elemento {posicion}: 'cantidad' no es numérica")
+        if entero:
+            if cantidad != cantidad.to_integral_value():
+                raise AjusteStockError(f"Elemento {posicion}: 'cantidad' debe ser entera")
+            cantidad = int(cantidad)
+
+        tipo = item.get('tipo', 'ajuste')
+        if tipo not in tipos:
+            raise AjusteStockError(f"Elemento {posicion}: tipo '{tipo}' no válido")
+
+        lineas.append((item_id, tipo, cantidad))
+
+    return lineas
+
+
+def ajustar_stock(model, datos, referencia=''):
+    """
+    Aplica una lista de ajustes de stock en una sola transacción.
+
+    Usa siempre tres consultas, sea cual sea el tamaño de la lista:
+    1. Bloquea las filas afectadas en orden de id (evita interbloqueos entre
+       dos entradas concurrentes que tocan los mismos artículos).
+    2. Inserta una fila en el libro de movimientos por cada línea.
+    3. Suma los deltas con un único UPDATE ... FROM unnest(...), de modo que
+       la lectura-modificación-escritura la hace la base de datos.
+
+    Devuelve (actualizados, no_encontrados): filas actualizadas como
+    [{"id", "codigo", "stock_actual"}] e ids que no existen.
+    """
+    lineas = _validar_lineas(model, datos)
+    deltas = {}
+    for item_id, _, cantidad in lineas:
+        deltas[item_id] = deltas.get(item_id, 0) + cantidad
+    if not deltas:
+        return [], []
+
+    ids = sorted(deltas)
+    tabla = connection.ops.quote_name(model._meta.db_table)
+    tabla_movimientos = connection.ops.quote_name(MovimientoStock._meta.db_table)
+    columna = connection.ops.quote_name(
+        MovimientoStock._meta.get_field(_campo_movimiento(model)).column
+    )
+    tipo_stock = model._meta.get_field('stock_actual').db_type(connection)
+
+    try:
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"SELECT id FROM {tabla} WHERE id = ANY(%s) ORDER BY id FOR UPDATE",
+                    [ids],
+                )
+                existentes = {fila[0] for fila in cursor.fetchall()}
+                if not existentes:
+                    return [], ids
+
+                cursor.execute(
+                    f"""
+                    INSERT INTO {tabla_movimientos} (tipo, {columna}, cantidad, fecha, referencia)
+                    SELECT v.tipo, v.id, v.cantidad, now(), %s
+                    FROM unnest(%s::bigint[], %s::varchar[], %s::numeric[]) AS v(id, tipo, cantidad)
+                    WHERE v.id = ANY(%s) AND v.cantidad <> 0
+                    """,
+                    [
+                        referencia,
+                        [linea[0] for linea in lineas],
+                        [linea[1] for linea in lineas],
+                        [linea[2] for linea in lineas],
+                        list(existentes),
+                    ],
+                )
+
+                cursor.execute(
+                    f"""
+                    UPDATE {tabla} AS t
+                    SET stock_actual = t.stock_actual + v.delta
+                    FROM unnest(%s::bigint[], %s::{tipo_stock}[]) AS v(id, delta)
+                    WHERE t.id = v.id
+                    RETURNING t.id, t.codigo, t.stock_actual
+                    """,
+                    [ids, [deltas[i] for i in ids]],
+                )
+                filas = sorted(cursor.fetchall())
+    except DataError:
+        raise AjusteStockError("El ajuste deja algún stock fuera de rango")
+
+    actualizados = [
+        {'id': fila_id, 'codigo': codigo, 'stock_actual': stock}
+        for fila_id, codigo, stock in filas
+    ]
+    no_encontrados = [i for i in ids if i not in existentes]
+    return actualizados, no_encontrados
+
+
+# ========================================
+# CONSULTAS HISTÓRICAS
+# ========================================
+
+def _fin_del_dia(fecha):
+    """Último instante del día local de fecha (el corte de compactar_movimientos)"""
+    return timezone.make_aware(datetime.combine(timezone.localtime(fecha).date(), time.max))
+
+
+def stock_a_fecha(instancia, fecha):
+    """
+    Stock de un artículo en una fecha: último cierre anterior a la fecha más
+    los movimientos posteriores a ese cierre. Nunca recorre el historial completo,
+    solo el tramo entre el cierre y la fecha (índice por artículo y fecha).
+
+    Si se purgaron los movimientos del día de la fecha solo quedan los cierres
+    diarios: lanza StockHistoricoError para una hora de ese día que no coincide
+    con un cierre, en lugar de devolver un saldo sin esos movimientos.
+    """
+    campo = _campo_movimiento(type(instancia))
+    cierres = CierreStock.objects.filter(**{campo: instancia}).values('fecha', 'stock')
+
+    # Último cierre hasta la fecha y primer cierre purgado de lo que queda del día
+    anterior = cierres.filter(fecha__lte=fecha).order_by('-fecha')[:1]
+    purgado = cierres.filter(
+        fecha__gt=fecha, fecha__lte=_fin_del_dia(fecha), movimientos_purgados=True
+    ).order_by('fecha')[:1]
+    cierre = None
+    for fila in anterior.union(purgado, all=True):
+        if fila['fecha'] > fecha:
+            raise StockHistoricoError(
+                f"Los movimientos del {timezone.localtime(fecha):%Y-%m-%d} se purgaron; "
+                f"consulte el cierre del día"
+            )
+        cierre = fila
+
+    movimientos = MovimientoStock.objects.filter(**{campo: instancia}, fecha__lte=fecha)
+    if cierre:
+        movimientos = movimientos.filter(fecha__gt=cierre['fecha'])
+    delta = movimientos.aggregate(total=Sum('cantidad'))['total'] or 0
+
+    stock = (cierre['stock'] if cierre else 0) + delta
+    if type(instancia)._meta.get_field('stock_actual').get_internal_type() == 'IntegerField':
+        return int(stock)
+    return stock
+
+
+def compactar_movimientos(hasta, purgar=False):
+    """
+    Genera un cierre en la fecha `hasta` para cada artículo con movimientos
+    desde su último cierre, con una sentencia por tipo de artículo.
+
+    Si purgar es True, antes de borrar los movimientos con fecha <= hasta
+    crea un cierre al final de cada día con movimientos, para que stock_a_fecha
+    siga siendo exacto día a día en el tramo purgado, y marca los cierres
+    hasta `hasta` como purgados.
+    Devuelve (cierres_creados, movimientos_borrados).
+    """
+    tabla_movimientos = connection.ops.quote_name(MovimientoStock._meta.db_table)
+    tabla_cierres = connection.ops.quote_name(CierreStock._meta.db_table)
+    creados = 0
+    borrados = 0
+
+    with transaction.atomic():
+        ultimo = CierreStock.objects.order_by('-fecha').values_list('fecha', flat=True).first()
+        if ultimo and hasta < ultimo:
+            raise ValueError(f"Ya existe un cierre posterior ({ultimo:%Y-%m-%d %H:%M})")
+
+        with connection.cursor() as cursor:
+            for campo in ('materia_prima', 'producto'):
+                columna = connection.ops.quote_name(MovimientoStock._meta.get_field(campo).column)
+                cursor.execute(
+                    f"""
+                    WITH ultimo AS (
+                        SELECT DISTINCT ON ({columna}) {columna} AS articulo, fecha, stock
+                        FROM {tabla_cierres}
+                        WHERE {columna} IS NOT NULL AND fecha <= %(hasta)s
+                        ORDER BY {columna}, fecha DESC
+                    )
+                    INSERT INTO {tabla_cierres} ({columna}, fecha, stock, movimientos_purgados)
+                    SELECT m.{columna}, %(hasta)s, COALESCE(u.stock, 0) + SUM(m.cantidad), false
+                    FROM {tabla_movimientos} m
+                    LEFT JOIN ultimo u ON u.articulo = m.{columna}
+                    WHERE m.{columna} IS NOT NULL
+                      AND m.fecha <= %(hasta)s
+                      AND m.fecha > COALESCE(u.fecha, '-infinity')
+                    GROUP BY m.{columna}, u.stock
+                    """,
+                    {'hasta': hasta},
+                )
+                creados += cursor.rowcount
+
+                if purgar:
+                    # Cierre diario: saldo en `hasta` menos lo que entró después del día
+                    cursor.execute(
+                        f"""
+                        WITH saldo AS (
+                            SELECT DISTINCT ON ({columna}) {columna} AS articulo, stock
+                            FROM {tabla_cierres}
+                            WHERE {columna} IS NOT NULL AND fecha <= %(hasta)s
+                            ORDER BY {columna}, fecha DESC
+                        ), dias AS (
+                            SELECT DISTINCT {columna} AS articulo,
+                                   (date_trunc('day', fecha AT TIME ZONE %(zona)s)
+                                    + interval '1 day' - interval '1 microsecond')
+                                   AT TIME ZONE %(zona)s AS fecha
+                            FROM {tabla_movimientos}
+                            WHERE {columna} IS NOT NULL AND fecha <= %(hasta)s
+                        )
+                        INSERT INTO {tabla_cierres} ({columna}, fecha, stock, movimientos_purgados)
+                        SELECT d.articulo, d.fecha, s.stock - COALESCE((
+                            SELECT SUM(m.cantidad) FROM {tabla_movimientos} m
+                            WHERE m.{columna} = d.articulo
+                              AND m.fecha > d.fecha AND m.fecha <= %(hasta)s
+                        ), 0), false
+                        FROM dias d
+                        JOIN saldo s ON s.articulo = d.articulo
+                        WHERE d.fecha < %(hasta)s
+                        ON CONFLICT DO NOTHING
+                        """,
+                        {'hasta': hasta, 'zona': timezone.get_current_timezone_name()},
+                    )
+                    creados += cursor.rowcount
+
+            if purgar:
+                cursor.execute(
+                    f"""
+                    UPDATE {tabla_cierres} SET movimientos_purgados = true
+                    WHERE fecha <= %s AND NOT movimientos_purgados
+                    """,
+                    [hasta],
+                )
+                cursor.execute(
+                    f"DELETE FROM {tabla_movimientos} WHERE fecha <= %s",
+                    [hasta],
+                )
+                borrados = cursor.rowcount
+
+    return creados, borrados
+
+
+# ========================================
+# VALORACIÓN DE INVENTARIO
+# ========================================
+
+# Valoración calculada desde cero, con las mismas columnas que valoraciones_stock
+VALORACION_COMPLETA = """
+    SELECT 'materias_primas' AS ambito, familia_id, modelo_id, unidad_medida, proveedor,
+           COUNT(*) AS articulos, SUM(stock_actual) AS unidades,
+           SUM(stock_actual * precio_unitario) AS valor
+    FROM materias_primas
+    GROUP BY familia_id, modelo_id, unidad_medida, proveedor
+    UNION ALL
+    SELECT 'productos', NULL::bigint, modelo_id, NULL::varchar, NULL::varchar,
+           COUNT(*), SUM(stock_actual), SUM(stock_actual * precio_venta)
+    FROM productos
+    GROUP BY modelo_id
+"""
+
+
+def recalcular_valoracion():
+    """
+    Reconstruye valoraciones_stock con una agregación completa de las dos
+    tablas, para conciliar si algo se escribió saltándose los triggers.
+    Bloquea las escrituras en materias_primas y productos mientras dura.
+    Devuelve el número de grupos cuya valoración mantenida no cuadraba.
+    """
+    tabla = connection.ops.quote_name(ValoracionStock._meta.db_table)
+    columnas = "ambito, familia_id, modelo_id, unidad_medida, proveedor"
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute("LOCK TABLE materias_primas, productos IN SHARE MODE")
+            cursor.execute(
+                f"CREATE TEMP TABLE valoracion_calculada ON COMMIT DROP AS {VALORACION_COMPLETA}"
+            )
+            cursor.execute(
+                f"""
+                SELECT COUNT(*)
+                FROM (SELECT * FROM {tabla} WHERE articulos <> 0 OR unidades <> 0 OR valor <> 0) m
+                FULL JOIN valoracion_calculada c
+                  ON c.ambito = m.ambito
+                 AND c.familia_id IS NOT DISTINCT FROM m.familia_id
+                 AND c.modelo_id IS NOT DISTINCT FROM m.modelo_id
+                 AND c.unidad_medida IS NOT DISTINCT FROM m.unidad_medida
+                 AND c.proveedor IS NOT DISTINCT FROM m.proveedor
+                WHERE (m.articulos, m.unidades, m.valor) IS DISTINCT FROM (c.articulos, c.unidades, c.valor)
+                """
+            )
+            descuadres = cursor.fetchone()[0]
+
+            cursor.execute(f"DELETE FROM {tabla}")
+            cursor.execute(
+                f"""
+                INSERT INTO {tabla} ({columnas}, articulos, unidades, valor)
+                SELECT {columnas}, articulos, unidades, valor FROM valoracion_calculada
+                """
+            )
+    return descuadres
+
+
+# ========================================
+# PLANIFICADOR DE REPOSICIÓN
+# ========================================
+
+MAX_DIAS = 3650
+
+
+def _maximo(model, campo):
+    """Primer valor que ya no cabe en un DecimalField (p. ej. 1e8 para 10 dígitos con 2 decimales)"""
+    field = model._meta.get_field(campo)
+    return Decimal(10) ** (field.max_digits - field.decimal_places)
+
+
+def _dias(valor, nombre, minimo):
+    try:
+        dias = int(valor)
+    except (TypeError, ValueError):
+        raise PropuestaCompraError(f"'{nombre}' debe ser un número entero de días")
+    if not minimo <= dias <= MAX_DIAS:
+        raise PropuestaCompraError(f"'{nombre}' debe estar entre {minimo} y {MAX_DIAS}")
+    return dias
+
+
+def generar_propuesta_compra(cobertura_dias=0, dias_historial=90):
+    """
+    Calcula la reposición de todas las materias primas activas y la guarda
+    como una propuesta con un pedido de compra en borrador por proveedor.
+
+    Cantidad a pedir de cada artículo, redondeada hacia arriba al céntimo:
+        stock_minimo + cobertura_dias * consumo_diario - stock_actual
+    donde consumo_diario es la media de los movimientos de consumo de los
+    últimos `dias_historial` días. Solo se incluyen los artículos con cantidad
+    positiva, valorados a precio_unitario.
+
+    El cálculo, los pedidos y las líneas se generan en una sola sentencia
+    (sin traer artículos a Python), así que el coste no depende del número de
+    líneas que salgan. Devuelve la PropuestaCompra creada.
+
+    Lanza PropuestaCompraError si alguna cantidad, consumo o importe, o el
+    total de un pedido o de la propuesta, no cabe en su columna (coberturas
+    largas con consumos altos), en lugar de dejar que falle la inserción.
+    """
+    cobertura_dias = _dias(cobertura_dias, 'cobertura_dias', 0)
+    dias_historial = _dias(dias_historial, 'dias_historial', 1)
+
+    q = connection.ops.quote_name
+    tabla_pedidos = q(PedidoCompra._meta.db_table)
+    tabla_lineas = q(LineaPedidoCompra._meta.db_table)
+    tabla_movimientos = q(MovimientoStock._meta.db_table)
+    tabla_materias = q(MateriaPrima._meta.db_table)
+
+    with transaction.atomic():
+        propuesta = PropuestaCompra.objects.create(
+            cobertura_dias=cobertura_dias, dias_historial=dias_historial
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                WITH consumo AS (
+                    SELECT materia_prima_id, GREATEST(-SUM(cantidad), 0) / %(historial)s AS diario
+                    FROM {tabla_movimientos}
+                    WHERE tipo = 'consumo' AND materia_prima_id IS NOT NULL
+                      AND fecha >= now() - make_interval(days => %(historial)s)
+                    GROUP BY materia_prima_id
+                ),
+                necesidades AS (
+                    SELECT mp.id, mp.codigo, btrim(mp.proveedor) AS proveedor,
+                           mp.stock_actual, mp.stock_minimo, mp.precio_unitario,
+                           COALESCE(c.diario, 0) AS diario,
+                           CEIL((mp.stock_minimo + %(cobertura)s * COALESCE(c.diario, 0)
+                                 - mp.stock_actual) * 100) / 100 AS cantidad
+                    FROM {tabla_materias} mp
+                    LEFT JOIN consumo c ON c.materia_prima_id = mp.id
+                    WHERE mp.activo
+                ),
+                reponer AS MATERIALIZED (
+                    SELECT *, ROUND(cantidad * precio_unitario, 2) AS importe
+                    FROM necesidades
+                    WHERE cantidad > 0
+                ),
+                fuera_de_rango AS (
+                    SELECT 1 FROM reponer
+                    WHERE cantidad >= %(max_cantidad)s OR importe >= %(max_importe)s
+                       OR ROUND(diario, 4) >= %(max_consumo)s
+                    UNION ALL
+                    SELECT 1 FROM reponer GROUP BY proveedor HAVING SUM(importe) >= %(max_total)s
+                    UNION ALL
+                    SELECT 1 FROM reponer HAVING SUM(importe) >= %(max_total)s
+                ),
+                pedidos AS (
+                    INSERT INTO {tabla_pedidos} (propuesta_id, proveedor, estado, lineas, total)
+                    SELECT %(propuesta)s, proveedor, 'borrador', COUNT(*), SUM(importe)
+                    FROM reponer
+                    WHERE NOT EXISTS (SELECT 1 FROM fuera_de_rango)
+                    GROUP BY proveedor
+                    RETURNING id, proveedor
+                ),
+                lineas AS (
+                    INSERT INTO {tabla_lineas}
+                        (pedido_id, materia_prima_id, stock_actual, stock_minimo, consumo_diario,
+                         cantidad, precio_unitario, importe)
+                    SELECT p.id, r.id, r.stock_actual, r.stock_minimo, ROUND(r.diario, 4),
+                           r.cantidad, r.precio_unitario, r.importe
+                    FROM reponer r
+                    JOIN pedidos p ON p.proveedor = r.proveedor
+                    ORDER BY p.proveedor, r.codigo
+                )
+                SELECT EXISTS (SELECT 1 FROM fuera_de_rango)
+                """,
+                {
+                    'propuesta': propuesta.id, 'cobertura': cobertura_dias, 'historial': dias_historial,
+                    'max_cantidad': _maximo(LineaPedidoCompra, 'cantidad'),
+                    'max_importe': _maximo(LineaPedidoCompra, 'importe'),
+                    'max_consumo': _maximo(LineaPedidoCompra, 'consumo_diario'),
+                    'max_total': min(_maximo(PedidoCompra, 'total'), _maximo(PropuestaCompra, 'total')),
+                },
+            )
+            fuera_de_rango = cursor.fetchone()[0]
+        if fuera_de_rango:
+            raise PropuestaCompraError(
+                "La propuesta supera las cantidades o importes máximos admitidos; "
+                "reduzca 'cobertura_dias'"
+            )
+
+        totales = propuesta.pedidos.aggregate(lineas=Sum('lineas'), total=Sum('total'))
+        propuesta.lineas = totales['lineas'] or 0
+        propuesta.total = totales['total'] or 0
+        propuesta.save(update_fields=['lineas', 'total'])
+    return propuesta
+
+
+def _cerrar_pedidos_compra(propuesta_id, estado, pedidos=None):
+    """
+    Pasa a `estado` los pedidos en borrador de la propuesta (todos o los ids
+    de `pedidos`) con un único UPDATE. Cuando no queda ninguno en borrador la
+    propuesta queda aprobada, o descartada si no se aprobó ninguno.
+    Devuelve el número de pedidos cambiados.
+    """
+    with transaction.atomic():
+        propuesta = PropuestaCompra.objects.select_for_update().filter(pk=propuesta_id).first()
+        if propuesta is None:
+            raise PropuestaCompraError(f"La propuesta {propuesta_id} no existe")
+        if propuesta.estado != 'borrador':
+            raise PropuestaCompraError(f"La propuesta ya está {propuesta.get_estado_display().lower()}")
+
+        borradores = propuesta.pedidos.filter(estado='borrador')
+        if pedidos is not None:
+            if not isinstance(pedidos, list):
+                raise PropuestaCompraError("'pedidos' debe ser una lista de ids")
+            try:
+                ids = {int(pedido) for pedido in pedidos}
+            except (TypeError, ValueError):
+                raise PropuestaCompraError("'pedidos' debe ser una lista de ids")
+            ajenos = ids - set(borradores.filter(id__in=ids).values_list('id', flat=True))
+            if ajenos:
+                raise PropuestaCompraError(
+                    f"Pedidos que no están en borrador en esta propuesta: {sorted(ajenos)}"
+                )
+            borradores = borradores.filter(id__in=ids)
+
+        cambiados = borradores.update(estado=estado)
+
+        if not propuesta.pedidos.filter(estado='borrador').exists():
+            aprobados = propuesta.pedidos.filter(estado='aprobado').exists()
+            propuesta.estado = 'aprobada' if aprobados else 'descartada'
+            propuesta.save(update_fields=['estado'])
+    return cambiados
+
+
+def aprobar_propuesta_compra(propuesta_id, pedidos=None):
+    """Aprueba en bloque los pedidos en borrador de la propuesta (o los indicados)"""
+    return _cerrar_pedidos_compra(propuesta_id, 'aprobado', pedidos)
+
+
+def descartar_propuesta_compra(propuesta_id, pedidos=None):
+    """Descarta en bloque los pedidos en borrador de la propuesta (o los indicados)"""
+    return _cerrar_pedidos_compra(propuesta_id, 'descartado', pedidos)
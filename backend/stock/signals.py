@@ -0,0 +1,23 @@
+"""
+Señales de stock: invalidación de la caché de datos de referencia
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import referencias
+from .models import Familia, ModeloProducto
+
+
+@receiver(post_save, sender=Familia)
+@receiver(post_delete, sender=Familia)
+@receiver(post_save, sender=ModeloProducto)
+@receiver(post_delete, sender=ModeloProducto)
+def invalidar_referencias(sender, **kwargs):
+    """
+    Invalida al guardar y otra vez al confirmar la transacción: si otro proceso
+    recarga entre ambos momentos (y lee los datos aún sin confirmar), la
+    segunda invalidación le obliga a recargar de nuevo.
+    """
+    referencias.invalidar()
+    transaction.on_commit(referencias.invalidar)
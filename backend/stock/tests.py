@@ -1,3 +1,987 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import threading
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, connections, models
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .models import (
+    Familia, ModeloProducto, MateriaPrima, Producto, MovimientoStock, CierreStock, SecuenciaCodigo,
+    ContadorAlertaStock, ValoracionStock, PropuestaCompra,
+)
+from . import referencias
+from .services import compactar_movimientos, recalcular_valoracion, stock_a_fecha, StockHistoricoError
+
+
+# ========================================
+# AJUSTE MASIVO DE STOCK
+# ========================================
+
+class ActualizarStockTests(TestCase):
+    """Endpoints actualizar_stock de materias primas y productos"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.familia = Familia.objects.create(codigo='01', nombre='Madera')
+        self.modelo = ModeloProducto.objects.create(codigo='MARTINA', nombre='Martina', tipo='MATERIA')
+        self.materias = [
+            MateriaPrima.objects.create(
+                familia=self.familia, modelo=self.modelo, nombre=f'Tablero {i}',
+                stock_actual=10, stock_minimo=5, precio_unitario=2,
+            )
+            for i in range(3)
+        ]
+
+    def test_aplica_deltas_y_agrupa_repetidos(self):
+        m1, m2, _ = self.materias
+        response = self.client.post('/api/materias-primas/actualizar_stock/', [
+            {'id': m1.id, 'cantidad': 5},
+            {'id': m2.id, 'cantidad': '-2.5'},
+            {'id': m1.id, 'cantidad': 1},
+        ], format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['cantidad'], 2)
+        self.assertEqual(response.data['no_encontradas'], [])
+        m1.refresh_from_db()
+        m2.refresh_from_db()
+        self.assertEqual(m1.stock_actual, Decimal('16'))
+        self.assertEqual(m2.stock_actual, Decimal('7.5'))
+
+    def test_informa_ids_inexistentes(self):
+        m1 = self.materias[0]
+        response = self.client.post('/api/materias-primas/actualizar_stock/', [
+            {'id': m1.id, 'cantidad': 1},
+            {'id': 999999, 'cantidad': 1},
+        ], format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['cantidad'], 1)
+        self.assertEqual(response.data['no_encontradas'], [999999])
+
+    def test_lista_invalida_no_aplica_nada(self):
+        m1 = self.materias[0]
+        response = self.client.post('/api/materias-primas/actualizar_stock/', [
+            {'id': m1.id, 'cantidad': 1},
+            {'cantidad': 1},
+        ], format='json')
+
+        self.assertEqual(response.status_code, 400)
+        m1.refresh_from_db()
+        self.assertEqual(m1.stock_actual, Decimal('10'))
+
+    def test_productos_rechaza_cantidades_decimales(self):
+        producto = Producto.objects.create(codigo='P-001', nombre='Silla', stock_minimo=1, precio_venta=10)
+        response = self.client.post('/api/productos/actualizar_stock/', [
+            {'id': producto.id, 'cantidad': 1.5},
+        ], format='json')
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post('/api/productos/actualizar_stock/', [
+            {'id': producto.id, 'cantidad': 3},
+        ], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['actualizados'][0]['stock_actual'], 3)
+
+    def test_numero_de_consultas_constante(self):
+        productos = Producto.objects.bulk_create(
+            Producto(codigo=f'P-{i:03d}', nombre=f'Silla {i}', stock_minimo=1, precio_venta=10)
+            for i in range(200)
+        )
+
+        def consultas(tamano):
+            datos = [{'id': p.id, 'cantidad': 1} for p in productos[:tamano]]
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.post('/api/productos/actualizar_stock/', datos, format='json')
+            self.assertEqual(response.status_code, 200)
+            return len(ctx)
+
+        self.assertEqual(consultas(2), consultas(200))
+
+
+# ========================================
+# LIBRO DE MOVIMIENTOS
+# ========================================
+
+class MovimientoStockTests(TestCase):
+    """Libro de movimientos, foto de stock_actual y cierres"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.producto = Producto.objects.create(
+            codigo='P-001', nombre='Silla', stock_actual=10, stock_minimo=1, precio_venta=10
+        )
+
+    def test_alta_y_edicion_registran_ajustes(self):
+        self.producto.stock_actual = 7
+        self.producto.save()
+
+        cantidades = list(
+            self.producto.movimientos.order_by('id').values_list('referencia', 'cantidad')
+        )
+        self.assertEqual(cantidades, [('Alta', Decimal('10')), ('Edición manual', Decimal('-3'))])
+
+    def test_actualizar_stock_registra_una_linea_por_movimiento(self):
+        response = self.client.post('/api/productos/actualizar_stock/?referencia=ALB-1', [
+            {'id': self.producto.id, 'cantidad': 5, 'tipo': 'recepcion'},
+            {'id': self.producto.id, 'cantidad': -2, 'tipo': 'venta'},
+        ], format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock_actual, 13)
+        movimientos = self.producto.movimientos.filter(referencia='ALB-1')
+        self.assertEqual(
+            sorted(movimientos.values_list('tipo', 'cantidad')),
+            [('recepcion', Decimal('5')), ('venta', Decimal('-2'))],
+        )
+        total = self.producto.movimientos.aggregate(total=models.Sum('cantidad'))['total']
+        self.assertEqual(total, self.producto.stock_actual)
+
+    def test_tipo_no_valido(self):
+        response = self.client.post('/api/productos/actualizar_stock/', [
+            {'id': self.producto.id, 'cantidad': 5, 'tipo': 'regalo'},
+        ], format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_stock_a_fecha_con_cierres(self):
+        # Mediodía fijo: los días locales de los movimientos no dependen de la hora del test
+        ahora = timezone.make_aware(datetime(2026, 6, 20, 12))
+        self.producto.movimientos.update(fecha=ahora - timedelta(days=10))
+        for dias, cantidad in [(8, 5), (6, -3), (4, 2), (2, -1)]:
+            MovimientoStock.objects.create(
+                tipo='ajuste', producto=self.producto, cantidad=cantidad,
+                fecha=ahora - timedelta(days=dias),
+            )
+
+        hasta = ahora - timedelta(days=5)
+        creados, borrados = compactar_movimientos(hasta, purgar=True)
+        # Cierre en el corte y uno al final de cada día con movimientos purgados
+        self.assertEqual(creados, 4)
+        self.assertEqual(borrados, 3)
+        self.assertEqual(CierreStock.objects.get(producto=self.producto, fecha=hasta).stock, Decimal('12'))
+
+        with self.assertNumQueries(2):
+            self.assertEqual(stock_a_fecha(self.producto, ahora - timedelta(days=3)), 14)
+        self.assertEqual(stock_a_fecha(self.producto, ahora), 13)
+        self.assertEqual(stock_a_fecha(self.producto, hasta), 12)
+
+        # En el tramo purgado el stock sigue siendo exacto al final de cada día...
+        fin_dia = lambda dias: timezone.make_aware(
+            datetime.combine((ahora - timedelta(days=dias)).date(), time.max))
+        self.assertEqual(stock_a_fecha(self.producto, fin_dia(10)), 10)
+        self.assertEqual(stock_a_fecha(self.producto, fin_dia(8)), 15)
+        self.assertEqual(stock_a_fecha(self.producto, ahora - timedelta(days=7)), 15)
+        self.assertEqual(stock_a_fecha(self.producto, fin_dia(6)), 12)
+        # ...pero no a una hora de un día cuyos movimientos se borraron
+        with self.assertRaises(StockHistoricoError):
+            stock_a_fecha(self.producto, ahora - timedelta(days=8, hours=1))
+        with self.assertRaises(StockHistoricoError):
+            stock_a_fecha(self.producto, hasta - timedelta(hours=1))
+
+        # Compactar dos veces en la misma fecha no duplica cierres
+        self.assertEqual(compactar_movimientos(hasta)[0], 0)
+
+    def test_endpoint_stock_a_fecha(self):
+        response = self.client.get(f'/api/productos/{self.producto.id}/stock_a_fecha/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['stock'], 10)
+
+        response = self.client.get(f'/api/productos/{self.producto.id}/stock_a_fecha/?fecha=ayer')
+        self.assertEqual(response.status_code, 400)
+
+
+# ========================================
+# SECUENCIAS DE CÓDIGO
+# ========================================
+
+class SecuenciaCodigoTests(TestCase):
+    """Asignación de códigos automáticos"""
+
+    def setUp(self):
+        self.familia = Familia.objects.create(codigo='01', nombre='Madera')
+        self.modelo = ModeloProducto.objects.create(codigo='MARTINA', nombre='Martina', tipo='MATERIA')
+        self.modelo_producto = ModeloProducto.objects.create(codigo='MARIA', nombre='María', tipo='PRODUCTO')
+
+    def crear_materia(self):
+        return MateriaPrima.objects.create(
+            familia=self.familia, modelo=self.modelo, nombre='Tablero',
+            stock_minimo=1, precio_unitario=1,
+        )
+
+    def test_codigos_consecutivos(self):
+        self.assertEqual(self.crear_materia().codigo, '01-MARTINA-001')
+        self.assertEqual(self.crear_materia().codigo, '01-MARTINA-002')
+        producto = Producto.objects.create(modelo=self.modelo_producto, nombre='Silla', stock_minimo=1, precio_venta=1)
+        self.assertEqual(producto.codigo, 'MARIA-001')
+
+    def test_siembra_con_codigos_existentes_y_pasa_de_999(self):
+        MateriaPrima.objects.create(
+            codigo='01-MARTINA-999', familia=self.familia, modelo=self.modelo,
+            nombre='Antiguo', stock_minimo=1, precio_unitario=1,
+        )
+        self.assertEqual(self.crear_materia().codigo, '01-MARTINA-1000')
+        self.assertEqual(self.crear_materia().codigo, '01-MARTINA-1001')
+
+    def test_reserva_de_bloque(self):
+        codigos = MateriaPrima.generar_codigos(self.familia, self.modelo, 3)
+        self.assertEqual(codigos, ['01-MARTINA-001', '01-MARTINA-002', '01-MARTINA-003'])
+        self.assertEqual(self.crear_materia().codigo, '01-MARTINA-004')
+
+    def test_una_consulta_por_alta(self):
+        self.crear_materia()
+        with self.assertNumQueries(1):
+            MateriaPrima.generar_codigos(self.familia, self.modelo)
+
+
+class SecuenciaCodigoConcurrenciaTests(TransactionTestCase):
+    """Altas simultáneas con la misma familia y modelo"""
+
+    def test_50_altas_en_paralelo(self):
+        familia = Familia.objects.create(codigo='01', nombre='Madera')
+        modelo = ModeloProducto.objects.create(codigo='MARTINA', nombre='Martina', tipo='MATERIA')
+        errores = []
+        barrera = threading.Barrier(50)
+
+        def alta(i):
+            try:
+                barrera.wait()
+                MateriaPrima.objects.create(
+                    familia=familia, modelo=modelo, nombre=f'Tablero {i}',
+                    stock_minimo=1, precio_unitario=1,
+                )
+            except Exception as e:
+                errores.append(e)
+            finally:
+                connections.close_all()
+
+        hilos = [threading.Thread(target=alta, args=(i,)) for i in range(50)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(errores, [])
+        codigos = set(MateriaPrima.objects.values_list('codigo', flat=True))
+        self.assertEqual(codigos, {f'01-MARTINA-{i:03d}' for i in range(1, 51)})
+        self.assertEqual(SecuenciaCodigo.objects.get(prefijo='01-MARTINA').ultimo, 50)
+
+
+# ========================================
+# ALERTAS DE STOCK
+# ========================================
+
+class AlertaStockTests(TestCase):
+    """Columna en_alerta y contadores de alertas"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.madera = Familia.objects.create(codigo='01', nombre='Madera')
+        self.tela = Familia.objects.create(codigo='02', nombre='Tela')
+        self.modelo = ModeloProducto.objects.create(codigo='MARTINA', nombre='Martina', tipo='MATERIA')
+
+    def crear_materia(self, familia, stock, activo=True):
+        return MateriaPrima.objects.create(
+            familia=familia, modelo=self.modelo, nombre='Material',
+            stock_actual=stock, stock_minimo=5, precio_unitario=1, activo=activo,
+        )
+
+    def alertas(self, familia):
+        return ContadorAlertaStock.objects.filter(
+            ambito='materias_primas', familia=familia
+        ).aggregate(total=models.Sum('alertas'))['total'] or 0
+
+    def test_contadores_siguen_los_cambios_de_stock(self):
+        m1 = self.crear_materia(self.madera, 1)
+        m2 = self.crear_materia(self.madera, 10)
+        self.crear_materia(self.tela, 0)
+        self.crear_materia(self.tela, 0, activo=False)
+        self.assertEqual((self.alertas(self.madera), self.alertas(self.tela)), (1, 1))
+
+        # UPDATE masivo: m1 sale de alerta y m2 entra
+        self.client.post('/api/materias-primas/actualizar_stock/', [
+            {'id': m1.id, 'cantidad': 10},
+            {'id': m2.id, 'cantidad': -8},
+        ], format='json')
+        self.assertEqual(self.alertas(self.madera), 1)
+
+        MateriaPrima.objects.filter(pk=m2.pk).update(activo=False)
+        self.assertEqual(self.alertas(self.madera), 0)
+
+        MateriaPrima.objects.filter(familia=self.tela).delete()
+        self.assertEqual(self.alertas(self.tela), 0)
+
+    def test_listado_y_filtro_de_alertas(self):
+        m1 = self.crear_materia(self.madera, 1)
+        self.crear_materia(self.madera, 10)
+        self.crear_materia(self.tela, 0, activo=False)
+
+        response = self.client.get('/api/materias-primas/alerta_stock/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([m['id'] for m in response.data], [m1.id])
+
+        response = self.client.get('/api/materias-primas/?alerta=true&activo=true')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([m['id'] for m in response.data['results']], [m1.id])
+
+    def test_resumen_sin_recorrer_la_tabla(self):
+        self.crear_materia(self.madera, 1)
+        self.crear_materia(self.madera, 2)
+        self.crear_materia(self.tela, 3)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/materias-primas/alertas_resumen/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total'], 3)
+        self.assertEqual(
+            [(f['nombre'], f['alertas']) for f in response.data['por_familia']],
+            [('Madera', 2), ('Tela', 1)],
+        )
+        self.assertEqual(response.data['por_modelo'][0]['alertas'], 3)
+        self.assertFalse(any('FROM "materias_primas"' in q['sql'] for q in ctx.captured_queries))
+
+
+# ========================================
+# LISTADOS AGRUPADOS
+# ========================================
+
+class ListadosAgrupadosTests(TestCase):
+    """por_familia y por_modelo con número de consultas constante"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def crear_catalogo(self, desde, hasta):
+        for i in range(desde, hasta):
+            familia = Familia.objects.create(codigo=f'{i:02d}', nombre=f'Familia {i}')
+            modelo = ModeloProducto.objects.create(codigo=f'M{i:02d}', nombre=f'Modelo {i}', tipo='MATERIA')
+            modelo_producto = ModeloProducto.objects.create(codigo=f'P{i:02d}', nombre=f'Línea {i}', tipo='PRODUCTO')
+            for _ in range(3):
+                MateriaPrima.objects.create(
+                    familia=familia, modelo=modelo, nombre='Material',
+                    stock_minimo=1, precio_unitario=1,
+                )
+                Producto.objects.create(modelo=modelo_producto, nombre='Silla', stock_minimo=1, precio_venta=1)
+
+    def consultas(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx), response.data
+
+    def test_agrupacion(self):
+        self.crear_catalogo(0, 2)
+        Familia.objects.create(codigo='99', nombre='Vacía')
+        _, data = self.consultas('/api/materias-primas/por_familia/')
+        self.assertEqual(list(data), ['Familia 0', 'Familia 1', 'Vacía'])
+        self.assertEqual(len(data['Familia 1']), 3)
+        self.assertEqual(data['Familia 1'][0]['familia_nombre'], 'Familia 1')
+        self.assertEqual(data['Vacía'], [])
+
+    def test_numero_de_consultas_no_depende_de_los_grupos(self):
+        # Familias y modelos salen de la caché de referencias: con la caché
+        # cargada queda una sola consulta (la de los artículos)
+        self.crear_catalogo(0, 1)
+        referencias.familias()
+        pocos = [
+            self.consultas(url)[0]
+            for url in ('/api/materias-primas/por_familia/', '/api/materias-primas/por_modelo/',
+                        '/api/productos/por_modelo/')
+        ]
+        self.crear_catalogo(1, 11)
+        referencias.familias()
+        muchos = [
+            self.consultas(url)[0]
+            for url in ('/api/materias-primas/por_familia/', '/api/materias-primas/por_modelo/',
+                        '/api/productos/por_modelo/')
+        ]
+        self.assertEqual(pocos, [1, 1, 1])
+        self.assertEqual(muchos, pocos)
+
+
+# ========================================
+# IMPORTACIÓN DE CATÁLOGO
+# ========================================
+
+class ImportarCatalogoTests(TestCase):
+    """Importación masiva CSV/XLSX"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.familia = Familia.objects.create(codigo='01', nombre='Madera')
+        self.modelo = ModeloProducto.objects.create(codigo='MARTINA', nombre='Martina', tipo='MATERIA')
+        self.modelo_producto = ModeloProducto.objects.create(codigo='MARIA', nombre='María', tipo='PRODUCTO')
+
+    def importar(self, url, contenido, nombre='catalogo.csv'):
+        archivo = SimpleUploadedFile(nombre, contenido)
+        return self.client.post(url, {'archivo': archivo}, format='multipart')
+
+    def test_alta_actualizacion_y_errores(self):
+        existente = MateriaPrima.objects.create(
+            familia=self.familia, modelo=self.modelo, nombre='Viejo',
+            stock_actual=7, stock_minimo=1, precio_unitario=1,
+        )
+        contenido = (
+            "codigo;nombre;familia;modelo;unidad_medida;stock_actual;stock_minimo;precio_unitario;proveedor\n"
+            f"{existente.codigo};Tablero roble;01;MARTINA;m2;99;2;10,50;Maderas SL\n"
+            ";Tela gris;01;MARTINA;M;12;5;3.2;\n"
+            ";Tela azul;01;MARTINA;;0;5;3.2;\n"
+            ";Sin familia;09;MARTINA;M;0;5;1;\n"
+            ";Precio malo;01;MARTINA;M;0;5;caro;\n"
+            "01-MARTINA-050;Explícito;01;MARTINA;UN;0;5;1;\n"
+        ).encode()
+
+        response = self.importar('/api/materias-primas/importar/', contenido)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['creados'], response.data['actualizados']), (3, 1))
+        self.assertEqual(
+            [(e['fila'], e['error']) for e in response.data['errores']],
+            [(5, 'La familia 09 no existe'), (6, 'precio_unitario no es un número válido')],
+        )
+
+        existente.refresh_from_db()
+        self.assertEqual(existente.nombre, 'Tablero roble')
+        self.assertEqual(existente.unidad_medida, 'M2')
+        self.assertEqual(existente.precio_unitario, Decimal('10.50'))
+        self.assertEqual(existente.stock_actual, Decimal('7'))  # el stock no se importa sobre existentes
+
+        gris = MateriaPrima.objects.get(nombre='Tela gris')
+        self.assertEqual(gris.codigo, '01-MARTINA-051')  # después del explícito 050
+        self.assertEqual(gris.unidad_medida, 'M')
+        self.assertEqual(gris.movimientos.get().cantidad, Decimal('12'))
+        self.assertEqual(MateriaPrima.objects.get(nombre='Tela azul').unidad_medida, 'KG')
+
+        self.assertEqual(MateriaPrima.generar_codigos(self.familia, self.modelo)[0], '01-MARTINA-053')
+
+    def test_cabecera_incompleta(self):
+        response = self.importar('/api/productos/importar/', b"nombre,modelo\nSilla,MARIA\n")
+        self.assertEqual(response.status_code, 400)
+
+    def test_productos_desde_xlsx(self):
+        from openpyxl import Workbook
+
+        libro = Workbook()
+        hoja = libro.active
+        hoja.append(['Nombre', 'Modelo', 'Stock_actual', 'Stock_minimo', 'Precio_venta', 'Tiempo_fabricacion'])
+        hoja.append(['Silla', 'MARIA', 4, 1, 150, 8])
+        hoja.append(['Mesa', 'MARIA', None, 1, 300.5, None])
+        hoja.append(['Sofá', 'MARTINA', 1, 1, 10, 1])
+        salida = io.BytesIO()
+        libro.save(salida)
+
+        response = self.importar('/api/productos/importar/', salida.getvalue(), 'catalogo.xlsx')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['creados'], 2)
+        self.assertEqual(response.data['errores'][0]['fila'], 4)
+        self.assertEqual(
+            list(Producto.objects.order_by('codigo').values_list('codigo', 'stock_actual', 'tiempo_fabricacion')),
+            [('MARIA-001', 4, 8), ('MARIA-002', 0, 0)],
+        )
+
+
+# ========================================
+# EXPORTACIÓN EN STREAMING
+# ========================================
+
+class ExportarTests(TestCase):
+    """Exportación CSV/NDJSON del catálogo"""
+
+    def setUp(self):
+        self.client = APIClient()
+        modelo = ModeloProducto.objects.create(codigo='MARIA', nombre='María', tipo='PRODUCTO')
+        for i in range(3):
+            Producto.objects.create(modelo=modelo, nombre=f'Silla {i}', stock_minimo=1, precio_venta='10.50',
+                                    activo=i != 2)
+
+    def contenido(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_csv_con_filtros(self):
+        response = self.client.get('/api/productos/exportar/?activo=true')
+        lineas = self.contenido(response).decode().splitlines()
+        self.assertEqual(lineas[0].split(';')[:3], ['id', 'codigo', 'nombre'])
+        self.assertEqual([l.split(';')[1] for l in lineas[1:]], ['MARIA-001', 'MARIA-002'])
+        self.assertIn('attachment; filename="productos_', response['Content-Disposition'])
+
+    def test_ndjson_gzip(self):
+        response = self.client.get('/api/productos/exportar/?formato=ndjson&gzip=true')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        filas = [json.loads(l) for l in gzip.decompress(self.contenido(response)).decode().splitlines()]
+        self.assertEqual(len(filas), 3)
+        self.assertEqual(filas[0]['modelo_nombre'], 'María')
+        self.assertEqual(filas[0]['precio_venta'], '10.50')
+
+    def test_formato_no_valido(self):
+        self.assertEqual(self.client.get('/api/materias-primas/exportar/?formato=xml').status_code, 400)
+
+
+# ========================================
+# PAGINACIÓN POR CURSOR
+# ========================================
+
+class PaginacionCursorTests(TestCase):
+    """Listados paginados por keyset"""
+
+    def setUp(self):
+        self.client = APIClient()
+        modelo = ModeloProducto.objects.create(codigo='MARIA', nombre='María', tipo='PRODUCTO')
+        # Nombres repetidos para que la ordenación por nombre necesite el desempate por id
+        for i in range(7):
+            Producto.objects.create(modelo=modelo, nombre=f'Silla {i % 3}', stock_minimo=1, precio_venta=10)
+
+    def recorrer(self, url):
+        codigos = []
+        while url:
+            data = self.client.get(url).json()
+            codigos += [p['codigo'] for p in data['results']]
+            url = data['next']
+        return codigos
+
+    def test_recorre_todas_las_paginas(self):
+        data = self.client.get('/api/productos/?page_size=3').json()
+        self.assertEqual(data['count'], 7)
+        self.assertIsNone(data['previous'])
+        self.assertIn('cursor=', data['next'])
+
+        esperado = list(Producto.objects.order_by('codigo').values_list('codigo', flat=True))
+        self.assertEqual(self.recorrer('/api/productos/?page_size=3'), esperado)
+
+    def test_ordenacion_con_empates(self):
+        esperado = list(Producto.objects.order_by('-nombre', '-id').values_list('codigo', flat=True))
+        self.assertEqual(self.recorrer('/api/productos/?page_size=2&ordering=-nombre'), esperado)
+
+    def test_pagina_anterior(self):
+        primera = self.client.get('/api/productos/?page_size=3').json()
+        segunda = self.client.get(primera['next']).json()
+        anterior = self.client.get(segunda['previous']).json()
+        self.assertEqual(anterior['results'], primera['results'])
+        self.assertIsNotNone(anterior['next'])
+
+    def test_sin_count_ni_offset(self):
+        primera = self.client.get('/api/productos/?page_size=3').json()
+        with CaptureQueriesContext(connection) as consultas:
+            data = self.client.get(primera['next'] + '&contar=false').json()
+        self.assertNotIn('count', data)
+        sql = ' '.join(q['sql'] for q in consultas.captured_queries).upper()
+        self.assertNotIn('COUNT(', sql)
+        self.assertNotIn('OFFSET', sql)
+
+    def test_paginacion_clasica_y_cursor_no_valido(self):
+        data = self.client.get('/api/productos/?page=2&page_size=5').json()
+        self.assertEqual(data['count'], 7)
+        self.assertEqual(len(data['results']), 2)
+        self.assertEqual(self.client.get('/api/productos/?cursor=basura').status_code, 404)
+
+
+# ========================================
+# BÚSQUEDA DE TEXTO
+# ========================================
+
+class BusquedaTests(TestCase):
+    """?search= sobre el vector de búsqueda mantenido por triggers"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.familia = Familia.objects.create(codigo='01', nombre='Tapicería')
+        modelo = ModeloProducto.objects.create(codigo='MARIA', nombre='María', tipo='MATERIA')
+        for nombre in ['Tela gris', 'Tela beige', 'Espuma 30kg']:
+            MateriaPrima.objects.create(familia=self.familia, modelo=modelo, nombre=nombre,
+                                        stock_minimo=0, precio_unitario=1)
+
+    def buscar(self, texto):
+        response = self.client.get('/api/materias-primas/', {'search': texto})
+        self.assertEqual(response.status_code, 200)
+        return [m['nombre'] for m in response.json()['results']]
+
+    def test_prefijos_sin_tildes(self):
+        self.assertEqual(self.buscar('tel gri'), ['Tela gris'])
+        self.assertEqual(len(self.buscar('maria')), 3)
+        self.assertEqual(len(self.buscar('TAPICERIA')), 3)
+        self.assertEqual(self.buscar('inexistente'), [])
+
+    def test_prefijo_de_codigo_primero(self):
+        espuma = MateriaPrima.objects.get(nombre='Espuma 30kg')
+        # "01-maria-003" encuentra por prefijo de código y por vector
+        self.assertEqual(self.buscar(espuma.codigo.lower())[0], 'Espuma 30kg')
+        self.assertEqual(self.buscar('01-MARIA-00'), ['Tela gris', 'Tela beige', 'Espuma 30kg'])
+
+    def test_renombrar_familia_actualiza_vector(self):
+        self.familia.nombre = 'Relleno'
+        self.familia.save()
+        self.assertEqual(len(self.buscar('rellen')), 3)
+        self.assertEqual(self.buscar('tapiceria'), [])
+
+    def test_paginacion_por_relevancia(self):
+        nombres = []
+        url = '/api/materias-primas/?search=tela&page_size=1'
+        while url:
+            data = self.client.get(url).json()
+            nombres += [m['nombre'] for m in data['results']]
+            url = data['next']
+        self.assertCountEqual(nombres, ['Tela gris', 'Tela beige'])
+
+
+# ========================================
+# CACHÉ DE DATOS DE REFERENCIA
+# ========================================
+
+# Caché propia del proceso de test: la versión no se comparte con runserver
+# ni con otros procesos de test en paralelo
+@override_settings(CACHES={
+    **settings.CACHES,
+    'referencias': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'referencias-tests',
+    },
+})
+class ReferenciasCacheTests(TestCase):
+    """Familias y modelos servidos desde la caché versionada"""
+
+    def setUp(self):
+        self.client = APIClient()
+        referencias._cache().clear()
+        referencias.invalidar()
+        self.familia = Familia.objects.create(codigo='01', nombre='Madera')
+        Familia.objects.create(codigo='02', nombre='Antigua', activo=False)
+        ModeloProducto.objects.create(codigo='MARTINA', nombre='Martina', tipo='MATERIA')
+        ModeloProducto.objects.create(codigo='MARIA', nombre='María', tipo='PRODUCTO')
+
+    def test_desplegables_sin_consultas(self):
+        self.client.get('/api/familias/activas/')
+        antes = referencias.estadisticas()
+        with self.assertNumQueries(0):
+            familias = self.client.get('/api/familias/activas/').json()
+            por_tipo = self.client.get('/api/modelos/por_tipo/').json()
+        self.assertEqual([f['codigo'] for f in familias], ['01'])
+        self.assertEqual([m['codigo'] for m in por_tipo['materias']], ['MARTINA'])
+        self.assertEqual([m['codigo'] for m in por_tipo['productos']], ['MARIA'])
+
+        despues = self.client.get('/api/familias/cache/').json()
+        self.assertEqual(despues['fallos'], antes['fallos'])
+        self.assertGreater(despues['aciertos'], antes['aciertos'])
+
+    def test_guardar_invalida(self):
+        self.assertEqual(referencias.familia(self.familia.id)['nombre'], 'Madera')
+        fallos = referencias.estadisticas()['fallos']
+        self.familia.nombre = 'Maderas'
+        self.familia.save()
+        self.assertEqual(referencias.familia(self.familia.id)['nombre'], 'Maderas')
+        self.assertEqual(referencias.estadisticas()['fallos'], fallos + 1)
+
+        self.familia.delete()
+        self.assertIsNone(referencias.familia(self.familia.id))
+
+    def test_version_compartida_de_otro_proceso(self):
+        with mock.patch.object(referencias, 'time') as reloj:
+            reloj.monotonic.return_value = 1000.0
+            referencias.familias()
+            # Otro proceso cambia una familia: solo se entera a través de la versión compartida
+            Familia.objects.filter(pk=self.familia.pk).update(nombre='Cambiada')
+            referencias._cache().incr(referencias.CLAVE_VERSION)
+
+            reloj.monotonic.return_value += referencias.INTERVALO_COMPROBACION / 2
+            self.assertEqual(referencias.familia(self.familia.id)['nombre'], 'Madera')
+            reloj.monotonic.return_value += referencias.INTERVALO_COMPROBACION
+            self.assertEqual(referencias.familia(self.familia.id)['nombre'], 'Cambiada')
+
+    def test_serializers_leen_de_la_cache(self):
+        modelo = ModeloProducto.objects.get(codigo='MARTINA')
+        MateriaPrima.objects.create(familia=self.familia, modelo=modelo, nombre='Tablero',
+                                    stock_minimo=1, precio_unitario=1)
+        referencias.familias()
+        # Versión para el ETag y la página de artículos, sin joins
+        with self.assertNumQueries(2):
+            data = self.client.get('/api/materias-primas/?contar=false').json()
+        self.assertEqual(data['results'][0]['familia_nombre'], 'Madera')
+        self.assertEqual(data['results'][0]['modelo_nombre'], 'Martina')
+
+
+# ========================================
+# RESPUESTAS CONDICIONALES
+# ========================================
+
+class ListadoCondicionalTests(TestCase):
+    """ETag / Last-Modified de los listados a partir de versiones_tabla"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.familia = Familia.objects.create(codigo='01', nombre='Madera')
+        modelo = ModeloProducto.objects.create(codigo='MARTINA', nombre='Martina', tipo='MATERIA')
+        self.materia = MateriaPrima.objects.create(familia=self.familia, modelo=modelo, nombre='Tablero',
+                                                   stock_minimo=1, precio_unitario=1)
+        self.url = '/api/materias-primas/'
+
+    def test_304_sin_consultar_el_listado(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        ultima = self.client.get(self.url)['Last-Modified']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=ultima).status_code, 304)
+
+    def test_escrituras_cambian_el_etag(self):
+        etag = self.client.get(self.url)['ETag']
+
+        # UPDATE masivo en SQL (sin señales ni save())
+        self.client.post('/api/materias-primas/actualizar_stock/',
+                         [{'id': self.materia.id, 'cantidad': 5}], format='json')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        # El listado muestra el nombre de la familia
+        self.familia.nombre = 'Maderas'
+        self.familia.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['familia_nombre'], 'Maderas')
+
+    def test_etag_distinto_por_url(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url + '?activo=true', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        # Un listado que no depende de familias no cambia al renombrar una familia
+        etag_productos = self.client.get('/api/productos/')['ETag']
+        self.familia.nombre = 'Otra'
+        self.familia.save()
+        self.assertEqual(self.client.get('/api/productos/', HTTP_IF_NONE_MATCH=etag_productos).status_code, 304)
+
+
+# ========================================
+# LISTADOS RÁPIDOS
+# ========================================
+
+class ListadoRapidoTests(TestCase):
+    """list() por values() con la misma salida que el serializer"""
+
+    def setUp(self):
+        self.client = APIClient()
+        familia = Familia.objects.create(codigo='01', nombre='Tapicería')
+        modelo = ModeloProducto.objects.create(codigo='MARIA', nombre='María', tipo='MATERIA')
+        for i, unidad in enumerate(['M', 'KG', 'UN']):
+            MateriaPrima.objects.create(familia=familia, modelo=modelo, nombre=f'Material {i}',
+                                        unidad_medida=unidad, stock_actual=i, stock_minimo=1,
+                                        precio_unitario='2.50')
+
+    def test_misma_salida_que_el_serializer(self):
+        from .serializers import MateriaPrimaSerializer
+        esperado = MateriaPrimaSerializer(MateriaPrima.objects.order_by('codigo'), many=True).data
+        with self.assertNumQueries(3):  # versión, COUNT y la página
+            data = self.client.get('/api/materias-primas/').json()
+        self.assertEqual(data['results'], json.loads(json.dumps(esperado)))
+        self.assertEqual([m['alerta_stock'] for m in data['results']], [True, True, False])
+        self.assertEqual(data['results'][0]['unidad_medida_display'], 'Metros')
+
+    def test_fields_y_vista_minima(self):
+        data = self.client.get('/api/materias-primas/?fields=codigo,stock_actual&ordering=-stock_actual').json()
+        self.assertEqual(data['results'][0], {'codigo': '01-MARIA-003', 'stock_actual': '2.00'})
+
+        data = self.client.get('/api/materias-primas/?view=minimal').json()
+        self.assertEqual(set(data['results'][0]), {
+            'id', 'codigo', 'nombre', 'familia_codigo', 'modelo_codigo',
+            'stock_actual', 'stock_minimo', 'unidad_medida',
+        })
+        self.assertEqual(data['results'][0]['familia_codigo'], '01')
+
+        response = self.client.get('/api/materias-primas/?fields=codigo,inventado')
+        self.assertEqual(response.status_code, 400)
+
+    def test_paginacion_con_values(self):
+        codigos = []
+        url = '/api/materias-primas/?page_size=2&fields=codigo&ordering=-nombre'
+        while url:
+            data = self.client.get(url).json()
+            codigos += [m['codigo'] for m in data['results']]
+            url = data['next']
+        self.assertEqual(codigos, ['01-MARIA-003', '01-MARIA-002', '01-MARIA-001'])
+
+
+# ========================================
+# VALORACIÓN DE INVENTARIO
+# ========================================
+
+class ValoracionStockTests(TestCase):
+    """Valoración mantenida por triggers y su recálculo completo"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.madera = Familia.objects.create(codigo='01', nombre='Madera')
+        self.tela = Familia.objects.create(codigo='02', nombre='Tela')
+        modelo = ModeloProducto.objects.create(codigo='MARTINA', nombre='Martina', tipo='MATERIA')
+        self.tablero = MateriaPrima.objects.create(
+            familia=self.madera, modelo=modelo, nombre='Tablero', unidad_medida='M2',
+            stock_actual=10, stock_minimo=1, precio_unitario='2.50', proveedor='Maderas SL',
+        )
+        self.loneta = MateriaPrima.objects.create(
+            familia=self.tela, modelo=modelo, nombre='Loneta', unidad_medida='M',
+            stock_actual=4, stock_minimo=1, precio_unitario='3.25', proveedor='Textil SA',
+        )
+
+    def valoracion(self, url='/api/materias-primas/valoracion/'):
+        with self.assertNumQueries(5 if 'materias' in url else 2):
+            return self.client.get(url).json()
+
+    def test_totales_y_agrupaciones(self):
+        data = self.valoracion()
+        self.assertEqual(data['total'], {'articulos': 2, 'unidades': '14.00', 'valor': '38.00'})
+        self.assertEqual(
+            [(f['nombre'], f['valor']) for f in data['por_familia']],
+            [('Madera', '25.00'), ('Tela', '13.00')],
+        )
+        self.assertEqual([f['unidad_medida'] for f in data['por_unidad_medida']], ['M', 'M2'])
+        self.assertEqual(data['por_proveedor'][1], {
+            'proveedor': 'Textil SA', 'articulos': 1, 'unidades': '4.00', 'valor': '13.00',
+        })
+
+    def test_cambios_de_stock_precio_y_clasificacion(self):
+        # Ajuste masivo en SQL, cambio de precio, cambio de familia y borrado
+        self.client.post('/api/materias-primas/actualizar_stock/',
+                         [{'id': self.tablero.id, 'cantidad': 10}], format='json')
+        MateriaPrima.objects.filter(pk=self.loneta.pk).update(precio_unitario='5.00', familia=self.madera)
+        data = self.valoracion()
+        self.assertEqual(data['total']['valor'], '70.00')
+        self.assertEqual([(f['nombre'], f['articulos']) for f in data['por_familia']], [('Madera', 2)])
+
+        self.tablero.delete()
+        self.assertEqual(self.valoracion()['total'], {'articulos': 1, 'unidades': '4.00', 'valor': '20.00'})
+        self.assertEqual(recalcular_valoracion(), 0)
+
+    def test_productos_a_precio_de_venta(self):
+        modelo = ModeloProducto.objects.create(codigo='MARIA', nombre='María', tipo='PRODUCTO')
+        Producto.objects.create(modelo=modelo, nombre='Silla', stock_actual=3, stock_minimo=1, precio_venta='99.90')
+        data = self.valoracion('/api/productos/valoracion/')
+        self.assertEqual(data['total'], {'articulos': 1, 'unidades': '3.00', 'valor': '299.70'})
+        self.assertEqual(data['por_modelo'][0]['nombre'], 'María')
+
+    def test_recalcular_corrige_descuadres(self):
+        ValoracionStock.objects.filter(familia=self.madera).update(valor=0)
+        self.assertEqual(recalcular_valoracion(), 1)
+        self.assertEqual(self.valoracion()['total']['valor'], '38.00')
+
+
+# ========================================
+# PROPUESTAS DE COMPRA
+# ========================================
+
+class PropuestaCompraTests(TestCase):
+    """Planificador de reposición y aprobación en bloque"""
+
+    def setUp(self):
+        self.client = APIClient()
+        familia = Familia.objects.create(codigo='01', nombre='Madera')
+        modelo = ModeloProducto.objects.create(codigo='MARTINA', nombre='Martina', tipo='MATERIA')
+
+        def materia(nombre, stock, minimo, proveedor, precio='2.50', activo=True):
+            return MateriaPrima.objects.create(
+                familia=familia, modelo=modelo, nombre=nombre, stock_actual=stock,
+                stock_minimo=minimo, precio_unitario=precio, proveedor=proveedor, activo=activo,
+            )
+
+        self.tablero = materia('Tablero', 2, 10, 'Maderas SL ')
+        self.liston = materia('Listón', 20, 10, 'Maderas SL')
+        self.tornillo = materia('Tornillo', 0, 5, '', precio='0.10')
+        materia('Barniz', 0, 5, 'Pinturas SA', activo=False)
+        materia('Cola', 50, 5, 'Pinturas SA')
+
+        # 60 unidades consumidas en los últimos 30 días (2 al día) y otras fuera del historial
+        ahora = timezone.now()
+        for dias, cantidad in ((1, -40), (20, -20), (45, -500)):
+            MovimientoStock.objects.create(tipo='consumo', materia_prima=self.liston,
+                                           cantidad=cantidad, fecha=ahora - timedelta(days=dias))
+
+    def generar(self, **datos):
+        return self.client.post('/api/propuestas-compra/generar/', datos, format='json')
+
+    def detalle(self, propuesta_id):
+        with self.assertNumQueries(3):
+            return self.client.get(f'/api/propuestas-compra/{propuesta_id}/').json()
+
+    def test_faltante_hasta_el_minimo_agrupado_por_proveedor(self):
+        response = self.generar()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['lineas'], response.data['total']), (2, '20.50'))
+
+        pedidos = self.detalle(response.data['id'])['pedidos']
+        self.assertEqual([(p['proveedor'], p['estado'], p['total']) for p in pedidos],
+                         [('', 'borrador', '0.50'), ('Maderas SL', 'borrador', '20.00')])
+        linea = pedidos[1]['lineas_pedido'][0]
+        self.assertEqual(
+            (linea['materia_prima_codigo'], linea['cantidad'], linea['precio_unitario'], linea['importe']),
+            (self.tablero.codigo, '8.00', '2.50', '20.00'),
+        )
+
+    def test_cobertura_con_el_consumo_del_historial(self):
+        response = self.generar(cobertura_dias=10, dias_historial=30)
+        pedidos = self.detalle(response.data['id'])['pedidos']
+        lineas = {l['materia_prima']: l for l in pedidos[1]['lineas_pedido']}
+        # Listón: 10 mínimo + 10 días * 2 al día - 20 en stock
+        self.assertEqual(lineas[self.liston.id]['consumo_diario'], '2.0000')
+        self.assertEqual(lineas[self.liston.id]['cantidad'], '10.00')
+        self.assertEqual(lineas[self.tablero.id]['cantidad'], '8.00')
+
+    def test_parametros_no_validos(self):
+        self.assertEqual(self.generar(cobertura_dias=-1).status_code, 400)
+        self.assertEqual(self.generar(dias_historial='x').status_code, 400)
+        self.assertEqual(self.generar(dias_historial=0).status_code, 400)
+        self.assertFalse(PropuestaCompra.objects.exists())
+
+    def test_cantidades_e_importes_fuera_de_rango(self):
+        # Un millón al día durante 3650 días no cabe en la cantidad de la línea
+        MovimientoStock.objects.create(tipo='consumo', materia_prima=self.liston,
+                                       cantidad=-90_000_000, fecha=timezone.now() - timedelta(days=2))
+        response = self.generar(cobertura_dias=3650)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('cobertura_dias', response.data['error'])
+        self.assertFalse(PropuestaCompra.objects.exists())
+        self.assertEqual(self.generar(cobertura_dias=10).status_code, 201)
+
+    def test_total_de_un_proveedor_fuera_de_rango(self):
+        # Cada línea cabe, pero el pedido del proveedor suma 1,8 billones
+        familia, modelo = self.tablero.familia, self.tablero.modelo
+        for i in range(20):
+            MateriaPrima.objects.create(
+                familia=familia, modelo=modelo, nombre=f'Caro {i}', stock_actual=0,
+                stock_minimo=900, precio_unitario='99999999.99', proveedor='Caro SA',
+            )
+        self.assertEqual(self.generar().status_code, 400)
+        self.assertFalse(PropuestaCompra.objects.exists())
+
+    def test_aprobar_en_bloque(self):
+        propuesta_id = self.generar().data['id']
+        pedidos = self.detalle(propuesta_id)['pedidos']
+        url = f'/api/propuestas-compra/{propuesta_id}/'
+
+        response = self.client.post(url + 'aprobar/', {'pedidos': [pedidos[1]['id']]}, format='json')
+        self.assertEqual((response.data['pedidos'], response.data['estado']), (1, 'borrador'))
+        # Ya no está en borrador
+        response = self.client.post(url + 'descartar/', {'pedidos': [pedidos[1]['id']]}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post(url + 'descartar/')
+        self.assertEqual((response.data['pedidos'], response.data['estado']), (1, 'aprobada'))
+        self.assertEqual([p['estado'] for p in self.detalle(propuesta_id)['pedidos']],
+                         ['descartado', 'aprobado'])
+        self.assertEqual(self.client.post(url + 'aprobar/').status_code, 400)
+
+    def test_descartar_todo(self):
+        propuesta_id = self.generar().data['id']
+        response = self.client.post(f'/api/propuestas-compra/{propuesta_id}/descartar/')
+        self.assertEqual((response.data['pedidos'], response.data['estado']), (2, 'descartada'))
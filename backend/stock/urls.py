@@ -5,6 +5,8 @@ from .views import (
     ProductoViewSet,
     FamiliaViewSet,
     ModeloProductoViewSet,
+    MovimientoStockViewSet,
+    PropuestaCompraViewSet,
 )
 
 app_name = 'stock'
@@ -17,6 +19,8 @@ router.register(r'familias', FamiliaViewSet, basename='familia')
 router.register(r'modelos', ModeloProductoViewSet, basename='modelo')
 router.register(r'materias-primas', MateriaPrimaViewSet, basename='materia-prima')
 router.register(r'productos', ProductoViewSet, basename='producto')
+router.register(r'movimientos-stock', MovimientoStockViewSet, basename='movimiento-stock')
+router.register(r'propuestas-compra', PropuestaCompraViewSet, basename='propuesta-compra')
 
 # Las URLs se incluyen automáticamente con el router
 urlpatterns = [
@@ -33,6 +37,7 @@ ENDPOINTS DISPONIBLES:
    PUT    /api/stock/familias/{id}/            - Actualizar
    DELETE /api/stock/familias/{id}/            - Eliminar
    GET    /api/stock/familias/activas/list/    - Solo activas
+   GET    /api/stock/familias/cache/           - Aciertos/fallos de la caché de referencias
 
 2. MODELOS DE PRODUCTOS:
    GET    /api/stock/modelos/                     - Listar todas
@@ -50,9 +55,14 @@ ENDPOINTS DISPONIBLES:
    PUT    /api/stock/materias-primas/{id}/               - Actualizar
    DELETE /api/stock/materias-primas/{id}/               - Eliminar
    GET    /api/stock/materias-primas/alerta_stock/list/  - Con alerta
+   GET    /api/stock/materias-primas/alertas_resumen/    - Nº de alertas por familia/modelo
+   GET    /api/stock/materias-primas/valoracion/         - Valor del stock por familia/modelo/unidad/proveedor
    GET    /api/stock/materias-primas/por_familia/list/   - Por familia
    GET    /api/stock/materias-primas/por_modelo/list/    - Por modelo
    POST   /api/stock/materias-primas/actualizar_stock/   - Actualizar stock múltiple
+   GET    /api/stock/materias-primas/{id}/stock_a_fecha/ - Stock en una fecha
+   POST   /api/stock/materias-primas/importar/           - Importar catálogo CSV/XLSX
+   GET    /api/stock/materias-primas/exportar/           - Exportar (csv/ndjson, gzip)
 
 4. PRODUCTOS:
    GET    /api/stock/productos/                     - Listar todas
@@ -61,13 +71,33 @@ ENDPOINTS DISPONIBLES:
    PUT    /api/stock/productos/{id}/                - Actualizar
    DELETE /api/stock/productos/{id}/                - Eliminar
    GET    /api/stock/productos/alerta_stock/list/   - Con alerta
+   GET    /api/stock/productos/alertas_resumen/     - Nº de alertas por modelo
+   GET    /api/stock/productos/valoracion/          - Valor a precio de venta por modelo
    GET    /api/stock/productos/por_modelo/list/     - Por modelo
    POST   /api/stock/productos/actualizar_stock/    - Actualizar stock múltiple
+   GET    /api/stock/productos/{id}/stock_a_fecha/  - Stock en una fecha
+   POST   /api/stock/productos/importar/            - Importar catálogo CSV/XLSX
+   GET    /api/stock/productos/exportar/            - Exportar (csv/ndjson, gzip)
+
+5. MOVIMIENTOS DE STOCK (solo lectura):
+   GET    /api/stock/movimientos-stock/                       - Listar
+   GET    /api/stock/movimientos-stock/?materia_prima=1       - De una materia prima
+   GET    /api/stock/movimientos-stock/?producto=1&tipo=venta - De un producto
+
+6. PROPUESTAS DE COMPRA (reposición de materias primas):
+   GET    /api/stock/propuestas-compra/                - Listar (cabeceras, ?estado=)
+   GET    /api/stock/propuestas-compra/{id}/           - Pedidos por proveedor con sus líneas
+   POST   /api/stock/propuestas-compra/generar/        - Nueva propuesta
+   POST   /api/stock/propuestas-compra/{id}/aprobar/   - Aprobar pedidos en borrador
+   POST   /api/stock/propuestas-compra/{id}/descartar/ - Descartar pedidos en borrador
 
 FILTROS Y BÚSQUEDA:
 
-Búsqueda por texto:
+Búsqueda por texto (por prefijo de cada palabra, sin distinguir tildes; en materias
+primas y productos ordena por relevancia salvo que se indique ?ordering=):
    GET /api/stock/materias-primas/?search=MARTINA
+   GET /api/stock/materias-primas/?search=tela gri      - "Tela gris", "Telas grises"...
+   GET /api/stock/materias-primas/?search=01-MARTINA-0  - Por prefijo de código
    GET /api/stock/productos/?search=silla
 
 Filtros:
@@ -80,6 +110,18 @@ Ordenamiento:
    GET /api/stock/materias-primas/?ordering=codigo
    GET /api/stock/productos/?ordering=-precio_venta  (descendente)
 
+Paginación (materias primas y productos, por cursor):
+   GET /api/stock/materias-primas/                      - Primera página con "next"
+   GET /api/stock/materias-primas/?cursor=eyJ2Ij...     - Página siguiente (enlace "next")
+   GET /api/stock/materias-primas/?contar=false         - Sin "count" (evita el COUNT(*))
+   GET /api/stock/productos/?page_size=500&ordering=nombre
+   GET /api/stock/productos/?page=3                     - Paginación clásica por número
+
+Respuestas condicionales (listados de materias primas, productos, clientes y pedidos):
+   La respuesta lleva ETag y Last-Modified. Repitiendo la petición con
+   If-None-Match: <ETag> (o If-Modified-Since) se obtiene 304 sin cuerpo
+   mientras no cambie ninguna de las tablas del listado.
+
 EJEMPLOS DE USO:
 
 1. Crear familia:
@@ -126,9 +168,39 @@ EJEMPLOS DE USO:
    Resultado: código "MARTINA-001"
 
 5. Actualizar stock de múltiples items:
-   POST /api/stock/materias-primas/actualizar_stock/
+   POST /api/stock/materias-primas/actualizar_stock/?referencia=ALB-2026-0042
    [
-     {"id": 1, "cantidad": 50},
-     {"id": 2, "cantidad": -10}
+     {"id": 1, "cantidad": 50, "tipo": "recepcion"},
+     {"id": 2, "cantidad": -10, "tipo": "consumo"}
    ]
-"""
\ No newline at end of file
+   "tipo" es opcional (recepcion, consumo, venta, ajuste; por defecto ajuste).
+   Cada línea queda registrada en el libro de movimientos.
+   Se aplica en una sola transacción; los ids inexistentes se devuelven en
+   "no_encontradas" (o "no_encontrados" en productos).
+
+6. Importar catálogo (multipart, campo "archivo"):
+   POST /api/stock/materias-primas/importar/
+   Columnas: codigo, nombre, descripcion, familia, modelo, unidad_medida,
+             stock_actual, stock_minimo, precio_unitario, proveedor
+   POST /api/stock/productos/importar/
+   Columnas: codigo, nombre, descripcion, modelo, stock_actual, stock_minimo,
+             precio_venta, tiempo_fabricacion
+   familia y modelo van por código. Si falta el código se genera; si el código
+   ya existe se actualiza el artículo (sin tocar su stock). Las filas con error
+   no se importan y se devuelven en "errores". También por consola:
+   python manage.py importar_catalogo materias catalogo.csv --informe errores.csv
+
+7. Exportar el catálogo completo (streaming, admite los mismos filtros del listado):
+   GET /api/stock/materias-primas/exportar/?formato=csv
+   GET /api/stock/productos/exportar/?formato=ndjson&gzip=true&activo=true
+
+8. Generar y aprobar una propuesta de compra:
+   POST /api/stock/propuestas-compra/generar/
+   {"cobertura_dias": 15, "dias_historial": 90}
+   Cantidad por materia prima activa (solo si sale positiva):
+   stock_minimo + cobertura_dias * consumo diario medio - stock_actual,
+   con el consumo medio de los movimientos "consumo" de los últimos
+   dias_historial días. Se agrupa en un pedido de compra por proveedor.
+   POST /api/stock/propuestas-compra/5/aprobar/
+   {"pedidos": [12, 13]}   (sin cuerpo se aprueban todos los pedidos en borrador)
+"""
@@ -1,10 +1,23 @@
+from datetime import datetime, time
+from decimal import Decimal
+
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.filters import SearchFilter, OrderingFilter
 from django_filters.rest_framework import DjangoFilterBackend
 
-from .models import Producto, MateriaPrima, Familia, ModeloProducto
+from django.db.models import Prefetch, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from comun.condicional import ListadoCondicionalMixin
+from comun.exports import exportar_listado
+from comun.pagination import PaginacionCursor
+from .models import (
+    Producto, MateriaPrima, Familia, ModeloProducto, MovimientoStock, ContadorAlertaStock, ValoracionStock,
+    PropuestaCompra, LineaPedidoCompra,
+)
 from .serializers import (
     ProductoSerializer,
     MateriaPrimaSerializer,
@@ -12,7 +25,185 @@ from .serializers import (
     ModeloProductoSerializer,
     ProductoMinimalSerializer,
     MateriaPrimaMinimalSerializer,
+    MovimientoStockSerializer,
+    PropuestaCompraSerializer,
+    PropuestaCompraDetalleSerializer,
+)
+from .services import (
+    ajustar_stock, stock_a_fecha, AjusteStockError, StockHistoricoError,
+    generar_propuesta_compra, aprobar_propuesta_compra, descartar_propuesta_compra, PropuestaCompraError,
 )
+from .importers import importar_catalogo, ImportacionError
+from .filters import BusquedaTextoFilter, OrdenRelevanciaFilter
+from . import referencias
+from .listados import ListadoRapidoMixin
+
+# Errores de importación que se devuelven en la respuesta (el resto solo se cuentan)
+MAX_ERRORES_RESPUESTA = 1000
+
+# Columnas de exportación: (nombre en el archivo, campo)
+COLUMNAS_EXPORTACION_MATERIAS = [
+    ('id', 'id'),
+    ('codigo', 'codigo'),
+    ('nombre', 'nombre'),
+    ('familia', 'familia__codigo'),
+    ('familia_nombre', 'familia__nombre'),
+    ('modelo', 'modelo__codigo'),
+    ('modelo_nombre', 'modelo__nombre'),
+    ('unidad_medida', 'unidad_medida'),
+    ('stock_actual', 'stock_actual'),
+    ('stock_minimo', 'stock_minimo'),
+    ('precio_unitario', 'precio_unitario'),
+    ('proveedor', 'proveedor'),
+    ('activo', 'activo'),
+    ('alerta_stock', 'en_alerta'),
+]
+COLUMNAS_EXPORTACION_PRODUCTOS = [
+    ('id', 'id'),
+    ('codigo', 'codigo'),
+    ('nombre', 'nombre'),
+    ('modelo', 'modelo__codigo'),
+    ('modelo_nombre', 'modelo__nombre'),
+    ('stock_actual', 'stock_actual'),
+    ('stock_minimo', 'stock_minimo'),
+    ('precio_venta', 'precio_venta'),
+    ('tiempo_fabricacion', 'tiempo_fabricacion'),
+    ('activo', 'activo'),
+    ('alerta_stock', 'en_alerta'),
+]
+
+
+def _parsear_fecha_corte(valor):
+    """
+    Convierte ?fecha= en un datetime con zona horaria. Una fecha sin hora
+    se interpreta como el final de ese día.
+    """
+    if not valor:
+        return timezone.now()
+    fecha = parse_datetime(valor)
+    if fecha is None:
+        dia = parse_date(valor)
+        if dia is None:
+            raise ValueError(valor)
+        fecha = datetime.combine(dia, time.max)
+    if timezone.is_naive(fecha):
+        fecha = timezone.make_aware(fecha)
+    return fecha
+
+
+def _resumen_alertas(ambito, agrupaciones):
+    """
+    Número de artículos activos en alerta por cada agrupación ('familia', 'modelo'),
+    leído de los contadores que mantienen los triggers (sin COUNT(*) sobre la tabla).
+    """
+    contadores = ContadorAlertaStock.objects.filter(ambito=ambito, alertas__gt=0)
+    data = {'total': contadores.aggregate(total=Sum('alertas'))['total'] or 0}
+    
+    for campo in agrupaciones:
+        data[f'por_{campo}'] = [
+            {'id': fila[campo], 'nombre': fila[f'{campo}__nombre'], 'alertas': fila['total']}
+            for fila in contadores.values(campo, f'{campo}__nombre')
+                                  .annotate(total=Sum('alertas'))
+                                  .order_by(f'{campo}__nombre')
+        ]
+    return data
+
+
+def _valoracion(ambito, agrupaciones):
+    """
+    Valor del stock total y por cada agrupación ('familia', 'modelo',
+    'unidad_medida', 'proveedor'), leído de las filas de valoraciones_stock
+    que mantienen los triggers: tantas filas como combinaciones, no artículos.
+    """
+    filas = ValoracionStock.objects.filter(ambito=ambito, articulos__gt=0)
+    totales = {
+        'total_articulos': Sum('articulos'),
+        'total_unidades': Sum('unidades'),
+        'total_valor': Sum('valor'),
+    }
+    
+    def importes(fila):
+        return {
+            'articulos': fila['total_articulos'] or 0,
+            'unidades': str(fila['total_unidades'] or Decimal('0.00')),
+            'valor': str((fila['total_valor'] or Decimal(0)).quantize(Decimal('0.01'))),
+        }
+    
+    data = {'total': importes(filas.aggregate(**totales))}
+    for campo in agrupaciones:
+        if campo in ('familia', 'modelo'):
+            grupos = filas.values(campo, f'{campo}__nombre').order_by(f'{campo}__nombre')
+            data[f'por_{campo}'] = [
+                {'id': fila[campo], 'nombre': fila[f'{campo}__nombre'], **importes(fila)}
+                for fila in grupos.annotate(**totales)
+            ]
+        else:
+            data[f'por_{campo}'] = [
+                {campo: fila[campo], **importes(fila)}
+                for fila in filas.values(campo).order_by(campo).annotate(**totales)
+            ]
+    return data
+
+
+def _agrupar(grupos, articulos, campo, serializer_class):
+    """
+    Agrupa en memoria una única consulta de artículos por el campo indicado.
+    `grupos` son familias o modelos de la caché de referencias.
+    Devuelve {nombre del grupo: [artículos serializados]} en el orden de
+    `grupos`, incluyendo los grupos sin artículos.
+    """
+    por_grupo = {grupo['id']: [] for grupo in grupos}
+    for articulo in articulos:
+        por_grupo[getattr(articulo, f'{campo}_id')].append(articulo)
+    
+    return {
+        grupo['nombre']: serializer_class(por_grupo[grupo['id']], many=True).data
+        for grupo in grupos
+    }
+
+
+def _respuesta_importacion(model, request):
+    """Respuesta común de las acciones importar (archivo en el campo 'archivo')"""
+    archivo = request.FILES.get('archivo')
+    if archivo is None:
+        return Response(
+            {"error": "Debe enviar un archivo CSV o XLSX en el campo 'archivo'"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        informe = importar_catalogo(model, archivo, archivo.name)
+    except ImportacionError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    errores = informe['errores']
+    return Response({
+        'creados': informe['creados'],
+        'actualizados': informe['actualizados'],
+        'total_errores': len(errores),
+        'errores': errores[:MAX_ERRORES_RESPUESTA],
+    })
+
+
+def _respuesta_stock_a_fecha(articulo, valor):
+    """Respuesta común de las acciones stock_a_fecha"""
+    try:
+        fecha = _parsear_fecha_corte(valor)
+    except ValueError:
+        return Response(
+            {"error": "Fecha no válida, use AAAA-MM-DD o fecha y hora ISO 8601"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        stock = stock_a_fecha(articulo, fecha)
+    except StockHistoricoError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({
+        'id': articulo.id,
+        'codigo': articulo.codigo,
+        'fecha': fecha,
+        'stock': stock if isinstance(stock, int) else str(stock),
+    })
 
 
 # ========================================
@@ -30,6 +221,7 @@ class FamiliaViewSet(viewsets.ModelViewSet):
     - PUT /api/familias/{id}/ - Actualizar familia
     - DELETE /api/familias/{id}/ - Eliminar familia
     - GET /api/familias/activas/list/ - Solo familias activas
+    - GET /api/familias/cache/ - Aciertos y fallos de la caché de familias y modelos
     """
     queryset = Familia.objects.all()
     serializer_class = FamiliaSerializer
@@ -51,10 +243,13 @@ class FamiliaViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def activas(self, request):
-        """Retorna solo familias activas"""
-        familias = Familia.objects.filter(activo=True).order_by('codigo')
-        serializer = FamiliaSerializer(familias, many=True)
-        return Response(serializer.data)
+        """Retorna solo familias activas (desde la caché de referencias)"""
+        return Response([familia for familia in referencias.familias() if familia['activo']])
+    
+    @action(detail=False, methods=['get'])
+    def cache(self, request):
+        """Aciertos y fallos de la caché de referencias en este proceso"""
+        return Response(referencias.estadisticas())
 
 
 class ModeloProductoViewSet(viewsets.ModelViewSet):
@@ -94,44 +289,53 @@ class ModeloProductoViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def por_tipo(self, request):
-        """Retorna modelos agrupados por tipo"""
-        materias = ModeloProducto.objects.filter(tipo='MATERIA', activo=True)
-        productos = ModeloProducto.objects.filter(tipo='PRODUCTO', activo=True)
+        """Retorna modelos agrupados por tipo (desde la caché de referencias)"""
+        activos = [modelo for modelo in referencias.modelos() if modelo['activo']]
         
         return Response({
-            'materias': ModeloProductoSerializer(materias, many=True).data,
-            'productos': ModeloProductoSerializer(productos, many=True).data
+            'materias': [modelo for modelo in activos if modelo['tipo'] == 'MATERIA'],
+            'productos': [modelo for modelo in activos if modelo['tipo'] == 'PRODUCTO']
         })
     
     @action(detail=False, methods=['get'])
     def activos(self, request):
-        """Retorna solo modelos activos"""
-        modelos = ModeloProducto.objects.filter(activo=True).order_by('codigo')
-        serializer = ModeloProductoSerializer(modelos, many=True)
-        return Response(serializer.data)
+        """Retorna solo modelos activos (desde la caché de referencias)"""
+        return Response([modelo for modelo in referencias.modelos() if modelo['activo']])
 
 
 # ========================================
 # VIEWSETS DE STOCK
 # ========================================
 
-class MateriaPrimaViewSet(viewsets.ModelViewSet):
+class MateriaPrimaViewSet(ListadoCondicionalMixin, ListadoRapidoMixin, viewsets.ModelViewSet):
     """
     ViewSet para gestionar materias primas
     
     Endpoints:
-    - GET /api/materias-primas/ - Listar todas
+    - GET /api/materias-primas/ - Listar todas (ETag/Last-Modified: 304 si no ha cambiado)
+      (?fields=id,codigo,... solo esas columnas; ?view=minimal serializer mínimo)
+      (paginación por cursor: ?cursor=, ?page_size=, ?contar=false; ?page=N clásica)
     - POST /api/materias-primas/ - Crear nueva
     - GET /api/materias-primas/{id}/ - Obtener detalles
     - PUT /api/materias-primas/{id}/ - Actualizar
     - DELETE /api/materias-primas/{id}/ - Eliminar
     - GET /api/materias-primas/alerta-stock/list/ - Solo con alerta
+    - GET /api/materias-primas/alertas_resumen/ - Nº de alertas por familia y modelo
+    - GET /api/materias-primas/valoracion/ - Valor del stock por familia, modelo, unidad y proveedor
     - GET /api/materias-primas/por-familia/list/ - Agrupadas por familia
     - GET /api/materias-primas/por-modelo/list/ - Agrupadas por modelo
+    - GET /api/materias-primas/{id}/stock_a_fecha/?fecha=AAAA-MM-DD - Stock histórico
+    - POST /api/materias-primas/importar/ - Importar catálogo CSV/XLSX
+    - GET /api/materias-primas/exportar/?formato=csv|ndjson&gzip=true - Exportar en streaming
     """
     queryset = MateriaPrima.objects.all()
     serializer_class = MateriaPrimaSerializer
-    filter_backends = [SearchFilter, OrderingFilter, DjangoFilterBackend]
+    serializer_minimal_class = MateriaPrimaMinimalSerializer
+    columnas_sql = {'alerta_stock': 'en_alerta'}
+    pagination_class = PaginacionCursor
+    modelos_version = [MateriaPrima, Familia, ModeloProducto]
+    filter_backends = [BusquedaTextoFilter, OrdenRelevanciaFilter, DjangoFilterBackend]
+    # Campos que cubre el vector de búsqueda (ver stock/filters.py)
     search_fields = ['codigo', 'nombre', 'familia__nombre', 'modelo__nombre']
     ordering_fields = ['codigo', 'nombre', 'stock_actual', 'created_at']
     ordering = ['codigo']
@@ -139,7 +343,7 @@ class MateriaPrimaViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """Filtrar materias primas con opciones avanzadas"""
-        queryset = MateriaPrima.objects.select_related('familia', 'modelo')
+        queryset = MateriaPrima.objects.defer('busqueda')
         
         # Filtro por activo
         activo = self.request.query_params.get('activo', None)
@@ -149,7 +353,7 @@ class MateriaPrimaViewSet(viewsets.ModelViewSet):
         # Filtro por alerta de stock
         alerta = self.request.query_params.get('alerta', None)
         if alerta is not None and alerta.lower() == 'true':
-            queryset = queryset.filter(stock_actual__lte=models.F('stock_minimo'))
+            queryset = queryset.filter(en_alerta=True)
         
         return queryset.order_by('codigo')
     
@@ -157,109 +361,120 @@ class MateriaPrimaViewSet(viewsets.ModelViewSet):
     def alerta_stock(self, request):
         """Retorna solo materias primas con stock bajo"""
         materias = MateriaPrima.objects.filter(
-            stock_actual__lte=models.F('stock_minimo'),
-            activo=True
+            activo=True,
+            en_alerta=True
         ).order_by('codigo')
         serializer = MateriaPrimaSerializer(materias, many=True)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'])
+    def alertas_resumen(self, request):
+        """Retorna el número de materias primas en alerta por familia y por modelo"""
+        return Response(_resumen_alertas('materias_primas', ['familia', 'modelo']))
+    
+    @action(detail=False, methods=['get'])
+    def valoracion(self, request):
+        """Valor del stock (stock_actual x precio_unitario) total y por familia, modelo, unidad y proveedor"""
+        return Response(_valoracion('materias_primas', ['familia', 'modelo', 'unidad_medida', 'proveedor']))
+    
     @action(detail=False, methods=['get'])
     def por_familia(self, request):
         """Retorna materias primas agrupadas por familia"""
         familia_id = request.query_params.get('familia_id', None)
+        materias = MateriaPrima.objects.filter(
+            activo=True
+        ).order_by('codigo')
         
         if familia_id:
-            materias = MateriaPrima.objects.filter(
-                familia_id=familia_id,
-                activo=True
-            ).order_by('codigo')
-            serializer = MateriaPrimaSerializer(materias, many=True)
+            serializer = MateriaPrimaSerializer(materias.filter(familia_id=familia_id), many=True)
             return Response(serializer.data)
         
-        familias = Familia.objects.filter(activo=True)
-        data = {}
-        
-        for familia in familias:
-            materias = MateriaPrima.objects.filter(
-                familia=familia,
-                activo=True
-            ).order_by('codigo')
-            data[familia.nombre] = MateriaPrimaSerializer(materias, many=True).data
-        
-        return Response(data)
+        # Una consulta de artículos; las familias salen de la caché de referencias
+        familias = [f for f in referencias.familias() if f['activo']]
+        materias = materias.filter(familia__in=[familia['id'] for familia in familias])
+        return Response(_agrupar(familias, materias, 'familia', MateriaPrimaSerializer))
     
     @action(detail=False, methods=['get'])
     def por_modelo(self, request):
         """Retorna materias primas agrupadas por modelo"""
         modelo_id = request.query_params.get('modelo_id', None)
+        materias = MateriaPrima.objects.filter(
+            activo=True
+        ).order_by('codigo')
         
         if modelo_id:
-            materias = MateriaPrima.objects.filter(
-                modelo_id=modelo_id,
-                activo=True
-            ).order_by('codigo')
-            serializer = MateriaPrimaSerializer(materias, many=True)
+            serializer = MateriaPrimaSerializer(materias.filter(modelo_id=modelo_id), many=True)
             return Response(serializer.data)
         
-        modelos = ModeloProducto.objects.filter(tipo='MATERIA', activo=True)
-        data = {}
-        
-        for modelo in modelos:
-            materias = MateriaPrima.objects.filter(
-                modelo=modelo,
-                activo=True
-            ).order_by('codigo')
-            data[modelo.nombre] = MateriaPrimaSerializer(materias, many=True).data
-        
-        return Response(data)
+        modelos = [m for m in referencias.modelos() if m['activo'] and m['tipo'] == 'MATERIA']
+        materias = materias.filter(modelo__in=[modelo['id'] for modelo in modelos])
+        return Response(_agrupar(modelos, materias, 'modelo', MateriaPrimaSerializer))
     
     @action(detail=False, methods=['post'])
     def actualizar_stock(self, request):
         """Endpoint para actualizar stock de múltiples materias primas"""
         datos = request.data  # Debe ser lista: [{"id": 1, "cantidad": 10}, ...]
         
-        if not isinstance(datos, list):
-            return Response(
-                {"error": "Debe enviar una lista"},
-                status=status.HTTP_400_BAD_REQUEST
+        try:
+            actualizadas, no_encontradas = ajustar_stock(
+                MateriaPrima, datos, referencia=request.query_params.get('referencia', '')
             )
+        except AjusteStockError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
-        actualizadas = []
-        for item in datos:
-            try:
-                materia = MateriaPrima.objects.get(id=item['id'])
-                materia.stock_actual += item.get('cantidad', 0)
-                materia.save()
-                actualizadas.append({
-                    'id': materia.id,
-                    'codigo': materia.codigo,
-                    'stock_actual': str(materia.stock_actual)
-                })
-            except MateriaPrima.DoesNotExist:
-                pass
+        for materia in actualizadas:
+            materia['stock_actual'] = str(materia['stock_actual'])
         
         return Response({
             'actualizadas': actualizadas,
-            'cantidad': len(actualizadas)
+            'cantidad': len(actualizadas),
+            'no_encontradas': no_encontradas,
         })
+    
+    @action(detail=True, methods=['get'])
+    def stock_a_fecha(self, request, pk=None):
+        """Stock de la materia prima en una fecha (?fecha=, por defecto ahora)"""
+        return _respuesta_stock_a_fecha(self.get_object(), request.query_params.get('fecha'))
+    
+    @action(detail=False, methods=['post'])
+    def importar(self, request):
+        """Importa materias primas desde un archivo CSV o XLSX"""
+        return _respuesta_importacion(MateriaPrima, request)
+    
+    @action(detail=False, methods=['get'])
+    def exportar(self, request):
+        """Exporta las materias primas (con los filtros del listado) en CSV o NDJSON"""
+        return exportar_listado(self, COLUMNAS_EXPORTACION_MATERIAS, 'materias_primas')
 
 
-class ProductoViewSet(viewsets.ModelViewSet):
+class ProductoViewSet(ListadoCondicionalMixin, ListadoRapidoMixin, viewsets.ModelViewSet):
     """
     ViewSet para gestionar productos finales
     
     Endpoints:
-    - GET /api/productos/ - Listar todos
+    - GET /api/productos/ - Listar todos (ETag/Last-Modified: 304 si no ha cambiado)
+      (?fields=id,codigo,... solo esas columnas; ?view=minimal serializer mínimo)
+      (paginación por cursor: ?cursor=, ?page_size=, ?contar=false; ?page=N clásica)
     - POST /api/productos/ - Crear nuevo
     - GET /api/productos/{id}/ - Obtener detalles
     - PUT /api/productos/{id}/ - Actualizar
     - DELETE /api/productos/{id}/ - Eliminar
     - GET /api/productos/alerta-stock/list/ - Solo con alerta
+    - GET /api/productos/alertas_resumen/ - Nº de alertas por modelo
+    - GET /api/productos/valoracion/ - Valor del stock a precio de venta por modelo
     - GET /api/productos/por-modelo/list/ - Agrupados por modelo
+    - GET /api/productos/{id}/stock_a_fecha/?fecha=AAAA-MM-DD - Stock histórico
+    - POST /api/productos/importar/ - Importar catálogo CSV/XLSX
+    - GET /api/productos/exportar/?formato=csv|ndjson&gzip=true - Exportar en streaming
     """
     queryset = Producto.objects.all()
     serializer_class = ProductoSerializer
-    filter_backends = [SearchFilter, OrderingFilter, DjangoFilterBackend]
+    serializer_minimal_class = ProductoMinimalSerializer
+    columnas_sql = {'alerta_stock': 'en_alerta'}
+    pagination_class = PaginacionCursor
+    modelos_version = [Producto, ModeloProducto]
+    filter_backends = [BusquedaTextoFilter, OrdenRelevanciaFilter, DjangoFilterBackend]
+    # Campos que cubre el vector de búsqueda (ver stock/filters.py)
     search_fields = ['codigo', 'nombre', 'modelo__nombre']
     ordering_fields = ['codigo', 'nombre', 'stock_actual', 'precio_venta', 'created_at']
     ordering = ['codigo']
@@ -267,7 +482,7 @@ class ProductoViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """Filtrar productos con opciones avanzadas"""
-        queryset = Producto.objects.select_related('modelo')
+        queryset = Producto.objects.defer('busqueda')
         
         # Filtro por activo
         activo = self.request.query_params.get('activo', None)
@@ -277,7 +492,7 @@ class ProductoViewSet(viewsets.ModelViewSet):
         # Filtro por alerta de stock
         alerta = self.request.query_params.get('alerta', None)
         if alerta is not None and alerta.lower() == 'true':
-            queryset = queryset.filter(stock_actual__lte=models.F('stock_minimo'))
+            queryset = queryset.filter(en_alerta=True)
         
         return queryset.order_by('codigo')
     
@@ -285,63 +500,161 @@ class ProductoViewSet(viewsets.ModelViewSet):
     def alerta_stock(self, request):
         """Retorna solo productos con stock bajo"""
         productos = Producto.objects.filter(
-            stock_actual__lte=models.F('stock_minimo'),
-            activo=True
+            activo=True,
+            en_alerta=True
         ).order_by('codigo')
         serializer = ProductoSerializer(productos, many=True)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'])
+    def alertas_resumen(self, request):
+        """Retorna el número de productos en alerta por modelo"""
+        return Response(_resumen_alertas('productos', ['modelo']))
+    
+    @action(detail=False, methods=['get'])
+    def valoracion(self, request):
+        """Valor del stock de producto terminado (a precio de venta), total y por modelo"""
+        return Response(_valoracion('productos', ['modelo']))
+    
     @action(detail=False, methods=['get'])
     def por_modelo(self, request):
         """Retorna productos agrupados por modelo"""
         modelo_id = request.query_params.get('modelo_id', None)
+        productos = Producto.objects.filter(
+            activo=True
+        ).order_by('codigo')
         
         if modelo_id:
-            productos = Producto.objects.filter(
-                modelo_id=modelo_id,
-                activo=True
-            ).order_by('codigo')
-            serializer = ProductoSerializer(productos, many=True)
+            serializer = ProductoSerializer(productos.filter(modelo_id=modelo_id), many=True)
             return Response(serializer.data)
         
-        modelos = ModeloProducto.objects.filter(tipo='PRODUCTO', activo=True)
-        data = {}
-        
-        for modelo in modelos:
-            productos = Producto.objects.filter(
-                modelo=modelo,
-                activo=True
-            ).order_by('codigo')
-            data[modelo.nombre] = ProductoSerializer(productos, many=True).data
-        
-        return Response(data)
+        modelos = [m for m in referencias.modelos() if m['activo'] and m['tipo'] == 'PRODUCTO']
+        productos = productos.filter(modelo__in=[modelo['id'] for modelo in modelos])
+        return Response(_agrupar(modelos, productos, 'modelo', ProductoSerializer))
     
     @action(detail=False, methods=['post'])
     def actualizar_stock(self, request):
         """Endpoint para actualizar stock de múltiples productos"""
         datos = request.data  # Debe ser lista: [{"id": 1, "cantidad": 10}, ...]
         
-        if not isinstance(datos, list):
-            return Response(
-                {"error": "Debe enviar una lista"},
-                status=status.HTTP_400_BAD_REQUEST
+        try:
+            actualizados, no_encontrados = ajustar_stock(
+                Producto, datos, referencia=request.query_params.get('referencia', '')
             )
-        
-        actualizados = []
-        for item in datos:
-            try:
-                producto = Producto.objects.get(id=item['id'])
-                producto.stock_actual += item.get('cantidad', 0)
-                producto.save()
-                actualizados.append({
-                    'id': producto.id,
-                    'codigo': producto.codigo,
-                    'stock_actual': producto.stock_actual
-                })
-            except Producto.DoesNotExist:
-                pass
+        except AjusteStockError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
         return Response({
             'actualizados': actualizados,
-            'cantidad': len(actualizados)
-        })
\ No newline at end of file
+            'cantidad': len(actualizados),
+            'no_encontrados': no_encontrados,
+        })
+    
+    @action(detail=True, methods=['get'])
+    def stock_a_fecha(self, request, pk=None):
+        """Stock del producto en una fecha (?fecha=, por defecto ahora)"""
+        return _respuesta_stock_a_fecha(self.get_object(), request.query_params.get('fecha'))
+    
+    @action(detail=False, methods=['post'])
+    def importar(self, request):
+        """Importa productos desde un archivo CSV o XLSX"""
+        return _respuesta_importacion(Producto, request)
+    
+    @action(detail=False, methods=['get'])
+    def exportar(self, request):
+        """Exporta los productos (con los filtros del listado) en CSV o NDJSON"""
+        return exportar_listado(self, COLUMNAS_EXPORTACION_PRODUCTOS, 'productos')
+
+
+# ========================================
+# LIBRO DE MOVIMIENTOS
+# ========================================
+
+class MovimientoStockViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Consulta del libro de movimientos de stock (solo lectura).
+    Los movimientos se registran con actualizar_stock o al editar el stock.
+    
+    Endpoints:
+    - GET /api/movimientos-stock/ - Listar (filtros: tipo, materia_prima, producto)
+    - GET /api/movimientos-stock/{id}/ - Obtener detalles
+    """
+    queryset = MovimientoStock.objects.all()
+    serializer_class = MovimientoStockSerializer
+    filter_backends = [OrderingFilter, DjangoFilterBackend]
+    ordering_fields = ['fecha']
+    ordering = ['-fecha', '-id']
+    filterset_fields = ['tipo', 'materia_prima', 'producto']
+
+
+# ========================================
+# PROPUESTAS DE COMPRA
+# ========================================
+
+class PropuestaCompraViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Propuestas de reposición: un pedido de compra en borrador por proveedor.
+    
+    Endpoints:
+    - GET /api/propuestas-compra/ - Listar (solo cabeceras; filtro: estado)
+    - GET /api/propuestas-compra/{id}/ - Detalle con pedidos y líneas
+    - POST /api/propuestas-compra/generar/ - Calcula una nueva propuesta
+      {"cobertura_dias": 15, "dias_historial": 90}
+    - POST /api/propuestas-compra/{id}/aprobar/ - Aprueba los pedidos en borrador
+      (todos, o {"pedidos": [1, 2]})
+    - POST /api/propuestas-compra/{id}/descartar/ - Descarta los pedidos en borrador
+    """
+    queryset = PropuestaCompra.objects.all()
+    serializer_class = PropuestaCompraSerializer
+    filter_backends = [OrderingFilter, DjangoFilterBackend]
+    ordering_fields = ['fecha', 'total']
+    ordering = ['-fecha', '-id']
+    filterset_fields = ['estado']
+    
+    def get_queryset(self):
+        queryset = PropuestaCompra.objects.all()
+        if self.action == 'retrieve':
+            lineas = LineaPedidoCompra.objects.select_related('materia_prima').only(
+                'id', 'pedido_id', 'materia_prima__codigo', 'materia_prima__nombre',
+                'stock_actual', 'stock_minimo', 'consumo_diario', 'cantidad', 'precio_unitario', 'importe',
+            )
+            queryset = queryset.prefetch_related('pedidos', Prefetch('pedidos__lineas_pedido', queryset=lineas))
+        return queryset
+    
+    def get_serializer_class(self):
+        if self.action == 'retrieve':
+            return PropuestaCompraDetalleSerializer
+        return PropuestaCompraSerializer
+    
+    @action(detail=False, methods=['post'])
+    def generar(self, request):
+        """Calcula la reposición de todas las materias primas activas"""
+        datos = request.data if isinstance(request.data, dict) else {}
+        try:
+            propuesta = generar_propuesta_compra(
+                cobertura_dias=datos.get('cobertura_dias', 0),
+                dias_historial=datos.get('dias_historial', 90),
+            )
+        except PropuestaCompraError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(PropuestaCompraSerializer(propuesta).data, status=status.HTTP_201_CREATED)
+    
+    @action(detail=True, methods=['post'])
+    def aprobar(self, request, pk=None):
+        """Aprueba en bloque los pedidos en borrador ({"pedidos": [...]} opcional)"""
+        return self._cerrar(request, pk, aprobar_propuesta_compra)
+    
+    @action(detail=True, methods=['post'])
+    def descartar(self, request, pk=None):
+        """Descarta en bloque los pedidos en borrador ({"pedidos": [...]} opcional)"""
+        return self._cerrar(request, pk, descartar_propuesta_compra)
+    
+    def _cerrar(self, request, pk, operacion):
+        propuesta = self.get_object()
+        datos = request.data if isinstance(request.data, dict) else {}
+        try:
+            cambiados = operacion(propuesta.id, datos.get('pedidos'))
+        except PropuestaCompraError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        propuesta.refresh_from_db()
+        return Response({'pedidos': cambiados, **PropuestaCompraSerializer(propuesta).data})
@@ -1,5 +1,22 @@
 import { useState, useEffect } from 'react';
 import { BarChart, Bar, LineChart, Line, PieChart, Pie, Cell, XAxis, YAxis, CartesianGrid, Tooltip, Legend, ResponsiveContainer } from 'recharts';
+import { dashboardAPI, pedidosAPI } from '../services/api';
+
+const COLORES_ESTADO = {
+  pendiente: '#F59E0B',
+  en_produccion: '#3B82F6',
+  producido: '#8B5CF6',
+  entregado: '#10B981',
+  cancelado: '#EF4444',
+};
+
+// Primer día del mes de hace `meses` meses, en AAAA-MM-DD
+const inicioMes = (meses) => {
+  const fecha = new Date();
+  fecha.setDate(1);
+  fecha.setMonth(fecha.getMonth() - meses);
+  return `${fecha.getFullYear()}-${String(fecha.getMonth() + 1).padStart(2, '0')}-01`;
+};
 
 export default function Dashboard() {
   const [stats, setStats] = useState({
@@ -9,56 +26,64 @@ export default function Dashboard() {
     pedidosPendientes: 0,
   });
 
+  const [pedidosPorEstado, setPedidosPorEstado] = useState([]);
+  const [ventasMensuales, setVentasMensuales] = useState([]);
+  const [productosMasVendidos, setProductosMasVendidos] = useState([]);
+
   useEffect(() => {
     fetchStats();
+    fetchGraficos();
   }, []);
 
   const fetchStats = async () => {
     try {
-      const [clientesRes, pedidosRes, productosRes] = await Promise.all([
-        fetch('http://127.0.0.1:8000/api/clientes/'),
-        fetch('http://127.0.0.1:8000/api/pedidos/'),
-        fetch('http://127.0.0.1:8000/api/productos/'),
-      ]);
-
-      const clientes = await clientesRes.json();
-      const pedidos = await pedidosRes.json();
-      const productos = await productosRes.json();
-
+      // Todas las cifras en una petición (contadores del servidor, en caché)
+      const { data } = await dashboardAPI.stats();
       setStats({
-        totalClientes: clientes.length,
-        totalPedidos: pedidos.length,
-        totalProductos: productos.length,
-        pedidosPendientes: pedidos.filter(p => p.estado === 'pendiente').length,
+        totalClientes: data.clientes.total,
+        totalPedidos: data.pedidos.total,
+        totalProductos: data.productos.total,
+        pedidosPendientes: data.pedidos.pendientes,
       });
+      setPedidosPorEstado(
+        data.pedidos.por_estado
+          .filter((estado) => estado.cantidad > 0)
+          .map((estado) => ({
+            estado: estado.estado,
+            name: estado.nombre,
+            value: estado.cantidad,
+            color: COLORES_ESTADO[estado.estado] || '#6B7280',
+          }))
+      );
     } catch (error) {
       console.error('Error fetching stats:', error);
     }
   };
 
-  // Datos de ejemplo para gráficos
-  const pedidosPorEstado = [
-    { name: 'Pendiente', value: 12, color: '#F59E0B' },
-    { name: 'En Producción', value: 8, color: '#3B82F6' },
-    { name: 'Producido', value: 15, color: '#8B5CF6' },
-    { name: 'Entregado', value: 25, color: '#10B981' },
-  ];
-
-  const ventasMensuales = [
-    { mes: 'Ene', ventas: 45000 },
-    { mes: 'Feb', ventas: 52000 },
-    { mes: 'Mar', ventas: 48000 },
-    { mes: 'Abr', ventas: 61000 },
-    { mes: 'May', ventas: 55000 },
-    { mes: 'Jun', ventas: 67000 },
-  ];
-
-  const productosMasVendidos = [
-    { producto: 'Mesa Comedor', cantidad: 45 },
-    { producto: 'Silla Oficina', cantidad: 38 },
-    { producto: 'Estantería', cantidad: 32 },
-    { producto: 'Escritorio', cantidad: 28 },
-  ];
+  // Gráficos de ventas: agregados diarios del servidor
+  const fetchGraficos = async () => {
+    try {
+      const desde = inicioMes(5);
+      const [mensualesRes, productosRes] = await Promise.all([
+        pedidosAPI.ventas({ desde, periodo: 'mes' }),
+        pedidosAPI.ventas({ desde, agrupar: 'producto', orden: 'unidades', limite: 5 }),
+      ]);
+
+      setVentasMensuales(
+        mensualesRes.data.resultados.map((fila) => ({
+          mes: new Date(`${fila.periodo}T00:00:00`).toLocaleDateString('es-ES', { month: 'short' }),
+          ventas: Number(fila.importe),
+        }))
+      );
+      setProductosMasVendidos(
+        productosRes.data.resultados.map((fila) => ({ producto: fila.nombre, cantidad: fila.unidades }))
+      );
+    } catch (error) {
+      console.error('Error fetching charts:', error);
+    }
+  };
+
+  const enProduccion = pedidosPorEstado.find((fila) => fila.estado === 'en_produccion')?.value || 0;
 
   return (
     <div className="space-y-6">
@@ -133,7 +158,7 @@ export default function Dashboard() {
           <div className="flex items-center justify-between">
             <div>
               <p className="text-amber-100 text-sm font-medium">En Producción</p>
-              <p className="text-4xl font-bold mt-2">8</p>
+              <p className="text-4xl font-bold mt-2">{enProduccion}</p>
             </div>
             <div className="w-16 h-16 bg-white bg-opacity-20 rounded-lg flex items-center justify-center">
               <span className="text-4xl">⚙️</span>
@@ -41,6 +41,7 @@ export default function Pedidos() {
   
   const [formErrors, setFormErrors] = useState({});
   const [submitting, setSubmitting] = useState(false);
+  const [calculandoPlazo, setCalculandoPlazo] = useState(false);
 
   useEffect(() => {
     fetchData();
@@ -129,9 +130,6 @@ export default function Pedidos() {
   const validateForm = () => {
     const errors = {};
     
-    if (!formData.numero_pedido.trim()) {
-      errors.numero_pedido = 'El número de pedido es obligatorio';
-    }
     if (!formData.cliente) {
       errors.cliente = 'Debe seleccionar un cliente';
     }
@@ -158,36 +156,23 @@ export default function Pedidos() {
     try {
       setSubmitting(true);
       
+      // Cabecera y líneas en una sola petición; el total lo calcula el servidor
       const pedidoData = {
         ...formData,
-        total: calcularTotal(),
+        lineas: lineas
+          .filter(l => l.producto && l.cantidad > 0)
+          .map(l => ({
+            producto: l.producto,
+            cantidad: l.cantidad,
+            precio_unitario: l.precio_unitario,
+          })),
       };
 
       if (isEditing) {
         await pedidosAPI.update(editingId, pedidoData);
         toast.success('Pedido actualizado exitosamente', { id: loadingToast });
       } else {
-        const pedidoResponse = await pedidosAPI.create(pedidoData);
-        const pedidoId = pedidoResponse.data.id;
-        
-        const lineasValidas = lineas.filter(l => l.producto && l.cantidad > 0);
-        
-        for (const linea of lineasValidas) {
-          await fetch('http://127.0.0.1:8000/api/lineas-pedido/', {
-            method: 'POST',
-            headers: {
-              'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({
-              pedido: pedidoId,
-              producto: linea.producto,
-              cantidad: linea.cantidad,
-              precio_unitario: linea.precio_unitario,
-              subtotal: linea.cantidad * linea.precio_unitario,
-            }),
-          });
-        }
-        
+        await pedidosAPI.create(pedidoData);
         toast.success('Pedido creado exitosamente', { id: loadingToast });
       }
       
@@ -212,6 +197,30 @@ export default function Pedidos() {
       setSubmitting(false);
     }
   };
+  // Primera fecha que el taller puede cumplir con la carga actual
+  const calcularPlazo = async () => {
+    const lineasValidas = lineas
+      .filter(l => l.producto && l.cantidad > 0)
+      .map(l => ({ producto: l.producto, cantidad: l.cantidad }));
+    if (lineasValidas.length === 0) {
+      toast.error('Agregue productos para calcular el plazo');
+      return;
+    }
+
+    try {
+      setCalculandoPlazo(true);
+      const response = await pedidosAPI.plazoEntrega({ lineas: lineasValidas, pedido: editingId });
+      setFormData(prev => ({ ...prev, fecha_entrega_estimada: response.data.fecha_entrega }));
+      setFormErrors(prev => ({ ...prev, fecha_entrega_estimada: undefined }));
+      toast.success(`${response.data.horas} h de fabricación`);
+    } catch (err) {
+      console.error('Error calculating plazo:', err);
+      toast.error(err.response?.data?.error || 'Error al calcular el plazo de entrega');
+    } finally {
+      setCalculandoPlazo(false);
+    }
+  };
+
 const handleEdit = async (pedidoId) => {
     try {
       const response = await pedidosAPI.getById(pedidoId);
@@ -246,20 +255,15 @@ const handleEdit = async (pedidoId) => {
     const loadingToast = toast.loading('Actualizando estado...');
     
     try {
-      const pedidoResponse = await pedidosAPI.getById(pedidoId);
-      const pedido = pedidoResponse.data;
-      
-      await pedidosAPI.update(pedidoId, {
-        ...pedido,
-        estado: nuevoEstado,
-      });
+      await pedidosAPI.cambiarEstado([pedidoId], nuevoEstado);
       
       fetchData();
       
       toast.success('Estado actualizado exitosamente', { id: loadingToast });
     } catch (err) {
       console.error('Error updating estado:', err);
-      toast.error('Error al actualizar el estado', { id: loadingToast });
+      // El servidor rechaza los cambios de estado no permitidos
+      toast.error(err.response?.data?.error || 'Error al actualizar el estado', { id: loadingToast });
     }
   };
 
@@ -573,6 +577,11 @@ const handleEdit = async (pedidoId) => {
                 </td>
                 <td className="px-6 py-4 whitespace-nowrap text-sm text-gray-900">
                   {pedido.cliente_nombre}
+                  {pedido.resumen_productos && (
+                    <div className="text-xs text-gray-500 truncate max-w-xs" title={pedido.resumen_productos}>
+                      {pedido.resumen_productos}
+                    </div>
+                  )}
                 </td>
                 <td className="px-6 py-4 whitespace-nowrap text-sm text-gray-500">
                   {formatearFecha(pedido.fecha_pedido)}
@@ -724,21 +733,17 @@ const handleEdit = async (pedidoId) => {
             <div className="grid grid-cols-1 md:grid-cols-2 gap-4">
               <div>
                 <label className="block text-sm font-medium text-gray-700 mb-1">
-                  Número de Pedido *
+                  Número de Pedido
                 </label>
+                {/* Lo asigna el servidor al crear el pedido */}
                 <input
                   type="text"
                   name="numero_pedido"
                   value={formData.numero_pedido}
-                  onChange={handleInputChange}
-                  className={`w-full px-3 py-2 border rounded-md focus:outline-none focus:ring-2 focus:ring-green-500 ${
-                    formErrors.numero_pedido ? 'border-red-500' : 'border-gray-300'
-                  }`}
-                  placeholder="PED-2026-001"
+                  readOnly
+                  className="w-full px-3 py-2 border border-gray-300 rounded-md bg-gray-100 text-gray-600"
+                  placeholder="Se asigna al guardar"
                 />
-                {formErrors.numero_pedido && (
-                  <p className="text-red-500 text-xs mt-1">{formErrors.numero_pedido}</p>
-                )}
               </div>
 
               <div>
@@ -769,15 +774,26 @@ const handleEdit = async (pedidoId) => {
                 <label className="block text-sm font-medium text-gray-700 mb-1">
                   Fecha Entrega Estimada *
                 </label>
-                <input
-                  type="date"
-                  name="fecha_entrega_estimada"
-                  value={formData.fecha_entrega_estimada}
-                  onChange={handleInputChange}
-                  className={`w-full px-3 py-2 border rounded-md focus:outline-none focus:ring-2 focus:ring-green-500 ${
-                    formErrors.fecha_entrega_estimada ? 'border-red-500' : 'border-gray-300'
-                  }`}
-                />
+                <div className="flex gap-2">
+                  <input
+                    type="date"
+                    name="fecha_entrega_estimada"
+                    value={formData.fecha_entrega_estimada}
+                    onChange={handleInputChange}
+                    className={`w-full px-3 py-2 border rounded-md focus:outline-none focus:ring-2 focus:ring-green-500 ${
+                      formErrors.fecha_entrega_estimada ? 'border-red-500' : 'border-gray-300'
+                    }`}
+                  />
+                  <button
+                    type="button"
+                    onClick={calcularPlazo}
+                    disabled={calculandoPlazo}
+                    title="Primera fecha posible según la carga del taller"
+                    className="px-3 py-2 text-sm border border-green-600 text-green-700 rounded-md hover:bg-green-50 disabled:opacity-50 whitespace-nowrap"
+                  >
+                    {calculandoPlazo ? 'Calculando...' : 'Calcular'}
+                  </button>
+                </div>
                 {formErrors.fecha_entrega_estimada && (
                   <p className="text-red-500 text-xs mt-1">{formErrors.fecha_entrega_estimada}</p>
                 )}
@@ -791,7 +807,9 @@ const handleEdit = async (pedidoId) => {
                   name="estado"
                   value={formData.estado}
                   onChange={handleInputChange}
-                  className="w-full px-3 py-2 border border-gray-300 rounded-md focus:outline-none focus:ring-2 focus:ring-green-500"
+                  // Un pedido nuevo siempre empieza en 'pendiente'
+                  disabled={!editingId}
+                  className="w-full px-3 py-2 border border-gray-300 rounded-md focus:outline-none focus:ring-2 focus:ring-green-500 disabled:bg-gray-100"
                 >
                   <option value="pendiente">Pendiente</option>
                   <option value="en_produccion">En Producción</option>
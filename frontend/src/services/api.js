@@ -99,8 +99,31 @@ export const pedidosAPI = {
   getById: (id) => api.get(`/pedidos/${id}/`),
   create: (data) => api.post('/pedidos/', data),
   update: (id, data) => api.put(`/pedidos/${id}/`, data),
+  patch: (id, data) => api.patch(`/pedidos/${id}/`, data),
   delete: (id) => api.delete(`/pedidos/${id}/`),
   porEstado: (estado) => api.get(`/pedidos/por_estado/?estado=${estado}`),
+  cambiarEstado: (ids, estado, parcial = false) => api.post('/pedidos/cambiar_estado/', { ids, estado, parcial }),
+  estados: () => api.get('/pedidos/estados/'),
+  ventas: (params) => api.get('/pedidos/ventas/', { params }),
+  plazoEntrega: (data) => api.post('/pedidos/plazo_entrega/', data),
+};
+
+export const produccionAPI = {
+  listaMateriales: (params) => api.get('/lista-materiales/', { params }),
+  createComponente: (data) => api.post('/lista-materiales/', data),
+  updateComponente: (id, data) => api.put(`/lista-materiales/${id}/`, data),
+  deleteComponente: (id) => api.delete(`/lista-materiales/${id}/`),
+  necesidades: (params) => api.get('/produccion/necesidades/', { params }),
+  puestos: (params) => api.get('/puestos-trabajo/', { params }),
+  createPuesto: (data) => api.post('/puestos-trabajo/', data),
+  updatePuesto: (id, data) => api.put(`/puestos-trabajo/${id}/`, data),
+  ordenesTrabajo: (params) => api.get('/ordenes-trabajo/', { params }),
+  resumenPlan: () => api.get('/ordenes-trabajo/resumen/'),
+  replanificar: (data) => api.post('/ordenes-trabajo/replanificar/', data),
+};
+
+export const dashboardAPI = {
+  stats: () => api.get('/dashboard/stats/'),
 };
 
 export default api;
\ No newline at end of file